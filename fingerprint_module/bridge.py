@@ -8,23 +8,51 @@ Requirements:
     pip install -r requirements-flask.txt pyserial
 
 Usage:
-    python bridge.py                              # attendance + auto-detect port
+    python bridge.py                              # attendance on every Pico found (hot-plug)
     python bridge.py --port /dev/ttyACM0
+    python bridge.py --port /dev/ttyACM0 --port /dev/ttyACM1
     python bridge.py --enroll                     # prompt name/email/slot, then enroll on Pico
     python bridge.py --enroll LEGACY_EMP_ID 15    # link existing Node employee (PATCH /api/...), optional
+    python bridge.py --no-outbox --workers 2      # in-memory parallel dispatch (order not preserved)
+    python bridge.py --text-link                  # plain text lines only (no framed link)
+
+Serial reading and HTTP dispatch are decoupled: one reader thread per Pico
+(``DeviceManager``) tags and queues events; ``Dispatcher`` workers drain the queue
+over a pooled keep-alive session. ATTENDANCE / ENROLL_SUCCESS events are journaled
+to a SQLite outbox (``--outbox``, ``ROSE_BRIDGE_OUTBOX``) first, so scans made while
+the API is down are replayed later.
+
+Each reader offers the Pico a framed, acknowledged link (``HELLO:1``): events then
+arrive as CRC-checked frames with sequence numbers, the bridge acks them once
+queued, and the Pico retransmits whatever was not acked. The Pico buffers scans
+(RAM ring + flash) while no bridge is listening and flushes them, dated from the
+``TIME:`` line sent at connect, after the next HELLO. Firmware that does not
+answer the HELLO keeps working over text lines.
 """
 
 from __future__ import annotations
 
 import argparse
 import glob
+import json
 import os
+import queue
+import random
+import sqlite3
 import sys
+import threading
 import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from pathlib import Path  # noqa: F401 – used in _load_service_key
 
 import requests
 import serial
+import serial.tools.list_ports
+from requests.adapters import HTTPAdapter
 
 # fingerprint_module root (for stable_employee_id shared with Flask)
 _ROOT = Path(__file__).resolve().parent
@@ -44,6 +72,34 @@ LEGACY_API = EXPRESS_API
 BAUD_RATE = 115_200
 TIMEOUT = 1
 RETRY_LIMIT = 3
+# Exponential backoff with full jitter between retries: sleep U(0, min(CAP, BASE * 2**attempt))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+# 4xx statuses that mean "try again later", not "request rejected" (rate limiting);
+# every 5xx is retried as well, see ``retryable_status``
+RETRY_AFTER_STATUS = frozenset({429})
+# Keep-alive pool shared by every HTTP call (Express + Flask are two hosts)
+HTTP_POOL_SIZE = 4
+# Events waiting for HTTP dispatch; the serial reader only blocks once this fills up
+DISPATCH_QUEUE_SIZE = 1000
+# Durable outbox: every ATTENDANCE / ENROLL_SUCCESS is written here before dispatch
+OUTBOX_PATH = os.environ.get("ROSE_BRIDGE_OUTBOX", str(_ROOT / "bridge_outbox.sqlite3"))
+OUTBOX_BATCH = 50
+# Delivered event ids are remembered this long, so a scan the Pico replays after a
+# reboot (same event id, see pico_firmware's origin) is not posted twice
+DELIVERED_KEEP_S = 30 * 24 * 3600
+# Multi-device: how often to look for newly plugged / re-plugged Picos
+RESCAN_INTERVAL = 2.0
+# Pico resets when the port opens; give the firmware time before writing to it
+OPEN_SETTLE_S = 2.0
+# Port discovery: Raspberry Pi USB vendor id (Pico / Pico W running MicroPython)
+PICO_USB_VID = 0x2E8A
+# Handshake the Rose firmware answers with ``PONG:ROSE/<version>``
+HANDSHAKE_LINE = b"PING\r\n"
+HANDSHAKE_REPLY = "PONG:ROSE"
+# The firmware reads host commands between scan ticks, so allow a couple of ticks
+PROBE_TIMEOUT = 2.5
+PORT_CACHE_PATH = os.environ.get("ROSE_BRIDGE_PORT_CACHE", str(_ROOT / ".bridge_port_cache.json"))
 
 
 def _load_service_key() -> str:
@@ -66,31 +122,161 @@ SERVICE_KEY = _load_service_key()
 
 # Major step: pending interactive enroll — filled when user runs ``--enroll`` with prompts
 _pending_enroll: dict | None = None
+# Reader threads (one per device) share ``handle_line``
+_pending_lock = threading.Lock()
+
+# Highest AS608 template slot the bridge will enroll into
+MAX_SLOT = 162
+# Occupied template slots last reported by each Pico (``SLOTS:`` reply to ``SLOTS?``)
+_occupancy: dict[str, set[int]] = {}
+_occupancy_cond = threading.Condition()
 
 
 # ── Serial port auto-detection ────────────────────────────────────────────────
 
-def detect_pico_port() -> str | None:
-    """Return the first likely Pico W serial port, or None."""
-    # On Windows, scan COM1–COM20; on Linux/Mac, check ttyACM/usbmodem
-    windows_ports = [f"COM{i}" for i in range(1, 21)]
-    candidates = (
-        glob.glob("/dev/ttyACM*")
-        + glob.glob("/dev/tty.usbmodem*")
-        + windows_ports
-    )
-    for port in candidates:
-        try:
-            s = serial.Serial(port, BAUD_RATE, timeout=0.2)
-            s.close()
-            return port
-        except (serial.SerialException, OSError):
-            continue
+def _port_info(port: str):
+    for info in serial.tools.list_ports.comports():
+        if info.device == port:
+            return info
     return None
 
 
+def discover_pico_ports() -> list[str]:
+    """
+    Every port that looks like a Pico W, from OS metadata only (nothing is opened):
+    USB vendor id ``PICO_USB_VID``, plus ``ttyACM*`` / ``tty.usbmodem*`` names the
+    OS reports no USB id for. A port with another vendor's id is never included.
+    """
+    vids = {p.device: p.vid for p in serial.tools.list_ports.comports()}
+    ports = {device for device, vid in vids.items() if vid == PICO_USB_VID}
+    if os.name != "nt":
+        named = glob.glob("/dev/ttyACM*") + glob.glob("/dev/tty.usbmodem*")
+        ports.update(device for device in named if vids.get(device) is None)
+    return sorted(ports)
+
+
+def probe_port(port: str, timeout: float = PROBE_TIMEOUT, stop: threading.Event | None = None) -> bool:
+    """
+    Send the handshake line and wait for the Rose firmware's ``PONG`` reply;
+    setting ``stop`` gives up early and closes the port.
+    """
+    stop = stop or threading.Event()
+    timer = threading.Timer(timeout, stop.set)
+    try:
+        with serial.Serial(port, BAUD_RATE, timeout=0.05) as ser:
+            ser.write(HANDSHAKE_LINE)
+            timer.start()
+            for line in read_lines(ser, stop):
+                if line.startswith(HANDSHAKE_REPLY):
+                    return True
+    except (serial.SerialException, OSError):
+        pass
+    finally:
+        timer.cancel()
+    return False
+
+
+def _load_port_cache(path: str) -> dict:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_port_cache(path: str, port: str) -> None:
+    info = _port_info(port)
+    entry = {"port": port, "serial_number": getattr(info, "serial_number", None)}
+    try:
+        Path(path).write_text(json.dumps(entry), encoding="utf-8")
+    except OSError:
+        pass
+
+
+def detect_pico_port(
+    candidates: list[str] | None = None,
+    cache_path: str | None = PORT_CACHE_PATH,
+    timeout: float = PROBE_TIMEOUT,
+) -> str | None:
+    """
+    Return the Pico W running Rose firmware, or None.
+
+    1. The cached port from the last run is reused without opening it if it is
+       still present (and, when the OS reports one, has the same USB serial number).
+    2. Otherwise ``candidates`` (default ``discover_pico_ports()``) are probed in
+       parallel with the handshake; the first to answer wins and is cached.
+    3. If nothing answers (e.g. older firmware without PING), the first candidate
+       is returned as before.
+    """
+    if candidates is None:
+        candidates = discover_pico_ports()
+
+    if cache_path:
+        cached = _load_port_cache(cache_path)
+        port = cached.get("port")
+        if port in candidates:
+            info = _port_info(port)
+            if not cached.get("serial_number") or getattr(info, "serial_number", None) == cached["serial_number"]:
+                return port
+
+    if not candidates:
+        return None
+
+    pool = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="bridge-probe")
+    stops = [threading.Event() for _ in candidates]
+    pending = {pool.submit(probe_port, port, timeout, stop): port for port, stop in zip(candidates, stops)}
+    found = None
+    try:
+        while pending and found is None:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                port = pending.pop(fut)
+                if fut.result() and found is None:
+                    found = port
+    finally:
+        # Major step: stop the losing probes and wait until their ports are closed, so a
+        # DeviceReader opened next never shares a port with a probe still reading it
+        for stop in stops:
+            stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    if found is None:
+        print(f"  ⚠  No Rose handshake reply; assuming {candidates[0]}")
+        return candidates[0]
+    if cache_path:
+        _save_port_cache(cache_path, found)
+    return found
+
+
+def device_id_for(port: str) -> str:
+    """
+    Stable tag for events from ``port``: the USB serial number when the OS reports
+    one (survives re-enumeration as a different ttyACM), else the port's basename.
+    """
+    info = _port_info(port)
+    if info is not None and info.serial_number:
+        return info.serial_number
+    return os.path.basename(port)
+
+
 # ── HTTP helpers (Flask API) ─────────────────────────────────────────────────
 
+def _make_session() -> requests.Session:
+    """One keep-alive session so repeated scans reuse pooled TCP connections."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_session = _make_session()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Seconds to wait after failed ``attempt`` (1-based): capped exponential, full jitter."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
 def _service_headers() -> dict:
     """Return headers for Express service-to-service calls."""
     h = {"Content-Type": "application/json"}
@@ -99,101 +285,416 @@ def _service_headers() -> dict:
     return h
 
 
-def post_register_user(name: str, email: str, fingerprint_id: int) -> None:
-    """Persist new member after successful template storage (Flask register_user, then link to MongoDB)."""
-    body = {"name": name, "email": email, "fingerprint_id": fingerprint_id}
-    for attempt in range(1, RETRY_LIMIT + 1):
-        try:
-            r = requests.post(f"{FLASK_API}/register_user", json=body, timeout=10)
-            data = r.json() if r.text else {}
-            if r.status_code == 201:
-                print(f"  ✔  Registered in Flask: {data.get('user', {}).get('fullName', name)}")
-                # Also link to MongoDB employee by email
-                link_r = requests.patch(
-                    f"{EXPRESS_API}/employees/enroll-fingerprint-by-email",
-                    json={"email": email, "fingerprintId": fingerprint_id},
-                    headers=_service_headers(),
-                    timeout=5,
-                )
-                if link_r.ok:
-                    print(f"  ✔  Linked to MongoDB employee ({email})")
-                else:
-                    print(f"  ⚠  MongoDB link failed ({link_r.status_code}) — employee may not exist in HR data yet")
-            elif r.status_code == 409:
-                print(f"  ✘  Conflict: {data.get('error')}")
-            else:
-                print(f"  ✘  Server error ({r.status_code}): {data.get('error', r.text)}")
-            return
-        except requests.RequestException as e:
-            print(f"  ⚠  HTTP error (attempt {attempt}/{RETRY_LIMIT}): {e}")
-            time.sleep(1)
-    print("  ✘  All retries exhausted for register_user.")
+def retryable_status(status: int) -> bool:
+    """
+    True for statuses worth retrying: RETRY_AFTER_STATUS and every 5xx (Express
+    answers 500 from its catch block when Mongo is down).
+    """
+    return status in RETRY_AFTER_STATUS or status >= 500
 
 
-def post_attendance(fingerprint_id: int) -> None:
-    """Mark attendance in MongoDB via Express API (service token auth)."""
+def _request(method: str, url: str, what: str, **kwargs) -> requests.Response | None:
+    """
+    Send one request through the pooled session, retrying transport errors and
+    retryable statuses (``retryable_status``) with backoff. Returns None once
+    ``RETRY_LIMIT`` attempts have failed (the caller treats that as "API
+    unreachable", so a journaled event stays in the outbox).
+    """
     for attempt in range(1, RETRY_LIMIT + 1):
         try:
-            r = requests.post(
-                f"{EXPRESS_API}/attendance/scan",
-                json={"fingerprintId": fingerprint_id},
-                headers=_service_headers(),
-                timeout=5,
-            )
-            data = r.json() if r.text else {}
-            if r.ok:
-                emp = data.get("employee", {})
-                name = emp.get("fullName") or emp.get("employeeId", str(fingerprint_id))
-                print(f"  ✔  {data.get('message', f'Attendance marked for {name}')}")
-            else:
-                print(f"  ✘  Server error ({r.status_code}): {data.get('error')}")
-            return
+            r = _session.request(method, url, **kwargs)
+            if not retryable_status(r.status_code):
+                return r
+            print(f"  ⚠  API unavailable ({r.status_code}) (attempt {attempt}/{RETRY_LIMIT})")
         except requests.RequestException as e:
             print(f"  ⚠  HTTP error (attempt {attempt}/{RETRY_LIMIT}): {e}")
-            time.sleep(1)
-    print("  ✘  All retries exhausted for attendance scan.")
+        if attempt < RETRY_LIMIT:
+            time.sleep(backoff_delay(attempt))
+    print(f"  ✘  All retries exhausted for {what}.")
+    return None
 
 
-def patch_enroll_legacy(employee_id: str, fingerprint_id: int) -> None:
+def post_register_user(name: str, email: str, fingerprint_id: int) -> bool:
+    """Persist new member after successful template storage (Flask register_user, then link to MongoDB)."""
+    body = {"name": name, "email": email, "fingerprint_id": fingerprint_id}
+    r = _request("POST", f"{FLASK_API}/register_user", "register_user", json=body, timeout=10)
+    if r is None:
+        return False
+    data = r.json() if r.text else {}
+    if r.status_code == 201:
+        print(f"  ✔  Registered in Flask: {data.get('user', {}).get('fullName', name)}")
+        # Also link to MongoDB employee by email
+        link_r = _request(
+            "PATCH",
+            f"{EXPRESS_API}/employees/enroll-fingerprint-by-email",
+            "MongoDB link",
+            json={"email": email, "fingerprintId": fingerprint_id},
+            headers=_service_headers(),
+            timeout=5,
+        )
+        if link_r is not None and link_r.ok:
+            print(f"  ✔  Linked to MongoDB employee ({email})")
+        elif link_r is not None:
+            print(f"  ⚠  MongoDB link failed ({link_r.status_code}) — employee may not exist in HR data yet")
+    elif r.status_code == 409:
+        print(f"  ✘  Conflict: {data.get('error')}")
+    else:
+        print(f"  ✘  Server error ({r.status_code}): {data.get('error', r.text)}")
+    return True
+
+
+def post_attendance(
+    fingerprint_id: int,
+    captured_at: str | None = None,
+    event_id: str | None = None,
+    device_id: str | None = None,
+) -> bool:
+    """
+    Mark attendance in MongoDB via Express API (service token auth).
+    ``captured_at`` (ISO 8601) lets outbox replays count the scan on the day it happened.
+    """
+    body: dict = {"fingerprintId": fingerprint_id}
+    if captured_at:
+        body["capturedAt"] = captured_at
+    if event_id:
+        body["eventId"] = event_id
+    if device_id:
+        body["deviceId"] = device_id
+    r = _request(
+        "POST",
+        f"{EXPRESS_API}/attendance/scan",
+        "attendance scan",
+        json=body,
+        headers=_service_headers(),
+        timeout=5,
+    )
+    if r is None:
+        return False
+    data = r.json() if r.text else {}
+    if r.ok:
+        emp = data.get("employee", {})
+        name = emp.get("fullName") or emp.get("employeeId", str(fingerprint_id))
+        print(f"  ✔  {data.get('message', f'Attendance marked for {name}')}")
+    else:
+        print(f"  ✘  Server error ({r.status_code}): {data.get('error')}")
+    return True
+
+
+def patch_enroll_legacy(employee_id: str, fingerprint_id: int) -> bool:
     """Link template to an existing Express employeeId via PATCH (no Flask body needed)."""
-    for attempt in range(1, RETRY_LIMIT + 1):
-        try:
-            r = requests.patch(
-                f"{EXPRESS_API}/employees/enroll-fingerprint",
-                json={"employeeId": employee_id, "fingerprintId": fingerprint_id},
-                headers=_service_headers(),
-                timeout=5,
+    r = _request(
+        "PATCH",
+        f"{EXPRESS_API}/employees/enroll-fingerprint",
+        "legacy enrollment",
+        json={"employeeId": employee_id, "fingerprintId": fingerprint_id},
+        headers=_service_headers(),
+        timeout=5,
+    )
+    if r is None:
+        return False
+    data = r.json() if r.text else {}
+    if r.ok:
+        print(f"  ✔  Enrolled in MongoDB: {data.get('message', 'OK')}")
+    elif r.status_code == 409:
+        print(f"  ✘  Conflict: {data.get('error')}")
+    else:
+        print(f"  ✘  Server error ({r.status_code}): {data.get('error')}")
+    return True
+
+
+# ── Pipelined dispatch (serial reader → queue → HTTP worker) ──────────────────
+
+def _utc_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+@dataclass
+class BridgeEvent:
+    """One unit of HTTP work produced by the serial reader."""
+
+    kind: str  # "attendance" | "register" | "enroll_legacy"
+    payload: dict
+    event_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    captured_at: str = field(default_factory=_utc_iso)
+    device: str = ""  # which Pico produced it (see ``device_id_for``)
+    received_at: float = field(default_factory=time.monotonic)
+
+
+def deliver(event: BridgeEvent) -> bool:
+    """Run the HTTP call for ``event``; False means the API was unreachable or kept failing (5xx / 429)."""
+    p = event.payload
+    if event.kind == "attendance":
+        return post_attendance(p["fingerprint_id"], event.captured_at, event.event_id, event.device)
+    if event.kind == "register":
+        return post_register_user(p["name"], p["email"], p["fingerprint_id"])
+    if event.kind == "enroll_legacy":
+        return patch_enroll_legacy(p["employee_id"], p["fingerprint_id"])
+    print(f"  ⚠  Unknown event kind: {event.kind!r}")
+    return True
+
+
+class Outbox:
+    """
+    SQLite journal of events not yet accepted by the API.
+
+    Rows are inserted before dispatch and deleted only after the API answers, so
+    scans captured during an outage (or before a crash) are replayed in capture
+    order on the next run. ``event_id`` is unique: re-adding an event is a no-op,
+    also for DELIVERED_KEEP_S after it was delivered (the Express API does not
+    deduplicate by event id).
+    """
+
+    def __init__(self, path: str = OUTBOX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id    TEXT NOT NULL UNIQUE,
+                kind        TEXT NOT NULL,
+                payload     TEXT NOT NULL,
+                captured_at TEXT NOT NULL,
+                attempts    INTEGER NOT NULL DEFAULT 0
             )
-            data = r.json() if r.text else {}
-            if r.ok:
-                print(f"  ✔  Enrolled in MongoDB: {data.get('message', 'OK')}")
-            elif r.status_code == 409:
-                print(f"  ✘  Conflict: {data.get('error')}")
-            else:
-                print(f"  ✘  Server error ({r.status_code}): {data.get('error')}")
+            """
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(outbox)")}
+        if "device" not in columns:  # journals written before multi-device support
+            self._db.execute("ALTER TABLE outbox ADD COLUMN device TEXT NOT NULL DEFAULT ''")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS delivered (event_id TEXT PRIMARY KEY, delivered_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS delivered_at ON delivered (delivered_at)")
+        self._acks = 0
+        self._prune()
+
+    def _prune(self) -> None:
+        self._db.execute("DELETE FROM delivered WHERE delivered_at < ?", (time.time() - DELIVERED_KEEP_S,))
+
+    def add(self, event: BridgeEvent) -> bool:
+        """Persist ``event``; returns False if its ``event_id`` was already recorded."""
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO outbox (event_id, kind, payload, captured_at, device) "
+                "SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM delivered WHERE event_id = ?)",
+                (event.event_id, event.kind, json.dumps(event.payload), event.captured_at, event.device,
+                 event.event_id),
+            )
+            return cur.rowcount == 1
+
+    def batch(self, limit: int = OUTBOX_BATCH) -> list[tuple[int, BridgeEvent]]:
+        """Oldest ``limit`` pending events, in capture order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, event_id, kind, payload, captured_at, device FROM outbox ORDER BY seq LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            (
+                seq,
+                BridgeEvent(
+                    kind, json.loads(payload), event_id=event_id, captured_at=captured_at, device=device
+                ),
+            )
+            for seq, event_id, kind, payload, captured_at, device in rows
+        ]
+
+    def ack(self, seq: int) -> None:
+        """Delete a delivered row, remembering its event id."""
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT OR REPLACE INTO delivered (event_id, delivered_at) "
+                "SELECT event_id, ? FROM outbox WHERE seq = ?",
+                (time.time(), seq),
+            )
+            self._db.execute("DELETE FROM outbox WHERE seq = ?", (seq,))
+            self._db.execute("COMMIT")
+            self._acks += 1
+            if self._acks % 1000 == 0:
+                self._prune()
+
+    def mark_attempt(self, seq: int) -> None:
+        with self._lock:
+            self._db.execute("UPDATE outbox SET attempts = attempts + 1 WHERE seq = ?", (seq,))
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class Dispatcher:
+    """
+    Background HTTP workers fed by a bounded queue, so retries and slow API calls
+    never stop the serial loop from reading the Pico.
+
+    With an ``Outbox`` the queue is the on-disk journal instead: a single worker
+    replays it in order, in batches, and backs off while the API is unreachable.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        maxsize: int = DISPATCH_QUEUE_SIZE,
+        outbox: Outbox | None = None,
+    ):
+        self._queue: queue.Queue[BridgeEvent | None] = queue.Queue(maxsize)
+        self._outbox = outbox
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        # Order matters for replay, so the outbox is drained by exactly one worker
+        self._workers = 1 if outbox is not None else workers
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        # Seconds from serial read to HTTP completion, most recent events only
+        self.latencies: deque[float] = deque(maxlen=10_000)
+        self.processed = 0
+
+    def start(self) -> None:
+        self._stopping.clear()
+        target = self._run_outbox if self._outbox is not None else self._run
+        for i in range(self._workers):
+            t = threading.Thread(target=target, name=f"bridge-dispatch-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, event: BridgeEvent) -> None:
+        if self._outbox is None:
+            self._queue.put(event)
             return
-        except requests.RequestException as e:
-            print(f"  ⚠  HTTP error (attempt {attempt}/{RETRY_LIMIT}): {e}")
-            time.sleep(1)
-    print("  ✘  All retries exhausted for legacy enrollment.")
+        if not self._outbox.add(event):
+            print(f"  ⚠  Duplicate event {event.event_id} ignored")
+        self._wake.set()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Let workers finish queued events, then join them (outbox rows left undelivered persist)."""
+        self._stopping.set()
+        self._wake.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
+
+    def depth(self) -> int:
+        if self._outbox is not None:
+            return self._outbox.depth()
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lat = sorted(self.latencies)
+            processed = self.processed
+        def pct(q: float) -> float:
+            return lat[min(len(lat) - 1, int(q * len(lat)))] * 1000 if lat else 0.0
+        return {
+            "processed": processed,
+            "queued": self.depth(),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": lat[-1] * 1000 if lat else 0.0,
+        }
+
+    def _record(self, event: BridgeEvent) -> None:
+        with self._lock:
+            self.latencies.append(time.monotonic() - event.received_at)
+            self.processed += 1
+
+    def _run(self) -> None:
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+            try:
+                deliver(event)
+            except Exception as e:  # keep the worker alive whatever the API returns
+                print(f"  ✘  Dispatch failed for {event.kind}: {e}")
+            self._record(event)
+
+    def _run_outbox(self) -> None:
+        outages = 0
+        while True:
+            self._wake.clear()
+            rows = self._outbox.batch()
+            if not rows:
+                if self._stopping.is_set():
+                    return
+                self._wake.wait()
+                continue
+            for seq, event in rows:
+                try:
+                    ok = deliver(event)
+                except Exception as e:  # malformed row: drop it rather than block the journal
+                    print(f"  ✘  Dispatch failed for {event.kind}: {e}")
+                    ok = True
+                if not ok:
+                    # API unreachable: keep this row at the head and retry the batch later
+                    self._outbox.mark_attempt(seq)
+                    outages += 1
+                    print(f"  ⚠  API unreachable — {self._outbox.depth()} event(s) waiting in outbox")
+                    if self._stopping.is_set():
+                        return
+                    self._stopping.wait(backoff_delay(min(outages, 6)) + BACKOFF_BASE)
+                    break
+                self._outbox.ack(seq)
+                self._record(event)
+                if outages:
+                    outages = 0
+                    print(f"  ✔  API reachable again — replaying outbox ({self._outbox.depth()} left)")
+            else:
+                # Stopping: finish the batch in flight; the rest stays journaled for next start
+                if self._stopping.is_set():
+                    return
+
+
+# Set by ``main``; when None, ``handle_line`` delivers inline (scripts / tests)
+_dispatcher: Dispatcher | None = None
+
+
+def _dispatch(event: BridgeEvent) -> None:
+    if _dispatcher is not None:
+        _dispatcher.submit(event)
+    else:
+        deliver(event)
 
 
 # ── Command dispatcher ────────────────────────────────────────────────────────
 
-def handle_line(line: str) -> None:
+def handle_line(
+    line: str, device: str = "", event_id: str | None = None, captured_at: str | None = None
+) -> None:
+    """
+    Parse one Pico line; ``device`` tags the resulting events and log lines.
+    ``event_id`` (from a framed link) makes a retransmitted event collapse into
+    the first copy in the outbox; text-mode events get a random id.
+    ``captured_at`` is the Pico's own scan time for buffered scans; otherwise
+    the event is stamped on arrival.
+    """
     global _pending_enroll
 
     if ":" not in line:
         return
 
     command, _, value = line.partition(":")
+    tag = f"[{device}] " if device else ""
+    extra = {"event_id": event_id} if event_id else {}
+    if captured_at:
+        extra["captured_at"] = captured_at
 
     if command == "ATTENDANCE":
         if not value.isdigit():
-            print(f"  ⚠  Invalid fingerprint ID received: {value!r}")
+            print(f"  ⚠  {tag}Invalid fingerprint ID received: {value!r}")
             return
-        print(f"[ATTENDANCE] Fingerprint ID {value} detected — syncing…")
-        post_attendance(int(value))
+        print(f"{tag}[ATTENDANCE] Fingerprint ID {value} detected — syncing…")
+        _dispatch(BridgeEvent("attendance", {"fingerprint_id": int(value)}, device=device, **extra))
 
     elif command == "ENROLL_SUCCESS":
         # Major step: Pico stored template; bridge completes registration in the DB
@@ -203,35 +704,86 @@ def handle_line(line: str) -> None:
             return
         emp_id, f_id = parts[0].strip(), parts[1].strip()
 
-        if _pending_enroll is not None:
-            if emp_id != _pending_enroll["employee_id"]:
+        with _pending_lock:
+            pending, _pending_enroll = _pending_enroll, None
+        if pending is not None:
+            if emp_id != pending["employee_id"]:
                 print(
                     f"  ⚠  Pico reported employee_id {emp_id!r}, expected "
-                    f"{_pending_enroll['employee_id']!r} — registering with captured slot anyway."
+                    f"{pending['employee_id']!r} — registering with captured slot anyway."
+                )
+            _dispatch(
+                BridgeEvent(
+                    "register",
+                    {
+                        "name": pending["name"],
+                        "email": pending["email"],
+                        "fingerprint_id": int(f_id),
+                    },
+                    device=device,
+                    **extra,
                 )
-            post_register_user(
-                _pending_enroll["name"],
-                _pending_enroll["email"],
-                int(f_id),
             )
-            _pending_enroll = None
         else:
-            print(f"[ENROLL] No pending interactive session — using legacy API for {emp_id!r}…")
-            patch_enroll_legacy(emp_id, int(f_id))
+            print(f"{tag}[ENROLL] No pending interactive session — using legacy API for {emp_id!r}…")
+            _dispatch(
+                BridgeEvent(
+                    "enroll_legacy",
+                    {"employee_id": emp_id, "fingerprint_id": int(f_id)},
+                    device=device,
+                    **extra,
+                )
+            )
 
     elif command == "STATUS":
-        print(f"[PICO] {value}")
+        print(f"{tag}[PICO] {value}")
+
+    elif command == "PONG":
+        print(f"{tag}[PICO] Firmware {value}")
+
+    elif command == "HELLO":
+        firmware, _, version = value.partition(",")
+        print(f"{tag}[PICO] Firmware {firmware}, framed link v{version.split(',')[0]}")
+
+    elif command == "SLOTS":
+        with _occupancy_cond:
+            _occupancy[device] = parse_slot_ranges(value)
+            _occupancy_cond.notify_all()
 
     elif command == "ERROR":
-        print(f"[PICO ERROR] {value}")
+        print(f"{tag}[PICO ERROR] {value}")
 
     else:
-        print(f"[UNKNOWN] {line!r}")
+        print(f"{tag}[UNKNOWN] {line!r}")
 
 
 # ── Interactive enrollment (capture user details before the sensor runs) ─────
 
-def prompt_and_send_enroll(ser: serial.Serial) -> None:
+def parse_slot_ranges(text: str) -> set[int]:
+    """``"0-4,9"`` → ``{0, 1, 2, 3, 4, 9}`` (the firmware's ``occupied_slots_text`` format)."""
+    slots: set[int] = set()
+    for part in text.split(","):
+        lo, _, hi = part.strip().partition("-")
+        if lo.isdigit() and (not hi or hi.isdigit()):
+            slots.update(range(int(lo), int(hi or lo) + 1))
+    return slots
+
+
+def query_occupied_slots(ser, device: str = "", timeout: float = 3.0) -> set[int] | None:
+    """
+    Ask the Pico which template slots are in use (read from the sensor's index
+    table). The reply is picked up by that device's reader thread; None on timeout.
+    """
+    with _occupancy_cond:
+        _occupancy.pop(device, None)
+    ser.write(b"SLOTS?\r\n")
+    with _occupancy_cond:
+        if _occupancy_cond.wait_for(lambda: device in _occupancy, timeout):
+            return set(_occupancy[device])
+    return None
+
+
+def prompt_and_send_enroll(ser: serial.Serial | DeviceReader) -> None:
     """
     Major step: collect directory fields, derive stable employee id, tell Pico which slot to fill.
     """
@@ -239,23 +791,35 @@ def prompt_and_send_enroll(ser: serial.Serial) -> None:
 
     name = input("Full name: ").strip()
     email = input("Email: ").strip()
-    slot_s = input("AS608 template slot (0–162): ").strip()
+
+    used = query_occupied_slots(ser, getattr(ser, "device_id", ""))
+    free = None
+    if used is not None:
+        free = next((n for n in range(MAX_SLOT + 1) if n not in used), None)
+        print(f"Sensor reports {len(used)} stored template(s).")
+    hint = f" [Enter = first free: {free}]" if free is not None else ""
+    slot_s = input(f"AS608 template slot (0–{MAX_SLOT}){hint}: ").strip()
+    if not slot_s and free is not None:
+        slot_s = str(free)
 
     if not name or not email or not slot_s.isdigit():
         print("ERROR: name, email, and numeric slot are required.")
         return
 
     slot = int(slot_s)
-    if slot < 0 or slot > 162:
-        print("ERROR: slot must be between 0 and 162.")
+    if slot < 0 or slot > MAX_SLOT:
+        print(f"ERROR: slot must be between 0 and {MAX_SLOT}.")
         return
+    if used is not None and slot in used:
+        print(f"  ⚠  Slot {slot} already holds a template on this sensor; it will be overwritten.")
 
     employee_id = stable_employee_id(email)
-    _pending_enroll = {
-        "name": name,
-        "email": email,
-        "employee_id": employee_id,
-    }
+    with _pending_lock:
+        _pending_enroll = {
+            "name": name,
+            "email": email,
+            "employee_id": employee_id,
+        }
 
     print(f"Sending ENROLL:{employee_id},{slot} (follow prompts on the sensor)…")
     ser.write(f"ENROLL:{employee_id},{slot}\r\n".encode())
@@ -263,67 +827,433 @@ def prompt_and_send_enroll(ser: serial.Serial) -> None:
 
 # ── Main loop ─────────────────────────────────────────────────────────────────
 
+# Longest line accepted from the Pico; anything longer without a newline is junk
+MAX_LINE_BYTES = 1024
+
+# ── Framed link (mirrors the "Bridge link" section of pico_firmware.py) ───────
+# A5 5A | type (1) | seq (2) | length (1) | payload | CRC-16/CCITT (2, over type..payload)
+LINK_VERSION = 1
+HELLO_LINE = f"HELLO:{LINK_VERSION}\r\n".encode()
+TEXT_HELLO_LINE = b"HELLO:0\r\n"  # asks new firmware for text lines (and its buffered scans)
+FRAME_MAGIC = b"\xa5\x5a"
+FRAME_HEADER_LEN = 6
+FT_HELLO = 0x01
+FT_ATTENDANCE = 0x10
+FRAME_COMMANDS = {
+    FT_HELLO: "HELLO",
+    FT_ATTENDANCE: "ATTENDANCE",
+    0x11: "ENROLL_SUCCESS",
+    0x12: "STATUS",
+    0x13: "ERROR",
+    0x14: "PONG",
+    0x15: "SLOTS",
+}
+RELIABLE_TYPES = frozenset({FT_ATTENDANCE, 0x11})
+SEEN_WINDOW = 512  # recent sequence numbers remembered per device for duplicate acks
+
+
+def crc16(data: bytes) -> int:
+    """CRC-16/CCITT-FALSE, same as the firmware's ``crc16``."""
+    crc = 0xFFFF
+    for b in data:
+        crc ^= b << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        crc &= 0xFFFF
+    return crc
+
+
+def encode_frame(ftype: int, seq: int, payload: bytes) -> bytes:
+    body = bytes([ftype, seq >> 8, seq & 0xFF, len(payload)]) + payload
+    return FRAME_MAGIC + body + crc16(body).to_bytes(2, "big")
+
+
+@dataclass(frozen=True)
+class Frame:
+    ftype: int
+    seq: int
+    payload: bytes
+
+    @classmethod
+    def decode(cls, raw: bytes) -> Frame | None:
+        """Parse one complete frame (magic included); None if the CRC does not match."""
+        body = raw[2:-2]
+        if crc16(body) != int.from_bytes(raw[-2:], "big"):
+            return None
+        return cls(body[0], int.from_bytes(body[1:3], "big"), bytes(body[4:]))
+
+    @property
+    def reliable(self) -> bool:
+        return self.ftype in RELIABLE_TYPES
+
+    @property
+    def captured_at(self) -> str | None:
+        """Capture time of a buffered ATTENDANCE scan (payload bytes 2..5, epoch s; 0 = unknown)."""
+        if self.ftype != FT_ATTENDANCE or len(self.payload) < 6:
+            return None
+        epoch = int.from_bytes(self.payload[2:6], "big")
+        if not epoch:
+            return None
+        return datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec="milliseconds")
+
+    @property
+    def origin(self) -> tuple[str, int] | None:
+        """
+        (boot id, seq) an ATTENDANCE scan was first buffered under (payload bytes
+        6..11); a scan reloaded from the Pico's flash after a reboot keeps them.
+        """
+        if self.ftype != FT_ATTENDANCE or len(self.payload) < 12:
+            return None
+        return f"{int.from_bytes(self.payload[6:10], 'big'):08x}", int.from_bytes(self.payload[10:12], "big")
+
+    def as_line(self) -> str | None:
+        """The equivalent text-mode line, so ``handle_line`` serves both link modes."""
+        command = FRAME_COMMANDS.get(self.ftype)
+        if command is None:
+            return None
+        if self.ftype == FT_ATTENDANCE:
+            value = str(int.from_bytes(self.payload[:2], "big"))
+        elif self.ftype == FT_HELLO:
+            boot = int.from_bytes(self.payload[1:5], "big")
+            firmware = self.payload[5:].decode("utf-8", "replace")
+            value = f"{firmware},{self.payload[0]},{boot:08x}"
+        else:
+            value = self.payload.decode("utf-8", "replace")
+        return f"{command}:{value}"
+
+
+def read_messages(ser, stop: threading.Event | None = None):
+    """
+    Yield ``(line, frame)`` pairs from ``ser`` without busy-polling.
+
+    ``ser.read`` blocks (up to the port timeout) for the first byte, then drains
+    whatever else has arrived. The stream may mix text lines and binary frames:
+    text is split on ``\n`` across reads, frames on their length byte. Frames
+    with a bad CRC are dropped (the Pico retransmits reliable ones) and the
+    reader resynchronises on the next magic or newline. ``frame`` is None for
+    text lines; for frames ``line`` is the text-mode equivalent.
+    """
+    buf = bytearray()
+    while stop is None or not stop.is_set():
+        chunk = ser.read(max(1, ser.in_waiting))
+        if not chunk:
+            continue  # timeout: nothing arrived, loop to re-check ``stop``
+        buf += chunk
+        while buf:
+            if buf.startswith(FRAME_MAGIC):
+                if len(buf) < FRAME_HEADER_LEN:
+                    break
+                size = FRAME_HEADER_LEN + buf[5] + 2
+                if len(buf) < size:
+                    break
+                frame = Frame.decode(bytes(buf[:size]))
+                if frame is None:
+                    print("  ⚠  Dropping frame with bad CRC")
+                    del buf[: len(FRAME_MAGIC)]
+                    continue
+                del buf[:size]
+                line = frame.as_line()
+                if line is not None:
+                    yield line, frame
+                continue
+            nl = buf.find(b"\n")
+            magic = buf.find(FRAME_MAGIC)
+            if magic >= 0 and (nl < 0 or magic < nl):
+                del buf[:magic]  # noise before a frame
+                continue
+            if nl < 0:
+                break
+            raw = bytes(buf[:nl])
+            del buf[: nl + 1]
+            try:
+                line = raw.decode("utf-8").strip()
+            except UnicodeDecodeError:
+                continue
+            if line and line.isprintable():
+                yield line, None
+        if len(buf) > MAX_LINE_BYTES:
+            print(f"  ⚠  Discarding {len(buf)} unframed bytes from serial")
+            buf.clear()
+
+
+def read_lines(ser, stop: threading.Event | None = None):
+    """Yield decoded lines from ``ser``; frames arrive as their text-mode equivalent."""
+    for line, _ in read_messages(ser, stop):
+        yield line
+
+
+class LinkSession:
+    """
+    Per-connection state of the framed link: the Pico's boot id (from HELLO), the
+    recently seen sequence numbers, and gap detection. Reliable frames become
+    events with id ``<device>:<boot>:<seq>`` and are acknowledged once
+    ``handle_line`` has queued them (durably, when the outbox is on).
+    """
+
+    def __init__(self, device: str = ""):
+        self.device = device
+        self.boot = "0"
+        self.last_seq: int | None = None
+        self._seen: set[int] = set()
+        self._order: deque[int] = deque()
+
+    def receive(self, line: str, frame: Frame) -> bytes | None:
+        """Handle one frame; returns the ack to write back, if any."""
+        if frame.ftype == FT_HELLO:
+            boot = line.rsplit(",", 1)[-1]
+            if boot != self.boot:
+                self.boot, self.last_seq = boot, None
+                self._seen.clear()
+                self._order.clear()
+            handle_line(line, self.device)
+            return None
+        if not frame.reliable:
+            handle_line(line, self.device)
+            return None
+        ack = f"ACK:{frame.seq}\r\n".encode()
+        if frame.seq in self._seen:
+            return ack  # retransmission of something already queued: just re-ack
+        if self.last_seq is not None:
+            gap = (frame.seq - self.last_seq) & 0xFFFF
+            if 1 < gap < 0x8000:
+                tag = f"[{self.device}] " if self.device else ""
+                print(f"  ⚠  {tag}{gap - 1} framed event(s) missing before seq {frame.seq}; awaiting retransmit")
+            if gap < 0x8000:
+                self.last_seq = frame.seq
+        else:
+            self.last_seq = frame.seq
+        # Replayed scans keep the event id of their first boot, so the API records them once
+        boot, seq = frame.origin or (self.boot, frame.seq)
+        handle_line(
+            line,
+            self.device,
+            event_id=f"{self.device}:{boot}:{seq}",
+            captured_at=frame.captured_at,
+        )
+        self._seen.add(frame.seq)
+        self._order.append(frame.seq)
+        if len(self._order) > SEEN_WINDOW:
+            self._seen.discard(self._order.popleft())
+        return ack
+
+
+def run_serial_loop(ser, stop: threading.Event | None = None, device: str = "", send=None) -> None:
+    """
+    Read lines and frames from the Pico and hand them to ``handle_line`` until
+    interrupted. Acks for reliable frames go out through ``send`` (default ``ser.write``).
+    """
+    link = LinkSession(device)
+    for line, frame in read_messages(ser, stop):
+        if frame is None:
+            handle_line(line, device)
+            continue
+        ack = link.receive(line, frame)
+        if ack:
+            (send or ser.write)(ack)
+
+
+class DeviceReader(threading.Thread):
+    """
+    Owns one serial port: opens it, offers the framed link (unless ``framed`` is
+    False), reads until unplugged or stopped, then exits.
+    """
+
+    def __init__(self, port: str, framed: bool = True):
+        super().__init__(name=f"bridge-serial-{os.path.basename(port)}", daemon=True)
+        self.port = port
+        self.device_id = device_id_for(port)
+        self.framed = framed
+        self.connected = threading.Event()
+        self._stop_event = threading.Event()
+        self._ser: serial.Serial | None = None
+        self._write_lock = threading.Lock()  # acks (reader thread) vs ENROLL (main thread)
+
+    def run(self) -> None:
+        try:
+            self._ser = serial.Serial(self.port, BAUD_RATE, timeout=TIMEOUT)
+        except (serial.SerialException, OSError) as e:
+            print(f"  ⚠  [{self.device_id}] Could not open {self.port}: {e}")
+            return
+        print(f"[{self.device_id}] Connected on {self.port}")
+        self.connected.set()
+        try:
+            if self.framed:
+                # Clock first, so scans buffered on the Pico are dated before the flush.
+                # Firmware without framing ignores both and keeps sending text lines.
+                self.write(f"TIME:{int(time.time())}\r\n".encode())
+                self.write(HELLO_LINE)
+            else:
+                self.write(TEXT_HELLO_LINE)
+            run_serial_loop(self._ser, self._stop_event, self.device_id, send=self.write)
+        except (serial.SerialException, OSError) as e:
+            print(f"  ⚠  [{self.device_id}] Disconnected from {self.port}: {e}")
+        finally:
+            self.connected.clear()
+            self._ser.close()
+
+    def write(self, data: bytes) -> None:
+        if self._ser is None:
+            raise serial.SerialException(f"{self.port} is not open")
+        with self._write_lock:
+            self._ser.write(data)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+class DeviceManager:
+    """
+    Keeps one ``DeviceReader`` per Pico. ``discover`` is polled every
+    ``rescan_interval`` seconds; new ports get a reader and readers whose device
+    went away are restarted when the port comes back, with no bridge restart.
+    All readers feed the same ``handle_line`` → dispatcher → HTTP pool / outbox.
+    """
+
+    def __init__(
+        self,
+        discover=discover_pico_ports,
+        rescan_interval: float = RESCAN_INTERVAL,
+        framed: bool = True,
+    ):
+        self._discover = discover
+        self._interval = rescan_interval
+        self._framed = framed
+        self.readers: dict[str, DeviceReader] = {}
+
+    def scan_once(self) -> None:
+        for port in self._discover():
+            reader = self.readers.get(port)
+            if reader is None or not reader.is_alive():
+                if reader is not None:
+                    print(f"[{reader.device_id}] Reconnecting on {port}…")
+                reader = DeviceReader(port, framed=self._framed)
+                self.readers[port] = reader
+                reader.start()
+
+    def run(self, stop: threading.Event) -> None:
+        self.scan_once()
+        while not stop.wait(self._interval):
+            self.scan_once()
+
+    def wait_connected(self, port: str, timeout: float) -> DeviceReader | None:
+        """The reader for ``port`` once its serial port is open, or None on timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            reader = self.readers.get(port)
+            if reader is not None and reader.connected.is_set():
+                return reader
+            self.scan_once()
+            time.sleep(0.05)
+        return None
+
+    def stop_all(self, timeout: float | None = None) -> None:
+        for reader in self.readers.values():
+            reader.stop()
+        for reader in self.readers.values():
+            reader.join(timeout)
+
+
 def main() -> None:
+    global _dispatcher
+
     parser = argparse.ArgumentParser(description="Rose Fingerprint Bridge → Flask API")
-    parser.add_argument("--port", help="Serial port (e.g. /dev/ttyACM0 or COM3)")
+    parser.add_argument(
+        "--port",
+        action="append",
+        help="Serial port (e.g. /dev/ttyACM0 or COM3); repeat for several Picos. "
+        "Default: every Pico found, with hot-plug",
+    )
     parser.add_argument(
         "--enroll",
         nargs="*",
         metavar=("EMP_ID", "SLOT"),
         help="Interactive enroll (no args), or legacy EMP_ID SLOT for Express PATCH only",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="HTTP dispatch threads when --no-outbox is set (1 keeps scans in arrival order)",
+    )
+    parser.add_argument("--outbox", default=OUTBOX_PATH, help="SQLite outbox file for undelivered events")
+    parser.add_argument(
+        "--no-outbox",
+        action="store_true",
+        help="Dispatch from memory only (events are lost if the API is down)",
+    )
+    parser.add_argument(
+        "--text-link",
+        action="store_true",
+        help="Ask Picos for plain text lines instead of the framed, acknowledged link",
+    )
     args = parser.parse_args()
 
-    port = args.port or detect_pico_port()
-    if not port:
-        print("ERROR: Could not detect a Pico W serial port.")
+    if args.port:
+        fixed_ports = list(args.port)
+        discover = lambda: fixed_ports  # noqa: E731
+    else:
+        discover = discover_pico_ports
+    ports = discover()
+    if not ports:
+        print("No Pico W serial port detected yet — waiting for one to be plugged in.")
         print("  • On Linux, check:  ls /dev/ttyACM*")
         print("  • Pass the port manually with --port /dev/ttyACMx")
-        sys.exit(1)
 
-    print(f"Connecting to Pico W on {port} at {BAUD_RATE} baud…")
+    print(f"Pico W port(s): {', '.join(ports) or '(none)'} at {BAUD_RATE} baud")
     print(f"Express API (attendance + enrollment): {EXPRESS_API}")
     print(f"Flask API (interactive register_user):  {FLASK_API}")
     print(f"Service key loaded: {'yes' if SERVICE_KEY else 'NO — set INTERNAL_SERVICE_API_KEY in .env'}")
+
+    # Journal and dispatcher first: every reader thread (also the one opened for
+    # --enroll) hands scans to them, and the Pico drops a scan once it is acked
+    outbox = None if args.no_outbox else Outbox(args.outbox)
+    if outbox is not None:
+        print(f"Outbox: {outbox.path} ({outbox.depth()} pending event(s) to replay)")
+    _dispatcher = Dispatcher(workers=max(1, args.workers), outbox=outbox)
+    _dispatcher.start()
+    manager = DeviceManager(discover, framed=not args.text_link)
+    stop = threading.Event()
     try:
-        ser = serial.Serial(port, BAUD_RATE, timeout=TIMEOUT)
-    except serial.SerialException as e:
-        print(f"ERROR: Could not open serial port: {e}")
-        sys.exit(1)
-
-    time.sleep(2)
-    print("--- Rose Fingerprint Bridge Active ---")
-    print("Press Ctrl+C to stop.\n")
-
-    if args.enroll is not None:
-        if len(args.enroll) == 0:
-            prompt_and_send_enroll(ser)
-        elif len(args.enroll) == 2:
-            emp_id, slot = args.enroll
-            if not str(slot).isdigit():
-                print("ERROR: slot must be numeric.")
+        if args.enroll is not None:
+            if len(args.enroll) not in (0, 2):
+                print("ERROR: use --enroll alone (interactive) or --enroll EMP_ID SLOT (legacy).")
                 sys.exit(1)
-            print(f"Legacy enroll: EMP={emp_id}, SLOT={slot} (Flask register_user skipped)")
-            ser.write(f"ENROLL:{emp_id},{slot}\r\n".encode())
-        else:
-            print("ERROR: use --enroll alone (interactive) or --enroll EMP_ID SLOT (legacy).")
-            sys.exit(1)
+            # Enrollment talks to one sensor: --port, else the confirmed Rose device
+            # (probed before any reader holds the ports open)
+            enroll_port = args.port[0] if args.port else detect_pico_port()
+            target = manager.wait_connected(enroll_port, timeout=10) if enroll_port else None
+            if target is None:
+                print("ERROR: Could not open a Pico W serial port for enrollment.")
+                sys.exit(1)
+            time.sleep(OPEN_SETTLE_S)
+            if len(args.enroll) == 0:
+                prompt_and_send_enroll(target)
+            else:
+                emp_id, slot = args.enroll
+                if not str(slot).isdigit():
+                    print("ERROR: slot must be numeric.")
+                    sys.exit(1)
+                print(f"Legacy enroll: EMP={emp_id}, SLOT={slot} (Flask register_user skipped)")
+                target.write(f"ENROLL:{emp_id},{slot}\r\n".encode())
 
-    try:
-        while True:
-            if ser.in_waiting > 0:
-                raw = ser.readline()
-                try:
-                    line = raw.decode("utf-8").strip()
-                except UnicodeDecodeError:
-                    continue
-                if line:
-                    handle_line(line)
+        print("--- Rose Fingerprint Bridge Active ---")
+        print("Press Ctrl+C to stop.\n")
+        manager.run(stop)
     except KeyboardInterrupt:
         print("\nBridge stopped.")
     finally:
-        ser.close()
-
+        stop.set()
+        manager.stop_all(timeout=TIMEOUT + 1)
+        pending = _dispatcher.depth()
+        if pending and outbox is None:
+            print(f"Waiting for {pending} queued event(s) to finish…")
+        _dispatcher.stop(timeout=RETRY_LIMIT * (BACKOFF_CAP + 10))
+        _dispatcher = None
+        if outbox is not None:
+            left = outbox.depth()
+            if left:
+                print(f"{left} event(s) kept in outbox; they will be replayed on next start.")
+            outbox.close()
 
 if __name__ == "__main__":
     main()
@@ -10,11 +10,14 @@ from pathlib import Path
 # fingerprint_module on sys.path (see run_fingerprint_api.py)
 _pkg = Path(__file__).resolve().parent
 
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 
+from flask_api.database.connection import get_database
 from flask_api.database.repository import EmployeeRepository
 from flask_api.exceptions import ServiceError, ValidationError
 from flask_api.services.registration import register_user as register_user_svc
+from flask_api.services.scan_events import scan_events_from_config
+from flask_api.services.scan_scoring import scan_scorer_from_config
 from flask_api.services.verification import verify_fingerprint as verify_fingerprint_svc
 
 
@@ -24,7 +27,11 @@ def create_app() -> Flask:
         template_folder=str(_pkg / "templates"),
         static_folder=str(_pkg / "static"),
     )
-    repo = EmployeeRepository()
+    # ML_SCORING_URL set: every scan also stores a fresh anomaly score (see services/scan_scoring.py)
+    # Scans and enrollments pushed to GET /events; a change stream replaces in-process publishing when available
+    events, publish = scan_events_from_config(get_database()[EmployeeRepository.COLLECTION])
+    repo = EmployeeRepository(scorer=scan_scorer_from_config(), events=events if publish else None)
+    app.extensions["scan_events"] = events
 
     @app.errorhandler(ServiceError)
     def handle_service_error(err: ServiceError):
@@ -101,9 +108,30 @@ def create_app() -> Flask:
             }
         )
 
+    @app.get("/events")
+    def scan_events():
+        """
+        Major step: server-sent events instead of polling /enrolled.
+        ``scan`` and ``enrolled`` events carry the employee row; ``resync`` means reload the list.
+        Resumes after the ``Last-Event-ID`` header (or ``?last_event_id=``) when given.
+        """
+        if events.full():
+            return jsonify({"ok": False, "error": "Too many event subscribers"}), 503
+        last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+        try:
+            last_id = int(last_id) if last_id not in (None, "") else None
+        except ValueError:
+            raise ValidationError("Last-Event-ID must be an integer") from None
+        # Plain generator (no stream_with_context): the stream never touches the request
+        return Response(
+            events.stream(last_id),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     @app.get("/health")
     def health():
-        return jsonify({"ok": True, "service": "fingerprint_flask_api"})
+        return jsonify({"ok": True, "service": "fingerprint_flask_api", "events": events.stats()})
 
     return app
 
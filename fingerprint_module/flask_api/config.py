@@ -20,3 +20,11 @@ class Config:
     MONGO_URI: str = os.environ.get("MONGO_URI", "mongodb://127.0.0.1:27017/rose")
     MONGO_DB_NAME: str = os.environ.get("MONGO_DB_NAME", "")
     FLASK_DEBUG: bool = os.environ.get("FLASK_DEBUG", "").lower() in ("1", "true", "yes")
+    # Opt-in per-scan scoring: ML service base URL (POST /score-scan); empty keeps scans unscored
+    ML_SCORING_URL: str = os.environ.get("ML_SCORING_URL", "").rstrip("/")
+    ML_SCORING_TIMEOUT: float = float(os.environ.get("ML_SCORING_TIMEOUT", "0.5"))
+    # Scan event stream (GET /events): memory | changestream | auto (see services/scan_events.py)
+    SCAN_EVENTS_SOURCE: str = os.environ.get("SCAN_EVENTS_SOURCE", "auto").lower()
+    SSE_BACKLOG: int = int(os.environ.get("SSE_BACKLOG", "1000"))
+    SSE_KEEPALIVE_S: float = float(os.environ.get("SSE_KEEPALIVE_S", "15"))
+    SSE_MAX_SUBSCRIBERS: int = int(os.environ.get("SSE_MAX_SUBSCRIBERS", "1000"))
@@ -45,10 +45,16 @@ class EmployeeRepository:
     COLLECTION = "employees"
     HISTORY = "histories"
 
-    def __init__(self) -> None:
+    def __init__(self, scorer: Any = None, events: Any = None) -> None:
+        """
+        ``scorer``: optional ``services.scan_scoring.ScanScorer`` for fresh scores on every scan.
+        ``events``: optional ``services.scan_events.ScanEventHub`` told about scans and enrollments.
+        """
         db = get_database()
         self._employees = db[self.COLLECTION]
         self._history = db[self.HISTORY]
+        self._scorer = scorer
+        self._events = events
 
     # --- Registration (storage only; enrollment capture happens on device + bridge) ---
 
@@ -93,8 +99,10 @@ class EmployeeRepository:
                     }
                 },
             )
-            updated = self._employees.find_one({"_id": by_email["_id"]})
-            return _serialize_employee(updated) or {}
+            updated = _serialize_employee(self._employees.find_one({"_id": by_email["_id"]})) or {}
+            if self._events is not None:
+                self._events.publish_enrolled(updated)
+            return updated
 
         # Major step: brand-new directory entry
         doc = {
@@ -114,8 +122,10 @@ class EmployeeRepository:
                 raise ConflictError("Duplicate key: email or fingerprint already exists") from e
             raise
 
-        saved = self._employees.find_one({"employeeId": employee_id})
-        return _serialize_employee(saved) or {}
+        saved = _serialize_employee(self._employees.find_one({"employeeId": employee_id})) or {}
+        if self._events is not None:
+            self._events.publish_enrolled(saved)
+        return saved
 
     # --- Verification ---
 
@@ -154,6 +164,14 @@ class EmployeeRepository:
         today = _local_date_iso()
         last_day = employee.get("lastAttendanceDate")
         already_today = last_day == today
+        days = (employee.get("attendanceDays") or 0) + (0 if already_today else 1)
+
+        # Major step (opt-in): score the employee as stored after this scan; None keeps the old score
+        fresh = None
+        if self._scorer is not None:
+            fresh = self._scorer.score(
+                {**employee, "attendanceDays": days, "biometricLogs": (employee.get("biometricLogs") or 0) + 1}
+            )
 
         # Major step: always record the scan; only bump attendance + history once per day
         if already_today:
@@ -161,11 +179,10 @@ class EmployeeRepository:
                 {"_id": employee["_id"]},
                 {
                     "$inc": {"biometricLogs": 1},
-                    "$set": {"lastActive": now, "updatedAt": now},
+                    "$set": {"lastActive": now, "updatedAt": now, **(fresh or {})},
                 },
             )
         else:
-            days = (employee.get("attendanceDays") or 0) + 1
             self._employees.update_one(
                 {"_id": employee["_id"]},
                 {
@@ -175,6 +192,7 @@ class EmployeeRepository:
                         "lastAttendanceDate": today,
                         "lastActive": now,
                         "updatedAt": now,
+                        **(fresh or {}),
                     },
                 },
             )
@@ -185,12 +203,15 @@ class EmployeeRepository:
                     "employeeId": employee.get("employeeId"),
                     "month": month_name,
                     "attendance": days,
-                    "riskScore": employee.get("anomalyScore") or 0,
+                    "riskScore": (fresh or employee).get("anomalyScore") or 0,
                     "status": "Present",
                     "createdAt": now,
                     "updatedAt": now,
                 }
             )
 
-        refreshed = self._employees.find_one({"_id": employee["_id"]})
-        return _serialize_employee(refreshed) or {}, already_today
+        refreshed = _serialize_employee(self._employees.find_one({"_id": employee["_id"]})) or {}
+        # Major step: push the scan to open /events streams (dashboards stop re-fetching /enrolled)
+        if self._events is not None:
+            self._events.publish_scan(refreshed, already_today)
+        return refreshed, already_today
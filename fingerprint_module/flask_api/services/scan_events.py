@@ -0,0 +1,226 @@
+"""
+Push channel for attendance scans and enrollments (``GET /events``, server-sent events).
+
+Dashboards used to learn about a scan by re-fetching the whole enrolled list on
+a timer. ``ScanEventHub`` keeps the last SSE_BACKLOG events in one shared log
+with increasing ids; a subscriber is only the id of the last event it sent, so
+publishing is O(1) whatever the number of open streams, and no thread or queue
+is created per client. A reconnecting browser sends ``Last-Event-ID`` and gets
+what it missed from the log (a ``resync`` event when that fell off the log).
+
+Events come from one of two sources (SCAN_EVENTS_SOURCE):
+
+  memory        ``EmployeeRepository.record_scan`` / ``register_user`` publish
+                after their writes (this process only)
+  changestream  one shared watcher thread on ``employees`` (replica set or
+                Atlas), which also sees scans written by the Express server
+  auto          changestream when the deployment supports it, else memory
+
+Each open stream holds its WSGI worker while it waits; under a cooperative
+worker (``gunicorn -k gevent``) that wait is a greenlet, not a thread.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from typing import Any
+
+from pymongo.errors import PyMongoError
+
+from flask_api.config import Config
+
+log = logging.getLogger(__name__)
+
+# Employee fields an event carries (the dashboard row, not the whole document)
+EVENT_FIELDS = (
+    "id", "employeeId", "fullName", "email", "department", "fingerprintId", "attendanceDays",
+    "biometricLogs", "lastAttendanceDate", "lastActive", "anomalyScore", "riskLevel",
+)
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _summary(employee: dict[str, Any]) -> dict[str, Any]:
+    out = {k: employee.get(k) for k in EVENT_FIELDS if k in employee}
+    if "id" not in out and employee.get("_id") is not None:
+        out["id"] = str(employee["_id"])
+    return out
+
+
+class ScanEventHub:
+    """
+    Shared event log with blocking reads:
+
+        hub.publish("scan", {"employee": ..., "alreadyPresentToday": False})
+        for chunk in hub.stream(last_id):   # SSE-formatted strings
+            ...
+    """
+
+    def __init__(self, backlog: int = 1000, keepalive_s: float = 15.0, max_subscribers: int = 1000) -> None:
+        self._log: deque[tuple[int, str, str]] = deque(maxlen=backlog)
+        self._cond = threading.Condition()
+        self._last_id = 0
+        self.keepalive_s = keepalive_s
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+        self.published = 0
+        self.delivered = 0
+        self.source = "memory"
+        self._closed = False
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, kind: str, data: dict[str, Any]) -> int:
+        """Append one event and wake every waiting stream; returns its id."""
+        payload = json.dumps(data, default=_json_default, separators=(",", ":"))
+        with self._cond:
+            self._last_id += 1
+            self._log.append((self._last_id, kind, payload))
+            self.published += 1
+            self._cond.notify_all()
+            return self._last_id
+
+    def publish_scan(self, employee: dict[str, Any], already_today: bool) -> int:
+        return self.publish("scan", {"employee": _summary(employee), "alreadyPresentToday": already_today})
+
+    def publish_enrolled(self, employee: dict[str, Any]) -> int:
+        return self.publish("enrolled", {"employee": _summary(employee)})
+
+    def since(self, last_id: int) -> list[tuple[int, str, str]]:
+        """Events after ``last_id`` still in the log (oldest first)."""
+        with self._cond:
+            return self._since(last_id)
+
+    def _since(self, last_id: int) -> list[tuple[int, str, str]]:
+        if last_id >= self._last_id:
+            return []
+        return [e for e in self._log if e[0] > last_id]
+
+    def full(self) -> bool:
+        """True when SSE_MAX_SUBSCRIBERS streams are already open."""
+        with self._cond:
+            return self.subscribers >= self.max_subscribers
+
+    def stream(self, last_id: int | None = None, wait: bool = True) -> Iterator[str]:
+        """
+        SSE chunks for one subscriber; starts at the current end of the log
+        unless ``last_id`` asks for a replay. With ``wait=False`` it stops
+        instead of blocking when caught up.
+        """
+        with self._cond:
+            self.subscribers += 1
+        try:
+            with self._cond:
+                cursor = self._last_id if last_id is None else max(0, min(last_id, self._last_id))
+            yield f"retry: 3000\nid: {cursor}\n: connected\n\n"
+            while not self._closed:
+                with self._cond:
+                    pending = self._since(cursor)
+                    if not pending and wait:
+                        # Major step: sleep until a publish (or the keepalive timeout), not per-client polling
+                        self._cond.wait(self.keepalive_s)
+                        pending = self._since(cursor)
+                    self.delivered += len(pending)
+                if pending:
+                    # Events past the backlog are gone: the client reloads its list instead
+                    gap = "event: resync\ndata: {}\n\n" if pending[0][0] > cursor + 1 else ""
+                    cursor = pending[-1][0]
+                    yield gap + "".join(f"id: {i}\nevent: {kind}\ndata: {payload}\n\n" for i, kind, payload in pending)
+                elif not wait:
+                    return
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "source": self.source,
+                "subscribers": self.subscribers,
+                "published": self.published,
+                "delivered": self.delivered,
+                "lastEventId": self._last_id,
+            }
+
+
+class ChangeStreamFeed:
+    """One watcher thread on the employees collection, publishing into a hub."""
+
+    def __init__(self, collection: Any, hub: ScanEventHub) -> None:
+        self.collection = collection
+        self.hub = hub
+        self._thread: threading.Thread | None = None
+
+    def available(self) -> bool:
+        """True when the deployment serves change streams (replica set / Atlas, not a standalone)."""
+        try:
+            with self.collection.watch(max_await_time_ms=1):
+                return True
+        except (PyMongoError, NotImplementedError, TypeError) as e:  # TypeError: mongomock
+            log.info("Change streams unavailable (%s); scan events come from this process", e)
+            return False
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="scan-events-changestream", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        resume = None
+        while not self.hub._closed:
+            try:
+                with self.collection.watch(
+                    [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}],
+                    full_document="updateLookup",
+                    resume_after=resume,
+                ) as changes:
+                    for change in changes:
+                        resume = change["_id"]
+                        self._publish(change)
+            except PyMongoError as e:
+                # Major step: reconnect from the last seen change instead of dropping the feed
+                log.warning("Scan event change stream interrupted: %s", e)
+                time.sleep(1)
+
+    def _publish(self, change: dict[str, Any]) -> None:
+        doc = change.get("fullDocument")
+        if not doc or doc.get("fingerprintId") is None:
+            return
+        updated = (change.get("updateDescription") or {}).get("updatedFields") or {}
+        if change["operationType"] == "update" and "biometricLogs" in updated:
+            # record_scan sets attendanceDays only on the first scan of the day
+            self.hub.publish_scan(doc, already_today="attendanceDays" not in updated)
+        elif change["operationType"] != "update" or "fingerprintId" in updated:
+            self.hub.publish_enrolled(doc)
+
+
+def scan_events_from_config(collection: Any) -> tuple[ScanEventHub, bool]:
+    """
+    The hub and whether the repository should publish itself (False when a
+    change stream feeds the hub instead).
+    """
+    hub = ScanEventHub(Config.SSE_BACKLOG, Config.SSE_KEEPALIVE_S, Config.SSE_MAX_SUBSCRIBERS)
+    if Config.SCAN_EVENTS_SOURCE in ("auto", "changestream"):
+        feed = ChangeStreamFeed(collection, hub)
+        if feed.available():
+            feed.start()
+            hub.source = "changestream"
+            return hub, False
+        if Config.SCAN_EVENTS_SOURCE == "changestream":
+            log.warning("SCAN_EVENTS_SOURCE=changestream but the deployment has none; using memory")
+    return hub, True
@@ -0,0 +1,51 @@
+"""Attendance scan → fresh anomaly score from the ML service (opt-in via ML_SCORING_URL)."""
+
+from __future__ import annotations
+
+import json
+import logging
+import urllib.error
+import urllib.request
+from typing import Any
+
+from flask_api.config import Config
+
+log = logging.getLogger(__name__)
+
+# Employee document fields the ML service's /score-scan reads
+SCAN_FIELDS = ("employeeId", "fullName", "department", "email", "salary", "attendanceDays", "biometricLogs")
+# What a score writes back onto the employee document
+SCORE_FIELDS = ("anomalyScore", "riskLevel", "isGhost")
+
+
+class ScanScorer:
+    """POST one scanned employee to ``{base_url}/score-scan``; a failure never blocks the scan."""
+
+    def __init__(self, base_url: str, timeout: float = 0.5) -> None:
+        self.url = f"{base_url}/score-scan"
+        self.timeout = timeout
+
+    def score(self, employee: dict[str, Any]) -> dict[str, Any] | None:
+        """
+        Major step: score the employee as it will be stored after the scan.
+        Returns the SCORE_FIELDS, or None when the ML service is slow, down or errors.
+        """
+        body = json.dumps({k: employee.get(k) for k in SCAN_FIELDS}, default=str).encode()
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                result = json.loads(resp.read())
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            log.warning("Scan scoring unavailable for %s: %s", employee.get("employeeId"), e)
+            return None
+        if result.get("status") != "success":
+            log.warning("Scan scoring failed for %s: %s", employee.get("employeeId"), result.get("error"))
+            return None
+        return {k: result[k] for k in SCORE_FIELDS}
+
+
+def scan_scorer_from_config() -> ScanScorer | None:
+    """The configured scorer, or None when ML_SCORING_URL is unset."""
+    if not Config.ML_SCORING_URL:
+        return None
+    return ScanScorer(Config.ML_SCORING_URL, Config.ML_SCORING_TIMEOUT)
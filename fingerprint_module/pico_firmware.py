@@ -9,12 +9,22 @@ Wiring:
   AS608 RX  →  Pico GP0 (UART0 TX)
   AS608 VCC →  Pico 3.3V
   AS608 GND →  Pico GND
+
+The AS608 driver (``uart_cmd`` / ``read_packet``) is response-driven: it returns
+as soon as a complete, checksum-valid ack packet has arrived instead of sleeping
+a fixed time per command. The module also imports on CPython (no ``machine``),
+so the driver can be exercised against ``scripts/as608_sim.py``.
 """
 
-import machine
+import os
 import sys
 import time
 
+try:
+    import machine
+except ImportError:  # CPython: simulation / benchmarks assign ``uart`` themselves
+    machine = None
+
 try:
     import select
 
@@ -23,33 +33,529 @@ try:
 except (ImportError, AttributeError):
     _STDIN_POLL = None
 
+# MicroPython has ticks/sleep_ms; CPython gets equivalents for simulation
+try:
+    _ticks_ms = time.ticks_ms
+    _ticks_add = time.ticks_add
+    _ticks_diff = time.ticks_diff
+    _sleep_ms = time.sleep_ms
+except AttributeError:
+    def _ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def _ticks_add(a, b):
+        return a + b
+
+    def _ticks_diff(a, b):
+        return a - b
+
+    def _sleep_ms(ms):
+        time.sleep(ms / 1000)
+
 # ── UART setup for AS608 ──────────────────────────────────────────────────────
-uart = machine.UART(0, baudrate=57600, tx=machine.Pin(0), rx=machine.Pin(1))
-
-# ── AS608 command constants ───────────────────────────────────────────────────
-CMD_VERIFY    = bytes([0xEF, 0x01, 0xFF, 0xFF, 0xFF, 0xFF, 0x01,
-                       0x00, 0x03, 0x04, 0x00, 0x08])  # GenImg + Img2Tz + Search
-CMD_GEN_IMG   = bytes([0xEF, 0x01, 0xFF, 0xFF, 0xFF, 0xFF, 0x01,
-                       0x00, 0x03, 0x01, 0x00, 0x05])  # GenImg
-CMD_IMG2TZ1   = bytes([0xEF, 0x01, 0xFF, 0xFF, 0xFF, 0xFF, 0x01,
-                       0x00, 0x04, 0x02, 0x01, 0x00, 0x08])  # Img2Tz slot 1
-CMD_IMG2TZ2   = bytes([0xEF, 0x01, 0xFF, 0xFF, 0xFF, 0xFF, 0x01,
-                       0x00, 0x04, 0x02, 0x02, 0x00, 0x09])  # Img2Tz slot 2
-CMD_CREATE    = bytes([0xEF, 0x01, 0xFF, 0xFF, 0xFF, 0xFF, 0x01,
-                       0x00, 0x03, 0x05, 0x00, 0x09])  # RegModel
+uart = machine.UART(0, baudrate=57600, tx=machine.Pin(0), rx=machine.Pin(1)) if machine else None
+
+# ── AS608 packet format ───────────────────────────────────────────────────────
+# EF01 | address (4) | PID (1) | length (2, = payload + checksum) | payload | checksum (2)
+# checksum = (PID + length bytes + payload bytes) & 0xFFFF
+HEADER        = b"\xEF\x01"
+ADDRESS       = b"\xFF\xFF\xFF\xFF"
+PID_COMMAND   = 0x01
+PID_ACK       = 0x07
+HEADER_LEN    = 9   # header + address + PID + length
+MAX_PACKET    = 9 + 256
+
+# Per-command deadlines: generous upper bounds; normally the ack arrives far sooner
+TIMEOUT_MS    = 500
+SEARCH_TIMEOUT_MS = 1500
+
+
+def build_packet(payload: bytes, pid: int = PID_COMMAND) -> bytes:
+    """Frame ``payload`` (instruction code + parameters) as an AS608 packet."""
+    length = len(payload) + 2
+    checksum = pid + (length >> 8) + (length & 0xFF) + sum(payload)
+    return (HEADER + ADDRESS + bytes([pid, length >> 8, length & 0xFF]) + payload
+            + bytes([(checksum >> 8) & 0xFF, checksum & 0xFF]))
+
+
+def packet_checksum_ok(packet: bytes) -> bool:
+    body = packet[6:-2]
+    return (sum(body) & 0xFFFF) == ((packet[-2] << 8) | packet[-1])
+
+
+# ── AS608 commands ────────────────────────────────────────────────────────────
+CMD_GEN_IMG   = build_packet(b"\x01")          # GenImg
+CMD_IMG2TZ1   = build_packet(b"\x02\x01")      # Img2Tz → CharBuffer 1
+CMD_IMG2TZ2   = build_packet(b"\x02\x02")      # Img2Tz → CharBuffer 2
+CMD_CREATE    = build_packet(b"\x05")          # RegModel
+CMD_TEMPLATE_NUM = build_packet(b"\x1D")       # TempleteNum: number of stored templates
 RESP_OK       = 0x00
 
+# ── Template library occupancy ────────────────────────────────────────────────
+LIBRARY_SIZE  = 300           # AS608 flash capacity (pages 0..299)
+INDEX_PAGE_SLOTS = 256        # ReadIndexTable returns 32 bytes = 256 slots per page
+
+# Bit per slot, read from the sensor at boot and after each enrollment. Search is
+# limited to [_search_start, _search_start + _search_count); until the first
+# successful read it covers the whole library.
+_index = bytearray((LIBRARY_SIZE + 7) // 8)
+_search_start = 0
+_search_count = LIBRARY_SIZE
+
+# Reported to the bridge's PING handshake (``PONG:ROSE/<version>``)
+FIRMWARE_ID   = "ROSE/2"
+
+# ── Bridge link ───────────────────────────────────────────────────────────────
+# Text lines ("ATTENDANCE:12\r\n") are the fallback. When the bridge sends
+# HELLO:<version> the Pico answers with a HELLO frame and switches to frames:
+#   A5 5A | type (1) | seq (2) | length (1) | payload | CRC-16/CCITT (2, over type..payload)
+# ATTENDANCE and ENROLL_SUCCESS frames are kept until the bridge answers ACK:<seq>;
+# the other frame types are fire-and-forget and carry seq 0. HELLO:0 asks for text.
+LINK_VERSION  = 1
+FRAME_MAGIC   = b"\xA5\x5A"
+FT_HELLO      = 0x01
+FT_ATTENDANCE = 0x10
+FT_ENROLL_SUCCESS = 0x11
+FT_STATUS     = 0x12
+FT_ERROR      = 0x13
+FT_PONG       = 0x14
+FT_SLOTS      = 0x15
+FRAME_TYPES   = {
+    "ATTENDANCE": FT_ATTENDANCE,
+    "ENROLL_SUCCESS": FT_ENROLL_SUCCESS,
+    "STATUS": FT_STATUS,
+    "ERROR": FT_ERROR,
+    "PONG": FT_PONG,
+    "SLOTS": FT_SLOTS,
+}
+RING_SIZE     = 4      # unacknowledged ENROLL_SUCCESS frames kept for retransmission
+RETRANSMIT_MS = 1000   # resend unacknowledged frames once they are this old
+RETRANSMIT_MAX_MS = 30000  # passes back off to this while no ack comes back
+
+LINK_UNKNOWN, LINK_TEXT, LINK_FRAMED = 0, 1, 2
+_link = LINK_UNKNOWN   # no HELLO yet: scans wait in the buffer, other events go out as text
+_boot_id = int.from_bytes(os.urandom(4), "big")  # lets the bridge tell reboots apart
+_seq = 0
+_ring = []             # [seq, frame, last_sent_ms], oldest first
+
+# ── Scan buffer ───────────────────────────────────────────────────────────────
+# Attendance scans wait here until the bridge acks them, so scans made while the
+# laptop sleeps or the cable is out are delivered in bulk after the next HELLO.
+# Record: seq u16 | template u16 | time u32 | origin boot u32 | origin seq u16.
+# time is epoch seconds once the host clock is known (TIME:<epoch_s>, sent before
+# HELLO), ticks_ms until then. The origin is the boot id and seq the scan was first
+# buffered under; a scan reloaded from flash after a reboot keeps it, so the bridge
+# gives it the same event id as before. A record lives in slot seq % BUFFER_EVENTS;
+# when the buffer is full the oldest scan is dropped.
+#
+# RAM budget: BUFFER_EVENTS * (RECORD_SIZE + 1) bytes, allocated once at import
+# (7.5 KB at 512); buffering a scan allocates nothing that outlives the call.
+# Flash budget: nothing is written while acks arrive. Scans still unacked after
+# PERSIST_AFTER_MS are appended to BUFFER_PATH in one write, so an outage costs at
+# most one small append per PERSIST_AFTER_MS. Acks of persisted scans rewrite the
+# file with what is still pending (at most once per PERSIST_AFTER_MS), so a reboot
+# never requeues delivered scans; the file is also rewritten (compacted) past
+# 2 * BUFFER_EVENTS records (28 KB cap) and deleted once everything is acked.
+BUFFER_EVENTS = 512    # power of two, so slots stay unique across seq wrap-around
+RECORD_SIZE   = 14
+FLUSH_BATCH   = 32     # frames (re)sent per loop pass while flushing the buffer
+PERSIST_AFTER_MS = 5000
+BUFFER_PATH   = "scan_buffer.bin"
+MAX_CLOCK_AGE_S = 6 * 24 * 3600   # ticks_diff is only meaningful within ~6 days
+REC_FREE, REC_EPOCH, REC_TICKS = 0, 1, 2
+
+_buf = bytearray(BUFFER_EVENTS * RECORD_SIZE)
+_rec_state = bytearray(BUFFER_EVENTS)
+_tail = 1              # oldest sequence number that may still be pending
+_persisted = 1         # pending records before this seq are already on flash
+_unpersisted_since = None
+_file_records = 0
+_file_stale = None     # ticks_ms of the first ack of a persisted scan since the last write
+_resend = None         # next seq of the running flush pass, None between passes
+_resend_at = 0         # ticks_ms after which the next pass may start
+_resend_delay = RETRANSMIT_MS
+_dropped = 0           # scans lost to a full buffer since the last HELLO
+_clock = None          # (epoch_s, ticks_ms) anchor from the host's TIME line
+
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
+def _write_out(data: bytes) -> None:
+    getattr(sys.stdout, "buffer", sys.stdout).write(data)
+
+
+def crc16(data: bytes) -> int:
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF)."""
+    crc = 0xFFFF
+    for b in data:
+        crc ^= b << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        crc &= 0xFFFF
+    return crc
+
+
+def encode_frame(ftype: int, seq: int, payload: bytes) -> bytes:
+    body = bytes([ftype, seq >> 8, seq & 0xFF, len(payload)]) + payload
+    crc = crc16(body)
+    return FRAME_MAGIC + body + bytes([crc >> 8, crc & 0xFF])
+
+
+def _next_seq() -> int:
+    global _seq
+    _seq = (_seq + 1) & 0xFFFF
+    return _seq
+
+
+def _seq_diff(a: int, b: int) -> int:
+    return (a - b) & 0xFFFF
+
+
+def _slot_offset(seq: int) -> int:
+    return (seq & (BUFFER_EVENTS - 1)) * RECORD_SIZE
+
+
+def _epoch_now(now: int) -> int:
+    global _clock
+    epoch, base = _clock
+    elapsed = _ticks_diff(now, base) // 1000
+    if elapsed > 86400:  # re-anchor daily, well inside the ticks_diff range
+        _clock = (epoch + elapsed, _ticks_add(base, elapsed * 1000))
+    return epoch + elapsed
+
+
+def _record(seq: int):
+    """(template, time) of the record stored for ``seq``."""
+    off = _slot_offset(seq)
+    return ((_buf[off + 2] << 8) | _buf[off + 3],
+            int.from_bytes(_buf[off + 4:off + 8], "big"))
+
+
+def _origin(seq: int) -> bytes:
+    """Origin boot id (4 bytes) and seq (2 bytes) of the record stored for ``seq``."""
+    off = _slot_offset(seq)
+    return bytes(_buf[off + 8:off + 14])
+
+
+def _store_record(seq: int, template: int, t: int, state: int, origin=None) -> None:
+    off = _slot_offset(seq)
+    _buf[off:off + 2] = seq.to_bytes(2, "big")
+    _buf[off + 2:off + 4] = template.to_bytes(2, "big")
+    _buf[off + 4:off + 8] = t.to_bytes(4, "big")
+    _buf[off + 8:off + 14] = origin or (_boot_id.to_bytes(4, "big") + seq.to_bytes(2, "big"))
+    _rec_state[seq & (BUFFER_EVENTS - 1)] = state
+
+
+def _free_record(seq: int, now: int) -> None:
+    """Mark ``seq`` delivered; a persisted record also makes the flash copy stale."""
+    global _file_stale
+    _rec_state[seq & (BUFFER_EVENTS - 1)] = REC_FREE
+    if _file_records and _file_stale is None and _seq_diff(seq, _tail) < _seq_diff(_persisted, _tail):
+        _file_stale = now
+
+
+def _advance_tail() -> None:
+    """Move ``_tail`` past acked records, keeping the flush/persist cursors in the window."""
+    global _tail, _persisted, _resend, _resend_at, _resend_delay
+    head = (_seq + 1) & 0xFFFF
+    moved = False
+    while _tail != head and not _rec_state[_tail & (BUFFER_EVENTS - 1)]:
+        _tail = (_tail + 1) & 0xFFFF
+        moved = True
+    window = _seq_diff(head, _tail)
+    if _seq_diff(_persisted, _tail) > window:
+        _persisted = _tail
+    if _resend is not None and _seq_diff(_resend, _tail) > window:
+        _resend = _tail
+    if moved:
+        _resend_delay = RETRANSMIT_MS
+        _resend_at = _ticks_add(_ticks_ms(), RETRANSMIT_MS)
+
+
+def buffer_scan(template: int, epoch: int = -1, origin=None) -> int:
+    """
+    Queue one attendance scan; returns its sequence number. ``epoch`` is the capture
+    time when known and ``origin`` the scan's first boot id + seq (records reloaded
+    from flash), else they are taken from the clock and this boot.
+    """
+    global _tail, _dropped, _resend_at
+    if _tail == (_seq + 1) & 0xFFFF:
+        _resend_at = _ticks_add(_ticks_ms(), RETRANSMIT_MS)
+    seq = _next_seq()
+    while _seq_diff(seq, _tail) >= BUFFER_EVENTS:
+        slot = _tail & (BUFFER_EVENTS - 1)
+        if _rec_state[slot]:
+            _rec_state[slot] = REC_FREE
+            _dropped += 1
+        _tail = (_tail + 1) & 0xFFFF
+    now = _ticks_ms()
+    if epoch >= 0:
+        _store_record(seq, template, epoch, REC_EPOCH, origin)
+    elif _clock is not None:
+        _store_record(seq, template, _epoch_now(now), REC_EPOCH)
+    else:
+        _store_record(seq, template, now & 0x3FFFFFFF, REC_TICKS)
+    _advance_tail()
+    return seq
+
+
+def buffered_count() -> int:
+    return sum(1 for state in _rec_state if state)
+
+
+def _attendance_frame(seq: int) -> bytes:
+    template, t = _record(seq)
+    if _rec_state[seq & (BUFFER_EVENTS - 1)] != REC_EPOCH:
+        t = 0  # capture time not known yet; the bridge falls back to arrival time
+    payload = template.to_bytes(2, "big") + t.to_bytes(4, "big") + _origin(seq)
+    return encode_frame(FT_ATTENDANCE, seq, payload)
+
+
+def _sync_clock(epoch: int) -> None:
+    """Anchor the clock to the host's and date scans buffered before it was known."""
+    global _clock
+    now = _ticks_ms()
+    _clock = (epoch, now)
+    for slot in range(BUFFER_EVENTS):
+        if _rec_state[slot] != REC_TICKS:
+            continue
+        off = slot * RECORD_SIZE
+        age = _ticks_diff(now, int.from_bytes(_buf[off + 4:off + 8], "big")) // 1000
+        captured = epoch - age if 0 <= age <= MAX_CLOCK_AGE_S else 0
+        _buf[off + 4:off + 8] = captured.to_bytes(4, "big")
+        _rec_state[slot] = REC_EPOCH
+
+
+# ── Flash persistence of the scan buffer ──────────────────────────────────────
+
+def _flash_write(data: bytes, append: bool = True) -> None:
+    with open(BUFFER_PATH, "ab" if append else "wb") as f:
+        f.write(data)
+
+
+def _flash_read() -> bytes:
+    try:
+        with open(BUFFER_PATH, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+
+def _flash_clear() -> None:
+    try:
+        os.remove(BUFFER_PATH)
+    except OSError:
+        pass
+
+
+def _pending_bytes(start: int) -> bytes:
+    """Flash image of the pending records from ``start`` to the head (times: epoch or 0)."""
+    out = bytearray()
+    seq = start
+    head = (_seq + 1) & 0xFFFF
+    while seq != head:
+        state = _rec_state[seq & (BUFFER_EVENTS - 1)]
+        if state:
+            template, t = _record(seq)
+            out += seq.to_bytes(2, "big") + template.to_bytes(2, "big")
+            out += (t if state == REC_EPOCH else 0).to_bytes(4, "big") + _origin(seq)
+        seq = (seq + 1) & 0xFFFF
+    return bytes(out)
+
+
+def persist_buffer(now: int) -> None:
+    """
+    Write scans that stayed unacked for PERSIST_AFTER_MS, rewrite the file once
+    acked scans in it are PERSIST_AFTER_MS stale, and drop it once drained.
+    """
+    global _persisted, _unpersisted_since, _file_records, _file_stale
+    head = (_seq + 1) & 0xFFFF
+    if _tail == head:
+        if _file_records:
+            _flash_clear()
+            _file_records = 0
+        _file_stale = None
+        return
+    if _file_stale is not None and _ticks_diff(now, _file_stale) >= PERSIST_AFTER_MS:
+        # Major step: acked scans leave flash too, so a reboot only requeues undelivered ones
+        image = _pending_bytes(_tail)
+        _flash_write(image, append=False)
+        _file_records = len(image) // RECORD_SIZE
+        _persisted, _unpersisted_since, _file_stale = head, None, None
+        return
+    if _persisted == head:
+        return
+    if _unpersisted_since is None:
+        _unpersisted_since = now
+        return
+    if _ticks_diff(now, _unpersisted_since) < PERSIST_AFTER_MS:
+        return
+    new = _pending_bytes(_persisted)
+    if new:
+        if _file_records + len(new) // RECORD_SIZE > 2 * BUFFER_EVENTS:
+            image = _pending_bytes(_tail)
+            _flash_write(image, append=False)
+            _file_records = len(image) // RECORD_SIZE
+        else:
+            _flash_write(new)
+            _file_records += len(new) // RECORD_SIZE
+    _persisted = head
+    _unpersisted_since = None
+
+
+def load_buffer() -> int:
+    """Requeue scans persisted before a reboot (newest BUFFER_EVENTS). Returns the count."""
+    global _persisted, _file_records
+    data = _flash_read()
+    count = len(data) // RECORD_SIZE
+    start = max(0, count - BUFFER_EVENTS)
+    for i in range(start, count):
+        off = i * RECORD_SIZE
+        buffer_scan((data[off + 2] << 8) | data[off + 3],
+                    int.from_bytes(data[off + 4:off + 8], "big"),
+                    data[off + 8:off + 14])
+    _persisted = (_seq + 1) & 0xFFFF
+    _file_records = count
+    return count - start
+
+
+# ── Link ──────────────────────────────────────────────────────────────────────
+
 def send_to_bridge(command: str, data: str):
-    """Print a structured line that the laptop bridge will parse."""
-    print(f"{command}:{data}", end="\r\n")
+    """
+    Send one event to the bridge: a frame once HELLO was negotiated, else a text
+    line. Attendance is buffered until acked unless the bridge asked for text;
+    before the first HELLO it is only buffered, and goes out as frames or text
+    lines once the bridge says which.
+    """
+    if command == "ATTENDANCE" and _link != LINK_TEXT:
+        seq = buffer_scan(int(data))
+        if _link == LINK_FRAMED:
+            _write_out(_attendance_frame(seq))
+        return
+    if _link != LINK_FRAMED:
+        _write_out(f"{command}:{data}\r\n".encode())
+        return
+    ftype = FRAME_TYPES.get(command, FT_STATUS)
+    payload = str(data).encode()[:255]
+    if ftype != FT_ENROLL_SUCCESS:
+        _write_out(encode_frame(ftype, 0, payload))
+        return
+    seq = _next_seq()
+    frame = encode_frame(ftype, seq, payload)
+    _write_out(frame)
+    _ring.append([seq, frame, _ticks_ms()])
+    if len(_ring) > RING_SIZE:
+        lost = _ring.pop(0)
+        send_to_bridge("ERROR", f"Link ring full, dropped seq {lost[0]}")
+
+
+def _link_hello(version: int) -> None:
+    """Answer the bridge's HELLO, switch framing on or off, and flush the scan buffer."""
+    global _link, _dropped, _tail, _resend, _resend_delay
+    if version < LINK_VERSION:
+        # Text-only bridge: hand over the buffered scans as lines, no acks to wait for
+        _link = LINK_TEXT
+        head = (_seq + 1) & 0xFFFF
+        now = _ticks_ms()
+        while _tail != head:
+            if _rec_state[_tail & (BUFFER_EVENTS - 1)]:
+                _write_out(f"ATTENDANCE:{_record(_tail)[0]}\r\n".encode())
+                _free_record(_tail, now)
+            _tail = (_tail + 1) & 0xFFFF
+        _advance_tail()
+        return
+    _link = LINK_FRAMED
+    payload = bytes([LINK_VERSION]) + _boot_id.to_bytes(4, "big") + FIRMWARE_ID.encode()
+    _write_out(encode_frame(FT_HELLO, 0, payload))
+    if _dropped:
+        send_to_bridge("ERROR", f"Scan buffer full, {_dropped} scan(s) dropped")
+        _dropped = 0
+    _resend, _resend_delay = _tail, RETRANSMIT_MS
+    service_link(_ticks_ms(), force=True)
+
+
+def _link_ack(seq: int) -> None:
+    slot = seq & (BUFFER_EVENTS - 1)
+    off = slot * RECORD_SIZE
+    if _rec_state[slot] and ((_buf[off] << 8) | _buf[off + 1]) == seq:
+        _free_record(seq, _ticks_ms())
+        _advance_tail()
+        return
+    for i, entry in enumerate(_ring):
+        if entry[0] == seq:
+            _ring.pop(i)
+            return
 
 
-def uart_cmd(cmd: bytes, wait_ms: int = 200) -> bytes:
+def service_link(now: int, force: bool = False) -> None:
+    """
+    Persist long-unacked scans, and when framed resend what the bridge has not
+    acknowledged: the scan buffer in passes of FLUSH_BATCH frames per call (a bulk
+    flush right after HELLO, then again after RETRANSMIT_MS, doubling up to
+    RETRANSMIT_MAX_MS while nothing gets acked, e.g. with the laptop asleep).
+    """
+    global _resend, _resend_at, _resend_delay
+    persist_buffer(now)
+    if _link != LINK_FRAMED:
+        return
+    for entry in _ring:
+        if force or _ticks_diff(now, entry[2]) >= RETRANSMIT_MS:
+            _write_out(entry[1])
+            entry[2] = now
+    head = (_seq + 1) & 0xFFFF
+    if _resend is None:
+        if _tail == head or _ticks_diff(now, _resend_at) < 0:
+            return
+        _resend = _tail
+    sent = 0
+    while _resend != head and sent < FLUSH_BATCH:
+        if _rec_state[_resend & (BUFFER_EVENTS - 1)]:
+            _write_out(_attendance_frame(_resend))
+            sent += 1
+        _resend = (_resend + 1) & 0xFFFF
+    if _resend == head:
+        _resend = None
+        _resend_at = _ticks_add(now, _resend_delay)
+        _resend_delay = min(_resend_delay * 2, RETRANSMIT_MAX_MS)
+
+
+def read_packet(timeout_ms: int = TIMEOUT_MS) -> bytes:
+    """
+    Read one ack packet from the sensor: resync on the EF01 header, use the length
+    field to know when it is complete, verify the checksum. Returns the raw packet,
+    or b"" if the deadline passes or the packet is corrupt.
+    """
+    buf = b""
+    start = _ticks_ms()
+    while _ticks_diff(_ticks_ms(), start) < timeout_ms:
+        n = uart.any()
+        if not n:
+            _sleep_ms(1)
+            continue
+        buf += uart.read(n) or b""
+        i = buf.find(HEADER)
+        if i < 0:
+            buf = buf[-1:]  # keep a trailing 0xEF that may start the next header
+            continue
+        buf = buf[i:]
+        if len(buf) < HEADER_LEN:
+            continue
+        total = HEADER_LEN + ((buf[7] << 8) | buf[8])
+        if total > MAX_PACKET:
+            buf = buf[2:]  # not a real header; look for the next one
+            continue
+        if len(buf) >= total:
+            packet = buf[:total]
+            return packet if packet_checksum_ok(packet) else b""
+    return b""
+
+
+def uart_cmd(cmd: bytes, timeout_ms: int = TIMEOUT_MS) -> bytes:
+    """Send a command packet and return its ack packet (b"" on timeout / bad checksum)."""
+    if uart.any():
+        uart.read()  # drop stale bytes from an earlier timed-out command
     uart.write(cmd)
-    time.sleep_ms(wait_ms)
-    return uart.read() or b""
+    return read_packet(timeout_ms)
 
 
 def response_ok(raw: bytes) -> bool:
@@ -59,31 +565,93 @@ def response_ok(raw: bytes) -> bool:
 
 def store_template(slot: int) -> bool:
     """Store CharBuffer 1 into flash at the given slot number."""
-    hi, lo = (slot >> 8) & 0xFF, slot & 0xFF
-    checksum = 0x01 + 0x00 + 0x06 + 0x0D + hi + lo
-    cmd = bytes([0xEF, 0x01, 0xFF, 0xFF, 0xFF, 0xFF, 0x01,
-                 0x00, 0x06, 0x0D, 0x01, hi, lo,
-                 (checksum >> 8) & 0xFF, checksum & 0xFF])
-    raw = uart_cmd(cmd, 200)
+    raw = uart_cmd(build_packet(bytes([0x06, 0x01, (slot >> 8) & 0xFF, slot & 0xFF])))
     return response_ok(raw)
 
 
 def search_library() -> int:
-    """Search all templates; return matched page ID or -1."""
-    cmd = bytes([0xEF, 0x01, 0xFF, 0xFF, 0xFF, 0xFF, 0x01,
-                 0x00, 0x08, 0x04, 0x01, 0x00, 0x00, 0x03, 0xE8,
-                 0x00, 0xFF])
-    raw = uart_cmd(cmd, 300)
+    """Search the occupied template range; return matched page ID or -1."""
+    if _search_count == 0:
+        return -1  # empty library: nothing can match, skip the sensor round trip
+    start, count = _search_start, _search_count
+    raw = uart_cmd(build_packet(bytes([0x04, 0x01, start >> 8, start & 0xFF, count >> 8, count & 0xFF])),
+                   SEARCH_TIMEOUT_MS)
+    if len(raw) >= 16 and raw[9] == RESP_OK:
+        return (raw[10] << 8) | raw[11]
+    return -1
+
+
+def slot_used(slot: int) -> bool:
+    return bool(_index[slot >> 3] & (1 << (slot & 7)))
+
+
+def template_count() -> int:
+    """Number of templates stored on the sensor, or -1 if it did not answer."""
+    raw = uart_cmd(CMD_TEMPLATE_NUM)
     if len(raw) >= 14 and raw[9] == RESP_OK:
         return (raw[10] << 8) | raw[11]
     return -1
 
 
+def refresh_template_index() -> bool:
+    """
+    Re-read the occupancy bitmap (TempleteNum, then ReadIndexTable per 256-slot
+    page) and narrow the Search range to the first..last occupied slot.
+    On any sensor error the previous range is kept.
+    """
+    global _search_start, _search_count
+    count = template_count()
+    if count < 0:
+        return False
+    table = bytearray()
+    if count > 0:
+        for page in range((LIBRARY_SIZE + INDEX_PAGE_SLOTS - 1) // INDEX_PAGE_SLOTS):
+            raw = uart_cmd(build_packet(bytes([0x1F, page])))
+            if len(raw) < 44 or raw[9] != RESP_OK:
+                return False
+            table += raw[10:42]
+    for i in range(len(_index)):
+        _index[i] = table[i] if i < len(table) else 0
+
+    first = last = -1
+    for slot in range(LIBRARY_SIZE):
+        if slot_used(slot):
+            if first < 0:
+                first = slot
+            last = slot
+    _search_start = max(first, 0)
+    _search_count = last - first + 1 if first >= 0 else 0
+    return True
+
+
+def occupied_slots_text() -> str:
+    """Occupied slots as compact ranges, e.g. ``0-4,9,12-13`` (empty if none)."""
+    parts = []
+    slot = 0
+    while slot < LIBRARY_SIZE:
+        if not slot_used(slot):
+            slot += 1
+            continue
+        end = slot
+        while end + 1 < LIBRARY_SIZE and slot_used(end + 1):
+            end += 1
+        parts.append(str(slot) if end == slot else f"{slot}-{end}")
+        slot = end + 1
+    return ",".join(parts)
+
+
 # ── Host serial (USB) commands from ``bridge.py`` ─────────────────────────────
 
-def _read_host_line():
-    """Non-blocking read of one line from USB serial (ENROLL:... from the PC)."""
-    if _STDIN_POLL is None or not _STDIN_POLL.poll(0):
+def _read_host_line(wait_ms: int = 0):
+    """
+    Read one line from USB serial (ENROLL:... from the PC), waiting up to
+    ``wait_ms`` for it to arrive. Returns None if nothing came.
+    """
+    if _STDIN_POLL is None:
+        if wait_ms:
+            _sleep_ms(wait_ms)
+        return None
+    if not _STDIN_POLL.poll(wait_ms):
         return None
     raw = sys.stdin.readline()
     if not raw:
@@ -97,6 +665,28 @@ def _read_host_line():
 
 
 def _handle_host_command(line: str) -> None:
+    # Link protocol: acks for framed events, and the framing handshake
+    if line.startswith("ACK:"):
+        if line[4:].isdigit():
+            _link_ack(int(line[4:]))
+        return
+    if line.startswith("HELLO:"):
+        if line[6:].isdigit():
+            _link_hello(int(line[6:]))
+        return
+    if line.startswith("TIME:"):
+        if line[5:].isdigit():
+            _sync_clock(int(line[5:]))
+        return
+    # Port detection handshake from bridge.detect_pico_port
+    if line == "PING":
+        send_to_bridge("PONG", FIRMWARE_ID)
+        return
+    # Occupancy query: bridge picks a free slot without asking the database
+    if line == "SLOTS?":
+        refresh_template_index()
+        send_to_bridge("SLOTS", occupied_slots_text())
+        return
     # Major step: bridge sends ENROLL:<stable_employee_id>,<slot>
     if not line.startswith("ENROLL:"):
         return
@@ -110,44 +700,139 @@ def _handle_host_command(line: str) -> None:
     enroll_fingerprint(emp, slot)
 
 
+# ── Adaptive polling ──────────────────────────────────────────────────────────
+POLL_FAST_MS      = 50     # GenImg interval right after a finger was seen
+POLL_IDLE_MS      = 600    # slowest interval when nobody is at the door
+POLL_BACKOFF      = 1.5    # interval growth per empty poll once the active window ends
+ACTIVE_WINDOW_MS  = 5000   # stay fast this long after the last finger
+DEBOUNCE_MS       = 3000   # the same template is reported at most once per window
+HOST_SLICE_MS     = 20     # longest wait between checks for host commands / touch IRQ
+
+# Optional AS608 touch output (WAKEUP / TOUCH pin, active high) on this GPIO.
+# When wired, idle polling slows to POLL_TOUCH_IDLE_MS and a touch triggers a poll at once.
+TOUCH_PIN         = None
+POLL_TOUCH_IDLE_MS = 3000
+
+
+class PollScheduler:
+    """Decides when the next GenImg poll is due: fast after activity, backing off when idle."""
+
+    def __init__(self, now: int, idle_ms: int = POLL_IDLE_MS):
+        self.idle_ms = idle_ms
+        self.interval = POLL_FAST_MS
+        self.next_at = now
+        self.last_activity = now
+
+    def wait_ms(self, now: int) -> int:
+        return max(0, _ticks_diff(self.next_at, now))
+
+    def activity(self, now: int) -> None:
+        self.last_activity = now
+        self.interval = POLL_FAST_MS
+        self.next_at = _ticks_add(now, self.interval)
+
+    def idle(self, now: int) -> None:
+        if _ticks_diff(now, self.last_activity) > ACTIVE_WINDOW_MS:
+            self.interval = min(self.idle_ms, int(self.interval * POLL_BACKOFF))
+        self.next_at = _ticks_add(now, self.interval)
+
+    def wake(self, *_args) -> None:
+        """Touch IRQ: poll on the next pass (safe from an interrupt handler)."""
+        self.next_at = _ticks_ms()
+
+
+# template id (-1 = unknown finger) → ticks when last reported
+_last_reported = {}
+
+
+def _debounced(template: int, now: int) -> bool:
+    """True if ``template`` was reported within DEBOUNCE_MS; otherwise record it."""
+    last = _last_reported.get(template)
+    if last is not None and _ticks_diff(now, last) < DEBOUNCE_MS:
+        return True
+    if len(_last_reported) > 32:  # keep the table small on the Pico
+        for key in [k for k, t in _last_reported.items() if _ticks_diff(now, t) >= DEBOUNCE_MS]:
+            del _last_reported[key]
+    _last_reported[template] = now
+    return False
+
+
 # ── Modes ─────────────────────────────────────────────────────────────────────
 
-def attendance_tick() -> None:
-    """Single poll cycle for attendance (called from the main loop)."""
+def attendance_tick() -> bool:
+    """Single poll cycle for attendance; returns True if a finger was on the sensor."""
     # Step 1: capture image
-    raw = uart_cmd(CMD_GEN_IMG, 200)
+    raw = uart_cmd(CMD_GEN_IMG)
     if not response_ok(raw):
-        time.sleep(0.05)
-        return
+        return False
 
     # Step 2: convert image → CharBuffer 1
-    raw = uart_cmd(CMD_IMG2TZ1, 200)
+    raw = uart_cmd(CMD_IMG2TZ1)
     if not response_ok(raw):
         send_to_bridge("ERROR", "Image conversion failed")
-        time.sleep(0.2)
-        return
+        return True
 
-    # Step 3: search library
+    # Step 3: search library; same finger still resting on the glass is not re-sent
     matched_id = search_library()
+    if _debounced(matched_id, _ticks_ms()):
+        return True
     if matched_id >= 0:
         send_to_bridge("ATTENDANCE", str(matched_id))
     else:
         send_to_bridge("STATUS", "No match found")
-
-    time.sleep(1)  # debounce
+    return True
+
+
+def make_scheduler() -> PollScheduler:
+    """Scheduler for ``main_loop``; hooks the touch pin IRQ when ``TOUCH_PIN`` is set."""
+    if TOUCH_PIN is None or machine is None:
+        return PollScheduler(_ticks_ms())
+    sched = PollScheduler(_ticks_ms(), POLL_TOUCH_IDLE_MS)
+    pin = machine.Pin(TOUCH_PIN, machine.Pin.IN, machine.Pin.PULL_DOWN)
+    pin.irq(trigger=machine.Pin.IRQ_RISING, handler=sched.wake)
+    return sched
+
+
+def loop_step(sched: PollScheduler) -> None:
+    """One pass of the main loop: serve a host command or run a due poll, never both."""
+    now = _ticks_ms()
+    service_link(now)
+    line = _read_host_line(min(sched.wait_ms(now), HOST_SLICE_MS))
+    if line:
+        _handle_host_command(line)
+        return
+    now = _ticks_ms()
+    if sched.wait_ms(now) > 0:
+        return
+    if attendance_tick():
+        sched.activity(_ticks_ms())
+    else:
+        sched.idle(_ticks_ms())
 
 
 def main_loop() -> None:
     """
     Major step: interleave USB commands (enrollment) with attendance scanning.
     """
+    if refresh_template_index():
+        send_to_bridge("STATUS", f"Templates: {occupied_slots_text() or 'none'}")
+    restored = load_buffer()
+    if restored:
+        send_to_bridge("STATUS", f"Restored {restored} unsent scan(s) from flash")
     send_to_bridge("STATUS", "Attendance + serial ENROLL active")
+    sched = make_scheduler()
     while True:
-        line = _read_host_line()
-        if line:
-            _handle_host_command(line)
-            continue
-        attendance_tick()
+        loop_step(sched)
+
+
+def _wait_for_finger(present: bool, timeout_ms: int) -> bool:
+    """Poll GenImg until a finger is (``present``) or is no longer on the sensor."""
+    start = _ticks_ms()
+    while _ticks_diff(_ticks_ms(), start) < timeout_ms:
+        if response_ok(uart_cmd(CMD_GEN_IMG)) == present:
+            return True
+        _sleep_ms(100)
+    return False
 
 
 def enroll_fingerprint(employee_id: str, slot: int):
@@ -159,52 +844,39 @@ def enroll_fingerprint(employee_id: str, slot: int):
     # ── Scan 1: keep polling until a valid image is captured ─────────────────
     send_to_bridge("STATUS", f"[scan 1/2] Place finger on sensor for {employee_id}")
 
-    for _ in range(200):          # up to ~60 s (200 × 300 ms)
-        raw = uart_cmd(CMD_GEN_IMG, 200)
-        if response_ok(raw):
-            break
-        time.sleep_ms(100)
-    else:
+    if not _wait_for_finger(True, 60000):
         send_to_bridge("ERROR", "Timeout waiting for finger (scan 1/2) — please try again")
         return
 
-    raw = uart_cmd(CMD_IMG2TZ1, 200)
+    raw = uart_cmd(CMD_IMG2TZ1)
     if not response_ok(raw):
         send_to_bridge("ERROR", "Scan 1 image conversion failed — try again")
         return
 
     # ── Wait for finger removal ───────────────────────────────────────────────
     send_to_bridge("STATUS", "Remove finger")
-    for _ in range(100):          # up to ~30 s
-        raw = uart_cmd(CMD_GEN_IMG, 200)
-        if not response_ok(raw):
-            break
-        time.sleep_ms(100)
+    _wait_for_finger(False, 30000)
 
     # ── Scan 2: keep polling until a valid image is captured ─────────────────
     send_to_bridge("STATUS", "[scan 2/2] Place finger on sensor again")
 
-    for _ in range(200):          # up to ~60 s
-        raw = uart_cmd(CMD_GEN_IMG, 200)
-        if response_ok(raw):
-            break
-        time.sleep_ms(100)
-    else:
+    if not _wait_for_finger(True, 60000):
         send_to_bridge("ERROR", "Timeout waiting for finger (scan 2/2) — please try again")
         return
 
-    raw = uart_cmd(CMD_IMG2TZ2, 200)
+    raw = uart_cmd(CMD_IMG2TZ2)
     if not response_ok(raw):
         send_to_bridge("ERROR", "Scan 2 image conversion failed — try again")
         return
 
     # ── Create model & store ─────────────────────────────────────────────────
-    raw = uart_cmd(CMD_CREATE, 200)
+    raw = uart_cmd(CMD_CREATE)
     if not response_ok(raw):
         send_to_bridge("ERROR", "Fingerprints did not match — please try again")
         return
 
     if store_template(slot):
+        refresh_template_index()
         send_to_bridge("ENROLL_SUCCESS", f"{employee_id},{slot}")
     else:
         send_to_bridge("ERROR", f"Failed to save template at slot {slot}")
@@ -213,4 +885,5 @@ def enroll_fingerprint(employee_id: str, slot: int):
 # ── Entry point ───────────────────────────────────────────────────────────────
 # ATTENDANCE:<slot> → bridge → Flask POST /attendance/scan
 # ENROLL:... from bridge → enroll_fingerprint → ENROLL_SUCCESS → POST /register_user
-main_loop()
+if __name__ == "__main__":
+    main_loop()
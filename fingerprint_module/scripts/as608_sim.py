@@ -0,0 +1,143 @@
+"""
+CPython stand-in for the AS608 fingerprint sensor on the Pico's UART.
+
+``SimulatedAS608`` implements the subset of ``machine.UART`` the firmware uses
+(``write`` / ``any`` / ``read``). Command packets are parsed and checksummed like
+the real sensor; each ack is released byte by byte at the UART baud rate after a
+per-instruction processing latency, so partial reads happen as on hardware.
+"""
+
+from __future__ import annotations
+
+import time
+
+# Instruction codes (AS608 / R30x family)
+GEN_IMG, IMG2TZ, SEARCH, REG_MODEL, STORE = 0x01, 0x02, 0x04, 0x05, 0x06
+TEMPLATE_NUM, READ_INDEX = 0x1D, 0x1F
+
+# Typical processing time per instruction, ms (Search adds SEARCH_MS_PER_PAGE)
+DEFAULT_LATENCY_MS = {GEN_IMG: 30, IMG2TZ: 40, SEARCH: 5, REG_MODEL: 30, STORE: 25,
+                      TEMPLATE_NUM: 5, READ_INDEX: 8}
+# Search time grows with the number of pages compared
+SEARCH_MS_PER_PAGE = 0.8
+
+
+def ack_packet(payload: bytes) -> bytes:
+    length = len(payload) + 2
+    checksum = 0x07 + (length >> 8) + (length & 0xFF) + sum(payload)
+    return (b"\xEF\x01\xFF\xFF\xFF\xFF\x07" + bytes([length >> 8, length & 0xFF]) + payload
+            + bytes([(checksum >> 8) & 0xFF, checksum & 0xFF]))
+
+
+class SimulatedAS608:
+    """UART-like AS608: set ``finger`` to whatever is on the glass (None = nothing)."""
+
+    def __init__(self, templates: dict[int, str] | None = None, latency_ms: dict | None = None,
+                 baud: int = 57600, capacity: int = 300):
+        self.templates: dict[int, str] = dict(templates or {})  # page → finger identity
+        self.latency_ms = {**DEFAULT_LATENCY_MS, **(latency_ms or {})}
+        self.capacity = capacity
+        self.finger: str | None = None
+        self.corrupt_next = False
+        self.noise = b""  # line noise prepended to the next ack
+        self.instructions: list[int] = []
+        self.busy_ms = 0.0  # total time the sensor spent processing / transmitting
+        self._bytes_per_s = baud / 10  # 8N1
+        self._image: str | None = None
+        self._char: dict[int, str | None] = {1: None, 2: None}
+        self._queue: list[tuple[float, bytes]] = []  # (first byte time, packet)
+        self._rx = bytearray()
+
+    # ── machine.UART surface ──────────────────────────────────────────────────
+
+    def write(self, data: bytes) -> int:
+        data = bytes(data)
+        if data[:2] != b"\xEF\x01" or len(data) < 12:
+            return len(data)
+        body = data[6:-2]
+        if (sum(body) & 0xFFFF) != ((data[-2] << 8) | data[-1]):
+            self._respond(0, bytes([0x01]))  # packet receive error
+            return len(data)
+        code, params = data[9], data[10:-2]
+        self.instructions.append(code)
+        latency = self.latency_ms.get(code, 20)
+        if code == SEARCH:
+            count = (params[3] << 8) | params[4]
+            latency += SEARCH_MS_PER_PAGE * min(count, self.capacity)
+        self._respond(latency, self._execute(code, params))
+        return len(data)
+
+    def any(self) -> int:
+        self._release()
+        return len(self._rx)
+
+    def read(self, n: int | None = None) -> bytes | None:
+        self._release()
+        if not self._rx:
+            return None
+        n = len(self._rx) if n is None else min(n, len(self._rx))
+        out = bytes(self._rx[:n])
+        del self._rx[:n]
+        return out
+
+    # ── sensor behaviour ──────────────────────────────────────────────────────
+
+    def _execute(self, code: int, params: bytes) -> bytes:
+        if code == GEN_IMG:
+            self._image = self.finger
+            return bytes([0x00 if self.finger else 0x02])
+        if code == IMG2TZ:
+            self._char[params[0]] = self._image
+            return bytes([0x00 if self._image else 0x15])
+        if code == SEARCH:
+            probe = self._char.get(params[0])
+            start, count = (params[1] << 8) | params[2], (params[3] << 8) | params[4]
+            for page in range(start, min(start + count, self.capacity)):
+                if probe is not None and self.templates.get(page) == probe:
+                    return bytes([0x00, page >> 8, page & 0xFF, 0x00, 0x64])
+            return bytes([0x09, 0, 0, 0, 0])
+        if code == REG_MODEL:
+            ok = self._char[1] is not None and self._char[1] == self._char[2]
+            return bytes([0x00 if ok else 0x0A])
+        if code == STORE:
+            page = (params[1] << 8) | params[2]
+            if page >= self.capacity:
+                return bytes([0x0B])
+            self.templates[page] = self._char[params[0]]
+            return bytes([0x00])
+        if code == TEMPLATE_NUM:
+            n = len(self.templates)
+            return bytes([0x00, n >> 8, n & 0xFF])
+        if code == READ_INDEX:
+            table = bytearray(32)
+            for page in self.templates:
+                bit = page - params[0] * 256
+                if 0 <= bit < 256:
+                    table[bit >> 3] |= 1 << (bit & 7)
+            return bytes([0x00]) + bytes(table)
+        return bytes([0x01])
+
+    def _respond(self, latency_ms: float, payload: bytes) -> None:
+        packet = bytearray(ack_packet(payload))
+        if self.corrupt_next:
+            packet[-1] ^= 0xFF
+            self.corrupt_next = False
+        if self.noise:
+            packet[:0] = self.noise
+            self.noise = b""
+        self.busy_ms += latency_ms + len(packet) / self._bytes_per_s * 1000
+        self._queue.append((time.monotonic() + latency_ms / 1000, bytes(packet)))
+
+    def _release(self) -> None:
+        now = time.monotonic()
+        while self._queue:
+            at, packet = self._queue[0]
+            arrived = int((now - at) * self._bytes_per_s) if now >= at else 0
+            if arrived >= len(packet):
+                self._rx += packet
+                self._queue.pop(0)
+                continue
+            if arrived:
+                self._rx += packet[:arrived]
+                self._queue[0] = (at + arrived / self._bytes_per_s, packet[arrived:])
+            break
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Check the firmware's AS608 packet driver against a simulated sensor and measure
+scan-to-event latency (finger on glass → ``ATTENDANCE`` line) for:
+
+  fixed_wait    – the old driver: write, sleep 200/200/300 ms, read whatever is there
+  packet        – ``pico_firmware.uart_cmd``: return as soon as the ack is complete,
+                  Search still over the whole library
+  packet_range  – as above, Search limited to the occupied template range
+
+Run from fingerprint_module (CPython; no Pico needed):
+  ./.venv/bin/python scripts/bench_as608_driver.py --scans 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT, ROOT / "scripts"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+import pico_firmware as fw
+from as608_sim import SEARCH, SimulatedAS608
+
+_packet_uart_cmd = fw.uart_cmd
+
+
+def fixed_wait_uart_cmd(cmd: bytes, timeout_ms: int = 0) -> bytes:
+    """Pre-change driver: fixed sleep per command (Search waited 300 ms, the rest 200 ms)."""
+    fw.uart.write(cmd)
+    time.sleep(0.3 if cmd[9] == SEARCH else 0.2)
+    return fw.uart.read() or b""
+
+
+def check_driver() -> None:
+    sensor = SimulatedAS608({7: "alice"})
+    fw.uart = sensor
+    assert fw.packet_checksum_ok(fw.CMD_GEN_IMG)
+
+    # No finger → valid ack with "no finger" code
+    raw = fw.uart_cmd(fw.CMD_GEN_IMG)
+    assert len(raw) == 12 and raw[9] == 0x02, raw
+
+    # Corrupt checksum → rejected
+    sensor.finger = "alice"
+    sensor.corrupt_next = True
+    assert fw.uart_cmd(fw.CMD_GEN_IMG) == b""
+
+    # Stale bytes from an earlier timed-out command are flushed first
+    sensor._rx += b"\x00\x13\xEF"
+    assert fw.response_ok(fw.uart_cmd(fw.CMD_GEN_IMG))
+    # Noise (including a lone 0xEF) before the header → resync on EF01
+    sensor.noise = b"\x00\xEF\x13\xEF"
+    assert fw.response_ok(fw.uart_cmd(fw.CMD_IMG2TZ1))
+    assert fw.search_library() == 7
+
+    # Occupancy index: TempleteNum + ReadIndexTable narrow Search to slots 7..10
+    sensor.templates.update({9: "bob", 10: "carol"})
+    assert fw.refresh_template_index()
+    assert fw.occupied_slots_text() == "7,9-10"
+    assert (fw._search_start, fw._search_count) == (7, 4)
+    sensor.templates.clear()
+    assert fw.refresh_template_index() and fw._search_count == 0
+    assert fw.search_library() == -1
+
+    # Silent sensor → deadline, not a hang
+    mute = SimulatedAS608(latency_ms={0x01: 10_000})
+    fw.uart = mute
+    start = time.monotonic()
+    assert fw.uart_cmd(fw.CMD_GEN_IMG, timeout_ms=100) == b""
+    assert time.monotonic() - start < 0.3
+
+
+def measure(name: str, scans: int) -> dict:
+    fw.uart_cmd = fixed_wait_uart_cmd if name == "fixed_wait" else _packet_uart_cmd
+    sensor = SimulatedAS608({page: f"user{page}" for page in range(0, 60, 3)})
+    fw.uart = sensor
+    if name == "packet_range":
+        fw.refresh_template_index()
+    else:
+        fw._search_start, fw._search_count = 0, fw.LIBRARY_SIZE
+    fw._last_reported.clear()
+    events: list[tuple[str, float]] = []
+    fw.send_to_bridge = lambda command, data: events.append((command, time.monotonic()))
+
+    latencies = []
+    for i in range(scans):
+        sensor.finger = f"user{(i * 3) % 60}"
+        events.clear()
+        start = time.monotonic()
+        fw.attendance_tick()
+        hit = [t for c, t in events if c == "ATTENDANCE"]
+        assert hit, events
+        latencies.append((hit[0] - start) * 1000)
+    latencies.sort()
+    return {
+        "driver": name,
+        "scans": scans,
+        "p50_ms": round(latencies[len(latencies) // 2], 1),
+        "max_ms": round(latencies[-1], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scans", type=int, default=10)
+    args = parser.parse_args()
+
+    check_driver()
+    print("driver checks: OK")
+    for name in ("fixed_wait", "packet", "packet_range"):
+        print(json.dumps(measure(name, args.scans)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Measure bridge throughput and scan-to-API latency against a local stub of Express.
+
+A simulated serial source emits ``ATTENDANCE:<id>`` lines on a fixed schedule; the
+stub API answers every POST after ``--api-delay-ms``. Inline mode is the old
+behaviour (HTTP call on the serial thread); pipelined mode uses ``bridge.Dispatcher``.
+
+Latency runs from the moment a scan is emitted to its HTTP completion, so time a
+scan spends waiting in the serial buffer behind a blocked inline loop counts too.
+Each mode runs at ``--interval-ms`` (faster than the API: a queue builds up and
+only ``--workers`` bound it) and at ``--light-interval-ms`` (slower than the API:
+what one scan costs on an idle bridge).
+
+Run from fingerprint_module:
+  ./.venv/bin/pip install -r requirements-dev.txt pyserial requests
+  ./.venv/bin/python scripts/bench_bridge_dispatch.py --events 200 --api-delay-ms 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+class StubApi(BaseHTTPRequestHandler):
+    """Minimal keep-alive stand-in for ``POST /api/attendance/scan``."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    delay_s = 0.0
+    connections: set[int] = set()
+
+    def do_POST(self):  # noqa: N802 – http.server naming
+        self.connections.add(id(self.connection))
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.delay_s)
+        out = json.dumps({"message": "ok", "employee": {"employeeId": str(body.get("fingerprintId"))}})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class SimulatedSerial:
+    """Serial-like source: line ``i`` is emitted at ``start + i * interval``, then KeyboardInterrupt."""
+
+    def __init__(self, count: int, interval: float):
+        self._lines = [f"ATTENDANCE:{i}\r\n".encode() for i in range(count)]
+        start = time.monotonic()
+        self.emitted = [start + i * interval for i in range(count)]
+        self._next = 0
+
+    @property
+    def in_waiting(self) -> int:
+        return 0
+
+    def read(self, size: int = 1) -> bytes:
+        """Block until the next scan is due; a late reader finds it already buffered."""
+        if self._next == len(self._lines):
+            raise KeyboardInterrupt
+        delay = self.emitted[self._next] - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next += 1
+        return self._lines[self._next - 1]
+
+
+def run(mode: str, events: int, interval: float, workers: int) -> dict:
+    import bridge
+
+    StubApi.connections = set()
+    latencies: list[float] = []
+    original_deliver = bridge.deliver
+    source = SimulatedSerial(events, interval)
+
+    def timed_deliver(event):
+        ok = original_deliver(event)
+        latencies.append(time.monotonic() - source.emitted[event.payload["fingerprint_id"]])
+        return ok
+
+    bridge.deliver = timed_deliver
+    dispatcher = None
+    if mode == "pipelined":
+        dispatcher = bridge.Dispatcher(workers=workers)
+        dispatcher.start()
+    bridge._dispatcher = dispatcher
+
+    start = time.monotonic()
+    try:
+        bridge.run_serial_loop(source)
+    except KeyboardInterrupt:
+        pass
+    read_done = time.monotonic() - start
+    if dispatcher is not None:
+        dispatcher.stop()
+    elapsed = time.monotonic() - start
+    bridge.deliver = original_deliver
+    bridge._dispatcher = None
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "interval_ms": interval * 1000,
+        "events": len(latencies),
+        "serial_read_s": round(read_done, 3),
+        "throughput_eps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+        "tcp_connections": len(StubApi.connections),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="Gap between simulated scans (burst)")
+    parser.add_argument("--light-interval-ms", type=float, default=50.0, help="Gap between scans on an idle bridge")
+    parser.add_argument("--api-delay-ms", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    StubApi.delay_s = args.api_delay_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    import bridge
+
+    bridge.EXPRESS_API = f"http://127.0.0.1:{server.server_address[1]}/api"
+    bridge.print = lambda *a, **k: None  # silence per-event output
+
+    for interval_ms in (args.interval_ms, args.light_interval_ms):
+        for mode in ("inline", "pipelined"):
+            print(json.dumps(run(mode, args.events, interval_ms / 1000, args.workers)))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Simulate the Pico main loop at the door and compare the old fixed polling
+(GenImg every ~50 ms, blocking 1 s debounce) with ``PollScheduler``:
+
+  idle  – nobody at the door: GenImg polls per second and sensor duty cycle
+  peak  – a queue of people, each resting a finger for --hold-ms: scans/minute,
+          duplicate reports, and how long a host PING waits for its PONG
+
+Run from fingerprint_module (CPython; no Pico needed):
+  ./.venv/bin/python scripts/bench_pico_polling.py --idle-s 3 --people 15 --hold-ms 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT, ROOT / "scripts"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+import pico_firmware as fw
+from as608_sim import GEN_IMG, SimulatedAS608
+
+host_lines: queue.Queue[str] = queue.Queue()
+
+
+def host_line(wait_ms: int = 0):
+    """Stand-in for USB stdin: lines queued by the bench, honouring ``wait_ms``."""
+    try:
+        return host_lines.get(timeout=wait_ms / 1000) if wait_ms else host_lines.get_nowait()
+    except queue.Empty:
+        return None
+
+
+def legacy_step(_sched) -> None:
+    """Pre-change main loop body: host line check, then a tick with blocking sleeps."""
+    line = host_line()
+    if line:
+        fw._handle_host_command(line)
+        return
+    if not fw.response_ok(fw.uart_cmd(fw.CMD_GEN_IMG)):
+        time.sleep(0.05)
+        return
+    if not fw.response_ok(fw.uart_cmd(fw.CMD_IMG2TZ1)):
+        time.sleep(0.2)
+        return
+    matched = fw.search_library()
+    fw.send_to_bridge("ATTENDANCE" if matched >= 0 else "STATUS", str(matched))
+    time.sleep(1)
+
+
+def run(step, seconds: float, sensor: SimulatedAS608, crowd=None, pings: int = 0) -> dict:
+    events: list[tuple[str, str, float]] = []
+    fw.send_to_bridge = lambda command, data: events.append((command, data, time.monotonic()))
+    fw._last_reported.clear()
+    sensor.instructions.clear()
+    sensor.busy_ms = 0.0
+    sched = fw.PollScheduler(fw._ticks_ms())
+
+    ping_sent: list[float] = []
+
+    def pinger():
+        for _ in range(pings):
+            time.sleep(seconds / (pings + 1))
+            ping_sent.append(time.monotonic())
+            host_lines.put("PING")
+
+    threads = [threading.Thread(target=pinger, daemon=True)]
+    if crowd:
+        threads.append(threading.Thread(target=crowd, daemon=True))
+    for t in threads:
+        t.start()
+    start = time.monotonic()
+    while time.monotonic() - start < seconds:
+        step(sched)
+    wall = time.monotonic() - start
+
+    attendance = [data for c, data, _ in events if c == "ATTENDANCE"]
+    pongs = [t for c, _, t in events if c == "PONG"]
+    ping_wait = sorted((p - s) * 1000 for s, p in zip(ping_sent, pongs))
+    return {
+        "genimg_per_s": round(sensor.instructions.count(GEN_IMG) / wall, 1),
+        "sensor_duty_pct": round(sensor.busy_ms / (wall * 1000) * 100, 1),
+        "attendance": len(attendance),
+        "distinct": len(set(attendance)),
+        "scans_per_min": round(len(set(attendance)) / wall * 60, 1),
+        "ping_max_ms": round(ping_wait[-1], 1) if ping_wait else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--idle-s", type=float, default=3.0)
+    parser.add_argument("--people", type=int, default=15)
+    parser.add_argument("--hold-ms", type=float, default=500.0)
+    parser.add_argument("--gap-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    fw._read_host_line = host_line
+    sensor = SimulatedAS608({page: f"user{page}" for page in range(args.people)})
+    fw.uart = sensor
+    fw.refresh_template_index()
+
+    def crowd():
+        for person in range(args.people):
+            sensor.finger = f"user{person}"
+            time.sleep(args.hold_ms / 1000)
+            sensor.finger = None
+            time.sleep(args.gap_ms / 1000)
+
+    peak_s = args.people * (args.hold_ms + args.gap_ms) / 1000
+    for name, step in (("fixed_poll", legacy_step), ("adaptive", fw.loop_step)):
+        # Idle from a cold start, i.e. after the active window has long expired
+        fw.ACTIVE_WINDOW_MS = 0
+        idle = run(step, args.idle_s, sensor, pings=3)
+        fw.ACTIVE_WINDOW_MS = 5000
+        peak = run(step, peak_s, sensor, crowd=crowd, pings=3)
+        print(json.dumps({"loop": name, "idle": idle, "peak": peak}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Time Pico port detection with pty stand-ins: several silent serial devices plus
+one that answers the Rose handshake.
+
+  legacy   – the old sequential open-each-port scan (returns the first openable
+             port, which is usually the wrong device)
+  cold     – parallel handshake probe, no cache
+  warm     – restart with the cached port from the cold run
+
+Each run also reports probe threads still running when detection returns (the
+losing probes must have closed their ports by then).
+
+Run from fingerprint_module (Linux / macOS):
+  ./.venv/bin/python scripts/bench_port_detection.py --silent 6 --reply-delay-ms 150
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT, ROOT / "scripts"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+import serial
+
+import bridge
+from pico_sim import PtyPico
+
+
+def legacy_detect(candidates: list[str]) -> str | None:
+    """Pre-change ``detect_pico_port``: open each candidate plus COM1–COM20 in turn."""
+    for port in candidates + [f"COM{i}" for i in range(1, 21)]:
+        try:
+            s = serial.Serial(port, bridge.BAUD_RATE, timeout=0.2)
+            s.close()
+            return port
+        except (serial.SerialException, OSError):
+            continue
+    return None
+
+
+def timed(fn) -> tuple[str | None, float]:
+    start = time.perf_counter()
+    port = fn()
+    return port, round((time.perf_counter() - start) * 1000, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--silent", type=int, default=6, help="Non-Rose serial devices")
+    parser.add_argument("--reply-delay-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    bridge.print = lambda *a, **k: None
+    silent = [PtyPico() for _ in range(args.silent)]
+    rose = PtyPico()
+    rose.answer_handshake(delay=args.reply_delay_ms / 1000)
+    candidates = [p.port for p in silent] + [rose.port]
+    cache = tempfile.mktemp(suffix=".json")
+
+    results = {}
+    for name, fn in (
+        ("legacy", lambda: legacy_detect(candidates)),
+        ("cold", lambda: bridge.detect_pico_port(candidates, cache_path=cache)),
+        ("warm", lambda: bridge.detect_pico_port(candidates, cache_path=cache)),
+    ):
+        port, ms = timed(fn)
+        # Probe threads still alive would be reading ports the bridge is about to open
+        probes = sum(t.name.startswith("bridge-probe") for t in threading.enumerate())
+        results[name] = {"ms": ms, "correct": port == rose.port, "probes_left_running": probes}
+    print(json.dumps(results, indent=2))
+
+    for p in silent + [rose]:
+        p.close()
+
+
+if __name__ == "__main__":
+    main()
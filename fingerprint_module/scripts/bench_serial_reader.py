@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Compare the bridge's blocking serial reader with the old ``in_waiting`` busy loop.
+
+Both readers are driven by a pty stand-in for the Pico. For each we report CPU
+used while the line is idle and the delay from a line being written to
+``handle_line`` receiving it.
+
+Run from fingerprint_module (Linux / macOS):
+  ./.venv/bin/python scripts/bench_serial_reader.py --idle-s 2 --lines 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT, ROOT / "scripts"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+import serial
+
+import bridge
+from pico_sim import PtyPico
+
+
+def legacy_poll_loop(ser, stop: threading.Event) -> None:
+    """The pre-change ``main`` loop: spins on ``in_waiting`` with no sleep."""
+    while not stop.is_set():
+        if ser.in_waiting > 0:
+            raw = ser.readline()
+            try:
+                line = raw.decode("utf-8").strip()
+            except UnicodeDecodeError:
+                continue
+            if line:
+                bridge.handle_line(line)
+
+
+def measure(name: str, loop, idle_s: float, lines: int) -> dict:
+    pico = PtyPico()
+    ser = serial.Serial(pico.port, bridge.BAUD_RATE, timeout=bridge.TIMEOUT)
+    received: list[tuple[int, float]] = []
+    bridge.handle_line = lambda line, device="": received.append((int(line.split(":")[1]), time.perf_counter()))
+
+    stop = threading.Event()
+    reader = threading.Thread(target=loop, args=(ser, stop), daemon=True)
+    reader.start()
+
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    time.sleep(idle_s)
+    idle_cpu = (time.process_time() - cpu0) / (time.perf_counter() - wall0) * 100
+
+    sent: dict[int, float] = {}
+    for i in range(lines):
+        sent[i] = time.perf_counter()
+        if i % 2:
+            # Split the line across two writes to exercise framing
+            pico.send_raw(f"STATUS:{i}".encode())
+            time.sleep(0.002)
+            pico.send_raw(b"\r\n")
+        else:
+            pico.send(f"STATUS:{i}")
+        time.sleep(0.02)
+    time.sleep(0.2)
+
+    stop.set()
+    reader.join(bridge.TIMEOUT + 1)
+    ser.close()
+    pico.close()
+
+    lat = sorted((t - sent[i]) * 1000 for i, t in received)
+    return {
+        "reader": name,
+        "idle_cpu_pct": round(idle_cpu, 1),
+        "lines": f"{len(received)}/{lines}",
+        "p50_ms": round(lat[len(lat) // 2], 3) if lat else None,
+        "max_ms": round(lat[-1], 3) if lat else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--idle-s", type=float, default=2.0)
+    parser.add_argument("--lines", type=int, default=50)
+    args = parser.parse_args()
+
+    original = bridge.handle_line
+    for name, loop in (("busy_poll", legacy_poll_loop), ("blocking", bridge.run_serial_loop)):
+        print(json.dumps(measure(name, loop, args.idle_s, args.lines)))
+        bridge.handle_line = original
+
+
+if __name__ == "__main__":
+    main()
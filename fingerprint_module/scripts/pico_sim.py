@@ -0,0 +1,63 @@
+"""
+Pseudo-terminal stand-ins for the Pico W, shared by the bridge benchmark scripts.
+
+``PtyPico`` owns the master side of a pty pair; the bridge opens ``port`` (the
+slave path) with pyserial exactly as it would open ``/dev/ttyACM0``.
+"""
+
+from __future__ import annotations
+
+import os
+import select
+import threading
+import time
+import tty
+
+
+class PtyPico:
+    """One simulated Pico: write firmware lines, read what the host sends back."""
+
+    def __init__(self) -> None:
+        self.master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # no echo / CRLF translation, like a USB CDC port
+        self.port = os.ttyname(self._slave)
+
+    def send(self, line: str) -> None:
+        os.write(self.master, f"{line}\r\n".encode())
+
+    def send_raw(self, data: bytes) -> None:
+        os.write(self.master, data)
+
+    def read_host(self, timeout: float = 1.0) -> bytes:
+        """Bytes the bridge wrote to the port within ``timeout`` (b"" if none)."""
+        ready, _, _ = select.select([self.master], [], [], timeout)
+        return os.read(self.master, 4096) if ready else b""
+
+    def answer_handshake(self, reply: str = "PONG:ROSE/1", delay: float = 0.0) -> threading.Thread:
+        """Reply to ``PING`` like the Rose firmware (after ``delay``, e.g. a scan tick)."""
+
+        def serve() -> None:
+            buf = b""
+            while True:
+                try:
+                    buf += self.read_host(timeout=0.5)
+                except OSError:
+                    return
+                if b"PING" in buf:
+                    buf = b""
+                    time.sleep(delay)
+                    try:
+                        self.send(reply)
+                    except OSError:
+                        return
+
+        t = threading.Thread(target=serve, daemon=True)
+        t.start()
+        return t
+
+    def close(self) -> None:
+        for fd in (self.master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+End-to-end check of the Pico ↔ bridge link over a pty pair.
+
+The firmware's link layer (``pico_firmware.send_to_bridge`` / ``service_link`` /
+``_handle_host_command``) runs on the pty master; a real ``bridge.DeviceReader``
+opens the slave path with pyserial. The Pico → bridge direction drops and
+corrupts a share of writes, and a share of the bridge's ACK lines never reach
+the Pico. Scenarios:
+
+  framed        – clean line, framed link negotiated with HELLO
+  framed_lossy  – framed link on the lossy line: every scan must still arrive once
+  text_lossy    – --text-link on the same line: what was lost before framing
+  old_firmware  – firmware that ignores HELLO: the bridge falls back to text lines
+
+Run from fingerprint_module:
+  ./.venv/bin/python scripts/sim_link_protocol.py --events 100 --drop 0.2 --ack-drop 0.2 --corrupt 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import importlib
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT, ROOT / "scripts"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+import bridge
+import pico_firmware as fw
+from pico_sim import PtyPico
+
+
+class LossyLine:
+    """The Pico end of the pty: firmware writes and host reads, with injected faults."""
+
+    def __init__(self, pico: PtyPico, rng: random.Random, drop: float, ack_drop: float, corrupt: float):
+        self.pico = pico
+        self.rng = rng
+        self.drop, self.ack_drop, self.corrupt = drop, ack_drop, corrupt
+        self.sent: set[bytes] = set()
+        self.retransmits = 0
+        self._pending = b""
+
+    def write_out(self, data: bytes) -> None:
+        if data in self.sent:
+            self.retransmits += 1
+        self.sent.add(data)
+        if self.rng.random() < self.drop:
+            return
+        if self.rng.random() < self.corrupt:
+            i = self.rng.randrange(len(data))
+            data = data[:i] + bytes([data[i] ^ 0x41]) + data[i + 1 :]
+        self.pico.send_raw(data)
+
+    def read_host_line(self, wait_ms: int = 0):
+        if b"\n" not in self._pending:
+            self._pending += self.pico.read_host(timeout=wait_ms / 1000)
+        if b"\n" not in self._pending:
+            return None
+        raw, _, self._pending = self._pending.partition(b"\n")
+        line = raw.decode().strip()
+        if line.startswith("ACK:") and self.rng.random() < self.ack_drop:
+            return None
+        return line
+
+
+def run(name: str, events: int, interval_ms: float, faults: dict, framed: bool, honour_hello: bool = True) -> dict:
+    rng = random.Random(7)
+    pico = PtyPico()
+    line = LossyLine(pico, rng, **faults)
+    importlib.reload(fw)  # fresh link state and scan buffer
+    fw.BUFFER_PATH = str(Path(tempfile.mkdtemp()) / "scan_buffer.bin")
+    fw._write_out = line.write_out
+    fw._read_host_line = line.read_host_line
+    handle_host = fw._handle_host_command
+    if not honour_hello:
+        # Pre-framing firmware: HELLO is just an unknown host line and scans go out as text
+        handle_host = lambda text: None if text.startswith("HELLO:") else fw._handle_host_command(text)  # noqa: E731
+        fw._link = fw.LINK_TEXT
+
+    received: list[tuple[str, int]] = []
+    bad_crc = [0]
+
+    def record(event) -> None:
+        received.append((event.event_id, event.payload["fingerprint_id"]))
+
+    def quiet(*args, **_kwargs) -> None:
+        if args and "bad CRC" in str(args[0]):
+            bad_crc[0] += 1
+
+    bridge._dispatch = record
+    bridge.print = quiet
+    reader = bridge.DeviceReader(pico.port, framed=framed)
+    reader.start()
+    reader.connected.wait(5)
+
+    # Give the HELLO a moment, as the real firmware's main loop would
+    deadline = time.monotonic() + 0.5
+    while time.monotonic() < deadline:
+        text = fw._read_host_line(20)
+        if text:
+            handle_host(text)
+
+    start = time.monotonic()
+    emitted, next_emit = 0, start
+    settle_until = None
+    while True:
+        now = time.monotonic()
+        fw.service_link(fw._ticks_ms())
+        text = fw._read_host_line(5)
+        if text:
+            handle_host(text)
+        if emitted < events and now >= next_emit:
+            fw.send_to_bridge("ATTENDANCE", str(emitted))
+            emitted += 1
+            next_emit = now + interval_ms / 1000
+        if emitted == events and (fw._link != fw.LINK_FRAMED or not fw.buffered_count()):
+            settle_until = settle_until or now + 0.3
+            if now >= settle_until:
+                break
+        if now - start > events * interval_ms / 1000 + 30:
+            break  # retransmissions never converged
+    elapsed = time.monotonic() - start
+
+    reader.stop()
+    reader.join(bridge.TIMEOUT + 1)
+    pico.close()
+
+    counts = collections.Counter(fid for _, fid in received)
+    return {
+        "scenario": name,
+        "framed": fw._link == fw.LINK_FRAMED,
+        "emitted": events,
+        "delivered": len(counts),
+        "missing": events - len(counts),
+        "duplicates": sum(c - 1 for c in counts.values()),
+        "retransmits": line.retransmits,
+        "bad_crc_frames": bad_crc[0],
+        "unacked_left": fw.buffered_count() if fw._link == fw.LINK_FRAMED else 0,
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--interval-ms", type=float, default=100.0, help="Gap between simulated scans")
+    parser.add_argument("--drop", type=float, default=0.2, help="Share of Pico writes lost")
+    parser.add_argument("--ack-drop", type=float, default=0.2, help="Share of bridge ACKs lost")
+    parser.add_argument("--corrupt", type=float, default=0.05, help="Share of Pico writes with a flipped byte")
+    args = parser.parse_args()
+
+    clean = {"drop": 0.0, "ack_drop": 0.0, "corrupt": 0.0}
+    lossy = {"drop": args.drop, "ack_drop": args.ack_drop, "corrupt": args.corrupt}
+    results = [
+        run("framed", args.events, args.interval_ms, clean, framed=True),
+        run("framed_lossy", args.events, args.interval_ms, lossy, framed=True),
+        run("text_lossy", args.events, args.interval_ms, lossy, framed=False),
+        run("old_firmware", args.events, args.interval_ms, clean, framed=True, honour_hello=False),
+    ]
+    for result in results:
+        print(json.dumps(result))
+
+    framed, framed_lossy, _, old = results
+    ok = (
+        framed["framed"] and framed["delivered"] == args.events
+        and framed_lossy["delivered"] == args.events and framed_lossy["duplicates"] == 0
+        and not old["framed"] and old["delivered"] == args.events
+    )
+    print("link protocol checks:", "OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Simulate several door scanners against one bridge process.
+
+Each Pico is a pty pair (``pico_sim.PtyPico``); the bridge's ``DeviceManager``
+discovers them, tags events with a device id, and sends everything through the
+shared dispatcher / outbox / HTTP pool to a local stub API. Midway one device is
+unplugged and a new one plugged in to check hot-plug without a restart.
+
+Run from fingerprint_module (Linux / macOS):
+  ./.venv/bin/python scripts/sim_multi_device.py --devices 4 --scans 25
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT, ROOT / "scripts"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+import bridge
+from bench_bridge_dispatch import StubApi
+from pico_sim import PtyPico
+
+
+class RecordingApi(StubApi):
+    """Stub API that keeps every request body (to check device tags)."""
+
+    bodies: list[dict] = []
+
+    def do_POST(self):  # noqa: N802
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        self.bodies.append(json.loads(raw or b"{}"))
+        self.connections.add(id(self.connection))
+        out = b'{"message": "ok"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+
+def wait_for(predicate, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def scan_all(picos: list[PtyPico], scans: int) -> None:
+    for i in range(scans):
+        for n, pico in enumerate(picos):
+            pico.send(f"ATTENDANCE:{n * 100 + i % 100}")
+        time.sleep(0.005)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--scans", type=int, default=25, help="Scans per device per phase")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bridge.EXPRESS_API = f"http://127.0.0.1:{server.server_address[1]}/api"
+    bridge.print = lambda *a, **k: None
+
+    picos = [PtyPico() for _ in range(args.devices)]
+    plugged = {p.port for p in picos}
+    outbox = bridge.Outbox(tempfile.mktemp(suffix=".sqlite3"))
+    bridge._dispatcher = bridge.Dispatcher(outbox=outbox)
+    bridge._dispatcher.start()
+    manager = bridge.DeviceManager(lambda: sorted(plugged), rescan_interval=0.2)
+    stop = threading.Event()
+    threading.Thread(target=manager.run, args=(stop,), daemon=True).start()
+    assert wait_for(lambda: sum(r.connected.is_set() for r in manager.readers.values()) == args.devices, 5)
+
+    start = time.monotonic()
+    scan_all(picos, args.scans)
+    expected = args.devices * args.scans
+    assert wait_for(lambda: len(RecordingApi.bodies) >= expected, 30), len(RecordingApi.bodies)
+    phase1 = time.monotonic() - start
+
+    # Hot-plug: unplug device 0, plug in a brand-new one
+    gone = picos.pop(0)
+    plugged.discard(gone.port)
+    gone.close()
+    fresh = PtyPico()
+    picos.append(fresh)
+    plugged.add(fresh.port)
+    assert wait_for(lambda: fresh.port in manager.readers and manager.readers[fresh.port].connected.is_set(), 5)
+    scan_all(picos, args.scans)
+    expected += args.devices * args.scans
+    assert wait_for(lambda: len(RecordingApi.bodies) >= expected, 30), len(RecordingApi.bodies)
+
+    stop.set()
+    manager.stop_all(timeout=2)
+    bridge._dispatcher.stop()
+    per_device = Counter(b.get("deviceId") for b in RecordingApi.bodies)
+    print(
+        json.dumps(
+            {
+                "devices": args.devices,
+                "events": len(RecordingApi.bodies),
+                "phase1_eps": round(args.devices * args.scans / phase1, 1),
+                "per_device": dict(per_device),
+                "hot_plugged": manager.readers[fresh.port].device_id,
+                "tcp_connections": len(RecordingApi.connections),
+                "outbox_depth": outbox.depth(),
+            },
+            indent=2,
+        )
+    )
+    for pico in picos:
+        pico.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Simulate bridge outages against the Pico's scan buffer on a virtual clock.
+
+Firmware output goes nowhere while the bridge is away; on reconnect the host
+sends TIME + HELLO like ``bridge.DeviceReader`` and a ``bridge.LinkSession``
+acks what the flush delivers. Only the MicroPython subset the firmware uses is
+exercised (bytearray records, ticks arithmetic, open/os.remove on one file).
+
+  connected   – bridge always there: every scan acked, no flash writes
+  outage      – bridge away for --outage-min with a scan every --scan-every-s
+  reboot      – Pico power-cycles mid-outage: scans come back from flash
+  partial_ack – the bridge acks the first flush batch, then the Pico power-cycles
+                once the acks reached flash (acked scans must not come back) and
+                once right after them (they come back under their first event ids)
+  unsynced    – scans before the first TIME line (Pico booted without a host)
+  overflow    – more scans than BUFFER_EVENTS: the oldest are dropped and reported
+
+Reported per scenario: delivered / expected, scans seen under two event ids
+(the API would record them twice), capture-time error, flash writes and bytes,
+largest buffer file, and RAM growth (tracemalloc) while buffering.
+
+Run from fingerprint_module:
+  ./.venv/bin/python scripts/sim_scan_buffer.py --outage-min 120 --scan-every-s 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import bridge
+import pico_firmware as fw
+
+HOST_EPOCH = 1_767_000_000  # host wall clock at virtual tick 0
+OUTAGE_STEP_MS = 250        # loop granularity while nothing is listening (keeps the sim fast)
+
+
+class VirtualPico:
+    """Firmware module on a virtual clock, with its flash I/O counted."""
+
+    def __init__(self, buffer_path: str, clock_ms: int = 0):
+        self.clock_ms = clock_ms
+        self.out = bytearray()
+        self.connected = False
+        self.flash_writes = 0
+        self.flash_bytes = 0
+        self.max_file = 0
+        self.buffer_path = buffer_path
+        self.boot()
+
+    def boot(self) -> None:
+        importlib.reload(fw)
+        fw.BUFFER_PATH = self.buffer_path
+        fw._ticks_ms = lambda: self.clock_ms
+        fw._write_out = self._write_out
+        flash_write = fw._flash_write
+
+        def counted(data: bytes, append: bool = True) -> None:
+            flash_write(data, append)
+            self.flash_writes += 1
+            self.flash_bytes += len(data)
+            self.max_file = max(self.max_file, os.path.getsize(self.buffer_path))
+
+        fw._flash_write = counted
+
+    def _write_out(self, data: bytes) -> None:
+        if self.connected:
+            self.out += data
+
+    def advance(self, ms: int, step: int = 20) -> None:
+        """Let the firmware run ``ms`` of virtual time, calling service_link every ``step`` ms."""
+        end = self.clock_ms + ms
+        while self.clock_ms < end:
+            self.clock_ms = min(end, self.clock_ms + step)
+            fw.service_link(self.clock_ms)
+
+
+class Host:
+    """Bridge end: decodes frames with ``read_messages`` and acks via ``LinkSession``."""
+
+    def __init__(self, events: list | None = None) -> None:
+        self.session = bridge.LinkSession("pico-sim")
+        self.events: list = [] if events is None else events
+        self.errors: list[str] = []
+        bridge._dispatch = self.events.append
+
+        def quiet(*args, **_kwargs) -> None:
+            if args and "PICO ERROR" in str(args[0]):
+                self.errors.append(str(args[0]))
+
+        bridge.print = quiet
+
+    def connect(self, pico: VirtualPico) -> None:
+        pico.connected = True
+        fw._handle_host_command(f"TIME:{HOST_EPOCH + pico.clock_ms // 1000}")
+        fw._handle_host_command(f"HELLO:{bridge.LINK_VERSION}")
+
+    def pump(self, pico: VirtualPico) -> None:
+        data, pico.out = bytes(pico.out), bytearray()
+        stop = threading.Event()
+
+        class Pipe:
+            in_waiting = 0
+
+            def read(self, _size: int = 1) -> bytes:
+                nonlocal data
+                chunk, data = data, b""
+                if not chunk:
+                    stop.set()
+                return chunk
+
+        for line, frame in bridge.read_messages(Pipe(), stop):
+            if frame is None:
+                bridge.handle_line(line, self.session.device)
+                continue
+            ack = self.session.receive(line, frame)
+            if ack:
+                fw._handle_host_command(ack.decode().strip())
+
+    def drain(self, pico: VirtualPico, limit_ms: int = 60_000) -> int:
+        """Run until the Pico's buffer is empty; returns the virtual ms it took."""
+        start = pico.clock_ms
+        while fw.buffered_count() and pico.clock_ms - start < limit_ms:
+            pico.advance(20)
+            self.pump(pico)
+        self.pump(pico)
+        took = pico.clock_ms - start
+        pico.advance(20)  # next loop pass deletes the drained buffer file
+        return took
+
+
+def scan(pico: VirtualPico, template: int, truth: dict) -> None:
+    fw.send_to_bridge("ATTENDANCE", str(template))
+    truth[template] = HOST_EPOCH + pico.clock_ms // 1000
+
+
+def report(name: str, pico: VirtualPico, host: Host, truth: dict, flush_ms: int, ram_growth: int) -> dict:
+    attendance = [e for e in host.events if e.kind == "attendance"]
+    delivered = {e.payload["fingerprint_id"]: e for e in attendance}
+    errors = [
+        abs(datetime.fromisoformat(e.captured_at).timestamp() - truth[fid])
+        for fid, e in delivered.items()
+        if fid in truth
+    ]
+    ids = {}
+    for e in attendance:
+        ids.setdefault(e.payload["fingerprint_id"], set()).add(e.event_id)
+    return {
+        "scenario": name,
+        "expected": len(truth),
+        "delivered": len(delivered),
+        "duplicates": len(attendance) - len(delivered),
+        "recorded_twice": sum(len(v) > 1 for v in ids.values()),  # same scan under two event ids
+        "max_time_error_s": round(max(errors, default=0.0), 1),
+        "flush_ms": flush_ms,
+        "flash_writes": pico.flash_writes,
+        "flash_bytes": pico.flash_bytes,
+        "max_file_bytes": pico.max_file,
+        "file_left": os.path.exists(pico.buffer_path),
+        "ram_growth_bytes": ram_growth,
+        "errors": host.errors,
+    }
+
+
+def run_connected(path: str, scans: int, every_ms: int) -> dict:
+    pico, host, truth = VirtualPico(path), Host(), {}
+    host.connect(pico)
+    for i in range(scans):
+        scan(pico, i, truth)
+        host.pump(pico)
+        pico.advance(every_ms)
+    return report("connected", pico, host, truth, host.drain(pico), 0)
+
+
+def run_outage(path: str, scans: int, every_ms: int) -> dict:
+    pico, host, truth = VirtualPico(path), Host(), {}
+    host.connect(pico)
+    host.pump(pico)
+    pico.connected = False  # laptop asleep / cable out
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(scans):
+        scan(pico, i, truth)
+        pico.advance(every_ms, step=OUTAGE_STEP_MS)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    growth = sum(
+        stat.size_diff
+        for stat in after.compare_to(before, "filename")
+        if stat.traceback[0].filename == fw.__file__
+    )
+    host.connect(pico)
+    return report("outage", pico, host, truth, host.drain(pico), growth)
+
+
+def run_reboot(path: str, scans: int, every_ms: int) -> dict:
+    pico, host, truth = VirtualPico(path), Host(), {}
+    host.connect(pico)
+    host.pump(pico)
+    pico.connected = False
+    for i in range(scans):
+        scan(pico, i, truth)
+        pico.advance(every_ms, step=OUTAGE_STEP_MS)
+    pico.advance(fw.PERSIST_AFTER_MS)  # last scans reach flash before power is cut
+    pico.boot()
+    fw.load_buffer()
+    host = Host()  # bridge reconnects to a new boot id
+    host.connect(pico)
+    return report("reboot", pico, host, truth, host.drain(pico), 0)
+
+
+def run_partial_ack(path: str, scans: int, every_ms: int, compacted: bool) -> dict:
+    pico, host, truth = VirtualPico(path), Host(), {}
+    host.connect(pico)
+    host.pump(pico)
+    pico.connected = False
+    for i in range(scans):
+        scan(pico, i, truth)
+        pico.advance(every_ms, step=OUTAGE_STEP_MS)
+    pico.advance(fw.PERSIST_AFTER_MS)
+    host = Host()
+    host.connect(pico)  # the HELLO flush sends one FLUSH_BATCH ...
+    host.pump(pico)     # ... and the bridge acks it
+    acked = len(host.events)
+    pico.connected = False  # power cut before the rest is acked
+    if compacted:
+        pico.advance(fw.PERSIST_AFTER_MS + 20)
+    pico.boot()
+    restored = fw.load_buffer()
+    host = Host(host.events)
+    host.connect(pico)
+    result = report("partial_ack" if compacted else "partial_ack_crash", pico, host, truth, host.drain(pico), 0)
+    result.update({"acked_before_reboot": acked, "restored": restored})
+    return result
+
+
+def run_unsynced(path: str, scans: int, every_ms: int) -> dict:
+    pico, host, truth = VirtualPico(path), Host(), {}
+    for i in range(scans):  # no TIME yet: records keep ticks_ms
+        scan(pico, i, truth)
+        pico.advance(every_ms, step=OUTAGE_STEP_MS)
+    host.connect(pico)
+    return report("unsynced", pico, host, truth, host.drain(pico), 0)
+
+
+def run_overflow(path: str, every_ms: int) -> dict:
+    pico, host, truth = VirtualPico(path), Host(), {}
+    host.connect(pico)
+    host.pump(pico)
+    pico.connected = False
+    total = fw.BUFFER_EVENTS + 200
+    for i in range(total):
+        scan(pico, i, truth)
+        pico.advance(every_ms, step=OUTAGE_STEP_MS)
+    for i in range(total - fw.BUFFER_EVENTS):
+        truth.pop(i)  # expected to be dropped: only the newest BUFFER_EVENTS survive
+    host.connect(pico)
+    return report("overflow", pico, host, truth, host.drain(pico), 0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--outage-min", type=float, default=120.0)
+    parser.add_argument("--scan-every-s", type=float, default=30.0)
+    args = parser.parse_args()
+
+    every_ms = int(args.scan_every_s * 1000)
+    scans = int(args.outage_min * 60 / args.scan_every_s)
+    tmp = Path(tempfile.mkdtemp())
+    results = [
+        run_connected(str(tmp / "connected.bin"), scans, every_ms),
+        run_outage(str(tmp / "outage.bin"), scans, every_ms),
+        run_reboot(str(tmp / "reboot.bin"), min(scans, fw.BUFFER_EVENTS), every_ms),
+        run_partial_ack(str(tmp / "partial.bin"), min(scans, fw.BUFFER_EVENTS), every_ms, compacted=True),
+        run_partial_ack(str(tmp / "partial_crash.bin"), min(scans, fw.BUFFER_EVENTS), every_ms, compacted=False),
+        run_unsynced(str(tmp / "unsynced.bin"), min(scans, 50), every_ms),
+        run_overflow(str(tmp / "overflow.bin"), 1000),
+    ]
+    print(json.dumps({"ram_static_bytes": len(fw._buf) + len(fw._rec_state)}))
+    for result in results:
+        print(json.dumps(result))
+
+    ok = all(
+        r["delivered"] == r["expected"] and r["recorded_twice"] == 0 and r["max_time_error_s"] <= 1
+        and not r["file_left"]
+        and (r["duplicates"] == 0 or r["scenario"] == "partial_ack_crash")
+        for r in results
+    )
+    connected, outage, _, partial, crash, _, overflow = results
+    ok = ok and partial["restored"] == partial["expected"] - partial["acked_before_reboot"]
+    ok = ok and crash["restored"] == crash["expected"]
+    ok = ok and connected["flash_writes"] == 0 and outage["ram_growth_bytes"] < 1024
+    ok = ok and any("dropped" in e for e in overflow["errors"])
+    print("scan buffer checks:", "OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Dashboards kept current by polling ``/enrolled`` vs the ``/events`` stream (mongomock).
+
+--employees enrolled members, --dashboards open dashboards and --scans
+attendance scans spread over --minutes of virtual time, run against the real
+Flask app:
+
+  polling   every dashboard GETs /enrolled each --poll-s (the old behaviour):
+            requests, bytes, and how long a scan waits for the next poll
+  sse       every dashboard holds one /events stream: requests, bytes, and
+            whether each dashboard received each scan
+  fanout    --subscribers streams open at once in this one thread (each is a
+            generator over the shared log): threads created, memory per
+            stream, and time to deliver one scan to all of them
+  resync    a stream that falls more than SSE_BACKLOG events behind is told
+            to reload instead of silently missing scans
+
+Run from fingerprint_module:
+  ./.venv/bin/python scripts/sim_scan_events.py --dashboards 20 --minutes 10 --scans 120
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("MONGO_URI", "mongodb://127.0.0.1:27017/rose_sim_events")
+os.environ.setdefault("SSE_MAX_SUBSCRIBERS", "100000")
+os.environ["SCAN_EVENTS_SOURCE"] = "memory"
+os.environ["ML_SCORING_URL"] = ""
+
+
+def scan_times(scans: int, minutes: float) -> list[float]:
+    """Evenly spread scan instants (seconds of virtual time)."""
+    step = minutes * 60 / scans
+    return [step * (i + 0.5) for i in range(scans)]
+
+
+def run_polling(client, args) -> dict:
+    requests = bytes_ = 0
+    waits = []
+    duration = args.minutes * 60
+    polls = [args.poll_s * k for k in range(1, int(duration / args.poll_s) + 1)]
+    scans = scan_times(args.scans, args.minutes)
+    events = sorted([(t, "scan", i) for i, t in enumerate(scans)] + [(t, "poll", None) for t in polls])
+    for t, kind, i in events:
+        if kind == "scan":
+            client.post("/attendance/scan", json={"fingerprint_id": i % args.employees})
+            continue
+        # Major step: every dashboard re-fetches the full list
+        for _ in range(args.dashboards):
+            r = client.get("/enrolled")
+            requests += 1
+            bytes_ += len(r.data)
+    for t in scans:
+        after = [p for p in polls if p >= t]
+        waits.append((after[0] - t) if after else args.poll_s)
+    return {
+        "mode": "polling",
+        "requests": requests,
+        "mb": round(bytes_ / 1e6, 2),
+        "mean_staleness_s": round(sum(waits) / len(waits), 2),
+    }
+
+
+def run_sse(client, args) -> dict:
+    streams = [client.get("/events", buffered=False) for _ in range(args.dashboards)]
+    readers = [iter(s.response) for s in streams]
+    bytes_ = sum(len(next(r)) for r in readers)
+    received = [0] * args.dashboards
+    latencies = []
+    for i, _ in enumerate(scan_times(args.scans, args.minutes)):
+        client.post("/attendance/scan", json={"fingerprint_id": i % args.employees})
+        t = time.perf_counter()
+        for d, reader in enumerate(readers):
+            chunk = next(reader)
+            bytes_ += len(chunk)
+            received[d] += chunk.count(b"event: scan")
+        latencies.append((time.perf_counter() - t) / args.dashboards * 1000)
+    # Keepalives over the window: one comment line per stream per SSE_KEEPALIVE_S
+    from flask_api.config import Config
+
+    bytes_ += int(args.minutes * 60 / Config.SSE_KEEPALIVE_S) * len(b": keepalive\n\n") * args.dashboards
+    for s in streams:
+        s.close()
+    return {
+        "mode": "sse",
+        "requests": args.dashboards,
+        "mb": round(bytes_ / 1e6, 2),
+        "every_dashboard_got_every_scan": all(n == args.scans for n in received),
+        "deliver_ms_per_stream": round(sum(latencies) / len(latencies), 4),
+    }
+
+
+def run_fanout(client, hub, args) -> dict:
+    threads_before = threading.active_count()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    streams = [client.get("/events", buffered=False) for _ in range(args.subscribers)]
+    readers = [iter(s.response) for s in streams]
+    for r in readers:
+        next(r)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    per_stream_kb = sum(s.size_diff for s in after.compare_to(before, "filename")) / args.subscribers / 1024
+    subscribers = hub.stats()["subscribers"]
+    t = time.perf_counter()
+    hub.publish("scan", {"employee": {"fingerprintId": 0}, "alreadyPresentToday": True})
+    publish_ms = (time.perf_counter() - t) * 1000
+    t = time.perf_counter()
+    delivered = sum(b"event: scan" in next(r) for r in readers)
+    deliver_ms = (time.perf_counter() - t) * 1000
+    threads = threading.active_count() - threads_before
+    for s in streams:
+        s.close()
+    return {
+        "mode": "fanout",
+        "subscribers": subscribers,
+        "threads_created": threads,
+        "kb_per_stream": round(per_stream_kb, 1),
+        "publish_ms": round(publish_ms, 3),
+        "deliver_all_ms": round(deliver_ms, 1),
+        "delivered": delivered,
+        "subscribers_after_close": hub.stats()["subscribers"],
+    }
+
+
+def run_resync(client, hub) -> dict:
+    stream = client.get("/events", buffered=False)
+    reader = iter(stream.response)
+    next(reader)
+    overflow = hub._log.maxlen + 5
+    for _ in range(overflow):
+        hub.publish("scan", {"employee": {"fingerprintId": 0}, "alreadyPresentToday": True})
+    chunk = next(reader)
+    stream.close()
+    return {
+        "mode": "resync",
+        "published_while_behind": overflow,
+        "resync_sent": chunk.startswith(b"event: resync"),
+        "scans_replayed": chunk.count(b"event: scan"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--employees", type=int, default=200)
+    parser.add_argument("--dashboards", type=int, default=20)
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--scans", type=int, default=120)
+    parser.add_argument("--poll-s", type=float, default=5, help="old dashboard refresh interval")
+    parser.add_argument("--subscribers", type=int, default=2000)
+    args = parser.parse_args()
+
+    import mongomock
+
+    import flask_api.database.connection as conn
+
+    with patch.object(conn, "MongoClient", mongomock.MongoClient):
+        conn._client.cache_clear()
+        from flask_api.app import create_app
+
+        app = create_app()
+        hub = app.extensions["scan_events"]
+        client = app.test_client()
+        for i in range(args.employees):
+            client.post("/register_user", json={"name": f"Member {i}", "email": f"m{i}@example.com", "fingerprint_id": i})
+
+        polling = run_polling(client, args)
+        sse = run_sse(client, args)
+        common = {"employees": args.employees, "dashboards": args.dashboards, "minutes": args.minutes, "scans": args.scans}
+        print(json.dumps({**common, **polling}))
+        print(json.dumps({**common, **sse, "requests_saved": polling["requests"] - sse["requests"],
+                          "bytes_ratio": round(sse["mb"] / polling["mb"], 4) if polling["mb"] else None}))
+        print(json.dumps(run_fanout(client, hub, args)))
+        print(json.dumps(run_resync(client, hub)))
+
+
+if __name__ == "__main__":
+    main()
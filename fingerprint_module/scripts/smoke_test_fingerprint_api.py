@@ -77,6 +77,42 @@ def main() -> None:
         assert r.status_code == 200
         assert b"Test User" in r.data
 
+        # Major step: /events pushes scans to an open stream (replays after Last-Event-ID)
+        stream = client.get("/events", buffered=False)
+        assert stream.mimetype == "text/event-stream"
+        chunks = iter(stream.response)
+        assert b"connected" in next(chunks)
+        r = client.post("/attendance/scan", json={"fingerprint_id": 42})
+        event = next(chunks).decode()
+        assert "event: scan" in event and '"fingerprintId":42' in event and '"alreadyPresentToday":true' in event
+        stream.close()
+        replay = client.get("/events", headers={"Last-Event-ID": "0"}, buffered=False)
+        chunks = iter(replay.response)
+        next(chunks)
+        assert next(chunks).decode().startswith("id: 1\nevent: enrolled")
+        replay.close()
+        assert client.get("/health").get_json()["events"]["subscribers"] == 0
+
+        # Major step: opt-in scan scoring stores the fresh score (stub scorer, no ML service)
+        from flask_api.database.repository import EmployeeRepository
+        from flask_api.services.scan_scoring import ScanScorer
+
+        class StubScorer:
+            def score(self, employee):
+                return {"anomalyScore": 87.5, "riskLevel": "High", "isGhost": True}
+
+        repo = EmployeeRepository(scorer=StubScorer())
+        repo.register_user("Scored User", "scored@example.com", 43)
+        employee, _ = repo.record_scan(43)
+        assert employee["anomalyScore"] == 87.5 and employee["riskLevel"] == "High"
+        assert repo._history.find_one({"employeeId": employee["employeeId"]})["riskScore"] == 87.5
+
+        # Major step: an unreachable ML service leaves the scan and the stored score as they were
+        repo = EmployeeRepository(scorer=ScanScorer("http://127.0.0.1:9", timeout=0.2))
+        employee, already_today = repo.record_scan(43)
+        assert already_today is True and employee["biometricLogs"] == 2
+        assert employee["anomalyScore"] == 87.5
+
     print("smoke_test_fingerprint_api: OK")
 
 
@@ -0,0 +1,344 @@
+"""
+Streaming drift and data-quality sketches of what /analyze and /score-db score (``GET /drift``).
+
+Every scored request is folded into constant-size sketches; raw uploads are
+never kept:
+
+  QuantileSketch   per model feature and for the decision_function scores:
+                   counts on a fixed grid of logarithmic buckets (relative
+                   accuracy 1%, DDSketch-style), so two sketches compare bucket
+                   by bucket
+  HyperLogLog      distinct emails and phone numbers (4096 registers, ~1.6% error)
+  DepartmentSalary salary count / sum / sum of squares per department, hashed
+                   into DEPT_BUCKETS slots: a raise for some departments moves
+                   neither the pooled salary nor Department_Salary_Variance
+                   (measured against each upload's own department means)
+  null counts      per EmployeeRecord column, plus rejected upload rows
+
+train_model saves the same sketches of the training data next to the model
+(``model/drift_reference.npz``). The report compares the current window with
+it: PSI over the reference deciles and the Kolmogorov-Smirnov distance for
+every feature and the scores, departments whose mean salary moved, null
+rates, flagged share and the distinct email / phone ratio (distinct values per
+row, averaged over requests). The window persists under ``feature_store/drift``
+and restarts on ``reset``; a clean window can be promoted to the reference.
+"""
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REFERENCE_PATH = os.path.join(BASE_DIR, 'model', 'drift_reference.npz')
+WINDOW_PATH = os.path.join(BASE_DIR, 'feature_store', 'drift', 'window.npz')
+
+NULL_COLUMNS = ('name', 'department', 'email', 'phone_number', 'salary', 'Days_Present', 'biometricLogs')
+DISTINCT_COLUMNS = ('email', 'phone_number')
+SCORE = 'anomaly_score'
+PSI_BINS = 10
+PSI_MODERATE, PSI_MAJOR = 0.1, 0.25  # the usual PSI reading: <0.1 stable, >0.25 shifted
+DEPARTMENT_SALARY = 'salary_by_department'
+DEPT_BUCKETS = 1024
+DEPT_MIN_ROWS = 30     # rows a department needs in both sketches to be compared
+DEPT_SHIFT = 0.10      # mean salary change that counts as shifted ...
+DEPT_Z = 4.0           # ... when it is also this many standard errors away
+DEPT_SHARE_MODERATE, DEPT_SHARE_MAJOR = 0.02, 0.10  # share of current rows in shifted departments
+DEPT_NAMES_SHOWN = 20
+HASH_CHUNK = 100_000  # values turned into Python strings per hash_array call
+
+
+class QuantileSketch:
+    """
+    Value counts per logarithmic bucket: |x| in (GAMMA^(k-1), GAMMA^k] for
+    k in [-KEYS, KEYS], separately for negative and positive values, plus one
+    bucket for |x| <= GAMMA^-KEYS. Bucket indices are ordered like the values.
+    """
+    GAMMA = 1.02
+    KEYS = 1200  # |x| from 5e-11 to 2e10
+    SIZE = 4 * KEYS + 3
+
+    def __init__(self, counts=None):
+        self.counts = np.zeros(self.SIZE, dtype=np.int64) if counts is None else counts
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        magnitude = np.abs(values)
+        tiny = magnitude <= self.GAMMA ** -self.KEYS
+        with np.errstate(divide='ignore'):
+            key = np.ceil(np.log(np.where(tiny, 1.0, magnitude)) / np.log(self.GAMMA)).astype(np.int64)
+        key = np.clip(key, -self.KEYS, self.KEYS)
+        index = np.where(values < 0, self.KEYS - key, 3 * self.KEYS + 2 + key)
+        index[tiny] = 2 * self.KEYS + 1
+        self.counts += np.bincount(index, minlength=self.SIZE)
+
+    def merge(self, other):
+        self.counts += other.counts
+
+    @property
+    def n(self):
+        return int(self.counts.sum())
+
+    def values(self, index):
+        """Representative value (bucket midpoint) of bucket ``index``."""
+        index = np.asarray(index)
+        pos = index > 2 * self.KEYS + 1
+        key = np.where(pos, index - 3 * self.KEYS - 2, self.KEYS - index)
+        value = 2 * self.GAMMA ** key / (self.GAMMA + 1)
+        return np.where(index == 2 * self.KEYS + 1, 0.0, np.where(pos, value, -value))
+
+    def quantile(self, q):
+        if not self.n:
+            return None
+        index = np.searchsorted(np.cumsum(self.counts), q * (self.n - 1), side='right')
+        return float(self.values(index))
+
+    def cdf(self):
+        return np.cumsum(self.counts) / max(self.n, 1)
+
+
+def ks_distance(reference, current):
+    """Largest CDF gap over the shared bucket boundaries."""
+    return float(np.abs(reference.cdf() - current.cdf()).max())
+
+
+def psi(reference, current, bins=PSI_BINS, floor=1e-4):
+    """Population stability index over the reference's equal-frequency bins."""
+    cdf = reference.cdf()
+    edges = np.unique(np.searchsorted(cdf, np.arange(1, bins) / bins, side='left'))
+    edges = np.r_[edges[edges < len(cdf) - 1], len(cdf) - 1]  # each edge closes a bin (inclusive)
+
+    def shares(sketch):
+        mass = np.cumsum(sketch.counts)[edges]
+        return np.maximum(np.diff(np.r_[0, mass]) / max(sketch.n, 1), floor)
+
+    r, c = shares(reference), shares(current)
+    return float(np.sum((c - r) * np.log(c / r)))
+
+
+def _bit_length(w):
+    """bit_length of uint64 values, from exact float conversions of the 32-bit halves."""
+    hi, lo = (w >> np.uint64(32)).astype(np.float64), (w & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(hi > 0, 32 + np.frexp(hi)[1], np.frexp(lo)[1])
+
+
+class HyperLogLog:
+    P = 12
+    M = 1 << P
+
+    def __init__(self, registers=None):
+        self.registers = np.zeros(self.M, dtype=np.uint8) if registers is None else registers
+
+    def update(self, values):
+        values = pd.Series(values, copy=False).dropna()
+        for start in range(0, len(values), HASH_CHUNK):
+            h = pd.util.hash_array(values.iloc[start:start + HASH_CHUNK].astype(str).to_numpy(dtype=object))
+            bucket = (h >> np.uint64(64 - self.P)).astype(np.intp)
+            rest = h & np.uint64((1 << (64 - self.P)) - 1)
+            rank = (64 - self.P) - _bit_length(rest) + 1
+            np.maximum.at(self.registers, bucket, rank.astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.M)
+        estimate = alpha * self.M ** 2 / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.M and zeros:
+            estimate = self.M * np.log(self.M / zeros)  # linear counting for small sets
+        return float(estimate)
+
+
+class DepartmentSalary:
+    """
+    Salary moments per department bucket (hash of the department name), and
+    the first name seen in each bucket for the report. Constant size whatever
+    the number of departments; two departments sharing a bucket are compared
+    as one.
+    """
+
+    def __init__(self, moments=None, names=None):
+        self.moments = np.zeros((3, DEPT_BUCKETS)) if moments is None else moments  # rows, sum, sum of squares
+        self.names = {} if names is None else names
+
+    def update(self, departments, salaries):
+        salary = pd.to_numeric(pd.Series(salaries, copy=False), errors='coerce').to_numpy(np.float64)
+        codes, names = pd.factorize(pd.Series(departments, copy=False))
+        keep = np.isfinite(salary) & (codes >= 0)
+        if not keep.any():
+            return
+        salary, codes = salary[keep], codes[keep]
+        # Hash each distinct department once, not every row
+        names = np.asarray(names.astype(str), dtype=object)
+        bucket = (pd.util.hash_array(names) % np.uint64(DEPT_BUCKETS)).astype(np.intp)[codes]
+        self.moments += np.vstack([
+            np.bincount(bucket, minlength=DEPT_BUCKETS),
+            np.bincount(bucket, salary, minlength=DEPT_BUCKETS),
+            np.bincount(bucket, salary * salary, minlength=DEPT_BUCKETS),
+        ])
+        first = np.unique(bucket, return_index=True)[1]
+        for b, code in zip(bucket[first], codes[first]):
+            self.names.setdefault(str(b), names[code])
+
+    def merge(self, other):
+        self.moments += other.moments
+        for b, name in other.names.items():
+            self.names.setdefault(b, name)
+
+    def _stats(self):
+        n, total, sq = self.moments
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / n
+            var = np.maximum(sq / n - mean * mean, 0)
+        return n, mean, var
+
+
+def department_salary_shift(reference, current):
+    """Departments whose mean salary moved by DEPT_SHIFT and DEPT_Z standard errors, and their row share."""
+    ref_n, ref_mean, ref_var = reference._stats()
+    cur_n, cur_mean, cur_var = current._stats()
+    compared = (ref_n >= DEPT_MIN_ROWS) & (cur_n >= DEPT_MIN_ROWS) & (ref_mean > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = cur_mean / ref_mean - 1
+        z = (cur_mean - ref_mean) / np.sqrt(ref_var / ref_n + cur_var / cur_n)
+    shifted = compared & (np.abs(change) > DEPT_SHIFT) & (np.abs(np.nan_to_num(z, posinf=np.inf)) > DEPT_Z)
+    rows = cur_n.sum()
+    share = float(cur_n[shifted].sum() / rows) if rows else 0.0
+    order = np.flatnonzero(shifted)[np.argsort(-cur_n[shifted])][:DEPT_NAMES_SHOWN]
+    level = 'major' if share > DEPT_SHARE_MAJOR else 'moderate' if share > DEPT_SHARE_MODERATE else 'stable'
+    return {
+        'compared': int(compared.sum()),
+        'shifted': int(shifted.sum()),
+        'shifted_row_share': round(share, 4),
+        'drift': level,
+        'departments': {current.names.get(str(b), reference.names.get(str(b), str(b))): round(float(change[b]), 4)
+                        for b in order},
+    }
+
+
+class DriftSketches:
+    """The sketches of one window (or of the training data)."""
+
+    def __init__(self, features):
+        self.features = list(features)
+        self.quantiles = {name: QuantileSketch() for name in [*self.features, SCORE]}
+        self.nulls = {col: [0, 0] for col in NULL_COLUMNS}  # [missing, rows] while the column was supplied
+        self.meta = {
+            'rows': 0, 'uploaded_rows': 0, 'requests': 0, 'flagged': 0, 'since': time.time(),
+            'distinct_ratio': {col: [0.0, 0] for col in DISTINCT_COLUMNS},  # [sum of per-request ratios, requests]
+        }
+        self.distinct = {col: HyperLogLog() for col in DISTINCT_COLUMNS}
+        self.department_salary = DepartmentSalary()
+
+    def observe(self, frame, X, scores, uploaded_rows=None):
+        """
+        Fold one scored request in: ``frame`` the validated rows (EmployeeRecord
+        columns), ``X`` their model features, ``scores`` decision_function.
+        """
+        n = len(frame)
+        for name in self.features:
+            if name in X:
+                self.quantiles[name].update(X[name].to_numpy())
+        self.quantiles[SCORE].update(scores)
+        if 'department' in frame and 'salary' in frame:
+            self.department_salary.update(frame['department'], frame['salary'])
+        for col in NULL_COLUMNS:
+            if col in frame and frame[col].notna().any():  # an all-empty column was not supplied
+                self.nulls[col][0] += int(frame[col].isna().sum())
+                self.nulls[col][1] += n
+        for col in DISTINCT_COLUMNS:
+            present = int(frame[col].notna().sum()) if col in frame else 0
+            if present:
+                request = HyperLogLog()
+                request.update(frame[col])
+                ratio = self.meta['distinct_ratio'][col]
+                ratio[0] += min(request.count() / present, 1.0)
+                ratio[1] += 1
+                self.distinct[col].merge(request)
+        self.meta['rows'] += n
+        self.meta['uploaded_rows'] += n if uploaded_rows is None else uploaded_rows
+        self.meta['requests'] += 1
+        self.meta['flagged'] += int(np.count_nonzero(np.asarray(scores) < 0))
+
+    def summary(self):
+        """Rates of the window (None before the first request)."""
+        rows = self.meta['rows']
+        return {
+            'null_rates': {col: (missing / seen if seen else None) for col, (missing, seen) in self.nulls.items()},
+            'rejected_rate': 1 - rows / self.meta['uploaded_rows'] if self.meta['uploaded_rows'] else None,
+            'flagged_rate': self.meta['flagged'] / rows if rows else None,
+            'distinct_ratio': {col: (total / count if count else None)
+                               for col, (total, count) in self.meta['distinct_ratio'].items()},
+            'distinct_seen': {col: round(self.distinct[col].count()) for col in DISTINCT_COLUMNS},
+        }
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {f'q:{name}': sketch.counts for name, sketch in self.quantiles.items()}
+        arrays.update({f'hll:{col}': hll.registers for col, hll in self.distinct.items()})
+        arrays['dept:moments'] = self.department_salary.moments
+        meta = {**self.meta, 'features': self.features, 'nulls': self.nulls,
+                'department_names': self.department_salary.names}
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            sketches = cls(meta.pop('features'))
+            sketches.nulls.update(meta.pop('nulls'))
+            names = meta.pop('department_names', {})
+            if 'dept:moments' in data:  # sketches saved before DepartmentSalary have none
+                sketches.department_salary = DepartmentSalary(data['dept:moments'].copy(), names)
+            sketches.meta.update(meta)
+            for name in sketches.quantiles:
+                if f'q:{name}' in data:
+                    sketches.quantiles[name] = QuantileSketch(data[f'q:{name}'].copy())
+            for col in DISTINCT_COLUMNS:
+                sketches.distinct[col] = HyperLogLog(data[f'hll:{col}'].copy())
+        return sketches
+
+
+def _level(value):
+    return 'major' if value > PSI_MAJOR else 'moderate' if value > PSI_MODERATE else 'stable'
+
+
+def drift_report(reference, current):
+    """PSI / KS per feature and for the scores, department salary shifts, and the data-quality rates of both."""
+    distributions = {}
+    for name in [*reference.features, SCORE]:
+        ref, cur = reference.quantiles.get(name), current.quantiles.get(name)
+        if ref is None or cur is None or not ref.n or not cur.n:
+            continue
+        value = psi(ref, cur)
+        distributions[name] = {
+            'psi': round(value, 4),
+            'ks': round(ks_distance(ref, cur), 4),
+            'drift': _level(value),
+            'reference_median': ref.quantile(0.5),
+            'current_median': cur.quantile(0.5),
+            'reference_p95': ref.quantile(0.95),
+            'current_p95': cur.quantile(0.95),
+        }
+    department = department_salary_shift(reference.department_salary, current.department_salary)
+    ref_summary, cur_summary = reference.summary(), current.summary()
+    drifted = [name for name, d in distributions.items() if d['drift'] == 'major']
+    if department['drift'] == 'major':
+        drifted.append(DEPARTMENT_SALARY)
+    return {
+        'window': {
+            'requests': current.meta['requests'],
+            'rows': current.meta['rows'],
+            'since': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(current.meta['since'])),
+        },
+        'reference_rows': reference.meta['rows'],
+        'drifted': drifted,
+        'distributions': distributions,
+        DEPARTMENT_SALARY: department,
+        'quality': {key: {'reference': ref_summary[key], 'current': cur_summary[key]} for key in cur_summary},
+    }
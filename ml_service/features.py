@@ -0,0 +1,128 @@
+"""
+Feature engineering shared by serving (main.py) and training (train_model.py).
+
+Both call the same functions, so a model is trained on exactly the columns
+/analyze computes for an upload:
+
+  engineer_features   payroll features of one population (or of several, ``by``)
+  featurize_frame     engineer_features, attendance history (history_features.py)
+                      and cross-file reconciliation (reconciliation.py)
+  featurize_periods   featurize_frame over stacked payroll periods (multi_period.py)
+"""
+import numpy as np
+import pandas as pd
+
+from history_features import HistoryFeatureStore, add_history_features
+from identity_matching import near_duplicate_counts, shared_identity_keys
+from multi_period import month_of
+from reconciliation import add_reconciliation_features, attendance_period
+
+
+def _value_counts_of(values):
+    """``values.map(values.value_counts())`` as floats, from integer codes instead of a string index."""
+    codes = pd.factorize(values)[0]
+    counts = np.bincount(codes[codes >= 0], minlength=1).astype(float)
+    return pd.Series(np.where(codes >= 0, counts[codes], np.nan), index=values.index)
+
+
+def engineer_features(df_in, identity=None, inplace=False, by=None, near_duplicates=True):
+    """
+    Payroll features of ``df_in``: collisions, department salary variance,
+    profile completeness and near duplicates.
+    ``identity`` is precomputed ``identity_matching.identity_keys`` output;
+    ``inplace`` adds the feature columns to ``df_in`` instead of a copy.
+    ``by`` names a column of independent populations (e.g. ``period``):
+    collisions, department means and near duplicates are then counted within
+    each, in the same grouped passes. ``near_duplicates=False`` leaves out
+    Near_Duplicate_Count (see ``main.needs_near_duplicates``).
+    """
+    df_engineered = df_in if inplace else df_in.copy()
+    keys = [by] if by else []
+    
+    # 1. Email Collisions (missing emails count once, filled below)
+    if by:
+        df_engineered['Email_Collision_Count'] = df_engineered.groupby([by, 'email'])['email'].transform('size').astype(float)
+    else:
+        df_engineered['Email_Collision_Count'] = _value_counts_of(df_engineered['email'])
+    
+    # 2. Phone Collisions
+    if by:
+        df_engineered['Phone_Collision_Count'] = df_engineered.groupby([by, 'phone_number'])['phone_number'].transform('size').astype(float)
+    else:
+        df_engineered['Phone_Collision_Count'] = _value_counts_of(df_engineered['phone_number'])
+    
+    # 3. Department Salary Variance
+    dept_avg_salary = df_engineered.groupby(keys + ['department'])['salary'].transform('mean')
+    df_engineered['Department_Salary_Variance'] = abs(df_engineered['salary'] - dept_avg_salary) / dept_avg_salary
+    df_engineered['Department_Salary_Variance'] = df_engineered['Department_Salary_Variance'].fillna(0)
+    
+    # 4. Profile Completeness
+    essential_cols = ['name', 'department', 'email', 'phone_number', 'salary']
+    missing_count = df_engineered[essential_cols].isnull().sum(axis=1)
+    df_engineered['Profile_Completeness_Percentage'] = 100 - (missing_count / len(essential_cols) * 100)
+
+    # 5. Near-duplicate identities (normalized contacts, fuzzy names; see identity_matching.py)
+    if near_duplicates:
+        df_engineered['Near_Duplicate_Count'], df_engineered['Fuzzy_Duplicate_Count'] = near_duplicate_counts(
+            df_engineered['name'], df_engineered['email'], df_engineered['phone_number'], identity,
+            groups=pd.factorize(df_engineered[by])[0] if by else None)
+    
+    df_engineered['salary'] = df_engineered['salary'].fillna(0)
+    
+    # Fill anything else
+    df_engineered['Email_Collision_Count'] = df_engineered['Email_Collision_Count'].fillna(1)
+    df_engineered['Phone_Collision_Count'] = df_engineered['Phone_Collision_Count'].fillna(1)
+    df_engineered['Profile_Completeness_Percentage'] = df_engineered['Profile_Completeness_Percentage'].fillna(100)
+    
+    return df_engineered
+
+
+def featurize_frame(valid_df, attendance=None, employees=None, identity=None, inplace=False, store=None, period=None,
+                    near_duplicates=True):
+    """
+    engineer_features, history and reconciliation features of validated rows,
+    as /analyze scores them and the model is trained on. Returns (engineered,
+    reconciliation summary). History comes from ``store`` (default: the
+    service's), and only when the upload's month (``period``, default: the
+    attendance sheet's) is stored there.
+    """
+    store = store or HistoryFeatureStore()
+    period = period or attendance_period(attendance)
+    stored = period is not None and period in store.months()
+    engineered = engineer_features(valid_df, identity, inplace=inplace, near_duplicates=near_duplicates)
+    engineered = add_history_features(engineered, store, as_of=period if stored else None, inplace=inplace, available=stored)
+    # Holes between payroll, attendance, enrollment and histories (see reconciliation.py)
+    return add_reconciliation_features(
+        engineered,
+        attendance_ids=attendance['employee_id'] if attendance is not None else None,
+        employees=employees,
+        history_days=store.present_days(period) if stored else None,
+        inplace=inplace,
+    )
+
+
+def featurize_periods(valid_df, attendance_ids=None, employees=None, store=None, near_duplicates=True):
+    """
+    featurize_frame over the stacked periods of ``valid_df`` (``period`` column):
+    contacts normalized once per distinct employee, the population features in
+    one grouped pass over every period, history (from ``store``) and reconciliation per period (``attendance_ids``: period -> attendance sheet ids).
+    Returns (engineered, reconciliation summary per period).
+    """
+    identity = shared_identity_keys(valid_df['name'], valid_df['email'], valid_df['phone_number']) if near_duplicates else None
+    engineered = engineer_features(valid_df, identity, inplace=True, by='period', near_duplicates=near_duplicates)
+    store = store or HistoryFeatureStore()
+    months = set(store.months())
+    parts, summaries = [], {}
+    for label, rows in engineered.groupby('period', sort=False).indices.items():
+        month = month_of(label)
+        stored = month in months
+        part = add_history_features(engineered.iloc[rows], store, as_of=month if stored else None, available=stored)
+        part, summaries[label] = add_reconciliation_features(
+            part,
+            attendance_ids=(attendance_ids or {}).get(label),
+            employees=employees,
+            history_days=store.present_days(month) if stored else None,
+            inplace=True,
+        )
+        parts.append(part)
+    return pd.concat(parts).sort_index(), summaries
@@ -0,0 +1,256 @@
+"""
+Attendance time-series features from bulk ``histories`` exports.
+
+The Flask ``record_scan`` (and the Express scan route) insert one ``histories``
+document per employee per present day. This stage turns an export of those
+documents into per-employee rolling statistics that the snapshot features miss:
+
+  History_Months_Active       months in the window with at least one present day
+  History_Mean_Monthly_Days   present days per month, averaged over the window
+  Attendance_Gap_CV           std / mean of the gaps between present days (0 = regular)
+  Max_Attendance_Gap_Days     longest stretch between two present days
+  Days_Since_Last_Scan        days from the last present day to the window end
+  Weekday_Entropy             entropy of the present weekdays, 0 (one weekday) .. 1
+  Biometric_Attendance_Ratio  biometricLogs / counted attendance days (payroll export)
+
+Each month is reduced once to one row per employee and kept in a columnar store
+(one ``.npz`` per month under ``feature_store/history``, or
+``feature_store/tenants/<tenant>/history`` for a tenant). ``features`` combines
+the window's months with sorted-segment reductions, so a new export only costs
+the months that are not stored yet.
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(BASE_DIR, 'feature_store', 'history')
+TENANT_STORE_DIR = os.path.join(BASE_DIR, 'feature_store', 'tenants')  # <tenant>/history per institution
+WINDOW_MONTHS = 12
+
+HISTORY_FEATURES = [
+    'History_Months_Active', 'History_Mean_Monthly_Days', 'Attendance_Gap_CV',
+    'Max_Attendance_Gap_Days', 'Days_Since_Last_Scan', 'Weekday_Entropy',
+    'Biometric_Attendance_Ratio',
+]
+
+ID_COLUMNS = ('employeeId', 'employee_id', 'Employee_ID')
+TIME_COLUMNS = ('createdAt', 'scannedAt', 'date', 'timestamp')
+
+_DAY_BITS = 20  # day numbers (days since 1970) fit in 20 bits until year 4840
+
+
+def read_history_export(contents, filename):
+    """
+    Parse a ``histories`` export (mongoexport CSV, JSON array or JSON lines, or
+    Excel) into ``employee_id`` (str) and ``ts`` (naive UTC datetime) columns.
+    Rows whose status is not 'Present' are ignored.
+    """
+    name = filename.lower()
+    if name.endswith('.json') or name.endswith('.jsonl'):
+        df = pd.read_json(io.BytesIO(contents), lines=not contents.lstrip().startswith(b'['))
+    elif name.endswith('.xlsx') or name.endswith('.xls'):
+        df = pd.read_excel(io.BytesIO(contents))
+    else:
+        wanted = set(ID_COLUMNS + TIME_COLUMNS + ('status',))
+        df = pd.read_csv(io.BytesIO(contents), usecols=lambda c: c in wanted)
+
+    id_col = next((c for c in ID_COLUMNS if c in df.columns), None)
+    ts_col = next((c for c in TIME_COLUMNS if c in df.columns), None)
+    if id_col is None or ts_col is None:
+        raise ValueError(f"History export needs one of {ID_COLUMNS} and one of {TIME_COLUMNS}")
+    if 'status' in df.columns:
+        df = df[df['status'].fillna('Present') == 'Present']
+
+    ts = df[ts_col]
+    if ts.dtype == object:
+        # mongoexport JSON wraps dates as {"$date": "..."}
+        ts = ts.map(lambda v: v.get('$date') if isinstance(v, dict) else v)
+    ts = pd.to_datetime(ts, utc=True, errors='coerce').dt.tz_convert(None)
+    events = pd.DataFrame({'employee_id': df[id_col].astype(str).values, 'ts': ts.values})
+    return events.dropna(subset=['ts'])
+
+
+def _segments(keys):
+    """Start offsets of the runs of equal values in a sorted array."""
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def aggregate_month(events):
+    """
+    Reduce one month of events to one row per employee: present days, first and
+    last present day, gap sums (count, sum, sum of squares, max) and weekday counts.
+    """
+    codes, ids = pd.factorize(events['employee_id'])
+    day = events['ts'].values.astype('datetime64[D]').astype(np.int64)
+    # Major step: one present day per employee per calendar day, sorted by (employee, day)
+    key = np.unique((codes.astype(np.int64) << _DAY_BITS) | day)
+    emp = key >> _DAY_BITS
+    day = key & ((1 << _DAY_BITS) - 1)
+
+    starts = _segments(emp)
+    ends = np.r_[starts[1:], len(key)]
+    gaps = np.zeros(len(key), dtype=np.int64)
+    gaps[1:] = np.where(emp[1:] == emp[:-1], np.diff(day), 0)
+    group = np.repeat(np.arange(len(starts)), ends - starts)
+    weekday = (day + 3) % 7  # 1970-01-01 was a Thursday; Monday = 0
+
+    return {
+        'employee_id': np.asarray(ids, dtype=str)[emp[starts]],
+        'days': (ends - starts).astype(np.int32),
+        'first': day[starts].astype(np.int32),
+        'last': day[ends - 1].astype(np.int32),
+        'gap_n': (ends - starts - 1).astype(np.int32),
+        'gap_sum': np.add.reduceat(gaps, starts),
+        'gap_sq': np.add.reduceat(gaps * gaps, starts),
+        'gap_max': np.maximum.reduceat(gaps, starts).astype(np.int32),
+        'weekdays': np.bincount(group * 7 + weekday, minlength=len(starts) * 7)
+                      .reshape(len(starts), 7).astype(np.int32),
+    }
+
+
+class HistoryFeatureStore:
+    """Per-month aggregates on disk, combined into rolling per-employee features."""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, month):
+        return os.path.join(self.root, f'{month}.npz')
+
+    def months(self):
+        return sorted(f[:-4] for f in os.listdir(self.root) if f.endswith('.npz'))
+
+    def load(self, month):
+        with np.load(self._path(month)) as data:
+            return {k: data[k] for k in data.files}
+
+    def present_days(self, month):
+        """Present days per employee_id in one stored month ('YYYY-MM'); empty if not stored."""
+        if month not in self.months():
+            return pd.Series(dtype=float)
+        data = self.load(month)
+        return pd.Series(data['days'].astype(float), index=pd.Index(data['employee_id'], name='employee_id'))
+
+    def ingest(self, events, refresh=False):
+        """
+        Aggregate the months of ``events`` that are not stored yet. The newest
+        stored month is redone too (it may have been exported half-way through);
+        ``refresh`` redoes every month in the export. Returns the months written.
+        """
+        if events.empty:
+            return []
+        month = events['ts'].values.astype('datetime64[M]')
+        stored = set(self.months())
+        newest = max(stored) if stored else None
+        written = []
+        for m in np.unique(month):
+            key = str(m)
+            if not refresh and key in stored and key < newest:
+                continue
+            np.savez(self._path(key), **aggregate_month(events[month == m]))
+            written.append(key)
+        return written
+
+    def window(self, as_of=None, window_months=WINDOW_MONTHS):
+        """
+        Stored months in the ``window_months`` months ending at ``as_of`` ('YYYY-MM',
+        default: newest stored month), the window's last day number, and its length in days.
+        """
+        months = self.months()
+        end = np.datetime64(as_of or (months[-1] if months else 'today'), 'M')
+        start = end - (window_months - 1)
+        end_day = int((end + 1).astype('datetime64[D]').astype(np.int64)) - 1
+        start_day = int(start.astype('datetime64[D]').astype(np.int64))
+        in_window = [m for m in months if start <= np.datetime64(m, 'M') <= end]
+        return in_window, end_day, end_day - start_day + 1
+
+    def features(self, as_of=None, window_months=WINDOW_MONTHS):
+        """
+        Rolling features over the window (see ``window``), indexed by employee_id.
+        Biometric_Attendance_Ratio is not part of the history and is left out.
+        """
+        window, end_day, _ = self.window(as_of, window_months)
+        if not window:
+            return pd.DataFrame(columns=HISTORY_FEATURES[:-1])
+
+        parts = [self.load(m) for m in window]
+        col = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+        month_idx = np.repeat(np.arange(len(parts)), [len(p['days']) for p in parts])
+        codes, ids = pd.factorize(col['employee_id'])
+
+        # Major step: sort rows by (employee, month) and reduce each employee's run
+        order = np.lexsort((month_idx, codes))
+        emp = codes[order]
+        col = {k: v[order] for k, v in col.items()}
+        starts = _segments(emp)
+
+        # Gaps across month boundaries: first day of a month minus last day of the previous one
+        same = np.zeros(len(emp), dtype=bool)
+        same[1:] = emp[1:] == emp[:-1]
+        boundary = np.zeros(len(emp), dtype=np.int64)
+        boundary[1:] = np.where(same[1:], col['first'][1:] - col['last'][:-1], 0)
+
+        gap_n = np.add.reduceat(col['gap_n'] + same, starts)
+        gap_sum = np.add.reduceat(col['gap_sum'] + boundary, starts).astype(float)
+        gap_sq = np.add.reduceat(col['gap_sq'] + boundary * boundary, starts).astype(float)
+        gap_max = np.maximum.reduceat(np.maximum(col['gap_max'], boundary), starts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = gap_sum / gap_n
+            std = np.sqrt(np.maximum(gap_sq / gap_n - mean * mean, 0))
+            cv = np.where(gap_n > 0, std / mean, 0.0)
+
+        weekdays = np.add.reduceat(col['weekdays'], starts, axis=0).astype(float)
+        p = weekdays / weekdays.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            entropy = np.maximum(-np.where(p > 0, p * np.log(p), 0).sum(axis=1) / np.log(7), 0)
+
+        return pd.DataFrame({
+            'History_Months_Active': np.diff(np.r_[starts, len(emp)]),
+            'History_Mean_Monthly_Days': np.add.reduceat(col['days'], starts) / len(window),
+            'Attendance_Gap_CV': np.nan_to_num(cv),
+            'Max_Attendance_Gap_Days': gap_max,
+            'Days_Since_Last_Scan': end_day - np.maximum.reduceat(col['last'], starts),
+            'Weekday_Entropy': entropy,
+        }, index=pd.Index(np.asarray(ids)[emp[starts]], name='employee_id'))
+
+
+def no_history_defaults(window_days):
+    """Feature values for an employee with no present day in the window."""
+    return {
+        'History_Months_Active': 0,
+        'History_Mean_Monthly_Days': 0.0,
+        'Attendance_Gap_CV': 0.0,
+        'Max_Attendance_Gap_Days': window_days,
+        'Days_Since_Last_Scan': window_days,
+        'Weekday_Entropy': 0.0,
+    }
+
+
+def add_history_features(df, store, as_of=None, window_months=WINDOW_MONTHS, inplace=False, available=True):
+    """
+    Join the store's rolling features onto ``df`` by employee_id and add
+    Biometric_Attendance_Ratio from biometricLogs / Days_Present when present.
+    ``History_Available`` is False when the store holds no history at all, or
+    ``available`` is False (the caller's period is not stored); the features
+    then carry no-history defaults and should not drive explanations.
+    ``inplace`` adds the columns to ``df`` instead of a copy.
+    """
+    out = df if inplace else df.copy()
+    hist = store.features(as_of, window_months) if available else pd.DataFrame(columns=HISTORY_FEATURES[:-1])
+    _, _, window_days = store.window(as_of, window_months)
+    joined = hist.reindex(out['employee_id'].astype(str))
+    for name, default in no_history_defaults(window_days).items():
+        out[name] = joined[name].astype(float).fillna(default).to_numpy()
+
+    if 'biometricLogs' in out and 'Days_Present' in out:
+        logs = pd.to_numeric(out['biometricLogs'], errors='coerce')
+        days = pd.to_numeric(out['Days_Present'], errors='coerce')
+        out['Biometric_Attendance_Ratio'] = (logs / days.where(days > 0)).fillna(1.0).to_numpy()
+    else:
+        out['Biometric_Attendance_Ratio'] = 1.0
+    out['History_Available'] = not hist.empty
+    return out
@@ -0,0 +1,334 @@
+"""
+Near-duplicate identity detection for payroll records.
+
+``engineer_features`` counts exact email / phone collisions only, so
+``j.doe@hit.ac.zw`` vs ``jdoe@hit.ac.zw`` or ``512-507-0524x1231`` vs
+``(512)5070524`` look like different people. This stage normalizes contact
+details, groups records into blocks that share a cheap key, and scores only the
+pairs inside a block instead of all n² pairs:
+
+  phone     last 7 digits of the normalized phone number
+  email     the two rarest 3-grams of the normalized email local part
+  name      Soundex of the first and last name tokens
+
+Blocks larger than MAX_BLOCK (very common names or n-grams) are skipped; a real
+duplicate almost always shares a smaller block too. With ``groups`` (e.g. the
+payroll period of each row) blocks and 3-gram frequencies are per group, so
+stacked populations match as if each were run alone. A candidate pair is a near
+duplicate when the normalized phones or emails are equal, or when both the email
+local parts and the names are similar (3-gram Jaccard) and any numbers in the
+local parts agree.
+"""
+import itertools
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+MAX_BLOCK = 100
+EMAIL_GRAM_KEYS = 2       # rarest local-part 3-grams used as blocking keys per record
+EMAIL_SIMILARITY = 0.5
+NAME_SIMILARITY = 0.6
+PAIR_CHUNK = 100_000      # candidate pairs scored per sparse product
+KEY_CHUNK = 50_000        # records normalized per identity_keys pass
+
+_EXTENSION = re.compile(r'(x|ext\.?)\s*\d+$')
+_SOUNDEX = str.maketrans('aeiouybfpvcgjkqsxzdtlmnr', '000000111122222222334556')
+
+_grams = HashingVectorizer(
+    analyzer='char', ngram_range=(3, 3), n_features=2 ** 20,
+    alternate_sign=False, norm=None, binary=True, lowercase=False, dtype=np.int8,  # 0/1 entries
+)
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def normalize_phone(value):
+    """Digits without the extension, trimmed to the last 9 (drops +263 / 0 / +1 prefixes)."""
+    if _missing(value):
+        return ''
+    digits = re.sub(r'\D', '', _EXTENSION.sub('', str(value).strip().lower()))
+    return digits[-9:] if len(digits) >= 7 else ''
+
+
+def normalize_email(value):
+    """(local, domain) in lower case, with '+tag' and . _ - removed from the local part."""
+    if _missing(value):
+        return '', ''
+    local, _, domain = str(value).strip().lower().partition('@')
+    local = re.sub(r'[._-]', '', local.split('+', 1)[0])
+    return local, domain
+
+
+def normalize_name(value):
+    """Lower-case letters only, tokens sorted so 'Doe, John' matches 'John Doe'."""
+    if _missing(value):
+        return ''
+    return ' '.join(sorted(re.sub(r'[^a-z]', ' ', str(value).lower()).split()))
+
+
+def soundex(token):
+    if not token:
+        return ''
+    codes = token.translate(_SOUNDEX)
+    out, last = token[0], codes[0]
+    for ch, code in zip(token[1:], codes[1:]):
+        if code.isdigit() and code != '0' and code != last:
+            out += code
+        if ch not in 'hw':
+            last = code
+    return (out + '000')[:4]
+
+
+def _name_key(name):
+    tokens = name.split()
+    return ''.join(sorted(soundex(t) for t in (tokens[0], tokens[-1]))) if tokens else ''
+
+
+def _ranges(starts, sizes):
+    """Concatenation of arange(s, s + n) for every (s, n)."""
+    steps = np.ones(sizes.sum(), dtype=np.int64)
+    steps[0] = starts[0]
+    ends = np.cumsum(sizes)[:-1]
+    steps[ends] = starts[1:] - (starts[:-1] + sizes[:-1] - 1)
+    return np.cumsum(steps)
+
+
+def _block_pairs(rows, keys, n):
+    """
+    Pairs of records sharing a key, encoded as ``lo * n + hi`` (lo < hi). A record
+    may appear under several keys (``rows`` repeats); key 0 means missing.
+    """
+    valid = keys != 0
+    rows, keys = rows[valid], keys[valid]
+    if not len(rows):
+        return np.empty(0, dtype=np.int64)
+    order = np.argsort(keys, kind='stable')
+    rows, keys = rows[order], keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(keys)])
+    keep = (sizes >= 2) & (sizes <= MAX_BLOCK)
+    if not keep.any():
+        return np.empty(0, dtype=np.int64)
+
+    # Major step: expand each kept block into its upper-triangle pairs without a Python loop
+    starts, sizes = starts[keep], sizes[keep]
+    pos = _ranges(starts, sizes)
+    partners = np.repeat(starts + sizes, sizes) - pos - 1
+    left = np.repeat(pos, partners)
+    # In-place arithmetic: the pair arrays are the largest allocations of the matcher
+    right = np.arange(len(left))
+    right -= np.repeat(np.cumsum(partners) - partners, partners)
+    right += left
+    right += 1
+    a = rows[left].astype(np.int64)
+    del left
+    b = rows[right].astype(np.int64)
+    del right
+    lo = np.minimum(a, b)
+    hi = np.maximum(a, b, out=b)
+    del a
+    distinct = lo != hi
+    lo = lo[distinct]
+    lo *= n
+    lo += hi[distinct]
+    return lo
+
+
+def _within(keys, groups):
+    """Blocking keys that only match inside the same group; 0 stays missing."""
+    mixed = keys + (groups.astype(np.int64) + 1) * np.int64(-7046029254386353131)  # wraps; odd multiplier
+    return np.where(keys != 0, mixed, 0)
+
+
+def _rarest_grams(local_m, groups=None):
+    """
+    (record, 3-gram) for the EMAIL_GRAM_KEYS least frequent shared 3-grams of each
+    local part. With ``groups`` a 3-gram is counted and keyed per group.
+    """
+    width = local_m.shape[1]
+    if groups is None:
+        counts = np.bincount(local_m.indices, minlength=width)
+    else:
+        owner = np.repeat(groups.astype(np.int64), np.diff(local_m.indptr))
+        group_grams, counts = np.unique(owner * width + local_m.indices, return_counts=True)
+    out_rows, out_grams = [], []
+    # Frequencies are global, the ranking is per record: rank PAIR_CHUNK records at a time
+    for start in range(0, local_m.shape[0], PAIR_CHUNK):
+        chunk = local_m[start:start + PAIR_CHUNK]
+        rows = np.repeat(np.arange(start, start + chunk.shape[0]), np.diff(chunk.indptr))
+        grams = chunk.indices.astype(np.int64)
+        if groups is None:
+            freq = counts[grams]
+        else:
+            grams += groups[rows].astype(np.int64) * width
+            freq = counts[np.searchsorted(group_grams, grams)]
+        # A 3-gram no other record has (often a typo) cannot form a block
+        shared = freq > 1
+        rows, grams, freq = rows[shared], grams[shared], freq[shared]
+        if not len(rows):
+            continue
+        order = np.lexsort((grams, freq, rows))
+        rows, grams = rows[order], grams[order]
+        first = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        rank = np.arange(len(rows)) - np.repeat(first, np.diff(np.r_[first, len(rows)]))
+        take = rank < EMAIL_GRAM_KEYS
+        out_rows.append(rows[take])
+        # Gram ids start at 0; shift so that 0 keeps meaning "no key"
+        out_grams.append(grams[take] + 1)
+    if not out_rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(out_rows), np.concatenate(out_grams)
+
+
+def _jaccard(matrix, sizes, a, b):
+    inter = np.asarray(matrix[a].multiply(matrix[b]).sum(axis=1)).ravel()
+    union = sizes[a] + sizes[b] - inter
+    return np.divide(inter, union, out=np.zeros(len(a)), where=union > 0)
+
+
+def _hash(values):
+    """64-bit hash per string, 0 for ''."""
+    values = np.asarray(values, dtype=object)
+    hashed = pd.util.hash_array(values).view(np.int64)
+    hashed[values == ''] = 0
+    return hashed
+
+
+def identity_keys(names, emails, phones):
+    """
+    Row-local stage: hashed normalized contacts, blocking keys and 3-gram
+    matrices. Only numbers come out, so shards can compute this independently
+    and ``combine_identity_keys`` joins them (see parallel_scoring.py).
+    """
+    # The normalized string lists dominate memory at this stage: KEY_CHUNK records at a time
+    names, emails, phones = iter(names), iter(emails), iter(phones)
+    parts = []
+    while True:
+        chunk = [list(itertools.islice(values, KEY_CHUNK)) for values in (names, emails, phones)]
+        if not chunk[0] and parts:
+            break
+        parts.append(_identity_keys(*chunk))
+        if len(chunk[0]) < KEY_CHUNK:
+            break
+    return parts[0] if len(parts) == 1 else combine_identity_keys(parts)
+
+
+def _identity_keys(names, emails, phones):
+    """``identity_keys`` of lists of raw values."""
+    keys = {}
+    names = [normalize_name(v) for v in names]
+    keys['name_key'] = _hash([_name_key(s) for s in names])
+    keys['name_m'] = _grams.transform(names).tocsr()
+    del names
+    phone = [normalize_phone(v) for v in phones]
+    keys['phone'] = _hash(phone)
+    keys['phone_suffix'] = _hash([p[-7:] for p in phone])
+    del phone
+    parts = [normalize_email(v) for v in emails]
+    keys['email'] = _hash([f'{p[0]}@{p[1]}' if p[0] else '' for p in parts])
+    keys['digits'] = _hash([re.sub(r'\D', '', p[0]) for p in parts])
+    keys['local_m'] = _grams.transform([p[0] for p in parts]).tocsr()
+    return keys
+
+
+def shared_identity_keys(names, emails, phones):
+    """
+    ``identity_keys`` of every row, computed once per distinct (name, email, phone):
+    stacked payroll periods repeat most employees unchanged.
+    """
+    contacts = pd.DataFrame({'name': names, 'email': emails, 'phone': phones})
+    codes = contacts.groupby(list(contacts), dropna=False, sort=False).ngroup().to_numpy()
+    first = np.unique(codes, return_index=True)[1]
+    distinct = contacts.iloc[first]
+    keys = identity_keys(distinct['name'], distinct['email'], distinct['phone'])
+    return {k: v[codes] for k, v in keys.items()}
+
+
+def combine_identity_keys(parts):
+    """Stack ``identity_keys`` outputs of consecutive row ranges."""
+    return {
+        k: sparse.vstack([p[k] for p in parts], format='csr') if sparse.issparse(parts[0][k])
+        else np.concatenate([p[k] for p in parts])
+        for k in parts[0]
+    }
+
+
+def candidate_pairs(keys, groups=None):
+    """(lo, hi) index arrays of every pair that shares at least one block (within a group)."""
+    n = len(keys['phone'])
+    idx = np.arange(n)
+    phone_suffix, name_key = keys['phone_suffix'], keys['name_key']
+    if groups is not None:
+        groups = np.asarray(groups)
+        phone_suffix, name_key = _within(phone_suffix, groups), _within(name_key, groups)
+    gram_rows, gram_keys = _rarest_grams(keys['local_m'], groups)
+    encoded = np.concatenate([
+        _block_pairs(idx, phone_suffix, n),
+        _block_pairs(idx, name_key, n),
+        _block_pairs(gram_rows, gram_keys, n),
+    ])
+    encoded.sort()
+    # Pairs sharing several blocks are scored once (sort + mask beats np.unique here)
+    if len(encoded):
+        encoded = encoded[np.r_[True, encoded[1:] != encoded[:-1]]]
+    return np.divmod(encoded, n)
+
+
+def match_pairs(keys, lo, hi):
+    """Boolean mask: which (lo, hi) pairs are the same identity."""
+    phone, email, digits = keys['phone'], keys['email'], keys['digits']
+    name_size = np.diff(keys['name_m'].indptr)
+    local_size = np.diff(keys['local_m'].indptr)
+    keep = []
+    for s in range(0, len(lo), PAIR_CHUNK):
+        a, b = lo[s:s + PAIR_CHUNK], hi[s:s + PAIR_CHUNK]
+        same_phone = (phone[a] == phone[b]) & (phone[a] != 0)
+        same_email = (email[a] == email[b]) & (email[a] != 0)
+        match = same_phone | same_email
+        # 'tendai.zinyemba20' and 'tendai.zinyemba34' are two people: numbers must agree
+        numbers = (digits[a] == digits[b]) | (digits[a] == 0) | (digits[b] == 0)
+        # Major step: 3-gram similarity only for pairs still open, email first, then names
+        todo = np.flatnonzero(numbers & ~match)
+        todo = todo[_jaccard(keys['local_m'], local_size, a[todo], b[todo]) >= EMAIL_SIMILARITY]
+        todo = todo[_jaccard(keys['name_m'], name_size, a[todo], b[todo]) >= NAME_SIMILARITY]
+        match[todo] = True
+        keep.append(match)
+    return np.concatenate(keep) if keep else np.zeros(0, dtype=bool)
+
+
+def near_duplicate_pairs(names, emails, phones, keys=None, groups=None):
+    """
+    Index pairs (i, j), i < j, judged to be the same identity, and the number of
+    candidate pairs that were scored. Inputs are equal-length sequences;
+    ``keys`` (from ``identity_keys``) skips the row-local stage, ``groups``
+    (integer codes) only pairs rows of the same group.
+    """
+    if not len(names):
+        return np.empty((0, 2), dtype=np.int64), 0
+    keys = keys or identity_keys(names, emails, phones)
+    lo, hi = candidate_pairs(keys, groups)
+    keep = match_pairs(keys, lo, hi)
+    return np.column_stack([lo[keep], hi[keep]]), len(lo)
+
+
+def near_duplicate_counts(names, emails, phones, keys=None, groups=None):
+    """
+    Near_Duplicate_Count per record: how many other records (of its group) look
+    like the same person; and the fuzzy part of that count, the matches whose
+    normalized emails and phones both differ (Fuzzy_Duplicate_Count).
+    """
+    n = len(names)
+    if not n:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # Inputs are iterated once each; a Series streams its strings instead of being listed
+    keys = keys or identity_keys(names, emails, phones)
+    pairs, _ = near_duplicate_pairs(names, emails, phones, keys, groups)
+    a, b = pairs[:, 0], pairs[:, 1]
+    phone, email = keys['phone'], keys['email']
+    exact = ((phone[a] == phone[b]) & (phone[a] != 0)) | ((email[a] == email[b]) & (email[a] != 0))
+    return np.bincount(pairs.ravel(), minlength=n), np.bincount(pairs[~exact].ravel(), minlength=n)
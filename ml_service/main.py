@@ -1,17 +1,53 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
 import numpy as np
 import joblib
 import io
 import os
+import threading
+import time
 from pydantic import BaseModel, ConfigDict, Field
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 import shap
-from train_model import train_and_save_model
+from drift_monitor import REFERENCE_PATH, WINDOW_PATH, DriftSketches, drift_report
+from features import engineer_features, featurize_frame, featurize_periods
+from history_features import TENANT_STORE_DIR, HistoryFeatureStore, read_history_export
+from memory_lean import JSON_CHUNK_ROWS, READ_DTYPES, compact_frame, downcast_floats, iter_records_json, validate_frame
+from multi_period import long_format_periods, pair_labels, period_order, period_summaries, trajectories
+from mongo_scoring import ACTIVE, BATCH_SIZE, SCORE_CHUNK, employees_collection, read_employees, tenant_collection, write_scores
+from online_scoring import OnlineScorer
+from path_explainer import PathLengthExplainer
+from parallel_scoring import PARALLEL_MIN_ROWS, PARTITIONS, PartitionedScorer, default_workers
+from reconciliation import attendance_period, read_employees_export
+from schema_inference import SchemaCache
+from score_calibration import load_calibration
+from tenant_models import TenantArtifacts, TenantModels
+from train_model import FEATURES, train_and_save_model
 
-app = FastAPI()
+# ONLINE_SCORING_PRELOAD=1 builds the /score-scan state from MongoDB at startup instead of on the first scan
+ONLINE_SCORING_PRELOAD = os.environ.get('ONLINE_SCORING_PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+@asynccontextmanager
+async def lifespan(app):
+    if ONLINE_SCORING_PRELOAD and model is not None:
+        try:
+            print(f"Online scoring state: {len(refresh_online_scorer())} employees.")
+        except Exception as e:
+            print(f"Online scoring state not preloaded: {e}")
+    try:
+        preloaded = tenant_models.preload()
+        if preloaded:
+            print(f"Tenant models preloaded: {', '.join(preloaded)}.")
+    except Exception as e:
+        print(f"Tenant models not preloaded: {e}")
+    yield
+    tenant_models.save_usage()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,6 +70,82 @@ except Exception as e:
     print(f"Error loading artifacts: {e}")
     model = None
 
+# Score-to-percentile lookup and risk thresholds saved with the model (score_calibration.py); None for older models
+calibration = load_calibration()
+
+# Per-institution models under model/tenants, loaded on demand into a bounded LRU (see tenant_models.py)
+tenant_models = TenantModels()
+
+# Monthly attendance aggregates from uploaded histories exports (see history_features.py), one store per tenant
+_history_stores = {None: HistoryFeatureStore()}
+
+def history_store(tenant=None):
+    """``tenant``'s histories store (feature_store/tenants/<tenant>/history), the service's own without one."""
+    tenant = tenant or None
+    if tenant not in _history_stores:
+        tenant_models.path(tenant)  # validates the key
+        _history_stores[tenant] = HistoryFeatureStore(os.path.join(TENANT_STORE_DIR, tenant, 'history'))
+    return _history_stores[tenant]
+
+# Column mapping and dtypes of recurring upload formats, by header row (see schema_inference.py)
+schema_cache = SchemaCache()
+
+# Drift sketches (drift_monitor.py): training reference saved with the model, current window of scored requests
+def load_drift_state(reset=False):
+    """Reference of the loaded model and the persisted window (a new one on ``reset`` or new features)."""
+    global drift_reference, drift_window
+    drift_reference = DriftSketches.load(REFERENCE_PATH) if os.path.exists(REFERENCE_PATH) else None
+    drift_window = None
+    if os.path.exists(WINDOW_PATH) and not reset:
+        drift_window = DriftSketches.load(WINDOW_PATH)
+    if model is not None and (drift_window is None or drift_window.features != model_features(model)):
+        drift_window = DriftSketches(model_features(model))
+
+_drift_lock = threading.Lock()  # /score-db observes from the threadpool
+
+def observe_drift(frame, X, scores, uploaded_rows=None):
+    """Fold a scored request into the drift window; monitoring never fails the request."""
+    try:
+        with _drift_lock:
+            drift_window.observe(frame, X, scores, uploaded_rows)
+            drift_window.save(WINDOW_PATH)
+    except Exception as e:
+        print(f"Drift sketches not updated: {e}")
+
+# Per-request explainers: SHAP, path-length attributions (path_explainer.py) or none
+EXPLAIN_MODES = ('fast', 'shap', 'none')
+_explainers = {}  # built once per loaded model; cleared by /retrain
+
+def explain_rows(X, mode, served=None):
+    """Attributions (rows x features) of the loaded model (or ``served``'s); negative values push toward anomaly."""
+    fitted, explainers = (model, _explainers) if served is None else (served.model, served.explainers)
+    if mode not in explainers:
+        explainers[mode] = PathLengthExplainer(fitted) if mode == 'fast' else shap.TreeExplainer(fitted)
+    if mode == 'fast':
+        return explainers[mode].contributions(X)
+    return explainers[mode].shap_values(X)
+
+def serving(tenant=None):
+    """
+    Artifacts that score ``tenant``'s requests: the tenant's from the LRU
+    (loaded on a miss), or the service's own model without a tenant. Raises
+    ValueError / KeyError for an invalid or untrained tenant.
+    """
+    if not tenant:
+        return TenantArtifacts(None, model, calibration, _explainers)
+    return tenant_models.get(tenant)
+
+def tenant_error(e):
+    return {"status": "error", "error": e.args[0] if e.args else str(e)}
+
+def model_features(fitted):
+    """Feature columns the loaded model was trained on (history features are optional)."""
+    return list(getattr(fitted, 'feature_names_in_', FEATURES))
+
+def needs_near_duplicates(fitted, reasons=False):
+    """Near_Duplicate_Count is only worth its fuzzy matching when ``fitted`` scores it or determinations read it."""
+    return reasons or 'Near_Duplicate_Count' in model_features(fitted)
+
 # Pydantic Schema for Input Validation
 class EmployeeRecord(BaseModel):
     employee_id: Union[str, int] = Field(alias='employee_id')
@@ -43,53 +155,60 @@ class EmployeeRecord(BaseModel):
     phone_number: Optional[Union[str, int, float]] = Field(default=None, alias='phone_number')
     salary: float = Field(alias='salary')
     days_present: Optional[float] = Field(default=None, alias='Days_Present')
+    biometric_logs: Optional[float] = Field(default=None, alias='biometricLogs')
+
+    model_config = ConfigDict(extra='ignore', populate_by_name=True, coerce_numbers_to_str=True)
+
+SCHEMA_COLUMNS = [field.alias or name for name, field in EmployeeRecord.model_fields.items()]
+
+load_drift_state()
+
+# One attendance scan: Employee document fields (as the Flask repository sends them) or EmployeeRecord names
+class ScanEvent(BaseModel):
+    employee_id: Union[str, int] = Field(alias='employeeId')
+    name: Optional[Union[str, int, float]] = Field(default=None, alias='fullName')
+    department: Optional[Union[str, int, float]] = Field(default=None, alias='department')
+    email: Optional[Union[str, int, float]] = Field(default=None, alias='email')
+    phone_number: Optional[Union[str, int, float]] = Field(default=None, alias='phone')
+    salary: Optional[float] = Field(default=None, alias='salary')
+    days_present: Optional[float] = Field(default=None, alias='attendanceDays')
+    biometric_logs: Optional[float] = Field(default=None, alias='biometricLogs')
+    tenant: Optional[str] = Field(default=None, alias='tenant')  # scored with the tenant's model and state
 
     model_config = ConfigDict(extra='ignore', populate_by_name=True, coerce_numbers_to_str=True)
 
+# ANALYZE_LEAN=1 makes the memory-lean /analyze path (memory_lean.py) the default; ?lean= overrides it
+ANALYZE_LEAN = os.environ.get('ANALYZE_LEAN', '').lower() in ('1', 'true', 'yes')
+
 @app.get("/")
 def read_root():
     return {"status": "ML Service Running (Isolation Forest)"}
 
-def engineer_features(df_in):
+def risk_levels(anomaly_score, served=None):
     """
-    Apply the same feature engineering steps as during training.
+    Risk of each anomaly score (negated decision_function): above the calibrated
+    training percentiles, or the fixed cutoffs for a model without calibration.
+    ``served`` (see ``serving``) scores with a tenant's calibration.
     """
-    df_engineered = df_in.copy()
-    
-    df_engineered['email_filled'] = df_engineered['email'].astype(object)
-    mask_email = df_engineered['email_filled'].isna()
-    df_engineered.loc[mask_email, 'email_filled'] = 'unknown_email_' + df_engineered.index[mask_email].astype(str)
-    
-    df_engineered['phone_filled'] = df_engineered['phone_number'].astype(object)
-    mask_phone = df_engineered['phone_filled'].isna()
-    df_engineered.loc[mask_phone, 'phone_filled'] = 'unknown_phone_' + df_engineered.index[mask_phone].astype(str)
-    
-    # 1. Email Collisions
-    email_counts = df_engineered['email_filled'].value_counts().to_dict()
-    df_engineered['Email_Collision_Count'] = df_engineered['email_filled'].map(email_counts)
-    
-    # 2. Phone Collisions
-    phone_counts = df_engineered['phone_filled'].value_counts().to_dict()
-    df_engineered['Phone_Collision_Count'] = df_engineered['phone_filled'].map(phone_counts)
-    
-    # 3. Department Salary Variance
-    dept_avg_salary = df_engineered.groupby('department')['salary'].transform('mean')
-    df_engineered['Department_Salary_Variance'] = abs(df_engineered['salary'] - dept_avg_salary) / dept_avg_salary
-    df_engineered['Department_Salary_Variance'] = df_engineered['Department_Salary_Variance'].fillna(0)
-    
-    # 4. Profile Completeness
-    essential_cols = ['name', 'department', 'email', 'phone_number', 'salary']
-    missing_count = df_engineered[essential_cols].isnull().sum(axis=1)
-    df_engineered['Profile_Completeness_Percentage'] = 100 - (missing_count / len(essential_cols) * 100)
-    
-    df_engineered['salary'] = df_engineered['salary'].fillna(0)
-    
-    # Fill anything else
-    df_engineered['Email_Collision_Count'] = df_engineered['Email_Collision_Count'].fillna(1)
-    df_engineered['Phone_Collision_Count'] = df_engineered['Phone_Collision_Count'].fillna(1)
-    df_engineered['Profile_Completeness_Percentage'] = df_engineered['Profile_Completeness_Percentage'].fillna(100)
-    
-    return df_engineered
+    scale = calibration if served is None else served.calibration
+    if scale is not None:
+        return scale.risk_levels(anomaly_score)
+    return np.select([anomaly_score > 0.05, anomaly_score > 0], ['High', 'Medium'], 'Low')
+
+def anomaly_percentiles(anomaly_score, low=None, high=None, served=None):
+    """
+    Reconstruction_Error (0-1) of each anomaly score: its training percentile.
+    A model without calibration falls back to min-max over ``low``..``high``
+    (by default the scores' own range, i.e. per upload).
+    """
+    scale = calibration if served is None else served.calibration
+    if scale is not None:
+        return scale.percentiles(anomaly_score)
+    low = anomaly_score.min() if low is None else low
+    high = anomaly_score.max() if high is None else high
+    if high > low:
+        return np.clip((anomaly_score - low) / (high - low), 0.0, 1.0)
+    return np.zeros(len(anomaly_score))
 
 def get_dynamic_shap_explanation(row_idx, shap_vals, feature_names):
     row_shaps = shap_vals[row_idx]
@@ -158,7 +277,47 @@ def generate_determination(row, risk_level, anomaly_score, engineered_data_idx=N
     if phone_collisions and phone_collisions > 1:
         reasoning.append(f"Phone number shared with {int(phone_collisions - 1)} other employee records - contact info duplication")
         confidence = min(93, confidence + 8)
+
+    # Exact contact matches are reported above; only the fuzzy ones (emails and phones both differ) here
+    near_duplicates = row.get('Fuzzy_Duplicate_Count') or 0
+    if near_duplicates > 0:
+        reasoning.append(f"Name and contact details closely match {int(near_duplicates)} other employee record(s) - possible duplicate identity")
+        confidence = min(93, confidence + 8)
     
+    # Cross-source reconciliation (only for the sources that were supplied)
+    if row.get('No_Attendance_Record'):
+        reasoning.append("On the payroll but missing from the attendance records")
+        confidence = min(95, confidence + 10)
+    if row.get('Not_Enrolled'):
+        reasoning.append("No fingerprint enrollment on record for this payroll entry")
+        confidence = min(95, confidence + 10)
+    elif row.get('Attendance_Without_Scans'):
+        reasoning.append("Attendance days reported but no fingerprint scan has ever been logged")
+        confidence = min(95, confidence + 10)
+    mismatch = row.get('History_Days_Mismatch') or 0
+    if mismatch >= 3:
+        reasoning.append(f"Attendance sheet differs from biometric history by {int(mismatch)} days "
+                         f"({int(row.get('History_Present_Days') or 0)} scanned present days)")
+        confidence = min(93, confidence + 8)
+
+    # Attendance history (only when a histories export has been ingested)
+    if row.get('History_Available'):
+        since_last = row.get('Days_Since_Last_Scan') or 0
+        if not row.get('History_Months_Active'):
+            reasoning.append("No biometric attendance recorded anywhere in the history window")
+            confidence = min(99, confidence + 12)
+        elif since_last > 30:
+            reasoning.append(f"No biometric scan in the last {int(since_last)} days of recorded history")
+            confidence = min(95, confidence + 8)
+        elif (row.get('Max_Attendance_Gap_Days') or 0) > 30:
+            reasoning.append(f"Attendance history has a {int(row['Max_Attendance_Gap_Days'])}-day gap without scans")
+            confidence = min(90, confidence + 4)
+
+    biometric_ratio = row.get('Biometric_Attendance_Ratio', 1)
+    if biometric_ratio is not None and biometric_ratio < 0.5:
+        reasoning.append(f"Only {int(biometric_ratio * 100)}% of counted attendance days are backed by fingerprint scans")
+        confidence = min(93, confidence + 8)
+
     # Profile completeness
     profile_completeness = row.get('Profile_Completeness_Percentage', 100)
     if profile_completeness and profile_completeness < 50:
@@ -197,129 +356,204 @@ def generate_determination(row, risk_level, anomaly_score, engineered_data_idx=N
         "reasoning": reasoning
     }
 
+# Engineered values generate_determination reads; the lean path passes only these
+DETERMINATION_FIELDS = [
+    'Days_Present', 'Department_Salary_Variance', 'Email_Collision_Count', 'Phone_Collision_Count',
+    'Fuzzy_Duplicate_Count', 'No_Attendance_Record', 'Not_Enrolled', 'Attendance_Without_Scans',
+    'History_Days_Mismatch', 'History_Present_Days', 'History_Available', 'Days_Since_Last_Scan',
+    'History_Months_Active', 'Max_Attendance_Gap_Days', 'Biometric_Attendance_Ratio',
+    'Profile_Completeness_Percentage',
+]
+
+def _python_values(column):
+    """Column as a list of Python values with NaN as None (the default path's replace)."""
+    missing = pd.isna(column).to_numpy()
+    values = column.tolist()
+    if missing.any():
+        return [None if m else v for v, m in zip(values, missing)]
+    return values
+
+def lean_results(df, predictions, scores, explanations, reconciliation, served=None, reasons=True):
+    """
+    The /analyze JSON body, streamed from a frame of the output columns: the
+    same fields as the default path without per-row frames or dicts, and
+    identical determinations share one object (None without ``reasons``).
+    """
+    anomaly_score = -scores
+    # A few distinct values each: one categorical (integer codes) instead of a string column per use
+    risk = pd.Categorical(risk_levels(anomaly_score, served))
+    error = anomaly_percentiles(anomaly_score, served=served)
+
+    attendance_days = df['Days_Present'].fillna(20)
+    determinations = [None] * len(df)
+    shared = {}
+    # The determination inputs as Python values, JSON_CHUNK_ROWS rows at a time
+    for start in range(0, len(df) if reasons else 0, JSON_CHUNK_ROWS):
+        rows = slice(start, start + JSON_CHUNK_ROWS)
+        fields = {name: _python_values(df[name].iloc[rows]) for name in DETERMINATION_FIELDS if name in df}
+        fields['attendanceDays'] = attendance_days.iloc[rows].tolist()
+        keys = list(fields)
+        for i, (values, risk_level, score) in enumerate(zip(zip(*fields.values()), risk[rows].tolist(), error[rows].tolist()), start):
+            d = generate_determination(dict(zip(keys, values)), risk_level, score)
+            key = (d['classification'], d['confidence'], tuple(d['reasoning']))
+            determinations[i] = shared.setdefault(key, d)
+
+    out = pd.DataFrame({col: df[col] for col in SCHEMA_COLUMNS}, copy=False)
+    out['Risk_Level'] = risk
+    out['id'] = df['employee_id']
+    out['employeeId'] = df['employee_id']
+    out['fullName'] = df['name']
+    out['attendanceDays'] = attendance_days
+    out['isGhost'] = predictions == -1
+    out['explanation'] = pd.Categorical(explanations)
+    out['Reconstruction_Error'] = error
+    out['determination'] = determinations
+    out['risk'] = risk
+    return iter_records_json(out, reconciliation=reconciliation)
+
+def read_table(contents, filename, lean=False):
+    """
+    An uploaded CSV or Excel file, mapped to the EmployeeRecord aliases by its
+    cached format (schema_inference.py). ``lean`` parses text columns straight
+    into the memory-lean dtypes (memory_lean.READ_DTYPES).
+    """
+    return schema_cache.read(contents, filename, READ_DTYPES if lean else None)
+
+async def read_uploads(payroll_file, attendance_file, lean=False):
+    """
+    Read the payroll and attendance uploads and merge them on employee_id.
+    Returns (merged, attendance), or None when either file has no employee ID
+    column.
+    """
+    df_payroll = read_table(await payroll_file.read(), payroll_file.filename, lean)
+    df_attendance = read_table(await attendance_file.read(), attendance_file.filename, lean)
+    return merge_uploads(df_payroll, df_attendance)
+
+def merge_uploads(df_payroll, df_attendance):
+    """read_uploads on frames already mapped to the aliases."""
+    if 'employee_id' not in df_payroll.columns or 'employee_id' not in df_attendance.columns:
+        return None
+
+    # Merge datasets; the attendance sheet adds the columns the payroll lacks
+    added = [col for col in df_attendance.columns if col == 'employee_id' or col not in df_payroll.columns]
+    df = pd.merge(df_payroll, df_attendance[added], on='employee_id', how='left')
+    return df, df_attendance
+
 @app.post("/analyze")
-async def analyze_file(payroll_file: UploadFile = File(...), attendance_file: UploadFile = File(...)):
-    if model is None:
+async def analyze_file(
+    payroll_file: UploadFile = File(...),
+    attendance_file: UploadFile = File(...),
+    history_file: Optional[UploadFile] = File(None),
+    employees_file: Optional[UploadFile] = File(None),
+    workers: Optional[int] = None,
+    partition: str = 'department',
+    lean: Optional[bool] = None,
+    explain: str = 'shap',
+    tenant: Optional[str] = None,
+    reasons: bool = True,
+):
+    try:
+        served = serving(tenant)
+    except (KeyError, ValueError) as e:
+        return tenant_error(e)
+    if served.model is None:
         return {"status": "error", "error": "Model not loaded"}
+    if partition not in PARTITIONS:
+        return {"status": "error", "error": f"partition must be one of {PARTITIONS}"}
+    if explain not in EXPLAIN_MODES:
+        return {"status": "error", "error": f"explain must be one of {EXPLAIN_MODES}"}
+    lean = ANALYZE_LEAN if lean is None else lean
 
     try:
-        async def read_df(upload_file):
-            contents = await upload_file.read()
-            filename = upload_file.filename.lower()
-            if filename.endswith(".xlsx") or filename.endswith(".xls"):
-                return pd.read_excel(io.BytesIO(contents))
-            return pd.read_csv(io.BytesIO(contents))
-
-        df_payroll = await read_df(payroll_file)
-        df_attendance = await read_df(attendance_file)
-
-        def find_id_col(df):
-            for col in ['employee_id', 'Employee_ID', 'id', 'ID']:
-                if col in df.columns:
-                    return col
-            return None
-
-        pay_id_col = find_id_col(df_payroll)
-        att_id_col = find_id_col(df_attendance)
-
-        if not pay_id_col or not att_id_col:
-             # Try to just use the first column if names don't match exactly, or just assume employee_id
-             return {"status": "error", "error": "Could not find an employee ID column in one or both files."}
-
-        df_payroll = df_payroll.rename(columns={pay_id_col: 'employee_id'})
-        df_attendance = df_attendance.rename(columns={att_id_col: 'employee_id'})
-
-        # Merge datasets
-        df = pd.merge(df_payroll, df_attendance, on='employee_id', how='left')
-
-        # Optional: standardize common columns like in training
-        if 'date_of_hiring' in df.columns:
-            df = df.rename(columns={'date_of_hiring': 'hire_date'})
-        if 'job_title' in df.columns:
-            df = df.rename(columns={'job_title': 'job_titles'})
-        
-        # Normalize column names to expected aliases used by the Pydantic schema
-        # This helps accept CSVs with different header conventions (e.g. 'Name', 'Employee_ID', 'Monthly_Salary')
-        col_map = {}
-        for col in df.columns:
-            key = col.strip()
-            key_lower = key.lower()
-            # Employee identifier
-            if key_lower in ('employee_id', 'employeeid', 'employee id', 'id'):
-                col_map[col] = 'employee_id'
-                continue
-            # Name fields
-            if key_lower in ('name', 'full_name', 'full name', 'employee_name', 'employee name'):
-                col_map[col] = 'name'
-                continue
-            # Department
-            if key_lower in ('department', 'dept'):
-                col_map[col] = 'department'
-                continue
-            # Email
-            if 'email' in key_lower:
-                col_map[col] = 'email'
-                continue
-            # Phone number
-            if 'phone' in key_lower or 'telephone' in key_lower:
-                col_map[col] = 'phone_number'
-                continue
-            # Salary variants
-            if 'salary' in key_lower or 'monthly_salary' in key_lower or 'monthly salary' in key_lower:
-                col_map[col] = 'salary'
-                continue
-            # Attendance / days present
-            if 'days_present' in key_lower or ('days' in key_lower and 'present' in key_lower) or key_lower == 'days':
-                col_map[col] = 'Days_Present'
-                continue
-
-        if col_map:
-            df = df.rename(columns=col_map)
-            
+        # Optional histories export: new months are added to the feature store
+        if history_file is not None:
+            history_store(tenant).ingest(read_history_export(await history_file.read(), history_file.filename))
+        # Optional mongoexport of the employees collection (enrollment + biometricLogs)
+        employees = None
+        if employees_file is not None:
+            employees = read_employees_export(await employees_file.read(), employees_file.filename)
+
+        uploads = await read_uploads(payroll_file, attendance_file, lean)
+        if uploads is None:
+            return {"status": "error", "error": "Could not find an employee ID column in one or both files; map it with POST /schemas/overrides."}
+        df, df_attendance = uploads
+        del uploads
     except Exception as e:
         return {"status": "error", "error": f"Failed to read or merge files: {str(e)}"}
     
-    records = df.to_dict(orient='records')
-    validated_data = []
-    errors = []
-    
-    for i, record in enumerate(records):
-        try:
-             cleaned_record = {k: (None if pd.isna(v) else v) for k, v in record.items()}
-             validated = EmployeeRecord(**cleaned_record)
-             validated_data.append(validated.model_dump(by_alias=True))
-        except Exception as e:
-             errors.append(f"Row {i+1} validation failed: {str(e)[:100]}...")
+    uploaded_rows = len(df)
+    if lean:
+        # Column-wise validation; the merged upload is released before featurization
+        valid_df, errors = validate_frame(df, EmployeeRecord)
+        del df
+    else:
+        records = df.to_dict(orient='records')
+        validated_data = []
+        errors = []
+
+        for i, record in enumerate(records):
+            try:
+                 cleaned_record = {k: (None if pd.isna(v) else v) for k, v in record.items()}
+                 validated = EmployeeRecord(**cleaned_record)
+                 validated_data.append(validated.model_dump(by_alias=True))
+            except Exception as e:
+                 errors.append(f"Row {i+1} validation failed: {str(e)[:100]}...")
+        valid_df = pd.DataFrame(validated_data)
              
-    if not validated_data:
+    if valid_df.empty:
         return {"status": "error", "error": f"Data validation failed. Expected columns: employee_id, name, department, email, phone_number, salary. Errors: {errors[:3]}"}
-    
-    valid_df = pd.DataFrame(validated_data)
-    df_engineered = engineer_features(valid_df)
+    if lean:
+        compact_frame(valid_df)
 
-    features = [
-        'salary', 'Email_Collision_Count', 'Phone_Collision_Count',
-        'Department_Salary_Variance', 'Profile_Completeness_Percentage'
-    ]
+    # ?reasons=false leaves determinations out, and with them near duplicates unless the model scores them
+    near_duplicates = needs_near_duplicates(served.model, reasons)
+
+    def featurize(identity=None):
+        # Lean mode assigns every feature column onto valid_df itself
+        engineered, summary = featurize_frame(valid_df, df_attendance, employees, identity, inplace=lean, store=history_store(tenant),
+                                              near_duplicates=near_duplicates)
+        if lean:
+            downcast_floats(engineered, [col for col in engineered if col not in SCHEMA_COLUMNS])
+        return engineered, summary
+
+    features = model_features(served.model)
+    workers = workers or default_workers()
+
+    if workers > 1 and len(valid_df) >= PARALLEL_MIN_ROWS:
+        # Large uploads: featurize and score in shards across processes (see parallel_scoring.py)
+        with PartitionedScorer(workers, partition).session(valid_df, served.model, features) as run:
+            df_engineered, reconciliation = featurize(run.identity_keys() if near_duplicates else None)
+            X = df_engineered[features]
+            scores = run.decision_function(X)
+        predictions = np.where(scores < 0, -1, 1)  # IsolationForest.predict's rule
+    else:
+        df_engineered, reconciliation = featurize()
+        X = df_engineered[features]
+        predictions = served.model.predict(X)
+        scores = served.model.decision_function(X)
+    if tenant is None:  # the drift reference is the service model's training data
+        observe_drift(df_engineered, X, scores, uploaded_rows)
+    
+    # Dynamic explanations for flagged rows (SHAP by default, ?explain=fast|none)
+    flagged = np.flatnonzero(predictions == -1)
+    explanations = np.full(len(X), "Normal behavior detected.", dtype=object)
+    if explain == 'none':
+        explanations[flagged] = None
+    elif len(flagged):
+        contributions = explain_rows(X.iloc[flagged], explain, served)
+        texts = {}  # a few distinct sentences: rows share one string each
+        for pos, idx in enumerate(flagged):
+            text = get_dynamic_shap_explanation(pos, contributions, features)
+            explanations[idx] = texts.setdefault(text, text)
+        del contributions
+
+    if lean:
+        body = lean_results(df_engineered, predictions, scores, explanations, reconciliation, served, reasons)
+        return StreamingResponse(body, media_type="application/json")
 
-    X = df_engineered[features]
-    
-    predictions = model.predict(X)
-    scores = model.decision_function(X)
-    
-    # SHAP Integration for Dynamic Explanations
-    explainer = shap.TreeExplainer(model)
-    shap_values = explainer.shap_values(X)
-    
     valid_df['Anomaly'] = predictions
     valid_df['Anomaly_Score'] = -scores 
-    
-    def assign_risk(score):
-        if score > 0.05: return 'High'
-        if score > 0: return 'Medium'
-        return 'Low'
-
-    valid_df['Risk_Level'] = valid_df['Anomaly_Score'].apply(assign_risk)
+    valid_df['Risk_Level'] = risk_levels(-scores, served)
     
     valid_df['Email_Collision_Count'] = df_engineered['Email_Collision_Count']
     valid_df['Phone_Collision_Count'] = df_engineered['Phone_Collision_Count']
@@ -333,21 +567,9 @@ async def analyze_file(payroll_file: UploadFile = File(...), attendance_file: Up
     valid_df['attendanceDays'] = valid_df['Days_Present'].fillna(20) # Use merged attendance data, default 20 if missing
     valid_df['isGhost'] = valid_df['Anomaly'].apply(lambda x: True if x == -1 else False)
 
-    # Dynamic SHAP explanations
-    explanations = []
-    for idx, row in valid_df.iterrows():
-        if row['Anomaly'] == -1:
-             explanations.append(get_dynamic_shap_explanation(idx, shap_values, features))
-        else:
-             explanations.append("Normal behavior detected.")
-    
     valid_df['explanation'] = explanations
         
-    min_score, max_score = valid_df['Anomaly_Score'].min(), valid_df['Anomaly_Score'].max()
-    if max_score > min_score:
-         valid_df['Reconstruction_Error'] = (valid_df['Anomaly_Score'] - min_score) / (max_score - min_score)
-    else:
-         valid_df['Reconstruction_Error'] = 0
+    valid_df['Reconstruction_Error'] = anomaly_percentiles(-scores, served=served)
 
     drop_cols = ['Anomaly', 'Anomaly_Score', 'Email_Collision_Count', 'Phone_Collision_Count', 'Profile_Completeness_Percentage', 'Department_Salary_Variance']
     valid_df = valid_df.drop(columns=[col for col in drop_cols if col in valid_df.columns])
@@ -368,27 +590,397 @@ async def analyze_file(payroll_file: UploadFile = File(...), attendance_file: Up
             valid_df.iloc[idx]['Risk_Level'],
             valid_df.iloc[idx].get('Reconstruction_Error', 0),
             idx
-        )
+        ) if reasons else None
         record['determination'] = determination
         record['risk'] = valid_df.iloc[idx]['Risk_Level']
         results.append(record)
     
-    return {"status": "success", "data": results}
+    return {"status": "success", "data": results, "reconciliation": reconciliation}
+
+def score_chunks(X, chunk_rows=SCORE_CHUNK, fitted=None):
+    """decision_function of ``X`` (by the loaded model, or ``fitted``) in one pass over bounded row chunks."""
+    fitted = model if fitted is None else fitted
+    # Major step: decision_function over bounded row chunks, not every row at once
+    return np.concatenate([fitted.decision_function(X.iloc[start:start + chunk_rows])
+                           for start in range(0, len(X), chunk_rows)])
+
+@app.post("/analyze/periods")
+async def analyze_periods(
+    payroll_files: Optional[List[UploadFile]] = File(None),
+    attendance_files: Optional[List[UploadFile]] = File(None),
+    file: Optional[UploadFile] = File(None),
+    employees_file: Optional[UploadFile] = File(None),
+    periods: Optional[str] = None,
+    explain: str = 'fast',
+    tenant: Optional[str] = None,
+):
+    """
+    Several payroll periods in one request (see multi_period.py): monthly
+    ``payroll_files`` / ``attendance_files`` pairs in matching order (``periods``
+    names them, comma-separated), or one long-format ``file`` with a period
+    column. Returns counts per period and every employee's trajectory.
+    """
+    try:
+        served = serving(tenant)
+    except (KeyError, ValueError) as e:
+        return tenant_error(e)
+    if served.model is None:
+        return {"status": "error", "error": "Model not loaded"}
+    if explain not in EXPLAIN_MODES:
+        return {"status": "error", "error": f"explain must be one of {EXPLAIN_MODES}"}
+
+    try:
+        employees = None
+        if employees_file is not None:
+            employees = read_employees_export(await employees_file.read(), employees_file.filename)
+        attendance_ids = None
+        if file is not None:
+            df = read_table(await file.read(), file.filename)
+            labels = long_format_periods(df)
+            if labels is None:
+                return {"status": "error", "error": "The long-format file needs a period column (or Month and Year)."}
+            df['period'] = labels
+        else:
+            if not payroll_files or len(payroll_files) != len(attendance_files or []):
+                return {"status": "error", "error": "Upload matching payroll_files and attendance_files, or one long-format file."}
+            merged = []
+            for payroll_file, attendance_file in zip(payroll_files, attendance_files):
+                uploads = merge_uploads(read_table(await payroll_file.read(), payroll_file.filename),
+                                        read_table(await attendance_file.read(), attendance_file.filename))
+                if uploads is None:
+                    return {"status": "error", "error": f"Could not find an employee ID column in {payroll_file.filename} or {attendance_file.filename}; map it with POST /schemas/overrides."}
+                merged.append(uploads)
+            labels = pair_labels([f.filename for f in payroll_files],
+                                 [attendance_period(attendance) for _, attendance in merged], periods)
+            attendance_ids = {label: attendance['employee_id'] for label, (_, attendance) in zip(labels, merged)}
+            df = pd.concat([frame.assign(period=label) for label, (frame, _) in zip(labels, merged)], ignore_index=True)
+            del merged
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+    except Exception as e:
+        return {"status": "error", "error": f"Failed to read or merge files: {str(e)}"}
+
+    uploaded_rows = len(df)
+    valid_df, errors = validate_frame(df[df['period'].notna()], EmployeeRecord, keep=('period',))
+    del df
+    if valid_df.empty:
+        return {"status": "error", "error": f"Data validation failed. Expected columns: employee_id, name, department, email, phone_number, salary, period. Errors: {errors[:3]}"}
+    order = period_order(valid_df['period'].tolist())
+
+    df_engineered, reconciliation = featurize_periods(valid_df, attendance_ids, employees, history_store(tenant),
+                                                      needs_near_duplicates(served.model))
+    features = model_features(served.model)
+    X = df_engineered[features]
+    # Major step: an employee unchanged between periods repeats a feature row; score and explain each distinct row once
+    rows, inverse = np.unique(X.to_numpy(np.float64), axis=0, return_inverse=True)
+    distinct = pd.DataFrame(rows, columns=features)
+    inverse = inverse.ravel()
+    distinct_scores = score_chunks(distinct, fitted=served.model)
+    scores = distinct_scores[inverse]
+    if tenant is None:
+        observe_drift(df_engineered, X, scores, uploaded_rows)
+
+    flagged = np.flatnonzero(distinct_scores < 0)  # IsolationForest.predict's rule
+    explanations = np.full(len(distinct), "Normal behavior detected.", dtype=object)
+    if explain == 'none':
+        explanations[flagged] = None
+    elif len(flagged):
+        contributions = explain_rows(distinct.iloc[flagged], explain, served)
+        for pos, idx in enumerate(flagged):
+            explanations[idx] = get_dynamic_shap_explanation(pos, contributions, features)
+    explanations = explanations[inverse]
+
+    # One scale for every period: calibrated percentiles (min-max over the request without calibration)
+    results = pd.DataFrame({
+        'employee_id': df_engineered['employee_id'].to_numpy(),
+        'name': df_engineered['name'].to_numpy(),
+        'department': df_engineered['department'].to_numpy(),
+        'period': df_engineered['period'].to_numpy(),
+        'salary': df_engineered['salary'].to_numpy(),
+        'attendanceDays': df_engineered['Days_Present'].fillna(20).to_numpy(),
+        'Reconstruction_Error': anomaly_percentiles(-scores, served=served),
+        'risk': risk_levels(-scores, served),
+        'isGhost': scores < 0,
+        'explanation': explanations,
+    })
+    # The body holds only JSON-native values: skip jsonable_encoder's walk over every trajectory row
+    return JSONResponse({
+        "status": "success",
+        "periods": order,
+        "rows": len(results),
+        "skipped": uploaded_rows - len(results),
+        "summary": period_summaries(results, order, reconciliation),
+        "employees": trajectories(results, order),
+    })
+
+def score_collection(collection, include_terminated=False, batch_size=BATCH_SIZE, chunk_rows=SCORE_CHUNK, dry_run=False, served=None):
+    """
+    Score the Employee documents of ``collection`` (see mongo_scoring.py) and
+    write anomalyScore (0-100, /analyze's Reconstruction_Error as a percentage), riskLevel
+    and isGhost back to them. Returns the counts a scheduled report records.
+    ``served`` (see ``serving``) scores with a tenant's artifacts.
+    """
+    fitted = model if served is None else served.model
+    if fitted is None:
+        return {"status": "error", "error": "Model not loaded"}
+
+    seconds = {}
+    t = time.perf_counter()
+    ids, valid_df, employees, stored = read_employees(collection, None if include_terminated else ACTIVE, batch_size)
+    seconds['read'] = time.perf_counter() - t
+    if valid_df.empty:
+        return {"status": "error", "error": f"No scorable employee documents (required: employeeId, fullName, department, salary); {len(employees)} read."}
+
+    t = time.perf_counter()
+    # The live collection's period is the current month
+    df_engineered, reconciliation = featurize_frame(valid_df, employees=employees, inplace=True,
+                                                    store=history_store(served.tenant if served is not None else None),
+                                                    period=time.strftime('%Y-%m'), near_duplicates=needs_near_duplicates(fitted))
+    X = df_engineered[model_features(fitted)]
+    scores = score_chunks(X, chunk_rows, fitted)
+    anomaly_score = -scores
+    risk = risk_levels(anomaly_score, served)
+    error = anomaly_percentiles(anomaly_score, served=served)
+    seconds['score'] = time.perf_counter() - t
+    if served is None or served.tenant is None:
+        observe_drift(df_engineered, X, scores, len(employees))
+
+    summary = {
+        "status": "success",
+        "totalAnalyzed": len(ids),
+        "skipped": len(employees) - len(ids),
+        "highRiskCount": int((risk == 'High').sum()),
+        "mediumRiskCount": int((risk == 'Medium').sum()),
+        "ghostCount": int((scores < 0).sum()),  # IsolationForest.predict's rule
+    }
+    if not dry_run:
+        t = time.perf_counter()
+        summary["written"] = write_scores(collection, ids, {
+            'anomalyScore': np.round(error * 100, 2),
+            'riskLevel': risk,
+            'isGhost': scores < 0,
+        }, stored)
+        seconds['write'] = time.perf_counter() - t
+    summary["seconds"] = {k: round(v, 3) for k, v in seconds.items()}
+    summary["reconciliation"] = reconciliation
+    return summary
+
+@app.post("/score-db")
+def score_database(
+    include_terminated: bool = False,
+    batch_size: int = BATCH_SIZE,
+    chunk_rows: int = SCORE_CHUNK,
+    dry_run: bool = False,
+    tenant: Optional[str] = None,
+):
+    """
+    Score the shared MongoDB employees collection in place (MONGO_URI, as the
+    Node and Flask services); a ``tenant``'s employees in its own database with
+    its model.
+    """
+    try:
+        served = serving(tenant)
+    except (KeyError, ValueError) as e:
+        return tenant_error(e)
+    try:
+        collection = tenant_collection(tenant) if tenant else employees_collection()
+        return score_collection(collection, include_terminated, batch_size, chunk_rows, dry_run, served)
+    except Exception as e:
+        return {"status": "error", "error": f"MongoDB scoring failed: {str(e)}"}
+
+# Cached population state for /score-scan (online_scoring.py); rebuilt by /score-scan/refresh.
+# A tenant's state lives with its artifacts in the LRU and is dropped with them.
+online_scorer = None
+
+def refresh_online_scorer(collection=None, served=None):
+    """Featurize the employees collection once and cache it for per-scan scoring."""
+    global online_scorer
+    tenant = served.tenant if served is not None else None
+    if collection is None:
+        collection = tenant_collection(tenant) if tenant else employees_collection()
+    ids, valid_df, employees, _ = read_employees(collection, ACTIVE)
+    if valid_df.empty:
+        raise ValueError("No scorable employee documents to build the online state from.")
+    fitted = model if served is None else served.model
+    df_engineered, _ = featurize_frame(valid_df, employees=employees, inplace=True, store=history_store(tenant), period=time.strftime('%Y-%m'),
+                                       near_duplicates=needs_near_duplicates(fitted))
+    scorer = OnlineScorer(fitted, model_features(fitted))
+    scorer.load(df_engineered, fitted.decision_function(df_engineered[scorer.features]))
+    if tenant:
+        served.online_scorer = scorer
+    else:
+        online_scorer = scorer
+    return scorer
+
+@app.post("/score-scan/refresh")
+def refresh_scan_state(tenant: Optional[str] = None):
+    try:
+        served = serving(tenant)
+    except (KeyError, ValueError) as e:
+        return tenant_error(e)
+    if served.model is None:
+        return {"status": "error", "error": "Model not loaded"}
+    try:
+        t = time.perf_counter()
+        scorer = refresh_online_scorer(served=served)
+        return {"status": "success", "employees": len(scorer), "seconds": round(time.perf_counter() - t, 3)}
+    except Exception as e:
+        return {"status": "error", "error": f"Failed to build the online scoring state: {str(e)}"}
+
+@app.post("/score-scan")
+def score_scan(event: ScanEvent):
+    """
+    Score one employee on an attendance scan: the event's fields update that
+    employee's cached row (see online_scoring.py) and the row is scored alone.
+    The state is built from MongoDB on the first call.
+    """
+    t = time.perf_counter()
+    try:
+        served = serving(event.tenant)
+    except (KeyError, ValueError) as e:
+        return tenant_error(e)
+    if served.model is None:
+        return {"status": "error", "error": "Model not loaded"}
+    try:
+        scorer = (served.online_scorer if event.tenant else online_scorer) or refresh_online_scorer(served=served)
+    except Exception as e:
+        return {"status": "error", "error": f"Failed to build the online scoring state: {str(e)}"}
+
+    fields = event.model_dump(by_alias=False, exclude={'tenant'})
+    fields['Days_Present'] = fields.pop('days_present')
+    fields['biometricLogs'] = fields.pop('biometric_logs')
+    result = scorer.score(fields.pop('employee_id'), **fields)
+    decision = result['decision']
+    is_ghost = decision < 0  # IsolationForest.predict's rule
+    return {
+        "status": "success",
+        "employeeId": str(event.employee_id),
+        "anomalyScore": round(float(anomaly_percentiles(np.array([-decision]), scorer.low, scorer.high, served)[0]) * 100, 2),
+        "riskLevel": str(risk_levels(np.array([-decision]), served)[0]),
+        "isGhost": is_ghost,
+        "explanation": (get_dynamic_shap_explanation(0, result['contributions'], scorer.features)
+                        if is_ghost else "Normal behavior detected."),
+        "latency_ms": round((time.perf_counter() - t) * 1000, 3),
+    }
+
+@app.get("/drift")
+def drift(reset: bool = False):
+    """
+    PSI / KS of every model feature and of the scores, null rates and distinct
+    email / phone ratios: the requests scored since the last reset against the
+    training reference (see drift_monitor.py). ``reset`` starts a new window
+    after reporting.
+    """
+    global drift_window
+    if drift_reference is None:
+        return {"status": "error", "error": "No drift reference: retrain the model, or POST /drift/reference to pin the current window."}
+    with _drift_lock:
+        report = drift_report(drift_reference, drift_window)
+        if reset:
+            drift_window = DriftSketches(drift_window.features)
+            drift_window.save(WINDOW_PATH)
+    return {"status": "success", **report}
+
+@app.post("/drift/reference")
+def pin_drift_reference():
+    """Make the current window (reviewed as clean) the reference and start a new one."""
+    global drift_reference, drift_window
+    with _drift_lock:
+        if not drift_window.meta['requests']:
+            return {"status": "error", "error": "The current window is empty."}
+        drift_window.save(REFERENCE_PATH)
+        drift_reference, drift_window = drift_window, DriftSketches(drift_window.features)
+        drift_window.save(WINDOW_PATH)
+    return {"status": "success", "reference_rows": drift_reference.meta['rows']}
+
+class SchemaOverride(BaseModel):
+    headers: List[str]
+    mapping: Dict[str, Optional[str]]
+
+@app.get("/schemas")
+def schemas():
+    """Cached upload formats (mapping, pinned dtypes, unmapped headers), overrides and cache hits."""
+    return {"status": "success", **schema_cache.summary()}
+
+@app.post("/schemas/overrides")
+def override_schema(override: SchemaOverride):
+    """
+    Confirm or correct the mapping of one header row: ``mapping`` names the
+    alias of each listed header (null ignores the column); the other headers
+    keep the rules. Applies to every later upload with that header row.
+    """
+    try:
+        key = schema_cache.set_override(override.headers, override.mapping)
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+    return {"status": "success", "signature": key}
+
+@app.delete("/schemas/{signature}")
+def forget_schema(signature: str):
+    """Resolve a cached format again on its next upload."""
+    if not schema_cache.forget(signature):
+        return {"status": "error", "error": f"No cached format {signature}."}
+    return {"status": "success"}
+
+@app.get("/tenants")
+def tenants():
+    """Tenants with a model on disk and the LRU's hit rate, evictions and cold-load latency."""
+    return {"status": "success", "known": tenant_models.known(), **tenant_models.stats()}
+
+@app.post("/tenants/preload")
+def preload_tenants(tenants: Optional[str] = None):
+    """Load ``tenants`` (comma-separated; default: the most used) ahead of their requests, within the memory bound."""
+    try:
+        names = [t.strip() for t in tenants.split(',') if t.strip()] if tenants else None
+        return {"status": "success", "loaded": tenant_models.preload(names)}
+    except (KeyError, ValueError) as e:
+        return tenant_error(e)
 
 @app.post("/retrain")
-async def retrain_model(file: UploadFile = File(...)):
+async def retrain_model(
+    file: UploadFile = File(...),
+    history_file: Optional[UploadFile] = File(None),
+    employees_file: Optional[UploadFile] = File(None),
+    tenant: Optional[str] = None,
+):
+    """
+    Retrain the service's model on the baseline data plus ``file``, or with
+    ``tenant`` that tenant's model on ``file`` alone (see tenant_models.py).
+    """
+    try:
+        model_dir = tenant_models.path(tenant) if tenant else None
+    except ValueError as e:
+        return tenant_error(e)
     try:
         contents = await file.read()
         additional_df = pd.read_csv(io.BytesIO(contents))
+        history_events = None
+        if history_file is not None:
+            history_events = read_history_export(await history_file.read(), history_file.filename)
+        employees = None
+        if employees_file is not None:
+            employees = read_employees_export(await employees_file.read(), employees_file.filename)
     except Exception as e:
         return {"status": "error", "error": f"Failed to read CSV: {str(e)}"}
     
     print("Initiating automated retraining pipeline...")
-    success = train_and_save_model(additional_df)
+    success = train_and_save_model(additional_df, history_events, employees, model_dir=model_dir, baseline=not tenant,
+                                   history_store=history_store(tenant))
+    if success and tenant:
+        tenant_models.invalidate(tenant)
+        try:
+            tenant_models.get(tenant)  # reloaded now rather than on the tenant's next request
+            return {"status": "success", "message": f"Model for tenant {tenant} retrained and loaded."}
+        except Exception as e:
+            return {"status": "error", "error": f"Model for tenant {tenant} retrained but failed to load: {e}"}
     if success:
-        global model
+        global model, online_scorer, calibration
         try:
             model = joblib.load(MODEL_PATH)
+            calibration = load_calibration()  # saved by train_model with the model
+            _explainers.clear()
+            online_scorer = None  # rebuilt for the new model on the next scan
+            load_drift_state(reset=True)  # train_model saved a new reference
             return {"status": "success", "message": "Model retrained and artifacts reloaded successfully."}
         except Exception as e:
             return {"status": "error", "error": f"Model retrained but failed to reload artifacts: {e}"}
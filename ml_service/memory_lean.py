@@ -0,0 +1,125 @@
+"""
+Memory-lean building blocks for ``/analyze`` on large uploads (``lean=true``).
+
+The default pipeline holds several full copies of the upload at once: a list
+of row dicts for validation, a second list of validated dicts, frame copies in
+every feature stage, a NaN-replaced copy of the output frame, one dict per row
+for the response and FastAPI's encoded copy of that. The lean path instead:
+
+  READ_DTYPES        categorical ``department``, Arrow-backed strings, already
+                     at parse time (for the columns the schema cache pins as text)
+  validate_frame     checks the schema column-wise and keeps the columns in place
+  compact_frame      the same dtypes for the columns parsed with inference
+  downcast_floats    float32 engineered features (IsolationForest scores in float32 anyway)
+  iter_records_json  streams the response, encoded from the columns in row chunks
+
+The merged upload is released once validated, and feature stages run with
+``inplace=True`` so new columns are assigned onto the validated frame instead
+of copying it.
+"""
+import json
+import typing
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = pd.StringDtype('pyarrow', na_value=np.nan)
+except ImportError:  # strings stay as Python objects
+    STRING_DTYPE = None
+
+CATEGORICAL_COLUMNS = ('department',)
+TEXT_COLUMNS = ('name', 'email', 'phone_number')
+JSON_CHUNK_ROWS = 5_000  # response rows encoded per chunk
+MAX_ERRORS = 20  # row errors reported, like the first errors of the row-by-row validation
+READ_DTYPES = {
+    **({col: STRING_DTYPE for col in ('employee_id', *TEXT_COLUMNS)} if STRING_DTYPE is not None else {}),
+    **{col: 'category' for col in CATEGORICAL_COLUMNS},
+}
+
+
+def _is_float_field(field):
+    types = typing.get_args(field.annotation) or (field.annotation,)
+    return set(types) <= {float, type(None)}
+
+
+def validate_frame(df, schema, keep=()):
+    """
+    Column-wise equivalent of validating every row with the pydantic ``schema``:
+    float fields are parsed with ``pd.to_numeric``, the union-typed text fields
+    keep their values, and rows missing a required value or holding an
+    unparsable number are dropped. Returns the schema columns (by
+    alias) of the valid rows, plus the ``keep`` columns, and a list of row errors.
+    """
+    columns = {}
+    bad = np.zeros(len(df), dtype=bool)
+    errors = []
+    for name, field in schema.model_fields.items():
+        alias = field.alias or name
+        if alias not in df:
+            if field.is_required():
+                return pd.DataFrame(), [f"Missing required column: {alias}"]
+            columns[alias] = pd.Series(np.nan, index=df.index)
+            continue
+        values = df[alias]
+        if isinstance(values, pd.DataFrame):  # renamed columns collided; the last one wins, as in to_dict
+            values = values.iloc[:, -1]
+        present = values.notna().to_numpy()
+        invalid = np.zeros(len(df), dtype=bool)
+        if _is_float_field(field):
+            parsed = pd.to_numeric(values, errors='coerce')
+            invalid = present & parsed.isna().to_numpy()
+            values = parsed.astype(float)
+        if field.is_required():
+            invalid |= ~present
+        for i in np.flatnonzero(invalid & ~bad)[:MAX_ERRORS - len(errors)]:
+            errors.append(f"Row {i + 1} validation failed: invalid or missing {alias}")
+        bad |= invalid
+        columns[alias] = values
+
+    columns.update({name: df[name] for name in keep if name in df})
+    valid = pd.DataFrame(columns)
+    if bad.any():
+        valid = valid[~bad]
+    return valid.reset_index(drop=True), errors
+
+
+def compact_frame(df):
+    """
+    Categorical department and Arrow-backed text columns (those holding only
+    strings), converted column by column in place.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype('category')
+    if STRING_DTYPE is not None:
+        for col in TEXT_COLUMNS:
+            if col in df and df[col].dtype != STRING_DTYPE and pd.api.types.is_string_dtype(df[col]):
+                df[col] = df[col].astype(STRING_DTYPE)
+    return df
+
+
+def downcast_floats(df, columns):
+    """float64 columns among ``columns`` to float32, one column at a time."""
+    for col in columns:
+        if col in df and df[col].dtype == np.float64:
+            df[col] = df[col].astype(np.float32)
+    return df
+
+
+def iter_records_json(frame, chunk_rows=JSON_CHUNK_ROWS, **fields):
+    """
+    ``{"status": "success", "data": [...rows of frame...], **fields}`` as a
+    stream of bytes chunks, each encoded column-wise by pandas from
+    ``chunk_rows`` rows, so the body never exists in one piece. NaN becomes null
+    like the default response.
+    """
+    yield b'{"status": "success", "data": ['
+    for start in range(0, len(frame), chunk_rows):
+        rows = frame.iloc[start:start + chunk_rows].to_json(orient='records', double_precision=15)
+        yield (',' if start else '').encode() + rows[1:-1].encode()
+    yield b']'
+    for key, value in fields.items():
+        yield f', {json.dumps(key)}: {json.dumps(value, default=str)}'.encode()
+    yield b'}'
@@ -0,0 +1,302 @@
+"""
+Detection quality of IsolationForest settings on a ghost-labelled upload (``python model_search.py``).
+
+train_model used to hardcode n_estimators=100, contamination=0.05 and
+random_state=42, and nothing measured what those settings catch. This harness
+scores settings against a labelled payroll / attendance pair (by default the
+HIT files at the repository root):
+
+  labels      the ghosts injected into the HIT files: no attendance all month
+              (their pay also skips deductions), or a bank account shared with
+              another employee. ``--labels`` takes a CSV of employee_id, label
+  features    the pair is read and featurized once as /analyze does; the
+              matrix is cached under ``feature_store/search`` by the files'
+              digest, and every trial reads the same matrix
+  trials      a grid (or ``--random N`` draws) over n_estimators, max_samples
+              and feature subsets (all FEATURES, then each left out), times
+              --seeds random states, mapped over a fork process pool; the
+              contaminations of a setting share one fit, since contamination
+              only sets the threshold (a percentile of the training scores)
+  metrics     precision@k / recall@k at each --k (default: the number of
+              labelled ghosts), average precision and ROC AUC, and per
+              contamination the flagged count, precision, recall and F1 at its
+              threshold, with fit and score latency; means over the seeds
+
+Each forest is fitted and scored on the whole upload, as a model trained on an
+institution's own payroll scores it. Settings print ranked by --objective,
+followed by the shipped model and the best operating point. ``--write-params``
+saves that operating point to ``model/model_params.json``, which train_model
+uses from then on. Run from ml_service:
+
+  python model_search.py
+  python model_search.py --random 40 --seeds 5 --objective f1 --write-params
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+from sklearn.metrics import average_precision_score, roc_auc_score
+
+from parallel_scoring import default_workers
+from schema_inference import header_alias
+from train_model import DEFAULT_PARAMS, FEATURES, PARAMS_FILE
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(BASE_DIR)
+CACHE_DIR = os.path.join(BASE_DIR, 'feature_store', 'search')
+CACHE_VERSION = 1  # bump when featurization changes
+
+PAYROLL = os.path.join(REPO, 'HIT_Payroll_2000_With_Ghost_Anomalies.xlsx')
+ATTENDANCE = os.path.join(REPO, 'HIT_Attendance_2000_With_Ghost_Anomalies.xlsx')
+
+N_ESTIMATORS = (50, 100, 200, 400)
+MAX_SAMPLES = ('auto', 128, 512, 1.0)
+CONTAMINATIONS = (0.03, 0.05, 0.07, 0.1)
+OBJECTIVES = ('average_precision', 'precision_at_k', 'f1')
+
+# Set in the parent before the pool forks; workers inherit them without pickling
+_data = {}
+
+
+def _read(path):
+    return pd.read_excel(path) if path.lower().endswith(('.xlsx', '.xls')) else pd.read_csv(path)
+
+
+def _column(df, alias=None, contains=None):
+    for col in df.columns:
+        if (alias and header_alias(col) == alias) or (contains and contains in str(col).lower()):
+            return col
+    return None
+
+
+def injected_ghosts(payroll_path, attendance_path):
+    """
+    Labels of the HIT files by employee id: no present day in the month, or a
+    bank account shared with another payroll row.
+    """
+    payroll, attendance = _read(payroll_path), _read(attendance_path)
+    pay_id, att_id = _column(payroll, 'employee_id'), _column(attendance, 'employee_id')
+    labels = pd.Series(False, index=payroll[pay_id].astype(str))
+    bank = _column(payroll, contains='bank')
+    if bank is not None:
+        labels |= payroll[bank].duplicated(keep=False).to_numpy() & payroll[bank].notna().to_numpy()
+    days = _column(attendance, 'Days_Present')
+    if days is not None:
+        absent = set(attendance.loc[attendance[days] == 0, att_id].astype(str))
+        labels |= labels.index.isin(absent)
+    return labels
+
+
+def read_labels(path):
+    """A CSV of employee_id and label (1 / true for a ghost) as a boolean Series by id."""
+    df = pd.read_csv(path)
+    labels = df['label'].astype(str).str.lower().isin(('1', 'true', 'yes', 'ghost'))
+    return pd.Series(labels.to_numpy(), index=df['employee_id'].astype(str))
+
+
+def featurize(payroll_path, attendance_path, labels_path=None):
+    """
+    (X of every FEATURES column, labels, employee ids) of the upload pair, as
+    /analyze featurizes it; cached by the files' digest.
+    """
+    digest = hashlib.sha1(str(CACHE_VERSION).encode() + json.dumps(FEATURES).encode())
+    for path in filter(None, (payroll_path, attendance_path, labels_path)):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    cache = os.path.join(CACHE_DIR, digest.hexdigest()[:16] + '.npz')
+    if os.path.exists(cache):
+        data = np.load(cache, allow_pickle=False)
+        return data['X'], data['labels'], data['ids'], True
+
+    import main  # the service's readers and feature engineering (loads the model)
+    from memory_lean import validate_frame
+
+    with open(payroll_path, 'rb') as p, open(attendance_path, 'rb') as a:
+        df, attendance = main.merge_uploads(main.read_table(p.read(), os.path.basename(payroll_path)),
+                                            main.read_table(a.read(), os.path.basename(attendance_path)))
+    valid, _ = validate_frame(df, main.EmployeeRecord)
+    engineered, _ = main.featurize_frame(valid, attendance)
+    ids = engineered['employee_id'].astype(str).to_numpy()
+    truth = read_labels(labels_path) if labels_path else injected_ghosts(payroll_path, attendance_path)
+    labels = truth.reindex(ids, fill_value=False).to_numpy(bool)
+    X = engineered[FEATURES].to_numpy(np.float64)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    np.savez(cache, X=X, labels=labels, ids=ids.astype(str))
+    return X, labels, ids, False
+
+
+def settings(feature_sets, n_estimators=N_ESTIMATORS, max_samples=MAX_SAMPLES, random=None, seed=0):
+    """Grid of (n_estimators, max_samples, features), or ``random`` draws from it."""
+    grid = list(itertools.product(n_estimators, max_samples, feature_sets))
+    if random and random < len(grid):
+        picks = np.random.default_rng(seed).choice(len(grid), random, replace=False)
+        grid = [grid[i] for i in sorted(picks)]
+    return grid
+
+
+def feature_sets():
+    """All FEATURES, then each one left out."""
+    return [tuple(FEATURES)] + [tuple(f for f in FEATURES if f != left) for left in FEATURES]
+
+
+def flag_metrics(flagged, labels):
+    """Flagged count, precision, recall and F1 of one set of flags."""
+    tp = int((flagged & labels).sum())
+    precision = tp / flagged.sum() if flagged.any() else 0.0
+    recall = tp / max(int(labels.sum()), 1)
+    return {
+        'flagged': int(flagged.sum()), 'precision': float(precision), 'recall': float(recall),
+        'f1': float(2 * precision * recall / (precision + recall)) if precision + recall else 0.0,
+    }
+
+
+def evaluate(score_samples, labels, ks, contaminations):
+    """Ranking and thresholded metrics of one scored upload (lower score_samples = more anomalous)."""
+    anomaly = -score_samples
+    ranked = labels[np.argsort(-anomaly, kind='stable')]
+    hits = np.cumsum(ranked)
+    positives = max(int(labels.sum()), 1)
+    out = {
+        'average_precision': float(average_precision_score(labels, anomaly)),
+        'roc_auc': float(roc_auc_score(labels, anomaly)) if 0 < labels.sum() < len(labels) else None,
+    }
+    for k in ks:
+        out[f'precision@{k}'] = float(hits[k - 1] / k)
+        out[f'recall@{k}'] = float(hits[k - 1] / positives)
+    for c in contaminations:
+        # IsolationForest's threshold: the contamination percentile of the training scores
+        out[f'contamination={c}'] = flag_metrics(score_samples < np.percentile(score_samples, 100 * c), labels)
+    return out
+
+
+def _trial(n_estimators, max_samples, features, seed):
+    X, labels = _data['X'], _data['labels']
+    columns = [FEATURES.index(f) for f in features]
+    X = np.ascontiguousarray(X[:, columns])
+    t = time.perf_counter()
+    forest = IsolationForest(n_estimators=n_estimators, max_samples=max_samples, contamination='auto', random_state=seed)
+    forest.fit(X)
+    fit_s = time.perf_counter() - t
+    t = time.perf_counter()
+    samples = forest.score_samples(X)
+    score_s = time.perf_counter() - t
+    return {**evaluate(samples, labels, _data['ks'], _data['contaminations']), 'fit_ms': fit_s * 1000,
+            'score_us_per_row': score_s / len(X) * 1e6}
+
+
+def _mean(results):
+    """Mean of each metric over the seeds of one setting (nested per-contamination dicts too)."""
+    out = {}
+    for key, value in results[0].items():
+        if isinstance(value, dict):
+            out[key] = _mean([r[key] for r in results])
+        elif value is None:
+            out[key] = None
+        else:
+            out[key] = round(float(np.mean([r[key] for r in results])), 4)
+    return out
+
+
+def operating_point(metrics, contaminations):
+    """The contamination with the best F1 for one setting."""
+    return max(contaminations, key=lambda c: metrics[f'contamination={c}']['f1'])
+
+
+def search(X, labels, grid, seeds=3, ks=None, contaminations=CONTAMINATIONS, workers=None):
+    """Mean metrics per setting of ``grid``; the trials (settings x seeds) run in a process pool."""
+    ks = ks or [int(labels.sum())]
+    _data.update({'X': X, 'labels': labels, 'ks': ks, 'contaminations': contaminations})
+    trials = [(n, m, f, DEFAULT_PARAMS['random_state'] + s) for n, m, f in grid for s in range(seeds)]
+    workers = max(1, min(workers or default_workers(), len(trials)))
+    try:
+        if workers > 1:
+            method = 'fork' if 'fork' in mp.get_all_start_methods() else None
+            with ProcessPoolExecutor(workers, mp_context=mp.get_context(method)) as pool:
+                results = list(pool.map(_trial, *zip(*trials)))
+        else:
+            results = [_trial(*trial) for trial in trials]
+    finally:
+        _data.clear()
+    rows = []
+    for i, (n, m, f) in enumerate(grid):
+        metrics = _mean(results[i * seeds:(i + 1) * seeds])
+        rows.append({'n_estimators': n, 'max_samples': m, 'features': list(f),
+                     'contamination': operating_point(metrics, contaminations), **metrics})
+    return rows
+
+
+def objective_value(row, objective, k):
+    if objective == 'f1':
+        return row[f"contamination={row['contamination']}"]['f1']
+    if objective == 'precision_at_k':
+        return row[f'precision@{k}']
+    return row['average_precision']
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--payroll', default=PAYROLL)
+    parser.add_argument('--attendance', default=ATTENDANCE)
+    parser.add_argument('--labels', default=None, help='CSV of employee_id,label (default: the HIT files\' injected ghosts)')
+    parser.add_argument('--n-estimators', default=','.join(map(str, N_ESTIMATORS)))
+    parser.add_argument('--max-samples', default=','.join(map(str, MAX_SAMPLES)), help="'auto', row counts or fractions")
+    parser.add_argument('--contamination', default=','.join(map(str, CONTAMINATIONS)))
+    parser.add_argument('--random', type=int, default=None, help='draw this many settings instead of the full grid')
+    parser.add_argument('--seeds', type=int, default=3)
+    parser.add_argument('--k', default=None, help='comma-separated k for precision@k (default: the labelled ghosts)')
+    parser.add_argument('--objective', default='average_precision', choices=OBJECTIVES)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--write-params', action='store_true', help=f'save the best operating point to model/{PARAMS_FILE}')
+    args = parser.parse_args()
+
+    t = time.perf_counter()
+    X, labels, ids, cached = featurize(args.payroll, args.attendance, args.labels)
+    ks = [int(k) for k in args.k.split(',')] if args.k else [int(labels.sum())]
+    print(json.dumps({'dataset': os.path.basename(args.payroll), 'rows': len(X), 'ghosts': int(labels.sum()),
+                      'featurize_cached': cached, 'featurize_s': round(time.perf_counter() - t, 3)}))
+
+    parse = lambda v: 'auto' if v == 'auto' else (float(v) if '.' in v else int(v))  # noqa: E731
+    grid = settings(feature_sets(), [int(n) for n in args.n_estimators.split(',')],
+                    [parse(m) for m in args.max_samples.split(',')], args.random)
+    contaminations = tuple(float(c) for c in args.contamination.split(','))
+    t = time.perf_counter()
+    rows = search(X, labels, grid, args.seeds, ks, contaminations, args.workers)
+    search_s = time.perf_counter() - t
+    rows.sort(key=lambda row: objective_value(row, args.objective, ks[0]), reverse=True)
+    for rank, row in enumerate(rows[:args.top], 1):
+        print(json.dumps({'rank': rank, **row}))
+
+    # The model /analyze serves now, on the same matrix, with its own threshold
+    import main
+    served = main.model_features(main.model)
+    if set(served) <= set(FEATURES):
+        frame = pd.DataFrame(X[:, [FEATURES.index(f) for f in served]], columns=served)
+        shipped = main.model.score_samples(frame)
+        print(json.dumps({'shipped_model': {**evaluate(shipped, labels, ks, ()),
+                                            'predict': flag_metrics(main.model.predict(frame) == -1, labels)}}))
+
+    best = rows[0]
+    params = {'n_estimators': best['n_estimators'], 'max_samples': best['max_samples'],
+              'contamination': best['contamination'], 'random_state': DEFAULT_PARAMS['random_state'],
+              'features': best['features']}
+    print(json.dumps({'best': params, 'objective': args.objective,
+                      'value': round(objective_value(best, args.objective, ks[0]), 4),
+                      'trials': len(grid) * args.seeds, 'search_s': round(search_s, 2)}))
+    if args.write_params:
+        path = os.path.join(BASE_DIR, 'model', PARAMS_FILE)
+        with open(path, 'w') as f:
+            json.dump(params, f, indent=2)
+        print(json.dumps({'written': path}))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,179 @@
+"""
+Score the shared MongoDB ``employees`` collection in place (``POST /score-db``).
+
+The scheduled analysis used to serialize every Employee document to CSV in
+Node, upload it, parse it back here and ``insertMany`` the JSON results. This
+module reads the collection directly instead:
+
+  read_employees   one ``find`` with a projection of the scored fields and a
+                   large ``batch_size``, collected into typed NumPy columns
+  write_scores     ``anomalyScore`` / ``riskLevel`` / ``isGhost`` written back by
+                   ``_id`` with unordered ``bulk_write`` batches, skipping documents
+                   that already hold the values (a re-run of the schedule rewrites
+                   only what changed)
+
+Featurization and chunked scoring live in ``main.score_collection``. From the
+command line (run from ml_service):
+
+  python mongo_scoring.py --uri mongodb://127.0.0.1:27017/rose
+  python mongo_scoring.py --include-terminated --dry-run
+"""
+import argparse
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://127.0.0.1:27017/rose')
+MONGO_DB_NAME = os.environ.get('MONGO_DB_NAME', '')
+COLLECTION = 'employees'
+
+# Employee document field -> EmployeeRecord alias (or reconciliation column)
+TEXT_FIELDS = {'employeeId': 'employee_id', 'fullName': 'name', 'department': 'department', 'email': 'email'}
+NUMERIC_FIELDS = {
+    'salary': 'salary', 'attendanceDays': 'Days_Present', 'biometricLogs': 'biometricLogs',
+    'fingerprintId': 'fingerprint_id',
+}
+SCORE_FIELDS = ('anomalyScore', 'riskLevel', 'isGhost')  # written back; read to skip unchanged documents
+PROJECTION = dict.fromkeys([*TEXT_FIELDS, *NUMERIC_FIELDS, *SCORE_FIELDS], 1)
+REQUIRED = ('employee_id', 'name', 'department', 'salary')  # EmployeeRecord's required fields
+
+BATCH_SIZE = 10_000  # documents per cursor batch
+SCORE_CHUNK = 50_000  # rows per decision_function call
+WRITE_BATCH = 5_000  # updates per bulk_write
+ACTIVE = {'employmentStatus': {'$ne': 'Terminated'}}  # the scheduler's selection
+
+
+@lru_cache(maxsize=1)
+def _client(uri):
+    from pymongo import MongoClient
+    return MongoClient(uri)
+
+
+def employees_collection(uri=None, db_name=None):
+    """``employees`` of the database named in the URI (as Mongoose and the Flask service resolve it)."""
+    from pymongo.uri_parser import parse_uri
+
+    uri = uri or MONGO_URI
+    name = parse_uri(uri).get('database') or db_name or MONGO_DB_NAME or 'test'
+    return _client(uri)[name][COLLECTION]
+
+
+def tenant_collection(tenant, uri=None):
+    """``employees`` of a tenant's own database (named after the tenant) on MONGO_URI's server."""
+    return _client(uri or MONGO_URI)[tenant][COLLECTION]
+
+
+def _numeric(values):
+    try:
+        return np.asarray(values, dtype=np.float64)  # None -> NaN
+    except (TypeError, ValueError):  # a stray string in a numeric field
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(np.float64)
+
+
+def read_employees(collection, query=None, batch_size=BATCH_SIZE):
+    """
+    Documents matching ``query`` as columns. Returns ``(ids, frame, employees, stored)``:
+    the ``_id`` of each scorable row, the rows under the EmployeeRecord aliases
+    (documents missing a required value are left out, as /analyze drops invalid
+    rows), a ``read_employees_export``-shaped frame of every document for
+    reconciliation, and the SCORE_FIELDS values the scorable rows hold now.
+    """
+    columns = {field: [] for field in [*TEXT_FIELDS, *NUMERIC_FIELDS, *SCORE_FIELDS]}
+    ids = []
+    # Major step: one projected cursor, fields appended column by column
+    for doc in collection.find(query or {}, PROJECTION, batch_size=batch_size):
+        ids.append(doc['_id'])
+        get = doc.get
+        for field, values in columns.items():
+            values.append(get(field))
+
+    ids = np.asarray(ids, dtype=object)
+    stored = {field: np.asarray(columns[field], dtype=object) for field in SCORE_FIELDS}
+    frame = pd.DataFrame({
+        **{alias: np.asarray(columns[field], dtype=object) for field, alias in TEXT_FIELDS.items()},
+        'phone_number': np.full(len(ids), np.nan),  # Employee documents carry no phone
+        **{alias: _numeric(columns[field]) for field, alias in NUMERIC_FIELDS.items()},
+    })
+    del columns
+    missing_id = frame['employee_id'].isna().to_numpy()
+    if missing_id.any():
+        frame.loc[missing_id, 'employee_id'] = [str(i) for i in ids[missing_id]]
+    frame['email'] = frame['email'].str.strip().str.lower()
+
+    employees = pd.DataFrame({
+        'employee_id': frame['employee_id'].astype(str).to_numpy(),
+        'email': frame['email'].to_numpy(),
+        'fingerprint_id': frame.pop('fingerprint_id').to_numpy(),
+        'biometric_logs': frame['biometricLogs'].to_numpy(),
+    })
+    valid = frame[list(REQUIRED)].notna().all(axis=1).to_numpy()
+    if not valid.all():
+        ids, frame = ids[valid], frame[valid].reset_index(drop=True)
+        stored = {field: values[valid] for field, values in stored.items()}
+    return ids, frame, employees, stored
+
+
+def write_scores(collection, ids, fields, stored=None, batch_rows=WRITE_BATCH):
+    """
+    ``$set`` ``fields`` (name -> per-row values) on the documents ``ids`` with
+    unordered bulk writes of ``batch_rows`` updates, leaving out documents whose
+    ``stored`` values (``read_employees``) already equal them. Returns matched /
+    modified / unchanged counts and the number of failed updates (a failure
+    does not stop the rest).
+    """
+    from pymongo import UpdateOne
+    from pymongo.errors import BulkWriteError
+
+    names = list(fields)
+    changed = np.ones(len(ids), dtype=bool)
+    if stored is not None:
+        changed[:] = False
+        for name in names:
+            changed |= stored[name] != np.asarray(fields[name], dtype=object)
+    rows = np.flatnonzero(changed)
+    ids = ids[rows]
+    values = [np.asarray(fields[name])[rows].tolist() for name in names]  # BSON needs Python scalars
+    totals = {'matched': 0, 'modified': 0, 'unchanged': len(changed) - len(rows), 'failed': 0}
+    for start in range(0, len(ids), batch_rows):
+        stop = start + batch_rows
+        requests = [
+            UpdateOne({'_id': _id}, {'$set': dict(zip(names, row))})
+            for _id, row in zip(ids[start:stop], zip(*(v[start:stop] for v in values)))
+        ]
+        try:
+            result = collection.bulk_write(requests, ordered=False)
+            totals['matched'] += result.matched_count
+            totals['modified'] += result.modified_count
+        except BulkWriteError as e:
+            totals['matched'] += e.details.get('nMatched', 0)
+            totals['modified'] += e.details.get('nModified', 0)
+            totals['failed'] += len(e.details.get('writeErrors', []))
+    return totals
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--uri', default=MONGO_URI)
+    parser.add_argument('--db', default=None, help='database when the URI names none')
+    parser.add_argument('--include-terminated', action='store_true')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--chunk-rows', type=int, default=SCORE_CHUNK)
+    parser.add_argument('--dry-run', action='store_true', help='score without writing back')
+    args = parser.parse_args()
+
+    import main  # loads the model
+
+    print(json.dumps(main.score_collection(
+        employees_collection(args.uri, args.db),
+        include_terminated=args.include_terminated,
+        batch_size=args.batch_size,
+        chunk_rows=args.chunk_rows,
+        dry_run=args.dry_run,
+    )))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,137 @@
+"""
+Several payroll periods in one request (``POST /analyze/periods``).
+
+Auditors used to upload one payroll / attendance pair to /analyze per month,
+and every call rebuilt collisions, department means and near-duplicate blocks
+from scratch. The multi-period mode stacks every period into one frame with a
+``period`` column instead:
+
+  input        monthly payroll / attendance pairs (labelled by ``periods``, the
+               attendance sheet's Month / Year, or the payroll file name), or
+               one long-format file with a period column
+  features     identity keys once per distinct (name, email, phone), then
+               ``engineer_features(..., by='period')``: each population feature
+               is one grouped pass over all periods, counted within a period
+  scoring      one chunked decision_function and one explanation pass over
+               the distinct feature rows of all periods (an employee unchanged
+               between periods repeats the same row)
+  output       per-period counts and a trajectory per employee: the periods
+               they were paid in, with score, risk and flag in each
+
+History and reconciliation features stay per period (each period has its own
+history window and attendance sheet).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+PERIOD_COLUMNS = ('period', 'pay_period', 'payroll_period')
+RISK_ORDER = {'Low': 0, 'Medium': 1, 'High': 2}
+TRAJECTORY_FIELDS = ['period', 'salary', 'attendanceDays', 'Reconstruction_Error', 'risk', 'isGhost', 'explanation']
+
+
+def month_of(label):
+    """'YYYY-MM' when the period label names a month (e.g. '2025-03', 'March 2025'), else None."""
+    for fmt in ('%Y-%m', '%B %Y', '%b %Y', '%Y-%m-%d'):
+        try:
+            return pd.to_datetime(str(label).strip(), format=fmt).strftime('%Y-%m')
+        except ValueError:
+            continue
+    return None
+
+
+def long_format_periods(df):
+    """
+    Period label of every row of a long-format upload: a PERIOD_COLUMNS column
+    (any case), else Month / Year columns as 'YYYY-MM'. None when neither exists.
+    """
+    for col in df.columns:
+        if str(col).strip().lower() in PERIOD_COLUMNS:
+            return df[col].astype(str).str.strip().where(df[col].notna())
+    if 'Month' in df and 'Year' in df:
+        months = pd.to_datetime(df['Month'].astype(str) + ' ' + df['Year'].astype(str), format='%B %Y', errors='coerce')
+        return months.dt.strftime('%Y-%m').where(months.notna())
+    return None
+
+
+def pair_labels(payroll_names, attendance_months, given=None):
+    """
+    One label per payroll / attendance pair: ``given`` (comma-separated), else
+    the attendance sheet's month, else the payroll file name without extension.
+    """
+    if given:
+        labels = [label.strip() for label in given.split(',')]
+        if len(labels) != len(payroll_names):
+            raise ValueError(f"{len(labels)} periods given for {len(payroll_names)} file pairs.")
+    else:
+        labels = [month or os.path.splitext(os.path.basename(name))[0]
+                  for name, month in zip(payroll_names, attendance_months)]
+    duplicated = sorted({label for label in labels if labels.count(label) > 1})
+    if duplicated:
+        raise ValueError(f"Duplicate period labels: {duplicated}; pass ?periods= to name them.")
+    return labels
+
+
+def period_order(labels):
+    """Distinct labels, chronological when every label names a month, else in upload order."""
+    distinct = list(dict.fromkeys(labels))
+    months = [month_of(label) for label in distinct]
+    if all(months):
+        return [label for _, label in sorted(zip(months, distinct))]
+    return distinct
+
+
+def period_summaries(results, periods, reconciliation):
+    """Row, flag and risk counts per period (one grouped count) with its reconciliation summary."""
+    counts = pd.crosstab(results['period'], results['risk']).reindex(index=periods, columns=list(RISK_ORDER), fill_value=0)
+    ghosts = results.groupby('period')['isGhost'].sum().reindex(periods, fill_value=0)
+    return {
+        period: {
+            'rows': int(counts.loc[period].sum()),
+            'ghostCount': int(ghosts[period]),
+            'highRiskCount': int(counts.loc[period, 'High']),
+            'mediumRiskCount': int(counts.loc[period, 'Medium']),
+            'reconciliation': reconciliation.get(period),
+        }
+        for period in periods
+    }
+
+
+def trajectories(results, periods):
+    """
+    One entry per employee (in order of first appearance) with their rows in
+    period order: ``results`` holds employee_id, name, department and the
+    TRAJECTORY_FIELDS for every scored row.
+    """
+    rank = {period: i for i, period in enumerate(periods)}
+    codes, _ = pd.factorize(results['employee_id'].astype(str))
+    # Major step: one sort by (employee, period); each employee is then a contiguous run
+    order = np.lexsort((results['period'].map(rank).to_numpy(), codes))
+    ordered = results.iloc[order]
+    starts = np.flatnonzero(np.r_[True, codes[order][1:] != codes[order][:-1]])
+    ends = np.r_[starts[1:], len(order)]
+
+    fields = ordered[TRAJECTORY_FIELDS].astype(object)
+    rows = fields.where(fields.notna(), None).to_dict(orient='records')
+    ids = ordered['employee_id'].astype(str).to_numpy()
+    names, departments = ordered['name'].to_numpy(), ordered['department'].to_numpy()
+    ghost = ordered['isGhost'].to_numpy()
+    risk = ordered['risk'].map(RISK_ORDER).to_numpy()
+    levels = list(RISK_ORDER)
+
+    out = []
+    for start, end in zip(starts, ends):
+        seen = [row['period'] for row in rows[start:end]]
+        out.append({
+            'employeeId': ids[start],
+            'name': names[end - 1],
+            'department': departments[end - 1],
+            'periodsPresent': int(end - start),
+            'periodsFlagged': int(ghost[start:end].sum()),
+            'missingPeriods': [p for p in periods if p not in seen],
+            'maxRisk': levels[int(risk[start:end].max())],
+            'riskChanged': bool(risk[start:end].min() != risk[start:end].max()),
+            'trajectory': rows[start:end],
+        })
+    return out
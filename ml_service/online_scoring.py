@@ -0,0 +1,183 @@
+"""
+Per-scan scoring of one employee (``POST /score-scan``) from cached population state.
+
+/analyze and /score-db featurize the whole population at once; an attendance
+scan changes one employee. OnlineScorer keeps what the population-level
+features of engineer_features need, taken from the last full featurization:
+
+  department salary sums and counts   Department_Salary_Variance
+  email / phone value counts          Email_Collision_Count, Phone_Collision_Count
+  every employee's feature row        one float32 matrix, in model column order
+
+A scan moves the employee's old salary / department / email / phone out of
+the aggregates and the new ones in, recomputes the ONLINE_FEATURES of that
+row only and scores it. Other model features (near duplicates, history,
+reconciliation) keep their values from the last refresh. Other employees
+pick up aggregate changes on their own next scan or at the next refresh.
+
+Scoring walks the PathLengthExplainer's flattened trees for the single row:
+the mean path length gives IsolationForest.decision_function exactly, and
+the attributions of the same pass give the explanation.
+"""
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from path_explainer import PathLengthExplainer, _average_path_length
+
+ONLINE_FEATURES = (
+    'salary', 'Email_Collision_Count', 'Phone_Collision_Count',
+    'Department_Salary_Variance', 'Profile_Completeness_Percentage',
+)
+RECORD_FIELDS = ('name', 'department', 'email', 'phone_number', 'salary')  # engineer_features' essential_cols
+
+
+def _present(value):
+    return value is not None and value == value  # not None / NaN
+
+
+class OnlineScorer:
+    """
+    Built from the engineered frame of a full featurization:
+
+        scorer = OnlineScorer(model, features)
+        scorer.load(engineered)
+        result = scorer.score('E0042', salary=4100.0)
+    """
+
+    def __init__(self, model, features):
+        self.features = list(features)
+        self.column = {name: i for i, name in enumerate(self.features)}
+        self.explainer = PathLengthExplainer(model)
+        self.c = float(_average_path_length(model.max_samples_))
+        self.offset = float(model.offset_)
+        self._lock = threading.Lock()  # /score-scan runs in FastAPI's threadpool
+
+        self.rows = {}
+        self.records = {field: [] for field in RECORD_FIELDS}
+        self.X = np.zeros((0, len(self.features)), dtype=np.float32)
+        self.n = 0
+        self.dept_sum = defaultdict(float)
+        self.dept_count = Counter()
+        self.counts = {'email': Counter(), 'phone_number': Counter()}
+        self.low = self.high = 0.0
+
+    def load(self, engineered, scores=None):
+        """
+        Replace the state with ``engineered`` (engineer_features output with the
+        EmployeeRecord columns). ``scores`` (decision_function) give the range
+        ``low``..``high`` an uncalibrated model's anomalyScore is scaled to, as
+        in the batch run; computed when omitted.
+        """
+        X = engineered[self.features].to_numpy(np.float32)
+        if scores is None:
+            scores = self.decision_function(X)
+        with self._lock:
+            ids = engineered['employee_id'].astype(str).tolist()
+            self.rows = dict(zip(ids, range(len(ids))))  # last row wins on duplicate ids
+            self.records = {field: _python_list(engineered[field]) for field in RECORD_FIELDS}
+            self.X, self.n = X, len(X)
+
+            salary = engineered['salary'].to_numpy(np.float64)
+            department = engineered['department'].astype(object)
+            sums = pd.Series(salary).groupby(department.to_numpy()).agg(['sum', 'count'])
+            self.dept_sum = defaultdict(float, sums['sum'].to_dict())
+            self.dept_count = Counter(sums['count'].to_dict())
+            self.counts = {
+                field: Counter(engineered[field].dropna().astype(object).value_counts().to_dict())
+                for field in self.counts
+            }
+            anomaly = -np.asarray(scores, dtype=np.float64)
+            self.low, self.high = (float(anomaly.min()), float(anomaly.max())) if len(anomaly) else (0.0, 0.0)
+
+    def decision_function(self, X):
+        """IsolationForest.decision_function from the explainer's mean path lengths."""
+        return -(2.0 ** (-self.explainer.path_lengths(X) / self.c)) - self.offset
+
+    def __len__(self):
+        return self.n
+
+    def _row(self, employee_id):
+        """Row of ``employee_id``; a new employee gets an empty row."""
+        row = self.rows.get(employee_id)
+        if row is not None:
+            return row
+        if self.n == len(self.X):
+            grown = np.zeros((max(2 * self.n, 1024), len(self.features)), dtype=np.float32)
+            grown[:self.n] = self.X[:self.n]
+            self.X = grown
+        row = self.rows[employee_id] = self.n
+        self.n += 1
+        for values in self.records.values():
+            values.append(None)
+        return row
+
+    def _update(self, row, fields):
+        """Write the scan's fields into the row, moving it between the aggregates."""
+        old = {field: values[row] for field, values in self.records.items()}
+        new = {field: fields[field] if _present(fields.get(field)) else old[field] for field in RECORD_FIELDS}
+        for field in self.counts:
+            if new[field] != old[field]:
+                if _present(old[field]):
+                    self.counts[field][old[field]] -= 1
+                if _present(new[field]):
+                    self.counts[field][new[field]] += 1
+        if (new['department'], new['salary']) != (old['department'], old['salary']):
+            if _present(old['department']) and _present(old['salary']):
+                self.dept_sum[old['department']] -= old['salary']
+                self.dept_count[old['department']] -= 1
+            if _present(new['department']) and _present(new['salary']):
+                self.dept_sum[new['department']] += new['salary']
+                self.dept_count[new['department']] += 1
+        for field, value in new.items():
+            self.records[field][row] = value
+
+    def _features(self, row, fields):
+        """Recompute the row's ONLINE_FEATURES (engineer_features, one row) and any passed feature."""
+        record = {field: values[row] for field, values in self.records.items()}
+        salary, department = record['salary'], record['department']
+        variance = 0.0
+        if _present(salary) and _present(department) and self.dept_count[department] > 0:
+            mean = self.dept_sum[department] / self.dept_count[department]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                variance = np.float64(abs(salary - mean)) / np.float64(mean)
+            variance = 0.0 if variance != variance else variance
+        online = {
+            'salary': salary if _present(salary) else 0.0,
+            'Email_Collision_Count': self.counts['email'][record['email']] if _present(record['email']) else 1.0,
+            'Phone_Collision_Count': (self.counts['phone_number'][record['phone_number']]
+                                      if _present(record['phone_number']) else 1.0),
+            'Department_Salary_Variance': variance,
+            'Profile_Completeness_Percentage': 100 - sum(not _present(v) for v in record.values()) / len(record) * 100,
+        }
+        x = self.X[row]
+        for name in ONLINE_FEATURES:
+            if name in self.column:
+                x[self.column[name]] = online[name]
+        for name, value in fields.items():  # e.g. Days_Present when the model was trained on it
+            if name in self.column and name not in online and _present(value):
+                x[self.column[name]] = value
+        return x.copy()
+
+    def score(self, employee_id, **fields):
+        """
+        Update ``employee_id`` with the scan's ``fields`` (EmployeeRecord aliases;
+        missing ones keep their cached values) and score it. Returns the
+        decision_function value and the row's attributions (negative push
+        toward anomaly).
+        """
+        with self._lock:
+            row = self._row(str(employee_id))
+            self._update(row, fields)
+            x = self._features(row, fields)
+        contributions = self.explainer.contributions(x[None, :])
+        decision = float(-(2.0 ** (-(self.explainer.expected_value + contributions.sum()) / self.c)) - self.offset)
+        return {'decision': decision, 'contributions': contributions}
+
+
+def _python_list(column):
+    """Column values with NaN as None."""
+    values = column.astype(object).tolist()
+    return [v if _present(v) else None for v in values]
@@ -0,0 +1,164 @@
+"""
+Partitioned, multi-process featurization and scoring for very large uploads.
+
+The validated frame is split into shards, either whole departments packed into
+roughly equal row counts (``department``) or plain row ranges (``rows``).
+Rows are reordered so every shard is one contiguous range, then two map stages
+run in a process pool:
+
+  1. identity_keys per shard      the row-local, Python-heavy part of
+                                  engineer_features (identity_matching.py)
+  2. decision_function per shard  on the feature matrix
+
+Workers never receive a DataFrame: with the ``fork`` start method they read the
+parent's columns directly, and the feature matrix and the scores live in
+``multiprocessing.shared_memory`` buffers that each shard reads / writes at its
+own offset. Global reductions (collision counts, department means, near-duplicate
+blocking) stay in the parent. Each shard owns a fixed slice of the output, so
+the merged result does not depend on worker count or completion order.
+"""
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from identity_matching import combine_identity_keys, identity_keys
+
+PARTITIONS = ('department', 'rows')
+PARALLEL_MIN_ROWS = int(os.environ.get('PARALLEL_MIN_ROWS', 200_000))
+SHARDS_PER_WORKER = 4  # smaller shards even out departments of different sizes
+
+# Set in the parent before the pool forks; workers inherit them without pickling
+_columns = {}
+_model = None
+
+
+def default_workers():
+    return int(os.environ.get('SCORING_WORKERS', os.cpu_count() or 1))
+
+
+def plan_shards(df, n_shards, partition='department'):
+    """
+    Row order and shard bounds: ``order`` lists the row positions shard by shard,
+    ``bounds`` the [start, end) of each shard in that order. A department is never
+    split across shards.
+    """
+    n = len(df)
+    if partition not in PARTITIONS:
+        raise ValueError(f"partition must be one of {PARTITIONS}")
+    if partition == 'rows' or 'department' not in df:
+        order = np.arange(n)
+        edges = np.linspace(0, n, n_shards + 1).astype(np.int64)
+        return order, list(zip(edges[:-1], edges[1:]))
+
+    codes, _ = pd.factorize(df['department'].astype(str), sort=True)
+    order = np.argsort(codes, kind='stable')
+    sizes = np.bincount(codes)
+    # Close a shard at the first department boundary past each equal-size target
+    ends = np.cumsum(sizes)
+    targets = np.arange(1, n_shards) * n / n_shards
+    cuts = np.unique(ends[np.minimum(np.searchsorted(ends, targets), len(ends) - 1)])
+    edges = np.r_[0, cuts[cuts < n], n]
+    return order, list(zip(edges[:-1], edges[1:]))
+
+
+def _keys_shard(start, end):
+    c = _columns
+    return identity_keys(c['name'][start:end], c['email'][start:end], c['phone_number'][start:end])
+
+
+def _score_shard(x_name, out_name, shape, start, end):
+    x_shm = shared_memory.SharedMemory(name=x_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    try:
+        X = np.ndarray(shape, dtype=np.float64, buffer=x_shm.buf)
+        out = np.ndarray(shape[0], dtype=np.float64, buffer=out_shm.buf)
+        frame = pd.DataFrame(X[start:end], columns=_columns['features'], copy=False)
+        out[start:end] = _model.decision_function(frame)
+    finally:
+        x_shm.close()
+        out_shm.close()
+    return end - start
+
+
+class PartitionedScorer:
+    """
+    One process pool per request, shared by the featurization and scoring stages:
+
+        with PartitionedScorer(workers, 'department').session(valid_df, model) as run:
+            keys = run.identity_keys()
+            ... engineer_features(valid_df, identity=keys) ...
+            scores = run.decision_function(X)
+    """
+
+    def __init__(self, workers=None, partition='department'):
+        self.workers = max(1, workers or default_workers())
+        self.partition = partition
+
+    @contextmanager
+    def session(self, df, model, features):
+        global _model
+        order, bounds = plan_shards(df, self.workers * SHARDS_PER_WORKER, self.partition)
+        _columns.clear()
+        _columns.update({
+            col: df[col].to_numpy(dtype=object)[order]
+            for col in ('name', 'email', 'phone_number')
+        })
+        _columns['features'] = list(features)
+        _model = model
+        pool = None
+        if self.workers > 1:
+            method = 'fork' if 'fork' in mp.get_all_start_methods() else None
+            pool = ProcessPoolExecutor(self.workers, mp_context=mp.get_context(method))
+        try:
+            yield _Session(pool, order, bounds)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            _columns.clear()
+            _model = None
+
+
+class _Session:
+    def __init__(self, pool, order, bounds):
+        self.pool = pool
+        self.order = order
+        self.bounds = bounds
+        self.inverse = np.empty_like(order)
+        self.inverse[order] = np.arange(len(order))
+
+    def _map(self, fn, *args):
+        calls = [args + (start, end) for start, end in self.bounds]
+        if self.pool is None:
+            return [fn(*call) for call in calls]
+        return list(self.pool.map(fn, *zip(*calls)))
+
+    def identity_keys(self):
+        """``identity_keys`` of every row, in the frame's original row order."""
+        keys = combine_identity_keys(self._map(_keys_shard))
+        return {
+            k: v[self.inverse] for k, v in keys.items()
+        }
+
+    def decision_function(self, X):
+        """Model decision_function for every row of ``X`` (original order)."""
+        X = np.asarray(X, dtype=np.float64)
+        n = len(X)
+        x_shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+        out_shm = shared_memory.SharedMemory(create=True, size=max(n * 8, 1))
+        try:
+            # Major step: write rows in shard order once; shards then read contiguous slices
+            shared_x = np.ndarray(X.shape, dtype=np.float64, buffer=x_shm.buf)
+            np.take(X, self.order, axis=0, out=shared_x)
+            self._map(_score_shard, x_shm.name, out_shm.name, X.shape)
+            scores = np.ndarray(n, dtype=np.float64, buffer=out_shm.buf)[self.inverse].copy()
+        finally:
+            x_shm.close()
+            x_shm.unlink()
+            out_shm.close()
+            out_shm.unlink()
+        return scores
@@ -0,0 +1,172 @@
+"""
+Cross-source reconciliation between the payroll upload, the attendance upload,
+a bulk export of the Mongo ``employees`` collection and the ``histories`` store.
+
+Ghost employees tend to show up as holes between the sources rather than as odd
+values inside one of them. The ids of all sources are hashed once into shared
+integer codes (one ``pd.factorize``); presence and values per source are then
+scattered into code-indexed arrays and gathered for every payroll row:
+
+  No_Attendance_Record       payroll row with no row in the attendance upload
+  Not_Enrolled               no employees document, or one without a fingerprintId
+  Attendance_Without_Scans   attendance days reported but biometricLogs == 0
+  History_Days_Mismatch      |Days_Present - present days in histories| for the period
+
+A feature whose source was not supplied stays 0 and is not listed in
+``summary['sources']``. The summary also carries the reverse set differences
+(attendance rows and enrolled employees that are not on the payroll).
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+RECONCILIATION_FEATURES = [
+    'No_Attendance_Record', 'Not_Enrolled', 'Attendance_Without_Scans', 'History_Days_Mismatch',
+]
+
+EMPLOYEE_ID_COLUMNS = ('employeeId', 'employee_id', 'Employee_ID')
+SAMPLE_IDS = 20  # ids listed per set difference in the summary
+
+
+def _ids(values):
+    """Ids as strings, so 101 in one file matches '101' in another."""
+    values = pd.Series(values, copy=False)
+    if not pd.api.types.is_string_dtype(values):
+        values = values.astype(str)
+    return values.to_numpy()
+
+
+def read_employees_export(contents, filename):
+    """
+    Parse a mongoexport of ``employees`` (CSV, JSON array or JSON lines) into
+    ``employee_id``, ``email``, ``fingerprint_id`` and ``biometric_logs`` columns.
+    """
+    name = filename.lower()
+    if name.endswith('.json') or name.endswith('.jsonl'):
+        df = pd.read_json(io.BytesIO(contents), lines=not contents.lstrip().startswith(b'['))
+    elif name.endswith('.xlsx') or name.endswith('.xls'):
+        df = pd.read_excel(io.BytesIO(contents))
+    else:
+        df = pd.read_csv(io.BytesIO(contents))
+
+    id_col = next((c for c in EMPLOYEE_ID_COLUMNS if c in df.columns), None)
+    if id_col is None:
+        raise ValueError(f"Employees export needs one of {EMPLOYEE_ID_COLUMNS}")
+
+    def column(name):
+        return df[name] if name in df.columns else pd.Series(np.nan, index=df.index)
+
+    return pd.DataFrame({
+        'employee_id': df[id_col].astype(str).str.strip().to_numpy(),
+        'email': column('email').astype(str).str.strip().str.lower().where(column('email').notna()).to_numpy(),
+        'fingerprint_id': pd.to_numeric(column('fingerprintId'), errors='coerce').to_numpy(),
+        'biometric_logs': pd.to_numeric(column('biometricLogs'), errors='coerce').to_numpy(),
+    })
+
+
+def attendance_period(df_attendance):
+    """'YYYY-MM' of the attendance sheet from its Month / Year columns, or None."""
+    if df_attendance is None or 'Month' not in df_attendance or 'Year' not in df_attendance:
+        return None
+    periods = pd.to_datetime(
+        df_attendance['Month'].astype(str) + ' ' + df_attendance['Year'].astype(str),
+        format='%B %Y', errors='coerce',
+    ).dropna()
+    return periods.max().strftime('%Y-%m') if len(periods) else None
+
+
+def _sample(index):
+    return [str(v) for v in index[:SAMPLE_IDS]]
+
+
+def reconcile(df, attendance_ids=None, employees=None, history_days=None):
+    """
+    Reconciliation features for each row of ``df`` (needs ``employee_id``; uses
+    ``email`` and ``Days_Present`` when present) and a summary dict.
+
+    ``attendance_ids``  employee ids of the attendance upload
+    ``employees``       ``read_employees_export`` frame
+    ``history_days``    present days per employee id for the attendance period
+    """
+    sources = {'payroll': _ids(df['employee_id'])}
+    if attendance_ids is not None:
+        sources['attendance'] = _ids(attendance_ids)
+    if employees is not None:
+        sources['employees'] = _ids(employees['employee_id'])
+    if history_days is not None and len(history_days):
+        sources['histories'] = _ids(history_days.index)
+
+    # Major step: one hash pass maps every id of every source to a shared integer code
+    codes, uniques = pd.factorize(np.concatenate(list(sources.values())))
+    bounds = np.cumsum([0] + [len(v) for v in sources.values()])
+    code = {name: codes[bounds[i]:bounds[i + 1]] for i, name in enumerate(sources)}
+    k = len(uniques)
+
+    pay = code['payroll']
+    n = len(pay)
+    on_payroll = np.zeros(k, dtype=bool)
+    on_payroll[pay] = True
+    days = pd.to_numeric(df.get('Days_Present', pd.Series(np.nan, index=df.index)), errors='coerce').to_numpy()
+    out = pd.DataFrame({name: np.zeros(n) for name in RECONCILIATION_FEATURES}, index=df.index)
+    repeats = np.bincount(pay, minlength=k)
+    summary = {
+        'sources': [name for name in sources if name != 'payroll'],
+        'payroll_rows': n,
+        'duplicate_payroll_ids': _sample(uniques[np.flatnonzero(repeats > 1)]),
+    }
+
+    if 'attendance' in code:
+        has_row = np.zeros(k, dtype=bool)
+        has_row[code['attendance']] = True
+        out['No_Attendance_Record'] = (~has_row[pay]).astype(float)
+        orphans = np.flatnonzero(has_row & ~on_payroll)
+        summary['attendance_not_on_payroll'] = {'count': len(orphans), 'ids': _sample(uniques[orphans])}
+
+    if 'employees' in code:
+        doc = np.full(k, -1)
+        doc[code['employees']] = np.arange(len(employees))  # last document wins on duplicate ids
+        pos = doc[pay]
+        # Flask enrollments key employees by a hash of the email; fall back to the email
+        missing = np.flatnonzero(pos < 0)
+        if len(missing) and 'email' in df:
+            wanted = df['email'].iloc[missing].astype(str).str.strip().str.lower().to_numpy()
+            emails = employees['email'].to_numpy()
+            known = np.flatnonzero(pd.notna(emails))
+            by_email = pd.Index(emails[known])
+            keep = ~by_email.duplicated(keep='last')
+            hit = by_email[keep].get_indexer(wanted)
+            pos[missing[hit >= 0]] = known[keep][hit[hit >= 0]]
+        found = pos >= 0
+        fingerprint = np.where(found, employees['fingerprint_id'].to_numpy()[pos], np.nan)
+        logs = np.where(found, employees['biometric_logs'].to_numpy()[pos], np.nan)
+        out['Not_Enrolled'] = np.isnan(fingerprint).astype(float)
+        out['Attendance_Without_Scans'] = ((np.nan_to_num(days) > 0) & ~np.isnan(fingerprint)
+                                           & (np.nan_to_num(logs) == 0)).astype(float)
+        matched = np.zeros(len(employees), dtype=bool)
+        matched[pos[found]] = True
+        off_payroll = ~matched & employees['fingerprint_id'].notna().to_numpy()
+        off_ids = employees['employee_id'].to_numpy()[off_payroll]
+        summary['enrolled_not_on_payroll'] = {'count': int(off_payroll.sum()), 'ids': _sample(off_ids)}
+
+    if 'histories' in code:
+        present = np.zeros(k)
+        present[code['histories']] = history_days.to_numpy()
+        hist = present[pay]
+        out['History_Days_Mismatch'] = np.where(np.isnan(days), 0, np.abs(np.nan_to_num(days) - hist))
+        out['History_Present_Days'] = hist
+
+    for name in ('No_Attendance_Record', 'Not_Enrolled', 'Attendance_Without_Scans'):
+        summary[name] = int(out[name].sum())
+    summary['History_Days_Mismatch'] = int((out['History_Days_Mismatch'] > 0).sum())
+    return out, summary
+
+
+def add_reconciliation_features(df, attendance_ids=None, employees=None, history_days=None, inplace=False):
+    """``df`` with the reconciliation columns added (to ``df`` itself with ``inplace``), and the summary."""
+    features, summary = reconcile(df, attendance_ids, employees, history_days)
+    if not inplace:
+        return pd.concat([df, features], axis=1), summary
+    for name in features:
+        df[name] = features[name].to_numpy()
+    return df, summary
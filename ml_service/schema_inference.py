@@ -0,0 +1,262 @@
+"""
+Column mapping and dtypes of uploaded payroll / attendance files, cached by header row.
+
+/analyze used to parse every column of an upload with full type inference,
+look for the ID column twice and run the substring rules over every merged
+column on each call. An HR system exports the same header row month after
+month, so the mapping is resolved once per format:
+
+  signature    hash of the header row (names and order)
+  mapping      header -> EmployeeRecord alias: user overrides first, then the
+               header rules (ALIASES_BY_NAME, then substring rules), then the
+               values of the sample for email / phone columns the rules miss
+  ambiguous    aliases several headers match (e.g. Basic_ / Gross_ / Net_Salary):
+               the last of them is used, as the old rename-then-to_dict path
+               did, unless an override names one; the ID follows ID_COLUMNS
+  dtypes       explicit dtypes from the first SAMPLE_ROWS rows: float64 for
+               numeric columns whose sample is all numbers, str for text
+               columns whose sample is text (numeric IDs keep pandas' inference)
+  usecols      mapped columns plus Month / Year and period columns; every
+               other column is never parsed
+
+A cached format only costs the header row before the full parse. Resolved
+formats persist in ``feature_store/schemas.json`` with the overrides
+(``POST /schemas/overrides``), which name an alias (or null to ignore the
+column) per header of one format and survive ``DELETE /schemas/{signature}``.
+A full parse the pinned dtypes reject falls back to inference and unpins them.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from multi_period import PERIOD_COLUMNS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(BASE_DIR, 'feature_store', 'schemas.json')
+
+SAMPLE_ROWS = 1000
+MAX_FORMATS = 256  # oldest resolved formats are dropped first; overrides are kept
+SCHEMA_VERSION = 2  # cached formats resolved by other rules are resolved again
+
+TEXT_ALIASES = ('employee_id', 'name', 'department', 'email', 'phone_number')
+NUMERIC_ALIASES = ('salary', 'Days_Present', 'biometricLogs')
+PASSTHROUGH = ('Month', 'Year')  # attendance period (reconciliation.attendance_period)
+ALIASES = TEXT_ALIASES + NUMERIC_ALIASES + PASSTHROUGH + PERIOD_COLUMNS
+
+ID_COLUMNS = ('employee_id', 'Employee_ID', 'id', 'ID')  # preferred ID header when several match
+ALIASES_BY_NAME = {
+    'employee_id': ('employee_id', 'employeeid', 'employee id', 'id'),
+    'name': ('name', 'full_name', 'full name', 'employee_name', 'employee name'),
+    'department': ('department', 'dept'),
+}
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+PHONE_PATTERN = re.compile(r'^\+?[\d\s().-]{7,20}(\s*(x|ext\.?)\s*\d{1,6})?$', re.IGNORECASE)
+SNIFF_SHARE = 0.9  # share of a column's sample values that must look like emails / phones
+
+
+def header_alias(header):
+    """EmployeeRecord alias of one header by name (e.g. 'Monthly_Salary' -> 'salary'), or None."""
+    key = str(header).strip()
+    key_lower = key.lower()
+    for alias, names in ALIASES_BY_NAME.items():
+        if key_lower in names:
+            return alias
+    if 'email' in key_lower:
+        return 'email'
+    if 'phone' in key_lower or 'telephone' in key_lower:
+        return 'phone_number'
+    if 'salary' in key_lower:
+        return 'salary'
+    if 'biometric' in key_lower:
+        return 'biometricLogs'
+    if 'days_present' in key_lower or ('days' in key_lower and 'present' in key_lower) or key_lower == 'days':
+        return 'Days_Present'
+    if key in PASSTHROUGH:
+        return key
+    if key_lower in PERIOD_COLUMNS:
+        return key_lower
+    return None
+
+
+def signature(headers):
+    """Fingerprint of a header row: names and order."""
+    return hashlib.sha1(json.dumps([str(h) for h in headers]).encode()).hexdigest()[:16]
+
+
+def _sniff(values):
+    """'email' / 'phone_number' when nearly every sample value looks like one, else None."""
+    text = values.dropna().astype(str).str.strip()
+    if len(text) == 0:
+        return None
+    if text.str.match(EMAIL_PATTERN).mean() >= SNIFF_SHARE:
+        return 'email'
+    if text.str.match(PHONE_PATTERN).mean() >= SNIFF_SHARE and text.str.count(r'\d').between(7, 15).mean() >= SNIFF_SHARE:
+        return 'phone_number'
+    return None
+
+
+def resolve(headers, sample=None, override=None):
+    """
+    Mapping (header -> alias, one header per alias) and pinned dtypes of one
+    header row. ``sample`` holds the first rows for dtype inference and value
+    sniffing; ``override`` maps headers to an alias or None (ignored).
+    """
+    override = override or {}
+    candidates = {}
+    for header in headers:
+        alias = override[header] if header in override else header_alias(header)
+        if alias is not None:
+            candidates.setdefault(alias, []).append(header)
+    mapping, ambiguous = {}, {}
+    for alias, found in candidates.items():
+        chosen = [h for h in found if override.get(h) == alias] or found
+        if len(chosen) > 1:
+            ambiguous[alias] = [str(h) for h in found]
+        if alias == 'employee_id' and chosen is found:
+            header = sorted(found, key=lambda h: ID_COLUMNS.index(h) if h in ID_COLUMNS else len(ID_COLUMNS))[0]
+        else:
+            header = chosen[-1]
+        mapping[header] = alias
+
+    sniffed = []
+    if sample is not None:
+        for header in headers:
+            if header in mapping or header in override:
+                continue
+            alias = _sniff(sample[header]) if sample[header].dtype.kind not in 'biufcb' else None
+            if alias is not None and alias not in mapping.values():
+                mapping[header] = alias
+                sniffed.append(header)
+
+    dtypes = {}
+    if sample is not None:
+        for header, alias in mapping.items():
+            values = sample[header]
+            if alias in NUMERIC_ALIASES and pd.to_numeric(values, errors='coerce').notna().sum() == values.notna().sum():
+                dtypes[header] = 'float64'
+            elif alias in TEXT_ALIASES and not pd.api.types.is_numeric_dtype(values):
+                dtypes[header] = 'str'
+    return {
+        'headers': [str(h) for h in headers],
+        'mapping': mapping,
+        'dtypes': dtypes,
+        'sniffed': sniffed,
+        'ambiguous': {alias: {'headers': found, 'used': next(h for h, a in mapping.items() if a == alias)}
+                      for alias, found in ambiguous.items()},
+        'unmapped': [str(h) for h in headers if h not in mapping],
+        'version': SCHEMA_VERSION,
+    }
+
+
+def _reader(filename):
+    name = filename.lower()
+    return pd.read_excel if name.endswith('.xlsx') or name.endswith('.xls') else pd.read_csv
+
+
+class SchemaCache:
+    """
+    Resolved formats and user overrides by header signature:
+
+        frame = schemas.read(contents, 'payroll.csv')   # columns renamed to aliases
+        schemas.set_override(headers, {'Staff No': 'employee_id', 'Notes': None})
+    """
+
+    def __init__(self, path=SCHEMA_PATH):
+        self.path = path
+        self.formats, self.overrides = {}, {}
+        self.hits = self.misses = self.fallbacks = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.formats, self.overrides = data.get('formats', {}), data.get('overrides', {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'formats': self.formats, 'overrides': self.overrides}, f)
+        os.replace(tmp, self.path)
+
+    def schema(self, headers, sample_fn):
+        """The cached schema of a header row, resolved from ``sample_fn()`` on a miss."""
+        key = signature(headers)
+        with self._lock:
+            cached = self.formats.get(key)
+            if cached is not None and cached.get('version') == SCHEMA_VERSION:
+                self.hits += 1
+                return key, cached
+            self.misses += 1
+        override = self.overrides.get(key, {}).get('mapping')
+        schema = {**resolve(headers, sample_fn(), override), 'overridden': override is not None, 'created': time.time()}
+        with self._lock:
+            self.formats[key] = schema
+            for old in sorted(self.formats, key=lambda k: self.formats[k]['created'])[:-MAX_FORMATS]:
+                del self.formats[old]
+            self.save()
+        return key, schema
+
+    def read(self, contents, filename, text_dtypes=None):
+        """
+        An uploaded CSV or Excel file with only its mapped columns, renamed to
+        the aliases. ``text_dtypes`` (alias -> dtype) replaces the pinned
+        ``str`` of those columns, e.g. a categorical department.
+        """
+        reader = _reader(filename)
+        headers = list(reader(io.BytesIO(contents), nrows=0).columns)
+        key, schema = self.schema(headers, lambda: reader(io.BytesIO(contents), nrows=SAMPLE_ROWS))
+        mapping = schema['mapping']
+        # Major step: parse only the mapped columns, with the dtypes pinned from the sample
+        usecols = [h for h in headers if h in mapping]
+        dtypes = {h: (text_dtypes or {}).get(mapping[h], dtype) if dtype == 'str' else dtype
+                  for h, dtype in schema['dtypes'].items()}
+        try:
+            df = reader(io.BytesIO(contents), usecols=usecols, dtype=dtypes or None)
+        except (ValueError, TypeError):
+            # A value past the sample breaks a pinned dtype: infer this file, unpin the format
+            df = reader(io.BytesIO(contents), usecols=usecols)
+            with self._lock:
+                self.fallbacks += 1
+                schema['dtypes'] = {}
+                self.save()
+        return df.rename(columns=mapping)
+
+    def set_override(self, headers, mapping):
+        """Store a user-confirmed mapping for one header row; its cached schema is resolved again."""
+        unknown = sorted({str(alias) for alias in mapping.values() if alias is not None and alias not in ALIASES})
+        if unknown:
+            raise ValueError(f"Unknown aliases {unknown}; expected one of {list(ALIASES)} or null.")
+        missing = sorted(set(mapping) - set(headers))
+        if missing:
+            raise ValueError(f"Headers {missing} are not in the header row.")
+        key = signature(headers)
+        with self._lock:
+            self.overrides[key] = {'headers': list(headers), 'mapping': dict(mapping)}
+            self.formats.pop(key, None)
+            self.save()
+        return key
+
+    def forget(self, key):
+        """Drop a cached schema (its override, if any, applies on the next upload)."""
+        with self._lock:
+            found = self.formats.pop(key, None) is not None
+            if found:
+                self.save()
+        return found
+
+    def summary(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'fallbacks': self.fallbacks,
+            'formats': [{'signature': key, **{k: v for k, v in schema.items() if k != 'created'}}
+                        for key, schema in self.formats.items()],
+            'overrides': [{'signature': key, **override} for key, override in self.overrides.items()],
+        }
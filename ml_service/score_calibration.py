@@ -0,0 +1,152 @@
+"""
+Score-to-percentile calibration and risk thresholds saved with the model.
+
+/analyze used to min-max the anomaly scores of each upload into
+Reconstruction_Error and cut risk at fixed decision_function values, so the
+same employee scored differently depending on who else was in the file.
+train_model now saves, next to the model (``model/score_calibration.json``):
+
+  knots        anomaly scores (negated decision_function) of the training
+               data at KNOTS evenly spaced percentiles
+  quantiles    training percentiles above which a row is Medium / High risk
+               (RISK_QUANTILES, or ``train_and_save_model(risk_quantiles=)``)
+
+Serving maps each score to its training percentile (the share of training
+scores at or below it) by binary search over the knots, linear between
+neighbours, and compares that with the quantiles: a row's anomalyScore and
+risk depend on that row only. RISK_QUANTILES set at serving time overrides
+the saved quantiles without retraining.
+
+A model trained before this has no calibration file; calibrate it against a
+representative file without retraining (run from ml_service):
+
+  python score_calibration.py --data payroll.csv
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CALIBRATION_PATH = os.path.join(BASE_DIR, 'model', 'score_calibration.json')
+
+KNOTS = 1001  # percentiles 0.0, 0.1, ..., 100.0
+RISK_LEVELS = ('Medium', 'High')
+DEFAULT_RISK_QUANTILES = {'Medium': 0.95, 'High': 0.99}  # Medium matches the model's 5% contamination
+
+
+def parse_risk_quantiles(text):
+    """``'Medium=0.95,High=0.99'`` -> ``{'Medium': 0.95, 'High': 0.99}``."""
+    quantiles = dict(DEFAULT_RISK_QUANTILES)
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        level, _, value = item.partition('=')
+        if level.strip() not in RISK_LEVELS:
+            raise ValueError(f"Unknown risk level {level!r} in RISK_QUANTILES (expected {RISK_LEVELS})")
+        quantiles[level.strip()] = float(value)
+    if not 0 < quantiles['Medium'] <= quantiles['High'] < 1:
+        raise ValueError(f"RISK_QUANTILES must satisfy 0 < Medium <= High < 1, got {quantiles}")
+    return quantiles
+
+
+# RISK_QUANTILES="Medium=0.95,High=0.99" sets the risk cutoffs as training percentiles
+RISK_QUANTILES = parse_risk_quantiles(os.environ.get('RISK_QUANTILES'))
+
+
+class ScoreCalibration:
+    """
+    Percentile lookup over the training anomaly scores:
+
+        calibration = ScoreCalibration.fit(-model.decision_function(X_train))
+        calibration.percentiles(-model.decision_function(X))   # 0..1
+        calibration.risk_levels(-model.decision_function(X))   # Low / Medium / High
+    """
+
+    def __init__(self, knots, quantiles, rows):
+        self.knots = np.asarray(knots, dtype=np.float64)
+        self.levels = np.linspace(0.0, 1.0, len(self.knots))
+        self.quantiles = dict(quantiles)
+        self.rows = rows
+
+    @classmethod
+    def fit(cls, anomaly_score, risk_quantiles=None, knots=KNOTS):
+        anomaly_score = np.asarray(anomaly_score, dtype=np.float64)
+        anomaly_score = anomaly_score[np.isfinite(anomaly_score)]
+        if not len(anomaly_score):
+            raise ValueError("No scores to calibrate on.")
+        knots = np.quantile(anomaly_score, np.linspace(0.0, 1.0, knots))
+        return cls(knots, risk_quantiles or RISK_QUANTILES, len(anomaly_score))
+
+    def percentiles(self, anomaly_score):
+        """
+        Training percentile (0..1) of each anomaly score: binary search, then
+        linear within the knot interval. A score tied with a run of knots maps
+        to the top of the run, so the highest training score maps to 1.
+        """
+        anomaly_score = np.asarray(anomaly_score, dtype=np.float64)
+        knots, levels = self.knots, self.levels
+        i = np.clip(np.searchsorted(knots, anomaly_score, side='right'), 1, len(knots) - 1)
+        lo, hi = knots[i - 1], knots[i]
+        width = hi - lo
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.where(width > 0, (anomaly_score - lo) / width, 1.0)
+        return np.clip(levels[i - 1] + frac * (levels[i] - levels[i - 1]), 0.0, 1.0)
+
+    def risk_levels(self, anomaly_score=None, percentiles=None):
+        """Low / Medium / High of each score (or of its ``percentiles`` when already mapped)."""
+        if percentiles is None:
+            percentiles = self.percentiles(anomaly_score)
+        return np.select(
+            [percentiles > self.quantiles['High'], percentiles > self.quantiles['Medium']],
+            ['High', 'Medium'], 'Low')
+
+    def save(self, path=CALIBRATION_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'rows': self.rows, 'quantiles': self.quantiles, 'knots': self.knots.tolist()}, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=CALIBRATION_PATH):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['knots'], data['quantiles'], data['rows'])
+
+
+def load_calibration(path=CALIBRATION_PATH, risk_quantiles=None):
+    """
+    The saved calibration, or None for a model trained without one.
+    ``risk_quantiles`` (default: RISK_QUANTILES when set in the environment)
+    replace the saved quantiles.
+    """
+    if not os.path.exists(path):
+        return None
+    calibration = ScoreCalibration.load(path)
+    if risk_quantiles is None and os.environ.get('RISK_QUANTILES'):
+        risk_quantiles = RISK_QUANTILES
+    if risk_quantiles is not None:
+        calibration.quantiles = dict(risk_quantiles)
+    return calibration
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--data', required=True, help='CSV with the EmployeeRecord columns')
+    parser.add_argument('--risk-quantiles', default=None, help="e.g. 'Medium=0.95,High=0.99'")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    import main  # loads the model
+
+    df = pd.read_csv(args.data)
+    engineered, _ = main.featurize_frame(df)
+    scores = main.model.decision_function(engineered[main.model_features(main.model)])
+    calibration = ScoreCalibration.fit(-scores, parse_risk_quantiles(args.risk_quantiles) if args.risk_quantiles else None)
+    calibration.save()
+    print(json.dumps({'rows': calibration.rows, 'quantiles': calibration.quantiles, 'path': CALIBRATION_PATH}))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Stability and cost of the saved score calibration (score_calibration.py).
+
+Calibrates the loaded model on --rows synthetic payroll rows (as train_model
+does on its training data), then scores a fixed panel of --panel employees
+inside --uploads uploads that mix them with different other rows (sizes,
+department counts, and in every other upload a share of rows with shared
+contacts):
+
+  spread        largest difference in one employee's Reconstruction_Error /
+                risk across the uploads: calibrated lookup vs the per-upload
+                min-max and fixed cutoffs it replaces. The panel's decision
+                scores are held fixed, so only the score mapping varies
+                (population features shift them too; that is not this change)
+  percentile    calibrated percentile against the exact share of held-out
+                scores from the same distribution at or below each (max abs error)
+  risk_share    share of held-out rows per risk level against the configured
+                quantiles
+  map_us        mapping --map-rows scores: binary search over the knots vs
+                min-max (which needs the whole upload first)
+
+Run from ml_service:
+  python scripts/bench_calibration.py --rows 100000 --panel 1000 --uploads 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+warnings.filterwarnings('ignore')
+
+import main  # noqa: E402
+from bench_parallel_scoring import payroll  # noqa: E402
+from score_calibration import ScoreCalibration  # noqa: E402
+
+
+def anomaly_scores(df):
+    engineered = main.engineer_features(df)
+    return -main.model.decision_function(engineered[main.model_features(main.model)])
+
+
+def legacy(anomaly_score):
+    low, high = anomaly_score.min(), anomaly_score.max()
+    error = (anomaly_score - low) / (high - low) if high > low else np.zeros(len(anomaly_score))
+    risk = np.select([anomaly_score > 0.05, anomaly_score > 0], ['High', 'Medium'], 'Low')
+    return error, risk
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--departments', type=int, default=60)
+    parser.add_argument('--panel', type=int, default=1_000)
+    parser.add_argument('--uploads', type=int, default=10)
+    parser.add_argument('--map-rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    t = time.perf_counter()
+    calibration = ScoreCalibration.fit(anomaly_scores(payroll(args.rows, args.departments, seed=100)))
+    print(json.dumps({'calibration_rows': calibration.rows, 'fit_s': round(time.perf_counter() - t, 2),
+                      'quantiles': calibration.quantiles}))
+
+    # The panel's scores stay fixed; the rest of each upload is other employees
+    anomaly = anomaly_scores(payroll(args.panel, args.departments, seed=7))
+    errors = {'calibrated': [], 'legacy': []}
+    risks = {'calibrated': [], 'legacy': []}
+    for u in range(args.uploads):
+        rng = np.random.default_rng(u)
+        others = payroll(int(rng.integers(args.panel, 20 * args.panel)), int(rng.integers(5, 2 * args.departments)), seed=u)
+        if u % 2:  # some uploads carry ghost-like rows sharing contacts, which move the upload's range
+            shared = rng.random(len(others)) < rng.uniform(0.01, 0.1)
+            others.loc[shared, ['email', 'phone_number']] = others[['email', 'phone_number']].to_numpy()[0]
+        error, risk = legacy(np.concatenate([anomaly, anomaly_scores(others)]))
+        errors['legacy'].append(error[:args.panel])
+        risks['legacy'].append(risk[:args.panel])
+        errors['calibrated'].append(calibration.percentiles(anomaly))
+        risks['calibrated'].append(calibration.risk_levels(anomaly))
+    spread = {}
+    for name in errors:
+        e, r = np.array(errors[name]), np.array(risks[name])
+        spread[name] = {
+            'error_spread_max': round(float((e.max(axis=0) - e.min(axis=0)).max()), 4),
+            'error_spread_mean': round(float((e.max(axis=0) - e.min(axis=0)).mean()), 4),
+            'risk_changes': int((r != r[0]).any(axis=0).sum()),
+        }
+    print(json.dumps({'panel': args.panel, 'uploads': args.uploads, 'spread': spread}))
+
+    held_out = anomaly_scores(payroll(args.rows, args.departments, seed=200))
+    exact = np.searchsorted(np.sort(held_out), held_out, side='right') / len(held_out)
+    risk = calibration.risk_levels(held_out)
+    print(json.dumps({
+        'percentile_max_abs_error': round(float(np.abs(calibration.percentiles(held_out) - exact).max()), 4),
+        'risk_share': {level: round(float((risk == level).mean()), 4) for level in ('Low', 'Medium', 'High')},
+    }))
+
+    values = np.random.default_rng(3).choice(held_out, args.map_rows)
+    timings = {}
+    for name, fn in (('calibrated', lambda: (calibration.percentiles(values), calibration.risk_levels(values))),
+                     ('legacy', lambda: legacy(values))):
+        fn()
+        t = time.perf_counter()
+        fn()
+        timings[name] = round((time.perf_counter() - t) / args.map_rows * 1e6, 4)
+    one = values[:1]
+    t = time.perf_counter()
+    for _ in range(1000):
+        calibration.percentiles(one)
+    print(json.dumps({'map_rows': args.map_rows, 'map_us_per_row': timings,
+                      'single_row_us': round((time.perf_counter() - t) / 1000 * 1e6, 2)}))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Accuracy, cost and detection of the drift sketches (drift_monitor.py, GET /drift).
+
+Builds a reference from --rows synthetic payroll rows, then streams --requests
+uploads of --batch rows through a fresh window per scenario:
+
+  same             new rows from the reference distribution
+  salary_shift     salaries of a third of the departments raised by 25%
+  shared_contacts  5% of rows reuse another row's email, a fifth lose their phone
+
+For each scenario it reports what the report marks as drifted (features, or
+salary_by_department for departments whose mean salary moved), and
+the sketch statistics against exact ones computed from the raw values (kept
+here only for the check): KS distance, PSI over the same deciles, HyperLogLog
+distinct counts. Cost is sketch bytes per feature (independent of rows) and
+observe time per row. Exits non-zero when a scenario with injected drift is
+not flagged, or when ``same`` is.
+
+Run from ml_service:
+  python scripts/bench_drift.py --rows 200000 --requests 10 --batch 50000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+warnings.filterwarnings('ignore')
+
+import main  # noqa: E402
+from bench_parallel_scoring import payroll  # noqa: E402
+from drift_monitor import SCORE, DriftSketches, drift_report  # noqa: E402
+
+
+def scored(df):
+    engineered = main.engineer_features(df)
+    X = engineered[main.model_features(main.model)]
+    return engineered, X, main.model.decision_function(X)
+
+
+def scenario(name, rows, departments, seed):
+    df = payroll(rows, departments, seed)
+    rng = np.random.default_rng(seed)
+    if name == 'salary_shift':
+        shifted = df['department'].isin(df['department'].unique()[::3])
+        df.loc[shifted, 'salary'] *= 1.25
+    elif name == 'shared_contacts':
+        reuse = rng.random(rows) < 0.05
+        df.loc[reuse, 'email'] = df['email'].to_numpy()[rng.integers(0, rows, reuse.sum())]
+        df.loc[rng.random(rows) < 0.2, 'phone_number'] = None
+    return df
+
+
+INJECTED = {'same': False, 'salary_shift': True, 'shared_contacts': True}
+
+
+def exact_ks(a, b):
+    a, b = np.sort(a), np.sort(b)
+    grid = np.concatenate([a, b])
+    return float(np.abs(np.searchsorted(a, grid, 'right') / len(a) - np.searchsorted(b, grid, 'right') / len(b)).max())
+
+
+def exact_psi(a, b, bins=10, floor=1e-4):
+    edges = np.unique(np.quantile(a, np.arange(1, bins) / bins))
+    r = np.bincount(np.searchsorted(edges, a, 'left'), minlength=len(edges) + 1) / len(a)
+    c = np.bincount(np.searchsorted(edges, b, 'left'), minlength=len(edges) + 1) / len(b)
+    r, c = np.maximum(r, floor), np.maximum(c, floor)
+    return float(np.sum((c - r) * np.log(c / r)))
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=50_000)
+    parser.add_argument('--departments', type=int, default=60)
+    args = parser.parse_args()
+
+    features = main.model_features(main.model)
+    ref_frame, ref_X, ref_scores = scored(payroll(args.rows, args.departments, seed=100))
+    reference = DriftSketches(features)
+    reference.observe(ref_frame, ref_X, ref_scores)
+    sketch_bytes = reference.quantiles[SCORE].counts.nbytes
+
+    missed = []
+    for name, injected in INJECTED.items():
+        window = DriftSketches(features)
+        raw = {f: [] for f in [*features, SCORE]}
+        emails = set()
+        observe_s = 0.0
+        for r in range(args.requests):
+            frame, X, scores = scored(scenario(name, args.batch, args.departments, seed=r))
+            t = time.perf_counter()
+            window.observe(frame, X, scores)
+            observe_s += time.perf_counter() - t
+            for f in features:
+                raw[f].append(X[f].to_numpy(np.float64))
+            raw[SCORE].append(scores)
+            emails.update(frame['email'].dropna())
+        report = drift_report(reference, window)
+        if bool(report['drifted']) != injected:
+            missed.append(name)
+        exact = {f: np.concatenate(v) for f, v in raw.items()}
+        ref_exact = {**{f: ref_X[f].to_numpy(np.float64) for f in features}, SCORE: ref_scores}
+        checks = {f: {
+            'ks': report['distributions'][f]['ks'], 'ks_exact': round(exact_ks(ref_exact[f], exact[f]), 4),
+            'psi': report['distributions'][f]['psi'], 'psi_exact': round(exact_psi(ref_exact[f], exact[f]), 4),
+        } for f in ('salary', 'Department_Salary_Variance', 'Email_Collision_Count', SCORE)}
+        print(json.dumps({
+            'scenario': name,
+            'rows': window.meta['rows'],
+            'drifted': report['drifted'],
+            'flagged_as_expected': name not in missed,
+            'salary_by_department': {k: report['salary_by_department'][k]
+                                     for k in ('compared', 'shifted', 'shifted_row_share', 'drift')},
+            'distinct_email_ratio': {k: v['email'] for k, v in report['quality']['distinct_ratio'].items()},
+            'phone_null_rate': {k: v['phone_number'] for k, v in report['quality']['null_rates'].items()},
+            'flagged_rate': report['quality']['flagged_rate'],
+            'hll_distinct_emails': window.summary()['distinct_seen']['email'],
+            'exact_distinct_emails': len(emails),
+            'checks': checks,
+            'observe_us_per_row': round(observe_s / window.meta['rows'] * 1e6, 3),
+        }))
+
+    print(json.dumps({
+        'sketch_bytes_per_feature': sketch_bytes,
+        'hll_bytes': reference.distinct['email'].registers.nbytes,
+        'window_bytes': sum(q.counts.nbytes for q in window.quantiles.values())
+        + sum(h.registers.nbytes for h in window.distinct.values()) + window.department_salary.moments.nbytes,
+        'rows_in_window': window.meta['rows'],
+    }))
+    if missed:
+        print(json.dumps({'check': 'FAILED', 'not_flagged_as_expected': missed}))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main_()
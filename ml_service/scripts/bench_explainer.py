@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Agreement and latency of the path-length explainer (path_explainer.py) against SHAP.
+
+Featurizes the HIT payroll / attendance uploads the way /analyze does, takes
+the rows the model flags, and compares per row the features each explainer
+ranks as pushing hardest toward anomaly:
+
+  top1_agreement         same most negative feature
+  top2_set_agreement     same two features (either order)
+  top2_overlap           at least one of the two in common
+  explanation_agreement  identical /analyze explanation text
+
+Latency covers building the explainer and explaining the flagged rows, plus
+the same on --rows resampled rows to show how each scales.
+
+Run from ml_service:
+  python scripts/bench_explainer.py
+  python scripts/bench_explainer.py --payroll ../hr_payroll.xlsx --attendance ../hr_attendance_sheet.xlsx
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+warnings.filterwarnings('ignore')
+
+import shap  # noqa: E402
+from fastapi import UploadFile  # noqa: E402
+
+import main  # noqa: E402
+from memory_lean import validate_frame  # noqa: E402
+from path_explainer import PathLengthExplainer  # noqa: E402
+
+REPO = os.path.dirname(ROOT)
+
+
+def featurize(payroll, attendance):
+    """The model's feature matrix for an upload pair, as /analyze builds it."""
+    with open(payroll, 'rb') as p, open(attendance, 'rb') as a:
+        df, _ = asyncio.run(main.read_uploads(
+            UploadFile(p, filename=os.path.basename(payroll)),
+            UploadFile(a, filename=os.path.basename(attendance)),
+        ))
+    valid, _ = validate_frame(df, main.EmployeeRecord)
+    return main.engineer_features(valid)[main.model_features(main.model)]
+
+
+def explain_shap(model, X):
+    return shap.TreeExplainer(model).shap_values(X)
+
+
+def explain_fast(model, X):
+    return PathLengthExplainer(model).contributions(X)
+
+
+def timed(fn, *args):
+    t = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t
+
+
+def agreement(a, b, features):
+    top_a, top_b = np.argsort(a, axis=1)[:, :2], np.argsort(b, axis=1)[:, :2]
+    same_set = np.sort(top_a, axis=1) == np.sort(top_b, axis=1)
+    overlap = (top_a[:, :, None] == top_b[:, None, :]).any(axis=(1, 2))
+    text = [main.get_dynamic_shap_explanation(i, a, features) == main.get_dynamic_shap_explanation(i, b, features)
+            for i in range(len(a))]
+    return {
+        'top1_agreement': round(float((top_a[:, 0] == top_b[:, 0]).mean()), 3),
+        'top2_set_agreement': round(float(same_set.all(axis=1).mean()), 3),
+        'top2_overlap': round(float(overlap.mean()), 3),
+        'explanation_agreement': round(float(np.mean(text)), 3),
+    }
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--payroll', default=os.path.join(REPO, 'HIT_Payroll_2000_With_Ghost_Anomalies.xlsx'))
+    parser.add_argument('--attendance', default=os.path.join(REPO, 'HIT_Attendance_2000_With_Ghost_Anomalies.xlsx'))
+    parser.add_argument('--rows', type=int, default=20_000)
+    args = parser.parse_args()
+
+    model = main.model
+    X = featurize(args.payroll, args.attendance)
+    features = list(X.columns)
+    flagged = X.iloc[np.flatnonzero(model.predict(X) == -1)]
+
+    shap_values, shap_s = timed(explain_shap, model, flagged)
+    fast_values, fast_s = timed(explain_fast, model, flagged)
+    # Both split the same path-length deficit from the same baseline; only the split differs
+    same_totals = bool(np.allclose(shap_values.sum(axis=1), fast_values.sum(axis=1), atol=1e-6))
+    print(json.dumps({
+        'dataset': os.path.basename(args.payroll),
+        'rows': len(X),
+        'flagged': len(flagged),
+        **agreement(shap_values, fast_values, features),
+        'same_totals': same_totals,
+        'shap_ms': round(shap_s * 1000, 1),
+        'fast_ms': round(fast_s * 1000, 1),
+        'speedup': round(shap_s / fast_s, 1),
+    }))
+
+    many = X.sample(args.rows, replace=True, random_state=0)
+    _, shap_s = timed(explain_shap, model, many)
+    _, fast_s = timed(explain_fast, model, many)
+    print(json.dumps({
+        'rows': args.rows,
+        'shap_s': round(shap_s, 2),
+        'fast_s': round(fast_s, 3),
+        'speedup': round(shap_s / fast_s, 1),
+        'fast_us_per_row': round(fast_s / args.rows * 1e6, 1),
+    }))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark the attendance history feature stage on synthetic histories exports.
+
+Generates --months months of present days for --employees employees (each with
+its own attendance rate), ingests them month by month into a scratch
+``HistoryFeatureStore`` and reports:
+
+  ingest_month_s     aggregating one new month into the store
+  features_s         combining the --window months into per-employee features
+  new_month_s        what a monthly refresh costs (ingest + features)
+  full_rebuild_s     re-aggregating every month from scratch (refresh=True)
+
+``--check`` first compares the store's features with a plain pandas groupby over
+the raw events for a small population.
+
+Run from ml_service:
+  python scripts/bench_history_features.py --employees 100000 --months 24 --window 12
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from history_features import HistoryFeatureStore  # noqa: E402
+
+FIRST_MONTH = np.datetime64('2024-01', 'M')
+
+
+def month_events(ids, rates, month, rng):
+    """Present days of one month: every business day, each employee with its own rate."""
+    days = pd.bdate_range(str(month), str((month + 1).astype('datetime64[D]') - 1)).values
+    present = rng.random((len(ids), len(days)), dtype=np.float32) < rates[:, None]
+    emp, day = np.nonzero(present)
+    ts = days[day] + np.timedelta64(8, 'h') + rng.integers(0, 3600, len(day)).astype('timedelta64[s]')
+    return pd.DataFrame({'employee_id': ids[emp], 'ts': ts})
+
+
+def reference_features(events, end_month, window):
+    """Straightforward pandas version over the raw events (small populations only)."""
+    start = (end_month - (window - 1)).astype('datetime64[D]')
+    end_day = (end_month + 1).astype('datetime64[D]') - 1
+    ev = events[events['ts'].values >= start].copy()
+    ev['day'] = ev['ts'].values.astype('datetime64[D]')
+    ev = ev.drop_duplicates(['employee_id', 'day']).sort_values(['employee_id', 'day'])
+    ev['gap'] = ev.groupby('employee_id')['day'].diff().dt.days
+    g = ev.groupby('employee_id')
+    weekday = pd.crosstab(ev['employee_id'], pd.DatetimeIndex(ev['day']).weekday)
+    p = weekday.div(weekday.sum(axis=1), axis=0)
+    return pd.DataFrame({
+        'Max_Attendance_Gap_Days': g['gap'].max().fillna(0),
+        'Attendance_Gap_CV': (g['gap'].std(ddof=0) / g['gap'].mean()).fillna(0),
+        'Days_Since_Last_Scan': (end_day - g['day'].max().values.astype('datetime64[D]')).astype(int),
+        'Weekday_Entropy': -(p * np.log(p.where(p > 0))).sum(axis=1) / np.log(7),
+    })
+
+
+def check(months, window):
+    rng = np.random.default_rng(1)
+    ids = np.array([f'E{i:06d}' for i in range(500)])
+    rates = rng.uniform(0.05, 0.95, len(ids))
+    events = pd.concat([month_events(ids, rates, FIRST_MONTH + m, rng) for m in range(months)])
+    store = HistoryFeatureStore(tempfile.mkdtemp())
+    store.ingest(events)
+    got = store.features(window_months=window)
+    want = reference_features(events, FIRST_MONTH + months - 1, window)
+    for name in want.columns:
+        np.testing.assert_allclose(got.loc[want.index, name], want[name], rtol=1e-9, atol=1e-9)
+    print(json.dumps({'check': 'OK', 'employees': len(want)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--employees', type=int, default=100_000)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--window', type=int, default=12)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    if args.check:
+        check(min(args.months, 6), min(args.window, 6))
+
+    rng = np.random.default_rng(0)
+    ids = np.array([f'E{i:07d}' for i in range(args.employees)])
+    rates = rng.beta(8, 2, args.employees).astype(np.float32)
+    rates[rng.random(args.employees) < 0.02] = 0.02  # a few near-absent ghosts
+    store = HistoryFeatureStore(tempfile.mkdtemp())
+
+    ingest_times, rows = [], 0
+    monthly = []
+    for m in range(args.months):
+        events = month_events(ids, rates, FIRST_MONTH + m, rng)
+        rows += len(events)
+        t = time.perf_counter()
+        store.ingest(events)
+        ingest_times.append(time.perf_counter() - t)
+        monthly.append(events)
+        if len(monthly) > 1:
+            monthly.pop(0)  # keep memory flat: only the newest month is needed below
+
+    t = time.perf_counter()
+    feats = store.features(window_months=args.window)
+    features_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    store.ingest(monthly[-1], refresh=True)
+    redo_last = time.perf_counter() - t
+
+    print(json.dumps({
+        'employees': args.employees,
+        'months': args.months,
+        'window': args.window,
+        'history_rows': rows,
+        'ingest_month_s': round(float(np.median(ingest_times)), 3),
+        'features_s': round(features_s, 3),
+        'new_month_s': round(redo_last + features_s, 3),
+        'full_rebuild_s': round(sum(ingest_times), 2),
+        'feature_rows': len(feats),
+    }))
+
+
+if __name__ == '__main__':
+    main()
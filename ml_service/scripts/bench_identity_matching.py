@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Benchmark near-duplicate identity detection on synthetic payroll records.
+
+Generates --records records, a --dup-rate share of which are re-entries of an
+earlier record with the kind of drift seen in payroll exports: dots or '+tags'
+in the email local part, reformatted phones ('512-507-0524x1231' vs
+'(512)5070524'), swapped name order and single-letter typos. Reports:
+
+  prepare_s / blocking_s / scoring_s   identity_keys, candidate pairs, pair scoring
+  candidate_pairs                      pairs scored vs all n(n-1)/2 pairs
+  recall / precision                   against the injected duplicates
+  exact_recall                         what email/phone value_counts alone would find
+
+``--check`` first scores every pair of a small sample and compares with the
+blocked result, i.e. how many matching pairs blocking loses. Every run also
+checks Fuzzy_Duplicate_Count on a record whose email matches one record and whose
+phone matches another: both matches are exact, so /analyze must not also report
+a possible duplicate identity for it. A failed check exits non-zero.
+
+Run from ml_service:
+  python scripts/bench_identity_matching.py --records 100000 1000000 --check
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from identity_matching import (  # noqa: E402
+    candidate_pairs,
+    identity_keys,
+    match_pairs,
+    near_duplicate_counts,
+    near_duplicate_pairs,
+)
+
+SYLLABLES = np.array([
+    'ta', 'ke', 'mu', 'ro', 'shi', 'na', 'po', 'le', 'zi', 'ga', 'ri', 'tho', 'bu', 'de', 'fa',
+    'yo', 'chi', 'man', 'son', 'do', 'wa', 'ni', 'ka', 'lo', 'mi', 'nde', 'ngo', 'pa', 'ru', 'se',
+    'ti', 'vu', 'zo', 'be', 'dzi', 'gu', 'ha', 'ji', 'ku', 'mbe', 'nyo', 'o', 'pe', 'sa', 'tsa',
+    'e', 'va', 'we', 'ze', 'bri', 'el', 'an', 'ton', 'ley', 'ford', 'wick', 'ster', 'ly', 'mar', 'ven',
+])
+DOMAINS = np.array(['hit.ac.zw', 'gmail.com', 'yahoo.com', 'outlook.com'])
+
+
+def words(rng, n, low=2, high=4):
+    parts = rng.choice(SYLLABLES, size=(n, high))
+    lengths = rng.integers(low, high + 1, n)
+    return np.array([''.join(p[:k]).capitalize() for p, k in zip(parts, lengths)])
+
+
+def phone_text(digits, style):
+    a, b, c = digits[:3], digits[3:6], digits[6:]
+    return [f'{a}-{b}-{c}', f'({a}){b}{c}', f'+1 {a} {b} {c}', f'{a}.{b}.{c}x{digits[-3:]}'][style]
+
+
+def typo(rng, text):
+    i = rng.integers(1, max(len(text) - 1, 2))
+    return text[:i] + text[i + 1:] if rng.random() < 0.5 else text[:i] + text[i] + text[i:]
+
+
+def synthesize(n, dup_rate, seed=0):
+    """Names, emails and phones with injected near duplicates; returns (..., true pairs)."""
+    rng = np.random.default_rng(seed)
+    base = n - int(n * dup_rate)
+    first, last = words(rng, base, 2, 3), words(rng, base, 2, 4)
+    number = rng.integers(0, 1000, base)
+    locals_ = [f'{f[0]}{l}{k}'.lower() if k % 3 else f'{f}{l}'.lower()
+               for f, l, k in zip(first, last, number)]
+    domain = rng.choice(DOMAINS, base)
+    digits = [str(d) for d in rng.integers(2_000_000_000, 9_999_999_999, base)]
+
+    names = [f'{f} {l}' for f, l in zip(first, last)]
+    emails = [f'{loc}@{d}' for loc, d in zip(locals_, domain)]
+    phones = [phone_text(d, rng.integers(4)) for d in digits]
+
+    src = rng.integers(0, base, n - base)
+    for i, s in enumerate(src):
+        f, l, loc, d = first[s], last[s], locals_[s], digits[s]
+        kind = rng.integers(4)
+        name = f'{l} {f}' if rng.random() < 0.5 else f'{f} {l}'
+        if kind == 0:   # same phone, new formatting; email from a different provider
+            names.append(name)
+            emails.append(f'{loc}{rng.integers(10)}@{rng.choice(DOMAINS)}')
+            phones.append(phone_text(d, (rng.integers(4))))
+        elif kind == 1:  # dotted / tagged email, new phone
+            names.append(name)
+            emails.append(f'{loc[:2]}.{loc[2:]}+payroll@{domain[s]}')
+            phones.append(phone_text(str(rng.integers(2_000_000_000, 9_999_999_999)), 0))
+        else:            # typo in name and email local part, new phone
+            names.append(f'{typo(rng, f)} {l}' if kind == 2 else f'{f} {typo(rng, l)}')
+            emails.append(f'{typo(rng, loc)}@{domain[s]}')
+            phones.append(phone_text(str(rng.integers(2_000_000_000, 9_999_999_999)), 1))
+    # Every pair of records of the same person: source-dup and dup-dup
+    records = {}
+    for i, s in enumerate(src):
+        records.setdefault(s, [s]).append(base + i)
+    truth = np.array([p for group in records.values() for p in itertools.combinations(group, 2)],
+                     dtype=np.int64).reshape(-1, 2)
+    return names, emails, phones, truth
+
+
+def pair_set(pairs, n):
+    return set((pairs[:, 0].astype(np.int64) * n + pairs[:, 1]).tolist())
+
+
+def check(sample):
+    names, emails, phones, _ = synthesize(sample, 0.05, seed=1)
+    found, _ = near_duplicate_pairs(names, emails, phones)
+    prep = identity_keys(names, emails, phones)
+    lo, hi = np.triu_indices(sample, k=1)
+    t = time.perf_counter()
+    keep = match_pairs(prep, lo, hi)
+    naive_s = time.perf_counter() - t
+    naive = pair_set(np.column_stack([lo[keep], hi[keep]]), sample)
+    blocked = pair_set(found, sample)
+    print(json.dumps({
+        'check': 'OK' if blocked <= naive else 'FAILED',
+        'records': sample,
+        'naive_pairs': len(lo),
+        'naive_matches': len(naive),
+        'blocked_matches': len(blocked),
+        'missed_by_blocking': len(naive - blocked),
+        'naive_s': round(naive_s, 2),
+    }))
+    return naive_s / len(lo), blocked <= naive
+
+
+def check_exact_vs_fuzzy():
+    """
+    Record 2 shares record 0's email and record 1's phone (two exact matches);
+    records 0 and 3 are the same person with a dotted email at another provider
+    and a new phone (a fuzzy match). Returns True when counts and reasons agree.
+    """
+    import pandas as pd
+    import main
+
+    df = pd.DataFrame({
+        'employee_id': ['E0', 'E1', 'E2', 'E3'],
+        'name': ['Tendai Moyo', 'Rudo Banda', 'Tinashe Chari', 'Tendai Moyo'],
+        'department': ['Finance'] * 4,
+        'email': ['tmoyo@hit.ac.zw', 'rbanda@hit.ac.zw', 'tmoyo@hit.ac.zw', 't.moyo@gmail.com'],
+        'phone_number': ['0771111111', '0772222222', '0772222222', '0779999999'],
+        'salary': [1000.0] * 4,
+    })
+    near, fuzzy = near_duplicate_counts(df['name'], df['email'], df['phone_number'])
+    engineered = main.engineer_features(df)
+    reasons = [main.generate_determination(row, 'Low', 0.0)['reasoning']
+               for row in engineered.to_dict(orient='records')]
+    fuzzy_reason = ['possible duplicate identity' in ' '.join(r) for r in reasons]
+    ok = near.tolist() == [2, 1, 2, 1] and fuzzy.tolist() == [1, 0, 0, 1] and fuzzy_reason == [True, False, False, True]
+    print(json.dumps({
+        'check': 'OK' if ok else 'FAILED',
+        'near_duplicate_count': near.tolist(),
+        'fuzzy_duplicate_count': fuzzy.tolist(),
+        'fuzzy_reason': fuzzy_reason,
+    }))
+    return ok
+
+
+def exact_recall(emails, phones, truth):
+    email = np.array([e.lower() for e in emails], dtype=object)
+    phone = np.array(phones, dtype=object)
+    a, b = truth[:, 0], truth[:, 1]
+    return float(np.mean((email[a] == email[b]) | (phone[a] == phone[b])))
+
+
+def bench(n, dup_rate, per_pair_s):
+    names, emails, phones, truth = synthesize(n, dup_rate)
+    t0 = time.perf_counter()
+    prep = identity_keys(names, emails, phones)
+    t1 = time.perf_counter()
+    lo, hi = candidate_pairs(prep)
+    t2 = time.perf_counter()
+    keep = match_pairs(prep, lo, hi)
+    t3 = time.perf_counter()
+
+    found = pair_set(np.column_stack([lo[keep], hi[keep]]), n)
+    true = pair_set(truth, n)
+    hits = len(found & true)
+    all_pairs = n * (n - 1) // 2
+    result = {
+        'records': n,
+        'injected_duplicates': len(true),
+        'prepare_s': round(t1 - t0, 2),
+        'blocking_s': round(t2 - t1, 2),
+        'scoring_s': round(t3 - t2, 2),
+        'total_s': round(t3 - t0, 2),
+        'candidate_pairs': int(len(lo)),
+        'all_pairs': all_pairs,
+        'pairs_scored_pct': round(100 * len(lo) / all_pairs, 4),
+        'recall': round(hits / len(true), 4),
+        'precision': round(hits / max(len(found), 1), 4),
+        'exact_recall': round(exact_recall(emails, phones, truth), 4),
+    }
+    if per_pair_s:
+        result['naive_est_s'] = round(per_pair_s * all_pairs)
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--dup-rate', type=float, default=0.02)
+    parser.add_argument('--check', action='store_true')
+    parser.add_argument('--check-sample', type=int, default=3000)
+    args = parser.parse_args()
+
+    ok = check_exact_vs_fuzzy()
+    per_pair_s = None
+    if args.check:
+        per_pair_s, blocked_ok = check(args.check_sample)
+        ok = ok and blocked_ok
+    for n in args.records:
+        bench(n, args.dup_rate, per_pair_s)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Peak memory of /analyze in the default and the memory-lean pipeline (memory_lean.py).
+
+Builds a --rows payroll + attendance CSV upload (written to temporary files, so
+generating it is not part of any measurement), then runs ``analyze_file`` and
+the response encoding FastAPI would do (the body goes to a temporary file, as
+to a socket), once per mode in a fresh process:
+
+  tracemalloc_peak_mb   Python / NumPy allocations (tracemalloc)
+  max_rss_mb            peak resident set of the process (separate run, no tracing;
+                        includes the interpreter, the model and Arrow buffers)
+
+and checks that both modes return the same rows, flags, risks, explanations
+and determinations (per-field digests), and that the lean peak RSS is at most
+1 / --min-rss-reduction of the default one. Exits non-zero otherwise.
+
+Run from ml_service:
+  python scripts/bench_memory_lean.py --rows 500000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+warnings.filterwarnings('ignore')
+
+FIELDS = ('employeeId', 'isGhost', 'risk', 'explanation', 'determination')
+
+
+def uploads(rows, departments):
+    from bench_parallel_scoring import payroll
+
+    df = payroll(rows, departments)
+    rng = np.random.default_rng(1)
+    attendance = df[['employee_id']].assign(Days_Present=rng.integers(0, 23, rows))
+    return df.to_csv(index=False).encode(), attendance.to_csv(index=False).encode()
+
+
+def analyze(payroll_csv, attendance_csv, lean, sink):
+    """analyze_file plus the encoding FastAPI applies to its return value, written to ``sink``."""
+    from fastapi import UploadFile
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    import main
+
+    async def run():
+        result = await main.analyze_file(
+            UploadFile(io.BytesIO(payroll_csv), filename='payroll.csv'),
+            UploadFile(io.BytesIO(attendance_csv), filename='attendance.csv'),
+            history_file=None, employees_file=None, workers=1, partition='department', lean=lean,
+        )
+        if isinstance(result, StreamingResponse):
+            async for chunk in result.body_iterator:
+                sink.write(chunk)
+        else:
+            sink.write(JSONResponse(jsonable_encoder(result)).body)
+
+    asyncio.run(run())
+
+
+def digests(body):
+    data = json.loads(body)['data']
+    out = {'rows': len(data)}
+    for field in FIELDS:
+        h = hashlib.sha256()
+        for row in data:
+            h.update(json.dumps(row[field], sort_keys=True).encode())
+        out[field] = h.hexdigest()[:16]
+    return out
+
+
+def child(args):
+    with open(os.path.join(args.upload_dir, 'payroll.csv'), 'rb') as f:
+        payroll_csv = f.read()
+    with open(os.path.join(args.upload_dir, 'attendance.csv'), 'rb') as f:
+        attendance_csv = f.read()
+    import main  # noqa: F401  (model load is not part of the measurement)
+
+    if args.measure == 'tracemalloc':
+        tracemalloc.start()
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t = time.perf_counter()
+    sink = tempfile.TemporaryFile()
+    analyze(payroll_csv, attendance_csv, args.lean, sink)
+    seconds = time.perf_counter() - t
+    result = {'seconds': round(seconds, 1)}
+    if args.measure == 'tracemalloc':
+        result['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+    else:
+        result['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        result['rss_before_mb'] = round(start_rss / 1024, 1)
+        sink.seek(0)
+        result['digests'] = digests(sink.read())
+    print(json.dumps(result))
+
+
+def run(args, upload_dir, lean, measure):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', '--upload-dir', upload_dir,
+           '--measure', measure] + (['--lean'] if lean else [])
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--departments', type=int, default=60)
+    parser.add_argument('--measure', choices=['tracemalloc', 'rss'], default=None)
+    parser.add_argument('--min-rss-reduction', type=float, default=3.0)
+    parser.add_argument('--lean', action='store_true')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--upload-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as upload_dir:
+        for name, contents in zip(('payroll.csv', 'attendance.csv'), uploads(args.rows, args.departments)):
+            with open(os.path.join(upload_dir, name), 'wb') as f:
+                f.write(contents)
+        for mode, lean in (('default', False), ('lean', True)):
+            results[mode] = {}
+            for measure in ([args.measure] if args.measure else ['tracemalloc', 'rss']):
+                results[mode].update(run(args, upload_dir, lean, measure))
+            print(json.dumps({'rows': args.rows, 'mode': mode, **results[mode]}))
+
+    summary = {'rows': args.rows}
+    for key in ('tracemalloc_peak_mb', 'max_rss_mb'):
+        if key in results['default']:
+            summary[key.replace('_mb', '_reduction')] = round(results['default'][key] / results['lean'][key], 2)
+    if 'max_rss_mb' in results['default']:
+        # Growth over the process baseline (interpreter, model, the upload bytes)
+        growth = {m: r['max_rss_mb'] - r['rss_before_mb'] for m, r in results.items()}
+        summary['rss_growth_reduction'] = round(growth['default'] / growth['lean'], 2)
+        a, b = results['default']['digests'], results['lean']['digests']
+        summary['differing_fields'] = [f for f in a if a[f] != b[f]]
+        summary['check'] = 'OK' if summary['max_rss_reduction'] >= args.min_rss_reduction and not summary['differing_fields'] else 'FAILED'
+    print(json.dumps(summary))
+    if summary.get('check') == 'FAILED':
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main_()
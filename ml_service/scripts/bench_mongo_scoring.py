@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Direct MongoDB scoring (mongo_scoring.py, POST /score-db) against the CSV round trip.
+
+Seeds --rows Employee documents (with the report fields a scored document
+carries) into mongomock (``pip install mongomock``), or into a local mongod
+with --uri, then times:
+
+  csv_round_trip  what the scheduled analysis does: every active document
+                  fetched whole, written out as payroll / attendance CSV,
+                  parsed and scored by /analyze (lean=true, explain=none), the JSON body
+                  encoded and decoded, and the rows insertMany'd as report records
+  direct          main.score_collection: projected cursor into NumPy columns,
+                  chunked scoring, unordered bulk_write of anomalyScore / riskLevel
+  direct_rerun    the same again, as the next scheduled run over unchanged data
+                  (every document already holds its scores, so nothing is written)
+
+and checks that both give every employee the same risk level and score.
+mongomock gets linear cursor iteration and an ``_id`` lookup for single-id
+filters (MongoDB's mandatory ``_id`` index); unpatched, every cursor step and
+every bulk update costs a pass over the whole collection, in both modes.
+
+Run from ml_service:
+  python scripts/bench_mongo_scoring.py --rows 100000
+  python scripts/bench_mongo_scoring.py --rows 100000 --uri mongodb://127.0.0.1:27017/rose_bench
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+warnings.filterwarnings('ignore')
+
+from fastapi import UploadFile  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, StreamingResponse  # noqa: E402
+
+import main  # noqa: E402
+from bench_parallel_scoring import payroll  # noqa: E402
+from mongo_scoring import ACTIVE  # noqa: E402
+
+
+def database(uri):
+    if uri:
+        from pymongo import MongoClient
+        from pymongo.uri_parser import parse_uri
+        return MongoClient(uri)[parse_uri(uri).get('database') or 'rose_bench']
+    import mongomock
+    from mongomock.collection import BulkOperationBuilder, Collection, Cursor
+
+    # mongomock's Cursor copies the remaining results on every next(), which makes
+    # any full scan quadratic; iterate the computed results instead
+    def cursor_iter(self):
+        return iter(self._compute_results(with_limit_and_skip=True))
+    Cursor.__iter__ = cursor_iter
+
+    # mongomock scans every document for each {_id: ...} filter; MongoDB always
+    # has the _id index, so look single-_id filters up directly
+    iter_documents = Collection._iter_documents
+
+    def iter_documents_by_id(self, filter):
+        if isinstance(filter, dict) and filter.keys() == {'_id'} and not isinstance(filter['_id'], dict):
+            return iter([self._store[filter['_id']]] if filter['_id'] in self._store else [])
+        return iter_documents(self, filter)
+    Collection._iter_documents = iter_documents_by_id
+
+    add_update = BulkOperationBuilder.add_update
+    if 'sort' not in add_update.__code__.co_varnames:
+        # pymongo >= 4.11 passes UpdateOne's sort, which mongomock 4.x does not accept
+        def add_update_compat(self, *args, sort=None, **kwargs):
+            return add_update(self, *args, **kwargs)
+        BulkOperationBuilder.add_update = add_update_compat
+    return mongomock.MongoClient()['rose']
+
+
+def seed(db, rows, departments):
+    df = payroll(rows, departments)
+    rng = np.random.default_rng(2)
+    attendance = rng.integers(0, 23, rows)
+    enrolled = rng.random(rows) < 0.9
+    status = rng.choice(['Active', 'On Leave', 'Terminated'], rows, p=[0.95, 0.02, 0.03])
+    docs = [{
+        'employeeId': r.employee_id, 'fullName': r.name, 'email': r.email, 'department': r.department,
+        'role': 'Officer', 'salary': float(r.salary), 'attendanceDays': int(attendance[i]),
+        'biometricLogs': int(attendance[i] * 2) if enrolled[i] else 0,
+        'fingerprintId': i if enrolled[i] else None, 'employmentStatus': str(status[i]),
+        'bankAccount': f'0{i:011d}', 'contractType': 'Full-Time', 'payrollFrequency': 'Monthly',
+        # What an earlier analysis left on the document; never needed for scoring
+        'flaggedReasons': ['Salary deviates from department average'],
+        'features': {'Email_Collision_Count': 1.0, 'Department_Salary_Variance': 0.1},
+        'determination': {'classification': 'Legitimate', 'confidence': 0.9,
+                          'reasoning': ['Attendance record is consistent with payroll']},
+    } for i, r in enumerate(df.itertuples())]
+    db.employees.drop()
+    db.reportrecords.drop()
+    db.employees.insert_many(docs)
+
+
+def csv_round_trip(db, lean):
+    stages = {}
+    t = time.perf_counter()
+    employees = list(db.employees.find(ACTIVE))
+    stages['find_s'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    payroll_csv = '\n'.join(['employee_id,name,department,email,salary,biometricLogs'] + [
+        f"{e['employeeId']},{e['fullName']},{e['department']},{e['email']},{e['salary']},{e['biometricLogs']}"
+        for e in employees]).encode()
+    attendance_csv = '\n'.join(['employee_id,Days_Present'] + [
+        f"{e['employeeId']},{e['attendanceDays']}" for e in employees]).encode()
+    stages['csv_s'] = time.perf_counter() - t
+
+    async def analyze():
+        result = await main.analyze_file(
+            UploadFile(io.BytesIO(payroll_csv), filename='scheduled_employees.csv'),
+            UploadFile(io.BytesIO(attendance_csv), filename='scheduled_attendance.csv'),
+            history_file=None, employees_file=None, workers=1, partition='department', lean=lean, explain='none',
+        )
+        if isinstance(result, StreamingResponse):
+            return b''.join([chunk async for chunk in result.body_iterator])
+        return JSONResponse(jsonable_encoder(result)).body
+
+    t = time.perf_counter()
+    body = asyncio.run(analyze())
+    stages['analyze_s'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    results = json.loads(body)['data']
+    db.reportrecords.insert_many([{**r, 'reportId': 'bench'} for r in results])
+    stages['insert_s'] = time.perf_counter() - t
+    return results, stages
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--departments', type=int, default=60)
+    parser.add_argument('--default-path', action='store_true', help='/analyze without lean=true')
+    parser.add_argument('--uri', default=None, help='local mongod to use instead of mongomock')
+    args = parser.parse_args()
+
+    db = database(args.uri)
+    seed(db, args.rows, args.departments)
+
+    t = time.perf_counter()
+    results, stages = csv_round_trip(db, not args.default_path)
+    csv_s = time.perf_counter() - t
+    print(json.dumps({'mode': 'csv_round_trip', 'rows': len(results), 'seconds': round(csv_s, 2),
+                      **{k: round(v, 2) for k, v in stages.items()}}))
+
+    runs = {}
+    for mode in ('direct', 'direct_rerun'):  # the rerun finds every score already stored
+        t = time.perf_counter()
+        summary = main.score_collection(db.employees)
+        runs[mode] = time.perf_counter() - t
+        print(json.dumps({'mode': mode, 'rows': summary['totalAnalyzed'], 'seconds': round(runs[mode], 2),
+                          **{f'{k}_s': v for k, v in summary['seconds'].items()}, **summary['written']}))
+
+    scored = {d['employeeId']: d for d in db.employees.find(ACTIVE, {'employeeId': 1, 'riskLevel': 1, 'anomalyScore': 1})}
+    same_risk = np.mean([scored[r['employeeId']]['riskLevel'] == r['risk'] for r in results])
+    score_diff = max(abs(scored[r['employeeId']]['anomalyScore'] - r['Reconstruction_Error'] * 100) for r in results)
+    print(json.dumps({
+        'rows': len(results),
+        'speedup': round(csv_s / runs['direct'], 2),
+        'rerun_speedup': round(csv_s / runs['direct_rerun'], 2),
+        'same_risk': round(float(same_risk), 4),
+        'max_anomaly_score_diff': round(float(score_diff), 4),
+    }))
+
+
+if __name__ == '__main__':
+    main_()
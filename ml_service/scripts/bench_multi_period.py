@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+One multi-period request against one /analyze call per month (multi_period.py).
+
+Builds --months monthly payroll / attendance pairs for about --rows employees
+(a few percent leave and join every month, 5% get a raise, and every third
+month a batch of ghost rows reuses existing contacts), then times:
+
+  sequential   one POST /analyze?lean=true per month (TestClient)
+  periods      one POST /analyze/periods with every pair
+  long         the same months as one long-format file with a period column
+
+and checks that every (employee, month) gets the flag and risk from the
+multi-period request that its own /analyze call gave, and that
+featurize_periods gives every month the model features and decision_function
+scores that featurize_frame gives that month alone.
+
+Run from ml_service:
+  python scripts/bench_multi_period.py --rows 20000 --months 12
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+warnings.filterwarnings('ignore')
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from bench_parallel_scoring import payroll  # noqa: E402
+from memory_lean import validate_frame  # noqa: E402
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+
+
+def months(rows, count, departments, seed=0):
+    """[(label, payroll, attendance)] with turnover, salary changes and periodic ghost batches."""
+    rng = np.random.default_rng(seed)
+    pool = payroll(int(rows * (1 + 0.03 * count)), departments, seed)
+    active = rng.random(len(pool)) < rows / len(pool)
+    out = []
+    for m in range(count):
+        year, month = 2025 + m // 12, m % 12
+        active &= rng.random(len(pool)) > 0.02  # leavers
+        active |= rng.random(len(pool)) < 0.02  # joiners
+        df = pool[active].copy()
+        raised = rng.random(len(df)) < 0.05
+        df.loc[raised, 'salary'] = (df.loc[raised, 'salary'] * rng.uniform(1.02, 1.1, raised.sum())).round(2)
+        pool.loc[df.index, 'salary'] = df['salary']  # raises persist
+        if m % 3 == 2:
+            ghosts = df.sample(max(len(df) // 200, 1), random_state=m).copy()
+            ghosts['employee_id'] = [f'G{m:02d}{i:05d}' for i in range(len(ghosts))]
+            ghosts['name'] = ghosts['name'].str[::-1]
+            df = pd.concat([df, ghosts], ignore_index=True)
+        attendance = pd.DataFrame({
+            'employee_id': df['employee_id'],
+            'Days_Present': rng.integers(0, 23, len(df)),
+            'Month': MONTH_NAMES[month],
+            'Year': year,
+        })
+        out.append((f'{year}-{month + 1:02d}', df.reset_index(drop=True), attendance))
+    return out
+
+
+def csv_bytes(df):
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+
+def consistency(data):
+    """Max feature / score difference between featurize_periods and featurize_frame per month."""
+    features = main.model_features(main.model)
+    frames = []
+    for label, pay, att in data:
+        frame = main.merge_uploads(pay, att)[0].assign(period=label)
+        frames.append(frame)
+    stacked, _ = validate_frame(pd.concat(frames, ignore_index=True), main.EmployeeRecord, keep=('period',))
+    engineered, _ = main.featurize_periods(stacked, {label: att['employee_id'] for label, _, att in data})
+    batched_scores = main.score_chunks(engineered[features])
+    feature_diff = score_diff = 0.0
+    for (label, pay, att), frame in zip(data, frames):
+        alone, _ = main.featurize_frame(validate_frame(frame, main.EmployeeRecord)[0], att)
+        rows = np.flatnonzero(engineered['period'].to_numpy() == label)
+        a = alone[features].to_numpy(np.float64)
+        b = engineered[features].to_numpy(np.float64)[rows]
+        feature_diff = max(feature_diff, float(np.abs(a - b).max()))
+        score_diff = max(score_diff, float(np.abs(main.model.decision_function(alone[features]) - batched_scores[rows]).max()))
+    return feature_diff, score_diff
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--departments', type=int, default=60)
+    parser.add_argument('--explain', default='fast', choices=['fast', 'shap', 'none'])
+    args = parser.parse_args()
+
+    data = months(args.rows, args.months, args.departments)
+    files = [(label, csv_bytes(pay), csv_bytes(att)) for label, pay, att in data]
+    client = TestClient(main.app)
+    timings = {}
+
+    t = time.perf_counter()
+    sequential = {}
+    for label, pay, att in files:
+        response = client.post(f'/analyze?lean=true&explain={args.explain}', files={
+            'payroll_file': (f'payroll_{label}.csv', pay, 'text/csv'),
+            'attendance_file': (f'attendance_{label}.csv', att, 'text/csv'),
+        })
+        sequential.update({(row['employeeId'], label): (row['isGhost'], row['risk']) for row in response.json()['data']})
+    timings['sequential_s'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    response = client.post(f'/analyze/periods?explain={args.explain}', files=[
+        *[('payroll_files', (f'payroll_{label}.csv', pay, 'text/csv')) for label, pay, _ in files],
+        *[('attendance_files', (f'attendance_{label}.csv', att, 'text/csv')) for label, _, att in files],
+    ])
+    timings['periods_s'] = time.perf_counter() - t
+    body = response.json()
+    assert body['status'] == 'success', body
+
+    long = pd.concat([main.merge_uploads(pay, att)[0].assign(period=label) for label, pay, att in data], ignore_index=True)
+    t = time.perf_counter()
+    long_body = client.post(f'/analyze/periods?explain={args.explain}', files={'file': ('long.csv', csv_bytes(long), 'text/csv')}).json()
+    timings['long_s'] = time.perf_counter() - t
+    assert long_body['status'] == 'success', long_body
+
+    feature_diff, score_diff = consistency(data)
+    employees = body['employees']
+    batched = {(e['employeeId'], row['period']): (row['isGhost'], row['risk'])
+               for e in employees for row in e['trajectory']}
+    print(json.dumps({
+        'months': args.months,
+        'explain': args.explain,
+        'rows': body['rows'],
+        'employees': len(employees),
+        **{k: round(v, 2) for k, v in timings.items()},
+        'speedup': round(timings['sequential_s'] / timings['periods_s'], 2),
+        'flagged_sequential': sum(flag for flag, _ in sequential.values()),
+        'flagged_periods': sum(p['ghostCount'] for p in body['summary'].values()),
+        'flagged_long': sum(p['ghostCount'] for p in long_body['summary'].values()),
+        'flag_or_risk_mismatches': sum(batched.get(key) != value for key, value in sequential.items()),
+        'risk_changed': sum(e['riskChanged'] for e in employees),
+        'single_period_employees': sum(e['periodsPresent'] == 1 for e in employees),
+        'max_feature_diff': feature_diff,
+        'max_score_diff': score_diff,
+    }))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Latency and consistency of per-scan online scoring (online_scoring.py, POST /score-scan).
+
+Featurizes --rows synthetic employees once, loads the OnlineScorer from that,
+then replays --scans attendance scans (Zipf-skewed over employees; a share of
+them change salary, department or email, or come from new employees):
+
+  service_us        OnlineScorer.score per scan (state update + one-row scoring)
+  response_ms       open-loop Poisson arrivals at each --rates scans/s on one
+                    server, queueing on the measured service times
+  http_ms           the same scans through the /score-scan endpoint (TestClient)
+  same_as_batch     unchanged employees score exactly as decision_function did
+  features_match    after the replay, every touched employee's online features
+                    equal engineer_features over the whole updated population
+
+Run from ml_service:
+  python scripts/bench_online_scoring.py --rows 100000 --scans 50000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+warnings.filterwarnings('ignore')
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from bench_parallel_scoring import payroll  # noqa: E402
+from online_scoring import ONLINE_FEATURES, RECORD_FIELDS, OnlineScorer  # noqa: E402
+
+
+def percentiles(values, scale=1.0, digits=1):
+    values = np.asarray(values) * scale
+    return {f'p{p}': round(float(np.percentile(values, p)), digits) for p in (50, 90, 99, 99.9)} | {
+        'max': round(float(values.max()), digits)}
+
+
+def scan_events(df, scans, seed=0):
+    """(employee_id, fields) per scan; about 2% of scans change something."""
+    rng = np.random.default_rng(seed)
+    n = len(df)
+    who = np.minimum(rng.zipf(1.3, scans) - 1, n - 1)
+    who = rng.permutation(n)[who]  # skew over a random subset, not the first rows
+    kind = rng.random(scans)
+    departments = df['department'].unique()
+    events = []
+    for i, (row, k) in enumerate(zip(who, kind)):
+        fields = {'Days_Present': float(rng.integers(0, 23))}
+        if k < 0.01:
+            fields['salary'] = round(float(df['salary'].iat[row] * rng.uniform(0.5, 2.0)), 2)
+        elif k < 0.015:
+            fields['department'] = str(rng.choice(departments))
+        elif k < 0.02:
+            fields['email'] = df['email'].iat[int(rng.integers(n))]  # now collides with someone
+        elif k < 0.022:
+            events.append((f'NEW{i:07d}', {'name': f'New Hire {i}', 'department': str(rng.choice(departments)),
+                                           'email': f'new{i}@example.com', 'salary': 5000.0}))
+            continue
+        events.append((df['employee_id'].iat[row], fields))
+    return events
+
+
+def online_feature_check(scorer, touched):
+    """Online rows of ``touched`` against engineer_features over the scorer's current records."""
+    ids = sorted(scorer.rows, key=scorer.rows.get)
+    frame = pd.DataFrame({'employee_id': ids, **{f: scorer.records[f][:scorer.n] for f in RECORD_FIELDS}})
+    frame['salary'] = frame['salary'].astype(float)
+    batch = main.engineer_features(frame)
+    columns = [scorer.column[f] for f in ONLINE_FEATURES if f in scorer.column]
+    names = [f for f in ONLINE_FEATURES if f in scorer.column]
+    rows = np.array(sorted({scorer.rows[str(e)] for e in touched}))
+    for row in rows:  # a no-op scan recomputes the row from the current aggregates
+        scorer.score(ids[row])
+    online = scorer.X[rows][:, columns]
+    expected = batch[names].to_numpy(np.float32)[rows]
+    return float(np.mean(np.all(np.isclose(online, expected, rtol=1e-6, atol=1e-6), axis=1)))
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--departments', type=int, default=60)
+    parser.add_argument('--scans', type=int, default=50_000)
+    parser.add_argument('--http-scans', type=int, default=5_000)
+    parser.add_argument('--rates', type=float, nargs='+', default=[100, 500, 1000, 2000])
+    args = parser.parse_args()
+
+    model = main.model
+    features = main.model_features(model)
+    df = payroll(args.rows, args.departments)
+
+    t = time.perf_counter()
+    engineered = main.engineer_features(df)
+    scores = model.decision_function(engineered[features])
+    scorer = OnlineScorer(model, features)
+    scorer.load(engineered, scores)
+    load_s = time.perf_counter() - t
+
+    # Unchanged employees (no field changes) must score as the batch did
+    sample = np.random.default_rng(1).choice(args.rows, 2000, replace=False)
+    diffs = [abs(scorer.score(df['employee_id'].iat[i])['decision'] - scores[i]) for i in sample]
+    print(json.dumps({'rows': args.rows, 'load_s': round(load_s, 2), 'same_as_batch_max_diff': float(max(diffs))}))
+
+    events = scan_events(df, args.scans)
+    service = np.empty(len(events))
+    for i, (employee_id, fields) in enumerate(events):
+        t = time.perf_counter()
+        scorer.score(employee_id, **fields)
+        service[i] = time.perf_counter() - t
+    changed = [e for e, f in events if set(f) - {'Days_Present'}]
+    print(json.dumps({'scans': len(events), 'changing_scans': len(changed), 'service_us': percentiles(service, 1e6)}))
+
+    rng = np.random.default_rng(2)
+    for rate in args.rates:
+        arrivals = np.cumsum(rng.exponential(1 / rate, len(service)))
+        done = np.empty_like(arrivals)
+        free = 0.0
+        for i, (arrive, s) in enumerate(zip(arrivals, service)):  # one server, FIFO
+            free = done[i] = max(arrive, free) + s
+        print(json.dumps({'rate_per_s': rate, 'utilization': round(float(service.sum() / arrivals[-1]), 3),
+                          'response_ms': percentiles(done - arrivals, 1e3, 3)}))
+
+    main.online_scorer = scorer
+    client = TestClient(main.app)
+    http = np.empty(min(args.http_scans, len(events)))
+    for i, (employee_id, fields) in enumerate(events[:len(http)]):
+        body = {'employeeId': employee_id, **{k: v for k, v in fields.items() if k != 'Days_Present'},
+                'attendanceDays': fields.get('Days_Present')}
+        t = time.perf_counter()
+        response = client.post('/score-scan', json=body)
+        http[i] = time.perf_counter() - t
+        assert response.json()['status'] == 'success'
+    print(json.dumps({'http_scans': len(http), 'http_ms': percentiles(http, 1e3, 3)}))
+
+    print(json.dumps({'touched': len(set(changed)), 'features_match': online_feature_check(scorer, changed)}))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for partitioned featurization + scoring (parallel_scoring.py).
+
+Builds --rows synthetic payroll rows across --departments departments of uneven
+size, then times the /analyze hot path (engineer_features + decision_function)
+serially and through ``PartitionedScorer`` with each --workers count, and checks
+that every partitioned run returns exactly the serial features and scores.
+
+Speedup is bounded by the cores actually available (reported as ``cpus``) and
+by the parent's global stage (collision counts, department means, blocking);
+``amdahl_bound`` is the best case from the measured single-worker stage split.
+
+Run from ml_service:
+  python scripts/bench_parallel_scoring.py --rows 500000 --workers 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+warnings.filterwarnings('ignore')
+
+import main  # noqa: E402
+from bench_identity_matching import synthesize  # noqa: E402
+from parallel_scoring import PartitionedScorer  # noqa: E402
+
+
+def payroll(n, departments, seed=0):
+    rng = np.random.default_rng(seed)
+    names, emails, phones, _ = synthesize(n, 0.02, seed)
+    weights = rng.pareto(1.5, departments) + 1
+    dept = rng.choice([f'Dept {i:03d}' for i in range(departments)], n, p=weights / weights.sum())
+    return pd.DataFrame({
+        'employee_id': [f'E{i:07d}' for i in range(n)],
+        'name': names,
+        'department': dept,
+        'email': emails,
+        'phone_number': phones,
+        'salary': rng.lognormal(8, 0.4, n).round(2),
+    })
+
+
+def serial(df, model, features):
+    engineered = main.engineer_features(df)
+    return engineered, model.decision_function(engineered[features])
+
+
+def partitioned(df, model, features, workers, partition, stages=None):
+    stages = {} if stages is None else stages
+    with PartitionedScorer(workers, partition).session(df, model, features) as run:
+        t = time.perf_counter()
+        keys = run.identity_keys()
+        stages['keys_s'] = time.perf_counter() - t
+        t = time.perf_counter()
+        engineered = main.engineer_features(df, keys)
+        stages['global_s'] = time.perf_counter() - t
+        t = time.perf_counter()
+        scores = run.decision_function(engineered[features])
+        stages['score_s'] = time.perf_counter() - t
+    return engineered, scores
+
+
+def timed(fn, *args):
+    t = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--departments', type=int, default=60)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--partition', choices=['department', 'rows'], default='department')
+    args = parser.parse_args()
+
+    model = main.model
+    features = main.model_features(model)
+    df = payroll(args.rows, args.departments)
+
+    (base_features, base_scores), serial_s = timed(serial, df, model, features)
+    print(json.dumps({'rows': args.rows, 'cpus': os.cpu_count(), 'mode': 'serial', 'seconds': round(serial_s, 2)}))
+    stages = {}
+    partitioned(df, model, features, 1, args.partition, stages)
+    parallel = (stages['keys_s'] + stages['score_s']) / sum(stages.values())
+    print(json.dumps({
+        'stages_1_worker': {k: round(v, 2) for k, v in stages.items()},
+        'parallel_fraction': round(parallel, 3),
+        'amdahl_bound': {w: round(1 / ((1 - parallel) + parallel / w), 2) for w in args.workers},
+    }))
+    for workers in args.workers:
+        (feats, scores), seconds = timed(partitioned, df, model, features, workers, args.partition)
+        same = np.array_equal(scores, base_scores) and feats[features].equals(base_features[features])
+        print(json.dumps({
+            'rows': args.rows,
+            'mode': args.partition,
+            'workers': workers,
+            'seconds': round(seconds, 2),
+            'speedup': round(serial_s / seconds, 2),
+            'identical': bool(same),
+        }))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark the reconciliation stage against a chain of pandas merges.
+
+Builds --rows payroll rows plus an attendance upload, an ``employees`` export and
+per-employee history days with a share of injected holes (missing attendance,
+no enrollment, zero scans, history mismatch), then reports:
+
+  reconcile_s   ``reconciliation.reconcile`` (hash index lookups, one pass)
+  merge_s       the same features from successive left merges
+  peak_mb       tracemalloc peak of each variant
+
+and checks both produce identical features and the injected counts.
+
+Run from ml_service:
+  python scripts/bench_reconciliation.py --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from reconciliation import reconcile  # noqa: E402
+
+
+def synthesize(n, hole_rate, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = np.array([f'HIT{i:07d}' for i in range(n)])
+    days = rng.integers(10, 23, n).astype(float)
+    payroll = pd.DataFrame({'employee_id': ids, 'email': [f'{i.lower()}@hit.ac.zw' for i in ids],
+                            'Days_Present': days})
+    holes = {name: rng.random(n) < hole_rate for name in ('attendance', 'enroll', 'scans', 'history')}
+    attendance_ids = ids[~holes['attendance']]
+    employees = pd.DataFrame({
+        'employee_id': ids,
+        'email': payroll['email'],
+        'fingerprint_id': np.where(holes['enroll'], np.nan, np.arange(n, dtype=float)),
+        'biometric_logs': np.where(holes['scans'], 0, days * 2),
+    }).sample(frac=1, random_state=seed).reset_index(drop=True)
+    history = pd.Series(np.where(holes['history'], days - 5, days), index=ids)
+    expected = {
+        'No_Attendance_Record': int(holes['attendance'].sum()),
+        'Not_Enrolled': int(holes['enroll'].sum()),
+        'Attendance_Without_Scans': int((holes['scans'] & ~holes['enroll']).sum()),
+        'History_Days_Mismatch': int(holes['history'].sum()),
+    }
+    return payroll, attendance_ids, employees, history, expected
+
+
+def merged(payroll, attendance_ids, employees, history):
+    """Reference: successive left merges, one per source."""
+    df = payroll[['employee_id', 'Days_Present']].copy()
+    df = df.merge(pd.DataFrame({'employee_id': attendance_ids, '_att': 1}), on='employee_id', how='left')
+    df = df.merge(employees[['employee_id', 'fingerprint_id', 'biometric_logs']], on='employee_id', how='left')
+    df = df.merge(history.rename('_hist').rename_axis('employee_id').reset_index(), on='employee_id', how='left')
+    return pd.DataFrame({
+        'No_Attendance_Record': df['_att'].isna().astype(float),
+        'Not_Enrolled': df['fingerprint_id'].isna().astype(float),
+        'Attendance_Without_Scans': ((df['Days_Present'] > 0) & df['fingerprint_id'].notna()
+                                     & (df['biometric_logs'].fillna(0) == 0)).astype(float),
+        'History_Days_Mismatch': (df['Days_Present'] - df['_hist'].fillna(0)).abs(),
+    })
+
+
+def timed(fn):
+    """Result, wall time of a plain run, and tracemalloc peak (MB) of a second run."""
+    t = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--hole-rate', type=float, default=0.01)
+    args = parser.parse_args()
+
+    payroll, attendance_ids, employees, history, expected = synthesize(args.rows, args.hole_rate)
+    (features, summary), reconcile_s, reconcile_mb = timed(
+        lambda: reconcile(payroll, attendance_ids, employees, history))
+    reference, merge_s, merge_mb = timed(lambda: merged(payroll, attendance_ids, employees, history))
+
+    same = all(np.array_equal(features[c].to_numpy(), reference[c].to_numpy()) for c in reference)
+    counts_ok = all(summary[k] == v for k, v in expected.items())
+    print(json.dumps({
+        'rows': args.rows,
+        'reconcile_s': round(reconcile_s, 3),
+        'reconcile_peak_mb': round(reconcile_mb, 1),
+        'merge_s': round(merge_s, 3),
+        'merge_peak_mb': round(merge_mb, 1),
+        'expected': expected,
+        'check': 'OK' if same and counts_ok else 'FAILED',
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Parse cost of uploads through the header-signature schema cache (schema_inference.py).
+
+Writes a --rows payroll export in the shape of an HR system export (the
+EmployeeRecord fields under that system's headers, plus --extra columns the
+service never uses: bank details, addresses, cost codes, dates) and its
+attendance sheet, then times reading and merging the pair:
+
+  legacy   full parse with type inference of every column, then the header
+           rules over the merged columns (the path this replaces)
+  cold     first upload of the format: header row, sample inference, parse
+  warm     later uploads of the same format (--repeats, median)
+
+and checks that every path gives the same validated frame. A second export
+with a header the rules cannot map ('Staff No') and unlabelled email / phone
+columns shows the value sniffing and an override.
+
+Run from ml_service:
+  python scripts/bench_schema_inference.py --rows 200000 --extra 30
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+warnings.filterwarnings('ignore')
+
+import main  # noqa: E402
+from bench_parallel_scoring import payroll  # noqa: E402
+from memory_lean import validate_frame  # noqa: E402
+from schema_inference import SchemaCache, header_alias  # noqa: E402
+
+HEADERS = {'employee_id': 'Employee_ID', 'name': 'Full Name', 'department': 'Dept',
+           'email': 'Work Email', 'phone_number': 'Mobile Phone', 'salary': 'Monthly Salary'}
+
+
+def export(rows, extra, departments, seed=0):
+    rng = np.random.default_rng(seed)
+    df = payroll(rows, departments, seed).rename(columns=HEADERS)
+    for i in range(extra):
+        kind = i % 3
+        if kind == 0:
+            df[f'Cost Code {i}'] = rng.integers(1000, 9999, rows)
+        elif kind == 1:
+            df[f'Address Line {i}'] = pd.Series(rng.integers(1, 999, rows)).astype(str) + ' Samora Machel Ave'
+        else:
+            df[f'Effective Date {i}'] = '2025-01-31'
+    attendance = pd.DataFrame({'ID': df['Employee_ID'], 'Days Present': rng.integers(0, 23, rows),
+                               'Month': 'January', 'Year': 2025})
+    return df, attendance
+
+
+def csv_bytes(df):
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+
+def legacy(pay, att):
+    """Full parse, ID lookup per file, merge, then the header rules over every merged column."""
+    df_payroll, df_attendance = pd.read_csv(io.BytesIO(pay)), pd.read_csv(io.BytesIO(att))
+    pay_id = next(c for c in ('employee_id', 'Employee_ID', 'id', 'ID') if c in df_payroll.columns)
+    att_id = next(c for c in ('employee_id', 'Employee_ID', 'id', 'ID') if c in df_attendance.columns)
+    df = pd.merge(df_payroll.rename(columns={pay_id: 'employee_id'}),
+                  df_attendance.rename(columns={att_id: 'employee_id'}), on='employee_id', how='left')
+    col_map = {col: header_alias(col) for col in df.columns if header_alias(col) not in (None, 'Month', 'Year')}
+    return df.rename(columns=col_map)
+
+
+def cached(schemas, pay, att):
+    return main.merge_uploads(schemas.read(pay, 'payroll.csv'), schemas.read(att, 'attendance.csv'))[0]
+
+
+def timed(fn):
+    t = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--extra', type=int, default=30)
+    parser.add_argument('--departments', type=int, default=60)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    df, attendance = export(args.rows, args.extra, args.departments)
+    pay, att = csv_bytes(df), csv_bytes(attendance)
+    with tempfile.TemporaryDirectory() as tmp:
+        schemas = SchemaCache(os.path.join(tmp, 'schemas.json'))
+        old, legacy_s = timed(lambda: legacy(pay, att))
+        new, cold_s = timed(lambda: cached(schemas, pay, att))
+        warm = [timed(lambda: cached(schemas, pay, att))[1] for _ in range(args.repeats)]
+        old_valid, _ = validate_frame(old, main.EmployeeRecord)
+        new_valid, _ = validate_frame(new, main.EmployeeRecord)
+        pd.testing.assert_frame_equal(old_valid.reset_index(drop=True), new_valid.reset_index(drop=True), check_dtype=False)
+        print(json.dumps({
+            'rows': args.rows,
+            'columns': df.shape[1],
+            'mb': round(len(pay) / 1e6, 1),
+            'legacy_s': round(legacy_s, 3),
+            'cold_s': round(cold_s, 3),
+            'warm_s': round(statistics.median(warm), 3),
+            'speedup_warm': round(legacy_s / statistics.median(warm), 2),
+            'frame_mb': {'legacy': round(old.memory_usage(deep=True).sum() / 1e6, 1),
+                         'cached': round(new.memory_usage(deep=True).sum() / 1e6, 1)},
+            'hits': schemas.hits,
+            'misses': schemas.misses,
+            'validated_rows_equal': len(old_valid) == len(new_valid),
+        }))
+
+        # A format the header rules only partly map: sniffing, then a user override
+        odd = payroll(2000, args.departments, seed=1).rename(columns={
+            'employee_id': 'Staff No', 'email': 'Contact', 'phone_number': 'Cell', 'salary': 'Gross Salary'})
+        odd_bytes = csv_bytes(odd)
+        first = schemas.read(odd_bytes, 'odd.csv')
+        schemas.set_override(list(odd.columns), {'Staff No': 'employee_id'})
+        second = schemas.read(odd_bytes, 'odd.csv')
+        print(json.dumps({
+            'odd_format_columns_before_override': sorted(first.columns),
+            'odd_format_columns_after_override': sorted(second.columns),
+            'formats': [{k: f[k] for k in ('mapping', 'sniffed', 'unmapped', 'overridden')}
+                        for f in schemas.summary()['formats'][-1:]],
+        }))
+
+
+if __name__ == '__main__':
+    main_()
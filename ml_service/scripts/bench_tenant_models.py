@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Per-tenant models and their LRU cache (tenant_models.py, ?tenant=).
+
+Trains --tenants institutions on synthetic payrolls whose salary scales differ
+by up to 10^(tenants-1)x, each with train_and_save_model(model_dir=...,
+baseline=False) in a temporary tenants directory, plus one pooled model on all
+of them. Then:
+
+  detection    1% of each tenant's held-out rows get a salary 4x their
+               department's: share of them in the tenant's top 2% of anomaly
+               scores, per-tenant model vs the pooled model
+  cache        --requests tenant lookups drawn Zipf-like (a few tenants get
+               most requests) through an LRU that holds about --fit tenants:
+               hit rate (overall and over the first FIRST requests after a
+               restart), evictions and cold-load latency, without and with
+               preloading the most used tenants first
+  warm_get_us  a lookup of a cached tenant
+
+Run from ml_service:
+  python scripts/bench_tenant_models.py --tenants 6 --rows 5000 --requests 2000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+warnings.filterwarnings('ignore')
+
+import main  # noqa: E402
+from bench_parallel_scoring import payroll  # noqa: E402
+from tenant_models import TenantModels  # noqa: E402
+from train_model import train_and_save_model  # noqa: E402
+
+FIRST = 50  # requests after a restart that preloading serves
+
+
+def tenant_payroll(rows, departments, scale, seed):
+    df = payroll(rows, departments, seed)
+    df['salary'] = (df['salary'] * scale).round(2)
+    return df
+
+
+def with_ghosts(df, seed, share=0.01):
+    """``df`` with ``share`` of its rows paid 4x their department's mean; returns (frame, injected mask)."""
+    rng = np.random.default_rng(seed)
+    injected = rng.random(len(df)) < share
+    df = df.copy()
+    df.loc[injected, 'salary'] = (df.groupby('department')['salary'].transform('mean')[injected] * 4).round(2)
+    return df, injected
+
+
+def top_share(fitted, df, injected, top=0.02):
+    engineered = main.engineer_features(df)
+    anomaly = -fitted.decision_function(engineered[main.model_features(fitted)])
+    cutoff = np.quantile(anomaly, 1 - top)
+    return float((anomaly[injected] >= cutoff).mean())
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def stream(tenants, requests, seed):
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(tenants) + 1) ** 1.2
+    return list(rng.choice(tenants, requests, p=weights / weights.sum()))
+
+
+def run_cache(root, max_mb, lookups, preload):
+    cache = TenantModels(root, max_mb, usage_path=os.path.join(root, 'usage.json'))
+    if preload:
+        cache.usage.update(pd.Series(lookups).value_counts().to_dict())  # request counts of an earlier run
+        cache.preload()
+    first = min(FIRST, len(lookups))
+    first_hits = None
+    t = time.perf_counter()
+    for i, tenant in enumerate(lookups):
+        if i == first:
+            first_hits = cache.hits
+        cache.get(tenant)
+    elapsed = time.perf_counter() - t
+    if first_hits is None:  # no more than FIRST requests: they are all "first"
+        first_hits = cache.hits
+    stats = cache.stats()
+    return {k: stats[k] for k in ('hits', 'misses', 'hit_rate', 'evictions', 'cold_load_ms', 'cached_mb')} | {
+        'preloaded': preload, f'hit_rate_first_{FIRST}': first_hits / first if first else 0.0,
+        'requests_s': round(elapsed, 3)}, cache
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tenants', type=int, default=6)
+    parser.add_argument('--rows', type=int, default=5_000)
+    parser.add_argument('--departments', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=2_000)
+    parser.add_argument('--fit', type=int, default=3, help='tenants the cache bound holds')
+    args = parser.parse_args()
+
+    names = [f'inst{i}' for i in range(args.tenants)]
+    scales = {name: 10.0 ** i for i, name in enumerate(names)}
+    with tempfile.TemporaryDirectory() as root:
+        t = time.perf_counter()
+        train = {name: tenant_payroll(args.rows, args.departments, scales[name], seed=i) for i, name in enumerate(names)}
+        for name, df in train.items():
+            assert quiet(train_and_save_model, df, model_dir=os.path.join(root, name), baseline=False)
+        pooled_dir = os.path.join(root, '_pooled')
+        assert quiet(train_and_save_model, pd.concat(train.values(), ignore_index=True), model_dir=pooled_dir, baseline=False)
+        train_s = time.perf_counter() - t
+
+        probe = TenantModels(root, usage_path=os.path.join(root, 'usage.json'))
+        pooled = probe.load('_pooled').model
+        detection = {}
+        for i, name in enumerate(names):
+            held_out, injected = with_ghosts(tenant_payroll(args.rows, args.departments, scales[name], seed=100 + i), seed=i)
+            detection[name] = {
+                'tenant_model': round(top_share(probe.load(name).model, held_out, injected), 3),
+                'pooled_model': round(top_share(pooled, held_out, injected), 3),
+            }
+        print(json.dumps({'tenants': args.tenants, 'train_s': round(train_s, 2), 'top2pct_recall': detection}))
+
+        tenant_mb = probe.load(names[0]).nbytes / 1024 / 1024
+        lookups = stream(names, args.requests, seed=0)
+        for preload in (False, True):
+            result, cache = run_cache(root, tenant_mb * (args.fit + 0.5), lookups, preload)
+            print(json.dumps({'tenant_mb': round(tenant_mb, 2), 'fit': args.fit, **result}))
+        cache.get(names[0])
+        t = time.perf_counter()
+        for _ in range(10_000):
+            cache.get(names[0])
+        print(json.dumps({'warm_get_us': round((time.perf_counter() - t) / 10_000 * 1e6, 2)}))
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Check that the model is trained on the features /analyze scores with.
+
+Builds a synthetic payroll with missing contacts and shared emails and phones,
+a histories export and an ``employees`` export, then compares:
+
+  training   ``train_model.training_matrix`` over the raw frame (what
+             ``train_and_save_model`` fits on)
+  serving    ``featurize_frame`` over the same frame after /analyze's
+             validation, for an attendance sheet of the export's newest month
+
+Both must give the same matrix, column for column, for every feature the
+training adds (FEATURES, history and enrollment reconciliation). Exits
+non-zero on any difference.
+
+Run from ml_service:
+  python scripts/check_feature_parity.py --rows 5000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for p in (ROOT, os.path.join(ROOT, 'scripts')):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import main  # noqa: E402
+from bench_parallel_scoring import payroll  # noqa: E402
+from history_features import HistoryFeatureStore  # noqa: E402
+from memory_lean import validate_frame  # noqa: E402
+from train_model import FEATURES, training_matrix  # noqa: E402
+
+
+def synthesize(rows, seed=0):
+    """(payroll, histories events, employees export, attendance sheet) over the same ids."""
+    rng = np.random.default_rng(seed)
+    df = payroll(rows, 20, seed)[['employee_id', 'name', 'department', 'email', 'phone_number', 'salary']]
+    df = df.astype({'employee_id': str})
+    df.loc[rng.random(rows) < 0.1, 'email'] = None
+    df.loc[rng.random(rows) < 0.1, 'phone_number'] = None
+    shared = rng.choice(rows, rows // 50, replace=False)
+    df.loc[shared, 'email'] = df['email'].iloc[0]
+    df.loc[shared[::2], 'phone_number'] = df['phone_number'].iloc[1]
+
+    scanned = df['employee_id'].to_numpy()[rng.random(rows) < 0.8]
+    days = pd.date_range('2025-01-01', '2025-02-28', freq='B')
+    present = rng.random((len(scanned), len(days))) < 0.9
+    emp, day = np.nonzero(present)
+    events = pd.DataFrame({'employee_id': scanned[emp], 'ts': days[day].values + np.timedelta64(8, 'h')})
+
+    employees = pd.DataFrame({
+        'employee_id': df['employee_id'].to_numpy(),
+        'email': df['email'].to_numpy(),
+        'fingerprint_id': np.where(rng.random(rows) < 0.9, np.arange(rows, dtype=float), np.nan),
+        'biometric_logs': rng.integers(0, 40, rows).astype(float),
+    })
+    attendance = pd.DataFrame({'employee_id': df['employee_id'], 'Month': 'February', 'Year': 2025})
+    return df, events, employees, attendance
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=5_000)
+    args = parser.parse_args()
+
+    df, events, employees, attendance = synthesize(args.rows)
+    with tempfile.TemporaryDirectory() as root:
+        store = HistoryFeatureStore(root)
+        _, X_train, features = training_matrix(df, events, employees, FEATURES, store)
+        valid, errors = validate_frame(df, main.EmployeeRecord)
+        served, _ = main.featurize_frame(valid, attendance, employees, store=store)
+        X_served = served[features]
+
+    same_rows = len(valid) == len(df) and not errors
+    diff = {f: float(np.nanmax(np.abs(X_train[f].to_numpy(np.float64) - X_served[f].to_numpy(np.float64)), initial=0))
+            for f in features} if same_rows else {}
+    ok = same_rows and np.array_equal(X_train.to_numpy(np.float64), X_served.to_numpy(np.float64), equal_nan=True)
+    print(json.dumps({
+        'check': 'OK' if ok else 'FAILED',
+        'rows': args.rows,
+        'features': features,
+        'history_available': bool(served['History_Available'].all()),
+        'max_abs_diff': {f: d for f, d in diff.items() if d},
+    }))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main_()
@@ -0,0 +1,212 @@
+"""
+Per-institution models for one ML service (``?tenant=`` on /analyze, /retrain and the scoring endpoints).
+
+Institutions pay on salary scales that differ by orders of magnitude, so one
+IsolationForest over all of them blurs their anomalies together. Each tenant
+gets its own artifacts, written by ``/retrain?tenant=`` (train_model with
+``model_dir``) under ``model/tenants/<tenant>/``:
+
+  isolation_forest_model.pkl   the tenant's model, trained on its data only
+  score_calibration.json       percentiles and risk quantiles (score_calibration.py)
+  path_explainer.pkl           the built PathLengthExplainer (explain=fast)
+  drift_reference.npz          training sketches (drift_monitor.py)
+
+TenantModels keeps loaded tenants in an LRU bounded by TENANT_CACHE_MB (the
+artifacts' size on disk stands in for their memory), loads a missing tenant
+once even when requests for it arrive together, and counts hits, misses,
+evictions and cold-load latency. Request counts persist in
+``feature_store/tenant_usage.json``; at startup the most used tenants (and
+TENANT_PRELOAD) are loaded up to the memory bound. Requests without a tenant
+use the service's own model in ``model/``.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+import joblib
+import numpy as np
+
+from path_explainer import PathLengthExplainer
+from score_calibration import load_calibration
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TENANTS_DIR = os.path.join(BASE_DIR, 'model', 'tenants')
+USAGE_PATH = os.path.join(BASE_DIR, 'feature_store', 'tenant_usage.json')
+
+MODEL_FILE = 'isolation_forest_model.pkl'
+CALIBRATION_FILE = 'score_calibration.json'
+EXPLAINER_FILE = 'path_explainer.pkl'
+TENANT_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')  # tenant keys name directories
+
+# TENANT_CACHE_MB bounds the loaded tenants; TENANT_PRELOAD="hit,uz" loads these at startup besides the most used
+TENANT_CACHE_MB = float(os.environ.get('TENANT_CACHE_MB', '512'))
+TENANT_PRELOAD = [t.strip() for t in os.environ.get('TENANT_PRELOAD', '').split(',') if t.strip()]
+PRELOAD_TOP = int(os.environ.get('TENANT_PRELOAD_TOP', '8'))
+LOAD_SAMPLES = 1000  # cold-load latencies kept for the percentiles
+
+
+class TenantArtifacts:
+    """What one tenant's requests are scored with; explainers and the /score-scan state are built on first use."""
+
+    def __init__(self, tenant, model, calibration, explainers=None, nbytes=0):
+        self.tenant = tenant
+        self.model = model
+        self.calibration = calibration
+        self.explainers = {} if explainers is None else explainers
+        self.online_scorer = None
+        self.nbytes = nbytes
+
+
+def save_explainer(model, model_dir):
+    """Build the path-length explainer once at training time (a cold load then skips it)."""
+    joblib.dump(PathLengthExplainer(model), os.path.join(model_dir, EXPLAINER_FILE))
+
+
+class TenantModels:
+    """
+    LRU of loaded tenants:
+
+        served = tenants.get('hit')     # loads model/tenants/hit/ on a miss
+        tenants.invalidate('hit')       # after /retrain?tenant=hit
+    """
+
+    def __init__(self, root=TENANTS_DIR, max_mb=TENANT_CACHE_MB, usage_path=USAGE_PATH):
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.usage_path = usage_path
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}  # tenant -> lock held while it loads
+        self.hits = self.misses = self.evictions = 0
+        self.load_ms = deque(maxlen=LOAD_SAMPLES)
+        self.usage = Counter()
+        if os.path.exists(usage_path):
+            with open(usage_path) as f:
+                self.usage.update(json.load(f))
+
+    def path(self, tenant):
+        if not TENANT_PATTERN.match(tenant or ''):
+            raise ValueError(f"Invalid tenant {tenant!r}: use 1-64 letters, digits, '_' or '-'.")
+        return os.path.join(self.root, tenant)
+
+    def exists(self, tenant):
+        return os.path.exists(os.path.join(self.path(tenant), MODEL_FILE))
+
+    def known(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(t for t in os.listdir(self.root) if TENANT_PATTERN.match(t) and self.exists(t))
+
+    def load(self, tenant):
+        """The tenant's artifacts read from disk (KeyError when it has no model)."""
+        directory = self.path(tenant)
+        if not self.exists(tenant):
+            raise KeyError(f"No model for tenant {tenant!r}; train one with POST /retrain?tenant={tenant}.")
+        model = joblib.load(os.path.join(directory, MODEL_FILE))
+        explainers = {}
+        if os.path.exists(os.path.join(directory, EXPLAINER_FILE)):
+            explainers['fast'] = joblib.load(os.path.join(directory, EXPLAINER_FILE))
+        nbytes = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        return TenantArtifacts(tenant, model, load_calibration(os.path.join(directory, CALIBRATION_FILE)), explainers, nbytes)
+
+    def get(self, tenant):
+        self.path(tenant)  # validates the key
+        with self._lock:
+            served = self._cache.get(tenant)
+            if served is not None:
+                self._cache.move_to_end(tenant)
+                self.hits += 1
+                self.usage[tenant] += 1
+                return served
+            loading = self._loading.setdefault(tenant, threading.Lock())
+        # Major step: one load per tenant; concurrent requests for it wait for that load
+        with loading:
+            with self._lock:
+                served = self._cache.get(tenant)
+                if served is not None:
+                    self.hits += 1
+                    self.usage[tenant] += 1
+                    return served
+            t = time.perf_counter()
+            try:
+                served = self.load(tenant)
+            except Exception:
+                with self._lock:
+                    self._loading.pop(tenant, None)
+                raise
+            with self._lock:
+                self.misses += 1
+                self.usage[tenant] += 1
+                self.load_ms.append((time.perf_counter() - t) * 1000)
+                self._insert(tenant, served)
+                self._loading.pop(tenant, None)
+        self.save_usage()
+        return served
+
+    def _insert(self, tenant, served):
+        self._cache[tenant] = served
+        self._cache.move_to_end(tenant)
+        # Least recently used tenants go first; the one just loaded always stays
+        while len(self._cache) > 1 and sum(a.nbytes for a in self._cache.values()) > self.max_bytes:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, tenant):
+        with self._lock:
+            self._cache.pop(tenant, None)
+
+    def preload(self, tenants=None):
+        """
+        Load ``tenants`` (default: TENANT_PRELOAD, then the most used known
+        tenants) while they fit the bound. Returns the tenants loaded.
+        """
+        if tenants is None:
+            known = set(self.known())
+            hot = [t for t, _ in self.usage.most_common() if t in known]
+            tenants = list(dict.fromkeys([t for t in TENANT_PRELOAD if t in known] + hot[:PRELOAD_TOP]))
+        loaded = []
+        for tenant in tenants:
+            with self._lock:
+                if tenant in self._cache:
+                    continue
+                used = sum(a.nbytes for a in self._cache.values())
+            served = self.load(tenant)
+            if used and used + served.nbytes > self.max_bytes:
+                break  # preloading never evicts
+            with self._lock:
+                self._insert(tenant, served)
+            loaded.append(tenant)
+        return loaded
+
+    def save_usage(self):
+        os.makedirs(os.path.dirname(self.usage_path), exist_ok=True)
+        with self._lock:
+            usage = dict(self.usage)
+        tmp = self.usage_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(usage, f)
+        os.replace(tmp, self.usage_path)
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            load_ms = np.array(self.load_ms)
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / requests, 4) if requests else None,
+                'evictions': self.evictions,
+                'cold_load_ms': {
+                    'count': len(load_ms),
+                    'p50': round(float(np.percentile(load_ms, 50)), 2) if len(load_ms) else None,
+                    'p95': round(float(np.percentile(load_ms, 95)), 2) if len(load_ms) else None,
+                    'max': round(float(load_ms.max()), 2) if len(load_ms) else None,
+                },
+                'cached': list(self._cache),
+                'cached_mb': round(sum(a.nbytes for a in self._cache.values()) / 1024 / 1024, 2),
+                'max_mb': round(self.max_bytes / 1024 / 1024, 2),
+                'usage': dict(self.usage.most_common(20)),
+            }
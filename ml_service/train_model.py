@@ -2,84 +2,124 @@ import numpy as np
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 import joblib
+import json
 import os
 
+from drift_monitor import REFERENCE_PATH, DriftSketches
+from features import featurize_frame
+from history_features import HISTORY_FEATURES, HistoryFeatureStore
+from score_calibration import ScoreCalibration
+from tenant_models import CALIBRATION_FILE, MODEL_FILE, save_explainer
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def engineer_features(df_in):
-    df_engineered = df_in.copy()
-    
-    df_engineered['email_filled'] = df_engineered['email'].astype(object)
-    mask_email = df_engineered['email_filled'].isna()
-    df_engineered.loc[mask_email, 'email_filled'] = 'unknown_email_' + df_engineered.index[mask_email].astype(str)
-    
-    df_engineered['phone_filled'] = df_engineered['phone_number'].astype(object)
-    mask_phone = df_engineered['phone_filled'].isna()
-    df_engineered.loc[mask_phone, 'phone_filled'] = 'unknown_phone_' + df_engineered.index[mask_phone].astype(str)
-    
-    # 1. Email Collisions
-    email_counts = df_engineered['email_filled'].value_counts().to_dict()
-    df_engineered['Email_Collision_Count'] = df_engineered['email_filled'].map(email_counts)
-    
-    # 2. Phone Collisions
-    phone_counts = df_engineered['phone_filled'].value_counts().to_dict()
-    df_engineered['Phone_Collision_Count'] = df_engineered['phone_filled'].map(phone_counts)
+FEATURES = [
+    'salary', 'Email_Collision_Count', 'Phone_Collision_Count',
+    'Department_Salary_Variance', 'Profile_Completeness_Percentage',
+    'Near_Duplicate_Count',
+]
 
-    # 3. Department Salary Variance
-    dept_avg_salary = df_engineered.groupby('department')['salary'].transform('mean')
-    df_engineered['Department_Salary_Variance'] = abs(df_engineered['salary'] - dept_avg_salary) / dept_avg_salary
-    df_engineered['Department_Salary_Variance'] = df_engineered['Department_Salary_Variance'].fillna(0)
-    
-    # 4. Profile Completeness
-    essential_cols = ['name', 'department', 'email', 'phone_number', 'salary']
-    missing_count = df_engineered[essential_cols].isnull().sum(axis=1)
-    df_engineered['Profile_Completeness_Percentage'] = 100 - (missing_count / len(essential_cols) * 100)
-    
-    df_engineered['salary'] = df_engineered['salary'].fillna(0)
-    
-    return df_engineered
+# IsolationForest settings; model_search.py --write-params saves tuned ones (and a FEATURES subset) next to the model
+PARAMS_FILE = 'model_params.json'
+DEFAULT_PARAMS = {'n_estimators': 100, 'max_samples': 'auto', 'contamination': 0.05, 'random_state': 42}
+
+def model_params(model_dir=None):
+    """DEFAULT_PARAMS and FEATURES, overridden by ``model_params.json`` in ``model_dir`` (default ``model/``)."""
+    params = {**DEFAULT_PARAMS, 'features': list(FEATURES)}
+    path = os.path.join(model_dir or os.path.join(BASE_DIR, 'model'), PARAMS_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+        params.update({k: saved[k] for k in params if k in saved})
+    return params
+
+def training_matrix(df, history_events=None, employees_df=None, features=None, history_store=None):
+    """
+    (engineered frame, X, feature names) the model is trained on: ``featurize_frame``,
+    the function /analyze scores uploads with, over ``df``. ``features`` (default
+    FEATURES) gains the history features with ``history_events`` (ingested into
+    ``history_store``, default: the service's) and the enrollment reconciliation
+    features with ``employees_df``.
+    """
+    features = list(FEATURES if features is None else features)
+    store = history_store or HistoryFeatureStore()
+    period = None
+    if history_events is not None:
+        store.ingest(history_events)
+        # The window ends at the export's newest month, as for an upload of that month
+        period = str(history_events['ts'].values.astype('datetime64[M]').max())
+        features += HISTORY_FEATURES
+    if employees_df is not None:
+        features += ['Not_Enrolled', 'Attendance_Without_Scans']
+    engineered, _ = featurize_frame(df, employees=employees_df, store=store, period=period,
+                                    near_duplicates='Near_Duplicate_Count' in features)
+    return engineered, engineered[features], features
 
-def train_and_save_model(additional_data_df=None):
-    os.makedirs(os.path.join(BASE_DIR, 'model'), exist_ok=True)
+def train_and_save_model(additional_data_df=None, history_events=None, employees_df=None, risk_quantiles=None,
+                         model_dir=None, baseline=True, params=None, history_store=None):
+    """
+    Train on the baseline CSVs (plus ``additional_data_df``). With ``history_events``
+    (see ``history_features.read_history_export``) the model also learns the
+    attendance history features; with ``employees_df`` (see
+    ``reconciliation.read_employees_export``) the enrollment reconciliation
+    features. /analyze then computes them for every upload. ``risk_quantiles``
+    (``{'Medium': 0.95, 'High': 0.99}``) overrides RISK_QUANTILES for the saved
+    score calibration.
+
+    ``model_dir`` (default ``model/``) receives every artifact; a tenant's
+    directory (see tenant_models.py) is trained with ``baseline=False``, on
+    ``additional_data_df`` alone. ``params`` override ``model_params(model_dir)``;
+    ``history_store`` (default: the service's) receives the history months.
+    """
+    model_dir = model_dir or os.path.join(BASE_DIR, 'model')
+    os.makedirs(model_dir, exist_ok=True)
     
-    print("Loading baseline datasets...")
     try:
-        df1 = pd.read_csv('/home/user/Documents/Calling/Rose/test_data.csv')
-        df2 = pd.read_csv('/home/user/Documents/Calling/Rose/test_data2.csv')
-        
-        # Standardize column names
-        df1 = df1.rename(columns={'date_of_hiring': 'hire_date', 'job_title': 'job_titles'})
-        
         common_cols = ['employee_id', 'name', 'department', 'email', 'phone_number', 'salary']
-        df = pd.concat([df1[common_cols], df2[common_cols]], ignore_index=True)
+        frames = []
+        if baseline:
+            print("Loading baseline datasets...")
+            df1 = pd.read_csv('/home/user/Documents/Calling/Rose/test_data.csv')
+            df2 = pd.read_csv('/home/user/Documents/Calling/Rose/test_data2.csv')
+
+            # Standardize column names
+            df1 = df1.rename(columns={'date_of_hiring': 'hire_date', 'job_title': 'job_titles'})
+            frames += [df1[common_cols], df2[common_cols]]
         
         if additional_data_df is not None:
              print("Appending additional retraining data...")
              # Standardize if needed and keep common cols
              if 'date_of_hiring' in additional_data_df.columns:
                  additional_data_df = additional_data_df.rename(columns={'date_of_hiring': 'hire_date'})
-             df = pd.concat([df, additional_data_df[common_cols]], ignore_index=True)
+             frames.append(additional_data_df[common_cols])
+        df = pd.concat(frames, ignore_index=True)
              
     except Exception as e:
         print(f"Error loading data: {e}")
         return False
         
     print("Engineering features...")
-    train_data_engineered = engineer_features(df)
-    
-    features = [
-        'salary', 'Email_Collision_Count', 'Phone_Collision_Count',
-        'Department_Salary_Variance', 'Profile_Completeness_Percentage'
-    ]
-    
-    X_train = train_data_engineered[features]
+    params = {**model_params(model_dir), **(params or {})}
+    train_data_engineered, X_train, features = training_matrix(
+        df, history_events, employees_df, params.pop('features'), history_store)
     
     print(f"Training Isolation Forest on {len(X_train)} records...")
-    iso_forest = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
+    iso_forest = IsolationForest(**params)
     iso_forest.fit(X_train)
     
-    MODEL_PATH = os.path.join(BASE_DIR, 'model', 'isolation_forest_model.pkl')
+    MODEL_PATH = os.path.join(model_dir, MODEL_FILE)
     joblib.dump(iso_forest, MODEL_PATH)
+    save_explainer(iso_forest, model_dir)
+
+    train_scores = iso_forest.decision_function(X_train)
+
+    # Score-to-percentile lookup and risk thresholds for serving (see score_calibration.py)
+    ScoreCalibration.fit(-train_scores, risk_quantiles).save(os.path.join(model_dir, CALIBRATION_FILE))
+
+    # Reference sketches of the training data for /drift (see drift_monitor.py)
+    reference = DriftSketches(features)
+    reference.observe(train_data_engineered, X_train, train_scores)
+    reference.save(os.path.join(model_dir, os.path.basename(REFERENCE_PATH)))
     
     print(f"✅ Isolation Forest model saved to {MODEL_PATH}!")
     return True
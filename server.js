@@ -201,12 +201,25 @@ const Report = mongoose.model('Report', ReportSchema);
 const HistorySchema = new mongoose.Schema({
     employeeId: { type: String, required: true },
     month: String,
+    date: String, // local calendar day (YYYY-MM-DD) a Present row counts
     attendance: Number,
     riskScore: Number,
     status: String
 }, { timestamps: true });
 const History = mongoose.model('History', HistorySchema);
 
+// Whether a Present row already counts ``day`` (rows from before ``date`` was stored: by createdAt)
+const presentOnDay = async (employeeId, day) => {
+    const start = new Date(`${day}T00:00:00`);
+    const end = new Date(start.getTime());
+    end.setDate(end.getDate() + 1);
+    return Boolean(await History.exists({
+        employeeId,
+        status: 'Present',
+        $or: [{ date: day }, { date: { $exists: false }, createdAt: { $gte: start, $lt: end } }]
+    }));
+};
+
 // SSE Clients Array
 let clients = [];
 
@@ -317,6 +330,7 @@ app.post('/api/attendance/manual', authenticate, authorize(ROLES.HR), requireFie
         await new History({
             employeeId: employee.employeeId,
             month: new Date().toLocaleString('default', { month: 'long' }),
+            date: today,
             attendance: employee.attendanceDays,
             riskScore: employee.anomalyScore,
             status: 'Present'
@@ -570,17 +584,30 @@ app.patch('/api/employees/enroll-fingerprint-by-email', authenticate, authorize(
 // ATTENDANCE: Mark present when a finger is scanned by the Pico W / Python bridge
 app.post('/api/attendance/scan', authenticate, authorize(ROLES.HR), requireFields('fingerprintId'), asyncHandler(async (req, res) => {
     try {
-        const { fingerprintId } = req.body;
+        const { fingerprintId, capturedAt } = req.body;
 
         const employee = await Employee.findOne({ fingerprintId });
         if (!employee) return res.status(404).json({ error: 'Fingerprint not recognized' });
 
-        // One counted present per local calendar day (YYYY-MM-DD)
-        const today = new Date().toLocaleDateString('en-CA');
-        const alreadyToday = employee.lastAttendanceDate === today;
+        // Bridge outbox replays carry the original capture time; ignore invalid or future values
+        const now = new Date();
+        const captured = capturedAt ? new Date(capturedAt) : null;
+        const scannedAt = captured && !Number.isNaN(captured.getTime()) && captured <= now ? captured : now;
+
+        // One counted present per local calendar day (YYYY-MM-DD), judged on the scan's own day:
+        // a replayed scan older than the last counted day checks that day's history row
+        const scanDay = scannedAt.toLocaleDateString('en-CA');
+        const lastDay = employee.lastAttendanceDate;
+        let alreadyToday = lastDay === scanDay;
+        if (!alreadyToday && lastDay && scanDay < lastDay) {
+            alreadyToday = await presentOnDay(employee.employeeId, scanDay);
+        }
 
         employee.biometricLogs = (employee.biometricLogs || 0) + 1;
-        employee.lastActive = new Date();
+        // Out-of-order scans (Pico flush, second device) never move lastActive backwards
+        if (!employee.lastActive || scannedAt > new Date(employee.lastActive)) {
+            employee.lastActive = scannedAt;
+        }
 
         if (alreadyToday) {
             await employee.save();
@@ -596,13 +623,16 @@ app.post('/api/attendance/scan', authenticate, authorize(ROLES.HR), requireField
             });
         }
 
-        employee.lastAttendanceDate = today;
+        if (!lastDay || scanDay > lastDay) {
+            employee.lastAttendanceDate = scanDay;
+        }
         employee.attendanceDays = (employee.attendanceDays || 0) + 1;
         await employee.save();
 
         const newHistory = new History({
             employeeId: employee.employeeId,
-            month: new Date().toLocaleString('default', { month: 'long' }),
+            month: scannedAt.toLocaleString('default', { month: 'long' }),
+            date: scanDay,
             attendance: employee.attendanceDays,
             riskScore: employee.anomalyScore,
             status: 'Present'
@@ -576,11 +576,24 @@ const FingerprintDashboard = () => {
 
   useEffect(() => { load(); }, [load]);
 
+  // Live feed: scans pushed by the fingerprint API (SSE); polling only while the stream is down
   useEffect(() => {
     loadRecentScans();
-    const id = setInterval(loadRecentScans, 5000);
-    return () => clearInterval(id);
-  }, [loadRecentScans]);
+    let pollId = null;
+    const startPolling = () => { if (!pollId) pollId = setInterval(loadRecentScans, 5000); };
+    const stopPolling = () => { clearInterval(pollId); pollId = null; };
+    if (typeof EventSource === 'undefined') {
+      startPolling();
+      return stopPolling;
+    }
+    const source = new EventSource('/fingerprint-api/events');
+    source.onopen = () => { stopPolling(); loadRecentScans(); };
+    source.onerror = startPolling;  // EventSource keeps reconnecting on its own
+    source.addEventListener('scan', loadRecentScans);
+    source.addEventListener('enrolled', load);
+    source.addEventListener('resync', () => { load(); loadRecentScans(); });
+    return () => { source.close(); stopPolling(); };
+  }, [load, loadRecentScans]);
 
   const handleEnrolled = async (msg) => {
     setEnrollOpen(false);